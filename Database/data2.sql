@@ -234,5 +234,49 @@ SET @RecipientId = SCOPE_IDENTITY();
 INSERT INTO Request (recipient_id, units_required, units_collected, status, blood_type, date_requested, date_fulfilled, approved_by)
 VALUES (@RecipientId, 2, 2, 'Fulfilled', (SELECT bloodtype_id FROM Blood_Type WHERE type = 'AB+'), DATEADD(day, -10, GETDATE()), DATEADD(day, -9, GETDATE()), @ManagerId);
 
+-- ==========================================================
+-- DERIVED DATA (Database/migrations/001, 002, 004, 006, 007, 008, 009)
+-- ==========================================================
+-- Stock and Notifications rows above are inserted directly, bypassing
+-- db.py, so fill in the denormalized FIFO columns, rebuild the
+-- materialized per-(Area, Blood Type) totals from Stock, recount
+-- each user's unread notifications, rebuild the donor search index,
+-- set the coordinates of the seeded areas, each donor's last
+-- donation / eligible-from date and each bag's expiry and the
+-- per-expiry-day totals.
+IF COL_LENGTH('Stock', 'blood_type') IS NOT NULL
+    -- Dynamic SQL: the columns only exist once migration 002 has run
+    EXEC(N'UPDATE s SET blood_type = dc.blood_type, received_at = dc.donation_date
+           FROM Stock s JOIN Donation_Completed dc ON s.donation_id = dc.id
+           WHERE s.blood_type IS NULL OR s.received_at IS NULL');
+
+IF OBJECT_ID('Inventory_Summary', 'U') IS NOT NULL
+BEGIN
+    DELETE FROM Inventory_Summary;
+    INSERT INTO Inventory_Summary (area_id, blood_type, units)
+    SELECT s.area_id, dc.blood_type, SUM(s.units)
+    FROM Stock s
+    JOIN Donation_Completed dc ON s.donation_id = dc.id
+    WHERE s.area_id IS NOT NULL
+    GROUP BY s.area_id, dc.blood_type;
+END
+
+IF COL_LENGTH('dbo.[User]', 'unread_notifications') IS NOT NULL
+    EXEC(N'UPDATE u SET unread_notifications = (SELECT COUNT(*) FROM Notifications n
+                                                WHERE n.user_id = u.id AND n.is_read = 0)
+           FROM [User] u');
+
+IF OBJECT_ID('Rebuild_Donor_Name_Index', 'P') IS NOT NULL
+    EXEC Rebuild_Donor_Name_Index;
+
+IF OBJECT_ID('Set_Area_Coordinates', 'P') IS NOT NULL
+    EXEC Set_Area_Coordinates;
+
+IF OBJECT_ID('Backfill_Donor_Eligibility', 'P') IS NOT NULL
+    EXEC Backfill_Donor_Eligibility;
+
+IF OBJECT_ID('Rebuild_Inventory_Buckets', 'P') IS NOT NULL
+    EXEC Rebuild_Inventory_Buckets;
+
 PRINT 'Expanded demo data inserted successfully.';
 GO
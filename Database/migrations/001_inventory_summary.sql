@@ -0,0 +1,38 @@
+-- ==========================================================
+-- MIGRATION 001 - MATERIALIZED INVENTORY LEDGER
+-- ==========================================================
+-- Inventory_Summary keeps the current units per (Area, Blood Type)
+-- so the inventory page and stock checks are point reads instead of
+-- SUM() over Stock JOIN Donation_Completed.
+--
+-- Maintained by db.py inside submit_donation_transaction and
+-- consume_stock (used by fulfill_request_transaction and exchanges).
+-- Rebuild / drift report: flask --app run reconcile-inventory
+
+USE BloodLink;
+GO
+
+IF OBJECT_ID('Inventory_Summary', 'U') IS NULL
+BEGIN
+    CREATE TABLE Inventory_Summary (
+        area_id INT NOT NULL,
+        blood_type INT NOT NULL,
+        units INT NOT NULL DEFAULT 0 CHECK (units >= 0),
+
+        PRIMARY KEY (area_id, blood_type),
+        FOREIGN KEY (area_id) REFERENCES Area(id) ON DELETE CASCADE,
+        FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id) ON DELETE CASCADE
+    );
+END
+GO
+
+-- Backfill from current physical stock
+DELETE FROM Inventory_Summary;
+
+INSERT INTO Inventory_Summary (area_id, blood_type, units)
+SELECT s.area_id, dc.blood_type, SUM(s.units)
+FROM Stock s
+JOIN Donation_Completed dc ON s.donation_id = dc.id
+WHERE s.area_id IS NOT NULL
+GROUP BY s.area_id, dc.blood_type;
+GO
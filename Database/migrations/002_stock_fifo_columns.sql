@@ -0,0 +1,38 @@
+-- ==========================================================
+-- MIGRATION 002 - DENORMALIZED STOCK FOR FIFO CONSUMPTION
+-- ==========================================================
+-- Copies blood_type and the donation date (received_at) onto Stock
+-- so consume_stock can take the oldest bags straight from a covering
+-- index, without joining Donation_Completed and sorting every bag.
+
+USE BloodLink;
+GO
+
+IF COL_LENGTH('Stock', 'blood_type') IS NULL
+    ALTER TABLE Stock ADD blood_type INT NULL;
+GO
+
+IF COL_LENGTH('Stock', 'received_at') IS NULL
+    ALTER TABLE Stock ADD received_at DATETIME NULL;
+GO
+
+IF OBJECT_ID('FK_Stock_Blood_Type', 'F') IS NULL
+    ALTER TABLE Stock ADD CONSTRAINT FK_Stock_Blood_Type
+        FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id);
+GO
+
+-- Backfill existing bags from their donation
+UPDATE s
+SET blood_type = dc.blood_type,
+    received_at = dc.donation_date
+FROM Stock s
+JOIN Donation_Completed dc ON s.donation_id = dc.id
+WHERE s.blood_type IS NULL OR s.received_at IS NULL;
+GO
+
+-- Covering index: FIFO seek on (area, type) in received order, units included
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Stock_Area_Type_Received' AND object_id = OBJECT_ID('Stock'))
+    CREATE INDEX IX_Stock_Area_Type_Received
+        ON Stock (area_id, blood_type, received_at)
+        INCLUDE (units);
+GO
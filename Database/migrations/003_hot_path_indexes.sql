@@ -0,0 +1,40 @@
+-- ==========================================================
+-- MIGRATION 003 - INDEXES FOR HOT LOOKUP PREDICATES
+-- ==========================================================
+-- create.sql only has primary keys and UNIQUE constraints. These
+-- indexes cover the filters/sorts db.py runs on every page view.
+-- Verify with: flask --app run check-query-plans
+
+USE BloodLink;
+GO
+
+-- Eligibility (last donation) and donor history pages
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Donation_Completed_Donor_Date' AND object_id = OBJECT_ID('Donation_Completed'))
+    CREATE INDEX IX_Donation_Completed_Donor_Date
+        ON Donation_Completed (donor_id, donation_date DESC)
+        INCLUDE (units, is_exchange);
+GO
+
+-- Unread badge count and notification lists
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Notifications_User_Read_Created' AND object_id = OBJECT_ID('Notifications'))
+    CREATE INDEX IX_Notifications_User_Read_Created
+        ON Notifications (user_id, is_read, created_at DESC);
+GO
+
+-- Active (Pending/Approved) request lists
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Request_Status_Date' AND object_id = OBJECT_ID('Request'))
+    CREATE INDEX IX_Request_Status_Date
+        ON Request (status, date_requested);
+GO
+
+-- Recipient dashboard request history
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Request_Recipient_Date' AND object_id = OBJECT_ID('Request'))
+    CREATE INDEX IX_Request_Recipient_Date
+        ON Request (recipient_id, date_requested);
+GO
+
+-- Donor filters by blood type / availability (approvals, broadcasts, donor list)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Donor_Bloodtype_Availability' AND object_id = OBJECT_ID('Donor'))
+    CREATE INDEX IX_Donor_Bloodtype_Availability
+        ON Donor (bloodtype, availability);
+GO
@@ -0,0 +1,27 @@
+-- ==========================================================
+-- MIGRATION 004 - MAINTAINED UNREAD NOTIFICATION COUNTER
+-- ==========================================================
+-- [User].unread_notifications replaces COUNT(*) over Notifications
+-- for the navigation badge and dashboards. db.py increments it with
+-- every notification insert and decrements it when notifications are
+-- marked read, in the same transaction.
+
+USE BloodLink;
+GO
+
+IF COL_LENGTH('dbo.[User]', 'unread_notifications') IS NULL
+    ALTER TABLE [User] ADD unread_notifications INT NOT NULL
+        CONSTRAINT DF_User_unread_notifications DEFAULT 0;
+GO
+
+-- Backfill from existing notifications
+UPDATE u
+SET unread_notifications = ISNULL(n.unread, 0)
+FROM [User] u
+LEFT JOIN (
+    SELECT user_id, COUNT(*) as unread
+    FROM Notifications
+    WHERE is_read = 0
+    GROUP BY user_id
+) n ON n.user_id = u.id;
+GO
@@ -0,0 +1,55 @@
+-- ==========================================================
+-- MIGRATION 005 - DURABLE BACKGROUND JOB QUEUE
+-- ==========================================================
+-- Jobs holds work that runs off the request path (notification
+-- fan-out, broadcasts). Worker threads in jobs.py claim rows with
+-- READPAST/UPDLOCK so several workers and processes never take
+-- the same job.
+--
+-- status:     Queued -> Running -> Done | Failed (after max_attempts)
+-- run_after:  when the job may next be claimed. While Running it is
+--             the lease expiry: a worker that dies leaves a Running
+--             job that becomes claimable again once the lease lapses.
+-- checkpoint: handler resume state (JSON), saved in the same
+--             transaction as the work it describes.
+
+USE BloodLink;
+GO
+
+IF OBJECT_ID('Jobs', 'U') IS NULL
+BEGIN
+    CREATE TABLE Jobs (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        kind NVARCHAR(50) NOT NULL,
+        payload NVARCHAR(MAX) NOT NULL,
+        idempotency_key NVARCHAR(200) NULL,
+        status NVARCHAR(20) NOT NULL DEFAULT 'Queued'
+            CHECK (status IN ('Queued', 'Running', 'Done', 'Failed')),
+        attempts INT NOT NULL DEFAULT 0,
+        max_attempts INT NOT NULL DEFAULT 5,
+        run_after DATETIME NOT NULL DEFAULT GETDATE(),
+        locked_by NVARCHAR(100) NULL,
+        progress_done INT NOT NULL DEFAULT 0,
+        progress_total INT NULL,
+        checkpoint NVARCHAR(MAX) NULL,
+        result NVARCHAR(MAX) NULL,
+        last_error NVARCHAR(MAX) NULL,
+        created_at DATETIME NOT NULL DEFAULT GETDATE(),
+        updated_at DATETIME NOT NULL DEFAULT GETDATE(),
+        finished_at DATETIME NULL
+    );
+END
+GO
+
+-- Enqueueing the same logical job twice returns the existing row
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_Jobs_Idempotency_Key')
+    CREATE UNIQUE INDEX UX_Jobs_Idempotency_Key
+    ON Jobs (idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
+GO
+
+-- Claim query: status IN ('Queued', 'Running') AND run_after <= GETDATE()
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Jobs_Status_Run_After')
+    CREATE INDEX IX_Jobs_Status_Run_After
+    ON Jobs (status, run_after);
+GO
@@ -0,0 +1,113 @@
+-- ==========================================================
+-- MIGRATION 006 - DONOR SEARCH INDEX (name n-grams, phone)
+-- ==========================================================
+-- Donor lookup used WHERE name LIKE '%term%', which scans Donor.
+-- Names are now indexed by word (see donor_search.py):
+--
+-- Name_Token:       vocabulary of lower-case name words
+-- Name_Token_Gram:  trigrams of each word, for fuzzy matching
+-- Donor_Name_Token: which donors' names contain which word
+--
+-- db.py maintains the rows on register and profile update.
+-- Rebuild_Donor_Name_Index backfills them here and after the
+-- seed scripts; `flask --app run reindex-donor-search` rebuilds
+-- them with the application's own tokenizer.
+--
+-- Donor.number_digits is the phone number without separators,
+-- so a phone prefix lookup is an index seek.
+
+USE BloodLink;
+GO
+
+IF OBJECT_ID('Name_Token', 'U') IS NULL
+BEGIN
+    CREATE TABLE Name_Token (
+        id INT IDENTITY(1,1) PRIMARY KEY,
+        token NVARCHAR(50) NOT NULL UNIQUE
+    );
+END
+GO
+
+IF OBJECT_ID('Name_Token_Gram', 'U') IS NULL
+BEGIN
+    CREATE TABLE Name_Token_Gram (
+        gram NVARCHAR(3) NOT NULL,
+        token_id INT NOT NULL,
+        PRIMARY KEY (gram, token_id),
+        FOREIGN KEY (token_id) REFERENCES Name_Token(id) ON DELETE CASCADE
+    );
+END
+GO
+
+IF OBJECT_ID('Donor_Name_Token', 'U') IS NULL
+BEGIN
+    CREATE TABLE Donor_Name_Token (
+        token_id INT NOT NULL,
+        donor_id INT NOT NULL,
+        PRIMARY KEY (token_id, donor_id),
+        FOREIGN KEY (token_id) REFERENCES Name_Token(id) ON DELETE CASCADE,
+        FOREIGN KEY (donor_id) REFERENCES Donor(id) ON DELETE CASCADE
+    );
+END
+GO
+
+-- Re-indexing one donor deletes its postings by donor
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Donor_Name_Token_Donor' AND object_id = OBJECT_ID('Donor_Name_Token'))
+    CREATE INDEX IX_Donor_Name_Token_Donor
+        ON Donor_Name_Token (donor_id);
+GO
+
+IF COL_LENGTH('Donor', 'number_digits') IS NULL
+    ALTER TABLE Donor ADD number_digits AS
+        CAST(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(number, '-', ''), ' ', ''), '+', ''), '(', ''), ')', '') AS NVARCHAR(20)) PERSISTED;
+GO
+
+-- Phone prefix lookup: number_digits LIKE '0300%'
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Donor_Number_Digits' AND object_id = OBJECT_ID('Donor'))
+    CREATE INDEX IX_Donor_Number_Digits
+        ON Donor (number_digits);
+GO
+
+-- Full rebuild from Donor.name: words split on spaces and common
+-- punctuation, lower-cased, trigrams of '  ' + word + ' '
+IF OBJECT_ID('Rebuild_Donor_Name_Index', 'P') IS NOT NULL
+    DROP PROCEDURE Rebuild_Donor_Name_Index;
+GO
+
+CREATE PROCEDURE Rebuild_Donor_Name_Index
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DELETE FROM Donor_Name_Token;
+    DELETE FROM Name_Token_Gram;
+    DELETE FROM Name_Token;
+
+    SELECT DISTINCT d.id AS donor_id, LOWER(LEFT(s.value, 50)) AS token
+    INTO #Donor_Words
+    FROM Donor d
+    CROSS APPLY STRING_SPLIT(
+        REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(d.name, '.', ' '), ',', ' '), '-', ' '), '''', ' '), '_', ' '), '/', ' '),
+        ' ') s
+    WHERE s.value <> '';
+
+    INSERT INTO Name_Token (token)
+    SELECT DISTINCT token FROM #Donor_Words;
+
+    INSERT INTO Donor_Name_Token (token_id, donor_id)
+    SELECT DISTINCT t.id, w.donor_id
+    FROM #Donor_Words w
+    JOIN Name_Token t ON t.token = w.token;
+
+    INSERT INTO Name_Token_Gram (gram, token_id)
+    SELECT DISTINCT SUBSTRING(N'  ' + t.token + N' ', n.n, 3), t.id
+    FROM Name_Token t
+    JOIN (SELECT TOP 51 ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) AS n FROM sys.all_objects) n
+        ON n.n <= LEN(t.token) + 1;
+
+    DROP TABLE #Donor_Words;
+END
+GO
+
+EXEC Rebuild_Donor_Name_Index;
+GO
@@ -0,0 +1,49 @@
+-- ==========================================================
+-- MIGRATION 007 - AREA COORDINATES (donor matching)
+-- ==========================================================
+-- Donor matching (donor_matching.py) ranks donors by how far
+-- their area is from the recipient's. Area gets the latitude /
+-- longitude of its centre; an area without coordinates counts
+-- as far from every other area until they are filled in.
+--
+-- Set_Area_Coordinates fills them for the Karachi areas the seed
+-- scripts create; it runs here and again after the seed scripts.
+
+USE BloodLink;
+GO
+
+IF COL_LENGTH('Area', 'latitude') IS NULL
+    ALTER TABLE Area ADD latitude DECIMAL(9,6) NULL, longitude DECIMAL(9,6) NULL;
+GO
+
+IF OBJECT_ID('Set_Area_Coordinates', 'P') IS NOT NULL
+    DROP PROCEDURE Set_Area_Coordinates;
+GO
+
+CREATE PROCEDURE Set_Area_Coordinates
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE a
+    SET latitude = c.latitude, longitude = c.longitude
+    FROM Area a
+    JOIN (VALUES
+        ('Clifton',         24.813800, 67.030000),
+        ('Bahria Town',     25.030000, 67.300000),
+        ('DHA',             24.800000, 67.065000),
+        ('Johar',           24.920000, 67.130000),
+        ('Gulshan',         24.920000, 67.095000),
+        ('Gulshan-e-Iqbal', 24.920000, 67.095000),
+        ('PECHS',           24.870000, 67.060000),
+        ('North Nazimabad', 24.942000, 67.038000),
+        ('Federal B Area',  24.933000, 67.075000),
+        ('Malir',           24.895000, 67.200000),
+        ('Malir Cantt',     24.940000, 67.205000)
+    ) AS c (name, latitude, longitude) ON c.name = a.name
+    WHERE a.latitude IS NULL;
+END
+GO
+
+EXEC Set_Area_Coordinates;
+GO
@@ -0,0 +1,46 @@
+-- ==========================================================
+-- MIGRATION 008 - DONOR ELIGIBILITY COLUMNS
+-- ==========================================================
+-- The 30-day rule read the donor's latest Donation_Completed row
+-- on every eligibility check, dashboard and donation, and the
+-- donor list took MAX(donation_date) over all donations.
+--
+-- Donor.last_donation_at: date of the latest donation
+-- Donor.eligible_from:    first day the donor may donate again
+--                         (NULL = never donated, eligible)
+--
+-- db.submit_donation_transaction writes both in the donation's
+-- own transaction. Backfill_Donor_Eligibility fills them here and
+-- after the seed scripts; `flask --app run sync-donor-eligibility`
+-- verifies (and fixes) them against Donation_Completed.
+
+USE BloodLink;
+GO
+
+IF COL_LENGTH('Donor', 'last_donation_at') IS NULL
+    ALTER TABLE Donor ADD last_donation_at DATETIME NULL, eligible_from DATE NULL;
+GO
+
+IF OBJECT_ID('Backfill_Donor_Eligibility', 'P') IS NOT NULL
+    DROP PROCEDURE Backfill_Donor_Eligibility;
+GO
+
+CREATE PROCEDURE Backfill_Donor_Eligibility
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE d
+    SET last_donation_at = x.last_donation,
+        eligible_from = DATEADD(DAY, 30, CAST(x.last_donation AS DATE))
+    FROM Donor d
+    CROSS APPLY (SELECT MAX(dc.donation_date) AS last_donation
+                 FROM Donation_Completed dc
+                 WHERE dc.donor_id = d.id) x
+    WHERE ISNULL(d.last_donation_at, '19000101') <> ISNULL(x.last_donation, '19000101')
+       OR ISNULL(d.eligible_from, '19000101') <> ISNULL(DATEADD(DAY, 30, CAST(x.last_donation AS DATE)), '19000101');
+END
+GO
+
+EXEC Backfill_Donor_Eligibility;
+GO
@@ -0,0 +1,88 @@
+-- ==========================================================
+-- MIGRATION 009 - STOCK EXPIRY AND EXPIRY BUCKETS
+-- ==========================================================
+-- Bags had no expiry of their own: consume_stock took the oldest
+-- bags by received_at, and expired bags stayed in every total.
+--
+-- Stock.expires_at:  midnight at which the bag expires - the day it
+--                    was received plus the shelf life (42 days for
+--                    red cells in additive solution; db.py uses
+--                    STOCK_SHELF_LIFE_DAYS). Usable while in the future.
+-- Inventory_Bucket:  units per (area, blood type, expiry day), kept
+--                    by db.py with every Stock change. Availability
+--                    checks and the "expiring in N days" view read
+--                    these few rows instead of the bags.
+--
+-- consume_stock allocates first-expiring-first-out from
+-- IX_Stock_Area_Type_Expires; the daily 'stock_expiry' job (and
+-- `flask --app run retire-expired-stock`) deletes expired bags via
+-- IX_Stock_Expires. Rebuild_Inventory_Buckets runs here and after
+-- the seed scripts; `flask --app run reconcile-inventory` fixes drift.
+
+USE BloodLink;
+GO
+
+IF COL_LENGTH('Stock', 'expires_at') IS NULL
+    ALTER TABLE Stock ADD expires_at DATETIME NULL;
+GO
+
+IF OBJECT_ID('Inventory_Bucket', 'U') IS NULL
+BEGIN
+    CREATE TABLE Inventory_Bucket (
+        area_id INT NOT NULL,
+        blood_type INT NOT NULL,
+        expires_on DATE NOT NULL,
+        units INT NOT NULL DEFAULT 0 CHECK (units >= 0),
+
+        PRIMARY KEY (area_id, blood_type, expires_on),
+        FOREIGN KEY (area_id) REFERENCES Area(id) ON DELETE CASCADE,
+        FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id) ON DELETE CASCADE
+    );
+END
+GO
+
+IF OBJECT_ID('Rebuild_Inventory_Buckets', 'P') IS NOT NULL
+    DROP PROCEDURE Rebuild_Inventory_Buckets;
+GO
+
+CREATE PROCEDURE Rebuild_Inventory_Buckets
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- Bags inserted without an expiry (seed scripts, older code paths)
+    UPDATE Stock
+    SET expires_at = DATEADD(DAY, 42, CAST(CAST(received_at AS DATE) AS DATETIME))
+    WHERE expires_at IS NULL AND received_at IS NOT NULL;
+
+    DELETE FROM Inventory_Bucket;
+
+    INSERT INTO Inventory_Bucket (area_id, blood_type, expires_on, units)
+    SELECT area_id, blood_type, CAST(expires_at AS DATE), SUM(units)
+    FROM Stock
+    WHERE area_id IS NOT NULL AND blood_type IS NOT NULL AND expires_at IS NOT NULL
+    GROUP BY area_id, blood_type, CAST(expires_at AS DATE);
+END
+GO
+
+EXEC Rebuild_Inventory_Buckets;
+GO
+
+-- FEFO seek on (area, type) in expiry order (bag_id is the clustered key), units covered.
+-- Replaces the received_at index of migration 002.
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Stock_Area_Type_Received' AND object_id = OBJECT_ID('Stock'))
+    DROP INDEX IX_Stock_Area_Type_Received ON Stock;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Stock_Area_Type_Expires' AND object_id = OBJECT_ID('Stock'))
+    CREATE INDEX IX_Stock_Area_Type_Expires
+        ON Stock (area_id, blood_type, expires_at)
+        INCLUDE (units);
+GO
+
+-- Expiry sweep: expired bags of every area and type in one range seek
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Stock_Expires' AND object_id = OBJECT_ID('Stock'))
+    CREATE INDEX IX_Stock_Expires
+        ON Stock (expires_at)
+        INCLUDE (area_id, blood_type, units);
+GO
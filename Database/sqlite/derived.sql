@@ -0,0 +1,62 @@
+-- ==========================================================
+-- DERIVED DATA (SQLite version of the seed scripts' last section)
+-- ==========================================================
+-- Run by init-sqlite after Database/data.sql and data2.sql: fills
+-- the denormalized FIFO columns, rebuilds Inventory_Summary from
+-- Stock, recounts each user's unread notifications, sets the
+-- coordinates of the seeded areas (migration 007) and each donor's
+-- last donation / eligible-from date (migration 008), and each
+-- bag's expiry with the per-expiry-day totals (migration 009).
+
+UPDATE Stock
+SET blood_type = (SELECT dc.blood_type FROM Donation_Completed dc WHERE dc.id = Stock.donation_id),
+    received_at = (SELECT dc.donation_date FROM Donation_Completed dc WHERE dc.id = Stock.donation_id)
+WHERE blood_type IS NULL OR received_at IS NULL;
+
+DELETE FROM Inventory_Summary;
+
+INSERT INTO Inventory_Summary (area_id, blood_type, units)
+SELECT s.area_id, dc.blood_type, SUM(s.units)
+FROM Stock s
+JOIN Donation_Completed dc ON s.donation_id = dc.id
+WHERE s.area_id IS NOT NULL
+GROUP BY s.area_id, dc.blood_type;
+
+UPDATE [User]
+SET unread_notifications = (SELECT COUNT(*) FROM Notifications n
+                            WHERE n.user_id = [User].id AND n.is_read = 0);
+
+WITH c (name, latitude, longitude) AS (VALUES
+    ('Clifton',         24.813800, 67.030000),
+    ('Bahria Town',     25.030000, 67.300000),
+    ('DHA',             24.800000, 67.065000),
+    ('Johar',           24.920000, 67.130000),
+    ('Gulshan',         24.920000, 67.095000),
+    ('Gulshan-e-Iqbal', 24.920000, 67.095000),
+    ('PECHS',           24.870000, 67.060000),
+    ('North Nazimabad', 24.942000, 67.038000),
+    ('Federal B Area',  24.933000, 67.075000),
+    ('Malir',           24.895000, 67.200000),
+    ('Malir Cantt',     24.940000, 67.205000)
+)
+UPDATE Area
+SET latitude = c.latitude, longitude = c.longitude
+FROM c
+WHERE c.name = Area.name AND Area.latitude IS NULL;
+
+UPDATE Donor
+SET last_donation_at = (SELECT MAX(dc.donation_date) FROM Donation_Completed dc WHERE dc.donor_id = Donor.id),
+    eligible_from = date((SELECT MAX(dc.donation_date) FROM Donation_Completed dc WHERE dc.donor_id = Donor.id),
+                         '+30 days');
+
+UPDATE Stock
+SET expires_at = datetime(date(received_at), '+42 days')
+WHERE expires_at IS NULL AND received_at IS NOT NULL;
+
+DELETE FROM Inventory_Bucket;
+
+INSERT INTO Inventory_Bucket (area_id, blood_type, expires_on, units)
+SELECT area_id, blood_type, date(expires_at), SUM(units)
+FROM Stock
+WHERE area_id IS NOT NULL AND blood_type IS NOT NULL AND expires_at IS NOT NULL
+GROUP BY area_id, blood_type, date(expires_at);
@@ -0,0 +1,297 @@
+-- ==========================================================
+-- BLOODLINK - SQLITE SCHEMA (local profiling / load testing)
+-- ==========================================================
+-- Equivalent of Database/create.sql plus every script in
+-- Database/migrations/ (recorded in Schema_Migrations below).
+-- A new migration must be mirrored here.
+--
+-- Differences from SQL Server:
+--   IDENTITY        -> INTEGER PRIMARY KEY (rowid alias)
+--   GETDATE()       -> local time text 'YYYY-MM-DD HH:MM:SS.SSS'
+--   NVARCHAR(MAX)   -> TEXT
+--   INCLUDE columns -> trailing index key columns
+--   DATE columns    -> triggers trim datetimes written by GETDATE()
+--                      (SQL Server converts implicitly)
+--
+-- Created by: flask --app run init-sqlite
+
+-- ==========================================================
+-- 1. CORE TABLES
+-- ==========================================================
+
+CREATE TABLE [User] (
+    id INTEGER PRIMARY KEY,
+    email NVARCHAR(255) NOT NULL UNIQUE,
+    password NVARCHAR(255) NOT NULL,
+    role VARCHAR(50) NOT NULL CHECK (role IN ('Donor', 'Recipient', 'Manager')),
+    unread_notifications INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE Blood_Type (
+    bloodtype_id INTEGER PRIMARY KEY,
+    type VARCHAR(10) NOT NULL UNIQUE
+);
+
+CREATE TABLE Area (
+    id INTEGER PRIMARY KEY,
+    name NVARCHAR(255) NOT NULL UNIQUE,
+    -- 007: centre of the area, for donor matching (set by derived.sql for the seeded areas)
+    latitude DECIMAL(9,6),
+    longitude DECIMAL(9,6)
+);
+
+-- ==========================================================
+-- 2. ROLE-SPECIFIC TABLES
+-- ==========================================================
+
+CREATE TABLE Donor (
+    id INTEGER PRIMARY KEY,
+    name NVARCHAR(255) NOT NULL,
+    bloodtype INT NOT NULL,
+    status VARCHAR(50),
+    area_id INT,
+    number NVARCHAR(20),
+    DOB DATE,
+    age INT,
+    availability BIT DEFAULT 1,
+    user_id INT UNIQUE,
+    -- 006: phone number without separators (persisted computed column on SQL Server)
+    number_digits NVARCHAR(20) COLLATE NOCASE GENERATED ALWAYS AS (
+        replace(replace(replace(replace(replace(number, '-', ''), ' ', ''), '+', ''), '(', ''), ')', '')) VIRTUAL,
+    -- 008: latest donation and first day the donor may donate again (set by db.py on donation)
+    last_donation_at DATETIME,
+    eligible_from DATE,
+
+    FOREIGN KEY (bloodtype) REFERENCES Blood_Type(bloodtype_id),
+    FOREIGN KEY (area_id) REFERENCES Area(id),
+    FOREIGN KEY (user_id) REFERENCES [User](id) ON DELETE SET NULL ON UPDATE CASCADE
+);
+
+CREATE TABLE Recipient (
+    id INTEGER PRIMARY KEY,
+    name NVARCHAR(255) NOT NULL,
+    bloodtype INT NOT NULL,
+    area_id INT,
+    number NVARCHAR(20),
+    DOB DATE,
+    age INT,
+    user_id INT UNIQUE,
+
+    FOREIGN KEY (bloodtype) REFERENCES Blood_Type(bloodtype_id),
+    FOREIGN KEY (area_id) REFERENCES Area(id),
+    FOREIGN KEY (user_id) REFERENCES [User](id) ON DELETE SET NULL ON UPDATE CASCADE
+);
+
+CREATE TABLE Manager (
+    id INTEGER PRIMARY KEY,
+    name NVARCHAR(255) NOT NULL,
+    user_id INT UNIQUE,
+
+    FOREIGN KEY (user_id) REFERENCES [User](id) ON DELETE SET NULL ON UPDATE CASCADE
+);
+
+-- ==========================================================
+-- 3. OPERATIONAL TABLES
+-- ==========================================================
+
+CREATE TABLE Request (
+    id INTEGER PRIMARY KEY,
+    status VARCHAR(50) NOT NULL DEFAULT 'Pending' CHECK (status IN ('Pending', 'Approved', 'Fulfilled', 'Rejected')),
+    recipient_id INT NOT NULL,
+    units_required INT NOT NULL CHECK (units_required > 0),
+    units_collected INT DEFAULT 0,
+    date_requested DATE DEFAULT (date('now', 'localtime')),
+    date_fulfilled DATE,
+    approved_by INT,
+    blood_type INT NOT NULL,
+
+    FOREIGN KEY (recipient_id) REFERENCES Recipient(id) ON DELETE CASCADE,
+    FOREIGN KEY (approved_by) REFERENCES Manager(id) ON DELETE SET NULL,
+    FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id)
+);
+
+CREATE TRIGGER TR_Request_Dates_Insert AFTER INSERT ON Request
+WHEN length(NEW.date_requested) > 10 OR length(NEW.date_fulfilled) > 10
+BEGIN
+    UPDATE Request
+    SET date_requested = substr(date_requested, 1, 10), date_fulfilled = substr(date_fulfilled, 1, 10)
+    WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER TR_Request_Dates_Update AFTER UPDATE OF date_requested, date_fulfilled ON Request
+WHEN length(NEW.date_requested) > 10 OR length(NEW.date_fulfilled) > 10
+BEGIN
+    UPDATE Request
+    SET date_requested = substr(date_requested, 1, 10), date_fulfilled = substr(date_fulfilled, 1, 10)
+    WHERE id = NEW.id;
+END;
+
+CREATE TABLE Donation_Completed (
+    id INTEGER PRIMARY KEY,
+    request_id INT,
+    units INT NOT NULL CHECK (units > 0),
+    donor_id INT NOT NULL,
+    blood_type INT NOT NULL,
+    donation_date DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    is_exchange BIT DEFAULT 0,
+
+    FOREIGN KEY (request_id) REFERENCES Request(id) ON DELETE SET NULL,
+    FOREIGN KEY (donor_id) REFERENCES Donor(id),
+    FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id)
+);
+
+-- blood_type / received_at: migration 002 (FIFO columns); expires_at: migration 009
+CREATE TABLE Stock (
+    bag_id INTEGER PRIMARY KEY,
+    units INT NOT NULL CHECK (units > 0),
+    donation_id INT NOT NULL UNIQUE,
+    request_id INT,
+    area_id INT,
+    blood_type INT NULL,
+    received_at DATETIME NULL,
+    expires_at DATETIME NULL,
+
+    FOREIGN KEY (donation_id) REFERENCES Donation_Completed(id) ON DELETE CASCADE,
+    FOREIGN KEY (request_id) REFERENCES Request(id) ON DELETE SET NULL,
+    FOREIGN KEY (area_id) REFERENCES Area(id),
+    FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id)
+);
+
+CREATE TABLE Donor_History (
+    donor_id INT NOT NULL,
+    [date] DATETIME NOT NULL,
+    unit INT NOT NULL CHECK (unit > 0),
+
+    PRIMARY KEY (donor_id, [date]),
+    FOREIGN KEY (donor_id) REFERENCES Donor(id) ON DELETE CASCADE
+);
+
+CREATE TABLE Notifications (
+    id INTEGER PRIMARY KEY,
+    user_id INT NOT NULL,
+    message TEXT NOT NULL,
+    is_read BIT DEFAULT 0,
+    created_at DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    type VARCHAR(50) CHECK (type IN ('Broadcast', 'Collection', 'General')),
+
+    FOREIGN KEY (user_id) REFERENCES [User](id) ON DELETE CASCADE
+);
+
+-- ==========================================================
+-- 4. MIGRATIONS 001 - 009
+-- ==========================================================
+
+-- 001: materialized inventory ledger
+CREATE TABLE Inventory_Summary (
+    area_id INT NOT NULL,
+    blood_type INT NOT NULL,
+    units INT NOT NULL DEFAULT 0 CHECK (units >= 0),
+
+    PRIMARY KEY (area_id, blood_type),
+    FOREIGN KEY (area_id) REFERENCES Area(id) ON DELETE CASCADE,
+    FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- 002: FIFO seek on (area, type) in received order (replaced by 009)
+
+-- 003: hot lookup predicates
+CREATE INDEX IX_Donation_Completed_Donor_Date ON Donation_Completed (donor_id, donation_date DESC, units, is_exchange);
+CREATE INDEX IX_Notifications_User_Read_Created ON Notifications (user_id, is_read, created_at DESC);
+CREATE INDEX IX_Request_Status_Date ON Request (status, date_requested);
+CREATE INDEX IX_Request_Recipient_Date ON Request (recipient_id, date_requested);
+CREATE INDEX IX_Donor_Bloodtype_Availability ON Donor (bloodtype, availability);
+
+-- 004: [User].unread_notifications (column above)
+
+-- 005: durable background job queue
+CREATE TABLE Jobs (
+    id INTEGER PRIMARY KEY,
+    kind NVARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key NVARCHAR(200) NULL,
+    status NVARCHAR(20) NOT NULL DEFAULT 'Queued'
+        CHECK (status IN ('Queued', 'Running', 'Done', 'Failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT 5,
+    run_after DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    locked_by NVARCHAR(100) NULL,
+    progress_done INT NOT NULL DEFAULT 0,
+    progress_total INT NULL,
+    checkpoint TEXT NULL,
+    result TEXT NULL,
+    last_error TEXT NULL,
+    created_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    updated_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    finished_at DATETIME NULL
+);
+
+CREATE UNIQUE INDEX UX_Jobs_Idempotency_Key ON Jobs (idempotency_key) WHERE idempotency_key IS NOT NULL;
+CREATE INDEX IX_Jobs_Status_Run_After ON Jobs (status, run_after);
+
+-- 006: donor search index (filled by donor_search.rebuild_index after the seeds).
+-- NOCASE: SQLite only turns LIKE 'prefix%' into an index seek on NOCASE columns.
+CREATE TABLE Name_Token (
+    id INTEGER PRIMARY KEY,
+    token NVARCHAR(50) COLLATE NOCASE NOT NULL UNIQUE
+);
+
+CREATE TABLE Name_Token_Gram (
+    gram NVARCHAR(3) NOT NULL,
+    token_id INT NOT NULL,
+    PRIMARY KEY (gram, token_id),
+    FOREIGN KEY (token_id) REFERENCES Name_Token(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TABLE Donor_Name_Token (
+    token_id INT NOT NULL,
+    donor_id INT NOT NULL,
+    PRIMARY KEY (token_id, donor_id),
+    FOREIGN KEY (token_id) REFERENCES Name_Token(id) ON DELETE CASCADE,
+    FOREIGN KEY (donor_id) REFERENCES Donor(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IX_Donor_Name_Token_Donor ON Donor_Name_Token (donor_id);
+CREATE INDEX IX_Donor_Number_Digits ON Donor (number_digits);
+
+-- 009: stock expiry (Stock.expires_at above) and per-expiry-day totals
+CREATE TABLE Inventory_Bucket (
+    area_id INT NOT NULL,
+    blood_type INT NOT NULL,
+    expires_on DATE NOT NULL,
+    units INT NOT NULL DEFAULT 0 CHECK (units >= 0),
+
+    PRIMARY KEY (area_id, blood_type, expires_on),
+    FOREIGN KEY (area_id) REFERENCES Area(id) ON DELETE CASCADE,
+    FOREIGN KEY (blood_type) REFERENCES Blood_Type(bloodtype_id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- FEFO seek on (area, type) in expiry order, units covered; expiry sweep
+CREATE INDEX IX_Stock_Area_Type_Expires ON Stock (area_id, blood_type, expires_at, units);
+CREATE INDEX IX_Stock_Expires ON Stock (expires_at, area_id, blood_type, units);
+
+CREATE TABLE Schema_Migrations (
+    version INT PRIMARY KEY,
+    name NVARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+
+INSERT INTO Schema_Migrations (version, name) VALUES
+    (1, 'inventory_summary'),
+    (2, 'stock_fifo_columns'),
+    (3, 'hot_path_indexes'),
+    (4, 'unread_notification_counter'),
+    (5, 'jobs'),
+    (6, 'donor_search_index'),
+    (7, 'area_coordinates'),
+    (8, 'donor_eligibility'),
+    (9, 'stock_expiry');
+
+-- ==========================================================
+-- 5. SEED DATA
+-- ==========================================================
+
+INSERT INTO Blood_Type (type)
+VALUES ('A+'), ('A-'), ('B+'), ('B-'), ('AB+'), ('AB-'), ('O+'), ('O-');
+
+INSERT INTO Area (name)
+VALUES ('Clifton'), ('Bahria Town'), ('DHA'), ('Johar'), ('Gulshan'), ('PECHS');
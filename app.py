@@ -1,5 +1,4 @@
 from flask import Flask
-import pyodbc
 
 import os
 
@@ -8,6 +7,87 @@ class Config:
     # Update with your actual SQL Server connection string
     DB_CONNECTION_STRING = os.environ.get('DB_CONNECTION_STRING') or \
         'Driver={ODBC Driver 17 for SQL Server};Server=localhost;Database=BloodLink;Trusted_Connection=yes;'
+
+    # Storage backend: 'mssql' (SQL Server via pyodbc) or 'sqlite' (local file for profiling/load tests,
+    # created with `flask --app run init-sqlite`; see sqlite_backend.py)
+    DB_BACKEND = os.environ.get('DB_BACKEND', 'mssql')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'bloodlink.db')
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))  # seconds a writer waits for the write lock
+
+    # Connection pool sizing (see db.get_pool_stats() for in-use/idle/wait counters)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))            # seconds to wait for a free connection
+    DB_POOL_MAX_IDLE = float(os.environ.get('DB_POOL_MAX_IDLE', 300))         # seconds before an idle connection is closed
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30))  # idle seconds before ping
+
+    # Reporting reads of the manager pages (db.get_read_connection): 'primary' shares the request's
+    # connection; 'snapshot' reads row versions through a separate pool at SNAPSHOT isolation (SQL
+    # Server needs ALLOW_SNAPSHOT_ISOLATION ON); 'replica' reads from DB_READ_CONNECTION_STRING
+    DB_READ_MODE = os.environ.get('DB_READ_MODE', 'primary')
+    DB_READ_CONNECTION_STRING = os.environ.get('DB_READ_CONNECTION_STRING')
+    DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 0))  # 0 = DB_POOL_SIZE
+
+    # Query tracing (query_trace.py): Server-Timing header on every response, slow-query log and
+    # /manager/diagnostics. Timing is always on; only a sampled share of requests is aggregated.
+    QUERY_TRACE = os.environ.get('QUERY_TRACE', '1').lower() in ('1', 'true', 'yes')
+    QUERY_TRACE_SAMPLE_RATE = float(os.environ.get('QUERY_TRACE_SAMPLE_RATE', 1.0))  # 0-1, share of requests aggregated
+    QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 200))           # statements this slow are logged (0 = off)
+    QUERY_SLOW_LOG = os.environ.get('QUERY_SLOW_LOG') or None             # log file (unset = 'bloodlink.slow_queries' logger)
+    QUERY_STATS_MAX_STATEMENTS = int(os.environ.get('QUERY_STATS_MAX_STATEMENTS', 500))  # distinct statements kept
+
+    # Transient transaction failures (deadlock victim, lock / snapshot conflict, dropped connection) are
+    # re-run by db.run_transaction: at most TRANSACTION_RETRIES times, after a random pause of up to
+    # TRANSACTION_RETRY_BASE seconds doubling per retry (capped at TRANSACTION_RETRY_MAX), and only while
+    # the request has spent less than TRANSACTION_TIME_BUDGET seconds in transactions
+    TRANSACTION_RETRIES = int(os.environ.get('TRANSACTION_RETRIES', 3))
+    TRANSACTION_RETRY_BASE = float(os.environ.get('TRANSACTION_RETRY_BASE', 0.02))
+    TRANSACTION_RETRY_MAX = float(os.environ.get('TRANSACTION_RETRY_MAX', 0.5))
+    TRANSACTION_TIME_BUDGET = float(os.environ.get('TRANSACTION_TIME_BUDGET', 5.0))
+
+    # Seconds the in-process Area / Blood_Type cache is served before reloading
+    REFERENCE_DATA_TTL = float(os.environ.get('REFERENCE_DATA_TTL', 3600))
+
+    # Seconds a user's unread-notification count is cached in process (badge on every page)
+    UNREAD_COUNT_TTL = float(os.environ.get('UNREAD_COUNT_TTL', 5))
+
+    # Users per committed chunk when broadcasting a notification (db.broadcast_notification)
+    BROADCAST_CHUNK_SIZE = int(os.environ.get('BROADCAST_CHUNK_SIZE', 5000))
+
+    # Batch donation entry (/manager/submit-donations): rows per transaction and per upload.
+    # 250 rows keep each multi-row INSERT under SQL Server's 2100-parameter limit; larger values
+    # are capped at db.DONATION_BATCH_MAX_CHUNK_SIZE (349).
+    DONATION_BATCH_CHUNK_SIZE = int(os.environ.get('DONATION_BATCH_CHUNK_SIZE', 250))
+    DONATION_BATCH_MAX_ROWS = int(os.environ.get('DONATION_BATCH_MAX_ROWS', 5000))
+
+    # Stock expiry (migration 009): shelf life of a bag from the day it is received, the window of the
+    # inventory page's "expiring in N days" view, bags per transaction when retiring expired stock,
+    # and whether job workers keep the daily 'stock_expiry' sweep scheduled
+    STOCK_SHELF_LIFE_DAYS = int(os.environ.get('STOCK_SHELF_LIFE_DAYS', 42))
+    STOCK_EXPIRING_DAYS = int(os.environ.get('STOCK_EXPIRING_DAYS', 7))
+    STOCK_EXPIRY_CHUNK_SIZE = int(os.environ.get('STOCK_EXPIRY_CHUNK_SIZE', 1000))
+    STOCK_EXPIRY_SWEEP = os.environ.get('STOCK_EXPIRY_SWEEP', '1').lower() in ('1', 'true', 'yes')
+
+    # Background job queue (Jobs table): worker threads per process, started with the first request
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))    # seconds between polls of an empty queue
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))    # claimed job is retried if no progress for this long
+    JOB_RETRY_BASE = float(os.environ.get('JOB_RETRY_BASE', 5))          # first retry delay in seconds (doubles per attempt)
+
+    # Live notification stream (/notifications/stream, Server-Sent Events)
+    NOTIFICATION_STREAM_HEARTBEAT = float(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT', 15))  # seconds between keep-alives
+    NOTIFICATION_STREAM_MAX_AGE = float(os.environ.get('NOTIFICATION_STREAM_MAX_AGE', 300))     # seconds before the browser reconnects
+    # Shared directory for cross-process fan-out when running several worker processes (unset = single process)
+    NOTIFICATION_RELAY_DIR = os.environ.get('NOTIFICATION_RELAY_DIR') or None
+
+    # In-memory donor lookup index (donor_index.py), loaded with each process's first request
+    DONOR_INDEX = os.environ.get('DONOR_INDEX', '1').lower() in ('1', 'true', 'yes')
+    DONOR_INDEX_REFRESH = float(os.environ.get('DONOR_INDEX_REFRESH', 3600))  # seconds between full reloads (0 = never)
+    # Best-matched donors notified when a request is approved (donor_matching.py; 0 = none)
+    MATCH_NOTIFY_DONORS = int(os.environ.get('MATCH_NOTIFY_DONORS', 0))
+
+    # Use cursor (keyset) pagination on list pages by default instead of page numbers.
+    # Pages are also switched to keyset mode by any ?after= / ?before= cursor in the URL.
+    KEYSET_PAGINATION = os.environ.get('KEYSET_PAGINATION', '').lower() in ('1', 'true', 'yes')
     
     from datetime import timedelta
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=30)
@@ -17,8 +97,29 @@ def create_app(config_class=Config):
     app.config.from_object(config_class)
 
     # Initialize DB connection
-    # We use raw pyodbc for direct SQL execution as per project requirements.
-    
+    # We use raw DB-API SQL (pyodbc on SQL Server) for direct SQL execution as per project requirements.
+    # Connections are pooled and borrowed once per request (see db.get_db_connection).
+    # The notification broker and query tracer come first: db.init_app registers a cache
+    # listener on the broker and wraps the pool's connections with the tracer.
+    import notification_events
+    notification_events.init_app(app)
+    import query_trace
+    query_trace.init_app(app)
+    import db
+    db.init_app(app)
+
+    # Process-local donor lookup index, kept current by db.py's donor change events
+    import donor_index
+    donor_index.init_app(app)
+
+    # Background job workers (notification fan-out, broadcasts); see jobs.py
+    import jobs
+    jobs.init_app(app)
+
+    # Maintenance CLI (e.g. `flask --app run reconcile-inventory`)
+    from commands import register_commands
+    register_commands(app)
+
     from routes.auth_routes import auth_bp
     from routes.manager_routes import manager_bp
     from routes.donor_routes import donor_bp
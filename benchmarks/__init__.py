@@ -0,0 +1,15 @@
+# ==================================================================================
+# BENCHMARKS
+# ==================================================================================
+# End-to-end load tests for the Flask app on the local SQLite backend (no SQL Server):
+#
+#   population.py  Seeded synthetic populations (SCALES: tiny ... large = 100k donors,
+#                  1M donations, 5M notifications), cached under benchmarks/.data/.
+#   workload.py    Per-role weighted actions (logins, dashboards, donor lookup,
+#                  submit-donation, approve/fulfill, broadcasts, notifications).
+#   transport.py   Flask test client or a local WSGI server; queries from Server-Timing.
+#   runner.py      Virtual-user threads against a fresh copy of the population.
+#   report.py      p50/p95/p99, throughput, queries/request; JSON results and compare.
+#   index.py       Memory, load time and lookup latency of the in-memory donor index.
+#
+# Run from the repository root: `python -m benchmarks --help`.
@@ -0,0 +1,185 @@
+import argparse
+import sys
+
+from benchmarks import contention
+from benchmarks import index as donor_index
+from benchmarks import pagination
+from benchmarks import population as populations
+from benchmarks import report
+from benchmarks.runner import population_database, run
+from benchmarks.workload import ACTIONS, only
+from db_backend import READ_MODES
+
+# ==================================================================================
+# COMMAND LINE
+# ==================================================================================
+#   python -m benchmarks populate --scale large
+#   python -m benchmarks run --scale small --users 16 --duration 60 [--transport wsgi]
+#   python -m benchmarks compare benchmarks/results/A.json benchmarks/results/B.json
+#   python -m benchmarks index --scale large
+#   python -m benchmarks contention --threads 16 --duration 10
+#   python -m benchmarks pagination --tied 50
+
+
+def _population(args):
+    scale = populations.SCALES[args.scale or 'small']
+    overrides = {field: getattr(args, field) for field in ('donors', 'recipients', 'requests', 'donations',
+                                                            'notifications') if getattr(args, field) is not None}
+    if not overrides:
+        return scale, args.scale or 'small'
+    return populations.Population.from_dict({**scale.to_dict(), **overrides}), 'custom'
+
+def _database(args):
+    population, name = _population(args)
+    # An explicit --db without any size options reuses whatever population it holds
+    reuse = args.db is not None and args.scale is None and name != 'custom'
+    return population_database(population, seed=args.seed, path=args.db, name=name, reuse=reuse, echo=print)
+
+def _add_population_options(parser):
+    parser.add_argument('--scale', choices=sorted(populations.SCALES), help='Population preset (default: small).')
+    for field in ('donors', 'recipients', 'requests', 'donations', 'notifications'):
+        parser.add_argument(f'--{field}', type=int, help=f'Override the preset number of {field}.')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the population and workload.')
+    parser.add_argument('--db', help='Database file (default: cached per scale under benchmarks/.data/).')
+
+
+def populate_command(args):
+    population, name = _population(args)
+    path, _ = population_database(population, seed=args.seed, path=args.db, name=name, echo=print)
+    manifest = populations.load_manifest(path)
+    for table, count in manifest['counts'].items():
+        print(f'{table:<22} {count:>10}')
+    print(f'Population ready in {path}.')
+
+def run_command(args):
+    path, population = _database(args)
+    actions = only(args.only) if args.only else ACTIONS
+    if not actions:
+        print(f'No endpoint matches {args.only}.', file=sys.stderr)
+        return 2
+
+    samples, elapsed, pool_stats = run(
+        path, population, users=args.users, duration=args.duration, warmup=args.warmup,
+        max_requests=args.max_requests, transport=args.transport, actions=actions, seed=args.seed,
+        session_length=args.session_length, job_workers=args.job_workers, pool_size=args.pool_size,
+        read_mode=args.read_mode, echo=print,
+    )
+    summary = report.summarize(samples, elapsed)
+    report.format_table(summary)
+
+    result = {
+        'format': report.FORMAT_VERSION,
+        'name': args.name,
+        'environment': report.environment(),
+        'settings': {
+            'backend': 'sqlite', 'transport': args.transport, 'users': args.users, 'duration': round(elapsed, 3),
+            'warmup': args.warmup, 'max_requests': args.max_requests, 'session_length': args.session_length,
+            'job_workers': args.job_workers, 'pool_size': args.pool_size, 'read_mode': args.read_mode,
+            'seed': args.seed,
+            'only': args.only,
+        },
+        'population': population.to_dict(),
+        'pool': pool_stats,
+        'summary': summary,
+    }
+    print(f'Saved {report.save(result, args.out)}')
+    return 0
+
+def index_command(args):
+    path, population = _database(args)
+    result = donor_index.measure(path, population, queries=args.queries, seed=args.seed, echo=print)
+    donor_index.format_result(result)
+    return 0
+
+def contention_command(args):
+    path = None if args.mssql else _database(args)[0]
+    result = contention.measure(path, threads=args.threads, duration=args.duration, units=args.units, hot=args.hot,
+                                fulfills=args.fulfills, seed=args.seed, mssql=args.mssql, echo=print)
+    contention.format_result(result)
+    return 0 if result['ok'] else 1
+
+def pagination_command(args):
+    path, _ = _database(args)
+    result = pagination.check(path, tied=args.tied, per_page=args.per_page, echo=print)
+    pagination.format_result(result)
+    return 0 if result['ok'] else 1
+
+def compare_command(args):
+    base, new = report.load(args.base), report.load(args.new)
+    rows, regressions = report.compare(base, new, threshold=args.threshold / 100, min_ms=args.min_ms)
+    print(f"base {base['environment']['commit']} ({args.base})\nnew  {new['environment']['commit']} ({args.new})\n")
+    report.format_comparison(rows)
+    if base['population'] != new['population'] or base['settings']['transport'] != new['settings']['transport']:
+        print('\nWarning: runs used different populations or transports.')
+    if regressions:
+        print('\nRegressions:')
+        for message in regressions:
+            print(f'  {message}')
+        return 1
+    print('\nNo regressions.')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='BloodLink HTTP load tests.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    populate = commands.add_parser('populate', help='Generate (or reuse) a synthetic population database.')
+    _add_population_options(populate)
+    populate.set_defaults(func=populate_command)
+
+    bench = commands.add_parser('run', help='Run the mixed workload and save the results.')
+    _add_population_options(bench)
+    bench.add_argument('--users', type=int, default=8, help='Concurrent virtual users.')
+    bench.add_argument('--duration', type=float, default=30.0, help='Seconds to record after warm-up.')
+    bench.add_argument('--warmup', type=float, default=5.0, help='Seconds to run before recording.')
+    bench.add_argument('--max-requests', type=int, help='Stop after this many recorded requests instead.')
+    bench.add_argument('--transport', choices=('client', 'wsgi'), default='client',
+                       help='Flask test client (in process) or a local WSGI server over HTTP.')
+    bench.add_argument('--only', nargs='+', metavar='ENDPOINT', help='Only endpoints whose label contains these.')
+    bench.add_argument('--session-length', type=int, default=25, help='Actions per login session.')
+    bench.add_argument('--job-workers', type=int, default=1, help='Background job threads in the app.')
+    bench.add_argument('--pool-size', type=int, help='DB_POOL_SIZE (default: the app config).')
+    bench.add_argument('--read-mode', choices=READ_MODES, help='DB_READ_MODE (default: the app config).')
+    bench.add_argument('--name', help='Label stored with the results.')
+    bench.add_argument('--out', help='Result file (default: benchmarks/results/<timestamp>-<commit>.json).')
+    bench.set_defaults(func=run_command)
+
+    index = commands.add_parser('index', help='Measure the in-memory donor index: memory, load time, lookups, matching.')
+    _add_population_options(index)
+    index.add_argument('--queries', type=int, default=2000, help='Lookups to time.')
+    index.set_defaults(func=index_command)
+
+    stress = commands.add_parser('contention', help='Concurrent stock allocation: allocations per second, '
+                                                    'exit 1 on any over-allocation or ledger drift.')
+    _add_population_options(stress)
+    stress.add_argument('--threads', type=int, default=8, help='Concurrent allocating threads.')
+    stress.add_argument('--duration', type=float, default=10.0, help='Seconds to run at most.')
+    stress.add_argument('--units', type=int, default=1, help='Units per allocation.')
+    stress.add_argument('--hot', type=int, default=4, help='Area/blood type pairs (those with the most stock) to allocate from.')
+    stress.add_argument('--fulfills', type=int, default=10,
+                        help='Approved requests each fulfilled by every thread at once first (0: skip).')
+    stress.add_argument('--mssql', metavar='CONNECTION_STRING',
+                        help='Run against this SQL Server database instead (its stock is consumed).')
+    stress.set_defaults(func=contention_command)
+
+    paging = commands.add_parser('pagination', help='Keyset paging over same-timestamp rows in both directions, '
+                                                    'exit 1 on duplicates, gaps or endless paging.')
+    _add_population_options(paging)
+    paging.add_argument('--tied', type=int, default=pagination.TIED_ROWS, help='Rows added with one timestamp.')
+    paging.add_argument('--per-page', type=int, default=10, help='Rows per page.')
+    paging.set_defaults(func=pagination_command)
+
+    diff = commands.add_parser('compare', help='Compare two result files; exit 1 on regressions.')
+    diff.add_argument('base')
+    diff.add_argument('new')
+    diff.add_argument('--threshold', type=float, default=10.0, help='Allowed p95 / throughput change in percent.')
+    diff.add_argument('--min-ms', type=float, default=1.0, help='Ignore p95 increases smaller than this.')
+    diff.set_defaults(func=compare_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
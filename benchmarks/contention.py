@@ -0,0 +1,256 @@
+import random
+import threading
+import time
+from datetime import datetime
+
+import db
+from app import Config, create_app
+from benchmarks.report import percentile
+from benchmarks.runner import build_app, working_copy
+
+# ==================================================================================
+# STOCK CONTENTION
+# ==================================================================================
+# Stress test of concurrent stock allocation (db.consume_stock inside db.run_transaction,
+# as fulfillment and exchanges use it, transient errors retried). `threads` workers keep
+# allocating `units` at a time from the same few (area, blood type) pairs - those holding
+# the most stock - until the stock is gone or `duration` runs out. Afterwards every pair's remaining bags are
+# counted: the units handed out must equal the units that left Stock (no bag allocated
+# twice, none lost), and Inventory_Summary / Inventory_Bucket must still match the bags.
+#
+# On SQLite writers are serialized, so this mostly checks the bookkeeping; pointed at a
+# SQL Server database (--mssql) it exercises the UPDLOCK / READPAST allocation path and
+# the deadlock retries. That database's stock really is consumed.
+#
+# Before that, `fulfills` Approved requests are each fulfilled by all threads at once
+# (db.fulfill_request_transaction) and then once more: exactly one attempt per request
+# may succeed, and only that attempt's units may leave Stock.
+
+
+def _usable_stock(pairs):
+    """{(area_id, blood_type): unexpired units in Stock} for `pairs`, counted from the bags."""
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT area_id, blood_type, SUM(units) as units
+        FROM Stock
+        WHERE expires_at > ?
+        GROUP BY area_id, blood_type
+    """, (datetime.now(),))
+    units = {(row.area_id, row.blood_type): row.units for row in cursor.fetchall()}
+    conn.close()
+    return {pair: units.get(pair, 0) for pair in pairs}
+
+def _approved_requests(count, seed):
+    """Up to `count` random Approved requests whose area holds enough stock for all of them together."""
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.id, rec.area_id, r.blood_type, r.units_required
+        FROM Request r
+        JOIN Recipient rec ON r.recipient_id = rec.id
+        WHERE r.status = 'Approved' AND rec.area_id IS NOT NULL AND r.units_required > 0
+        ORDER BY r.id
+    """)
+    candidates = cursor.fetchall()
+    conn.close()
+    random.Random(seed).shuffle(candidates)
+    left = _usable_stock({(row.area_id, row.blood_type) for row in candidates})
+    chosen = []
+    for row in candidates:
+        if len(chosen) == count:
+            break
+        pair = (row.area_id, row.blood_type)
+        if row.units_required <= left[pair]:
+            left[pair] -= row.units_required
+            chosen.append(row)
+    return chosen
+
+def _fulfill_race(app, threads, count, seed):
+    """
+    Returns:
+        dict: requests, attempts, fulfilled, and mismatches (requests fulfilled other than
+              exactly once, or whose pair lost other than their units)
+    """
+    with app.app_context():
+        requests = _approved_requests(count, seed)
+        pairs = {(row.area_id, row.blood_type) for row in requests}
+        before = _usable_stock(pairs)
+
+    outcomes = {row.id: [] for row in requests}
+    for row in requests:
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            barrier.wait()
+            with app.app_context():
+                outcomes[row.id].append(db.fulfill_request_transaction(row.id))
+
+        workers = [threading.Thread(target=worker, name=f'fulfill-{n}') for n in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        with app.app_context():
+            outcomes[row.id].append(db.fulfill_request_transaction(row.id))   # repeated fulfill
+
+    with app.app_context():
+        after = _usable_stock(pairs)
+
+    mismatches = []
+    consumed = {pair: 0 for pair in pairs}
+    for row in requests:
+        fulfilled = sum(success for success, _ in outcomes[row.id])
+        consumed[(row.area_id, row.blood_type)] += fulfilled * row.units_required
+        if fulfilled != 1:
+            mismatches.append(f'request {row.id} fulfilled {fulfilled} times')
+    for pair in sorted(pairs):
+        if before[pair] - after[pair] != consumed[pair]:
+            mismatches.append(f'area {pair[0]} type {pair[1]}: {consumed[pair]} units fulfilled, '
+                              f'{before[pair] - after[pair]} left Stock')
+    return {
+        'requests': len(requests),
+        'attempts': sum(len(attempts) for attempts in outcomes.values()),
+        'fulfilled': sum(success for attempts in outcomes.values() for success, _ in attempts),
+        'mismatches': mismatches,
+    }
+
+def _mssql_app(conn_str, pool_size):
+    class ContentionConfig(Config):
+        DB_BACKEND = 'mssql'
+        DB_CONNECTION_STRING = conn_str
+        DB_POOL_SIZE = pool_size
+        JOB_WORKERS = 0
+        DONOR_INDEX = False
+        QUERY_TRACE = False
+    return create_app(ContentionConfig)
+
+
+def measure(db_path=None, threads=8, duration=10.0, units=1, hot=4, fulfills=10, seed=1, mssql=None, echo=None):
+    """
+    Returns:
+        dict: pairs, threads, allocations (and units) per second, insufficient and failed
+              attempts, transaction retries, latency percentiles in ms, the fulfillment race
+              (see _fulfill_race) and the consistency check (ok, mismatches, drift).
+    """
+    echo = echo or (lambda message: None)
+    if mssql:
+        app = _mssql_app(mssql, threads + 1)
+    else:
+        app = build_app(working_copy(db_path), job_workers=0, pool_size=threads + 1)
+
+    fulfill = _fulfill_race(app, threads, fulfills, seed)
+    echo(f"Fulfilled {fulfill['requests']} request(s) from {threads} threads at once and once more: "
+         f"{fulfill['fulfilled']} of {fulfill['attempts']} attempts succeeded")
+
+    with app.app_context():
+        stock = db.get_rebalancing_inputs().stock
+        pairs = sorted(stock, key=lambda pair: -stock[pair])[:hot]
+        before = _usable_stock(pairs)
+    if not pairs:
+        raise RuntimeError('No unexpired stock to allocate.')
+    echo(f"Allocating {units} unit(s) at a time from {len(pairs)} area/type pair(s) holding "
+         f"{sum(before.values())} units, {threads} threads")
+
+    lock = threading.Lock()
+    live = list(pairs)
+    allocated = {pair: 0 for pair in pairs}
+    counts = {'allocations': 0, 'insufficient': 0, 'failed': 0}
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        while time.perf_counter() < deadline:
+            with lock:
+                if not live:
+                    return
+                pair = rng.choice(live)
+            started = time.perf_counter()
+            with app.app_context():
+                success, error = db.run_transaction(
+                    lambda cursor: (True, None) if db.consume_stock(cursor, pair[0], pair[1], units)
+                    else (False, 'Insufficient stock'), 'consume_stock')
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                if success:
+                    counts['allocations'] += 1
+                    allocated[pair] += units
+                elif error == 'Insufficient stock':
+                    # Allocations only ever remove stock, so the pair is done
+                    counts['insufficient'] += 1
+                    if pair in live:
+                        live.remove(pair)
+                else:
+                    counts['failed'] += 1
+                    errors.append(error)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,), name=f'contention-{n}') for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        after = _usable_stock(pairs)
+        _, summary_drift = db.reconcile_inventory_summary(apply=False)
+        _, bucket_drift = db.reconcile_inventory_buckets(apply=False)
+        retries = app.extensions['transaction_stats'].totals()
+    app.extensions['db_pool'].close()
+
+    mismatches = [{'area_id': pair[0], 'blood_type': pair[1], 'before': before[pair], 'after': after[pair],
+                   'allocated': allocated[pair]}
+                  for pair in pairs if before[pair] - after[pair] != allocated[pair] or after[pair] < 0]
+    drift = len(summary_drift or []) + len(bucket_drift or [])
+    latencies.sort()
+    return {
+        'pairs': len(pairs),
+        'threads': threads,
+        'units_per_allocation': units,
+        'seconds': round(elapsed, 3),
+        'allocations': counts['allocations'],
+        'allocations_per_second': round(counts['allocations'] / elapsed, 1) if elapsed else 0.0,
+        'units_allocated': sum(allocated.values()),
+        'insufficient': counts['insufficient'],
+        'failed': counts['failed'],
+        'retries': retries['retries'],
+        'gave_up': retries['gave_up'],
+        'errors': sorted(set(errors))[:5],
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+        },
+        'fulfill': fulfill,
+        'ok': not mismatches and not drift and not counts['failed'] and not fulfill['mismatches'],
+        'mismatches': mismatches,
+        'ledger_drift': drift,
+    }
+
+def format_result(result, out=None):
+    lines = [
+        f"threads             {result['threads']:>12}",
+        f"area/type pairs     {result['pairs']:>12}",
+        f"seconds             {result['seconds']:>12.2f}",
+        f"allocations         {result['allocations']:>12}",
+        f"allocations / s     {result['allocations_per_second']:>12.1f}",
+        f"units allocated     {result['units_allocated']:>12}",
+        f"insufficient        {result['insufficient']:>12}",
+        f"failed              {result['failed']:>12}",
+        f"retries (gave up)   {result['retries']:>7} ({result['gave_up']})",
+    ]
+    lines += [f"latency {name:<11} {value:>10.3f} ms" for name, value in result['latency_ms'].items()]
+    lines += [f"error: {error}" for error in result['errors']]
+    for row in result['mismatches']:
+        lines.append(f"over-allocation: area {row['area_id']} type {row['blood_type']}: {row['allocated']} allocated, "
+                     f"{row['before'] - row['after']} left Stock")
+    lines.append(f"fulfill race        {result['fulfill']['fulfilled']:>5} of {result['fulfill']['requests']} "
+                 f"requests ({result['fulfill']['attempts']} attempts)")
+    lines += [f"over-fulfillment: {mismatch}" for mismatch in result['fulfill']['mismatches']]
+    if result['ledger_drift']:
+        lines.append(f"ledger drift: {result['ledger_drift']} Inventory_Summary / Inventory_Bucket row(s)")
+    lines.append('consistent' if result['ok'] else 'INCONSISTENT')
+    print('\n'.join(lines), file=out)
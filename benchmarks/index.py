@@ -0,0 +1,109 @@
+import gc
+import random
+import time
+import tracemalloc
+
+import db
+from benchmarks.report import percentile
+from benchmarks.runner import build_app, working_copy
+from benchmarks.workload import Fixtures, lookup_query
+
+# ==================================================================================
+# DONOR INDEX
+# ==================================================================================
+# Loads the in-memory donor lookup index (donor_index.py) from a population database
+# and reports its memory per 100k donors (tracemalloc: what the loaded index keeps
+# allocated, and the peak while loading), load time, lookup latency for the
+# workload's mix of lookup queries and the latency of ranking the top 20 donors for a
+# request (donor_matching.py) of a random blood type and area. Phone number queries,
+# which the index hands to the database, are left out.
+
+
+def measure(db_path, population, queries=2000, seed=1, echo=None):
+    """
+    Returns:
+        dict: donors, vocabulary, memory (bytes, traced and the index's own estimate, per
+              100k donors), load seconds, lookup and match latency percentiles in ms.
+    """
+    echo = echo or (lambda message: None)
+    work = working_copy(db_path)
+    app = build_app(work, job_workers=0)
+    index = app.extensions['donor_index']
+
+    # Timed without tracing (tracemalloc slows allocation-heavy code several times over),
+    # then loaded again under tracemalloc for the memory figures
+    started = time.perf_counter()
+    index.reload(wait=True)
+    load_seconds = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    index.reload(wait=True)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = index.stats()
+    if not stats['ready']:
+        raise RuntimeError('The donor index did not load; see the log.')
+    echo(f"Loaded {stats['donors']} donors ({stats['vocabulary']} words) in {load_seconds:.2f}s")
+
+    rng = random.Random(seed)
+    fixtures = Fixtures(work, population, seed=seed)
+    latencies, match_latencies = [], []
+    with app.test_request_context():
+        while len(latencies) < queries:
+            query = lookup_query(rng, fixtures)
+            started = time.perf_counter()
+            page = index.search(query, 0, 11)
+            elapsed = time.perf_counter() - started
+            if page is not None:
+                latencies.append(elapsed * 1000)
+
+        blood_types = [bt.bloodtype_id for bt in db.reference_data().blood_types()]
+        areas = [area.id for area in db.reference_data().areas()]
+        for _ in range(queries):
+            blood_type, area_id = rng.choice(blood_types), rng.choice(areas)
+            started = time.perf_counter()
+            index.match_donors(blood_type, area_id, 20)
+            match_latencies.append((time.perf_counter() - started) * 1000)
+    app.extensions['db_pool'].close()
+    latencies.sort()
+    match_latencies.sort()
+
+    per_100k = 100000 / max(stats['donors'], 1)
+    return {
+        'donors': stats['donors'],
+        'vocabulary': stats['vocabulary'],
+        'memory_bytes': retained - before,
+        'memory_per_100k_bytes': round((retained - before) * per_100k),
+        'estimated_bytes': stats['memory_bytes'],
+        'load_peak_bytes': peak - before,
+        'load_seconds': round(load_seconds, 3),
+        'queries': len(latencies),
+        'latency_ms': _latency_summary(latencies),
+        'match_latency_ms': _latency_summary(match_latencies),
+    }
+
+def _latency_summary(latencies):
+    return {
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'max': round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+def format_result(result, out=None):
+    mb = 1024 * 1024
+    lines = [
+        f"donors              {result['donors']:>12}",
+        f"vocabulary words    {result['vocabulary']:>12}",
+        f"memory (traced)     {result['memory_bytes'] / mb:>10.2f} MB",
+        f"memory / 100k       {result['memory_per_100k_bytes'] / mb:>10.2f} MB",
+        f"memory (estimate)   {result['estimated_bytes'] / mb:>10.2f} MB",
+        f"load peak           {result['load_peak_bytes'] / mb:>10.2f} MB",
+        f"load time           {result['load_seconds']:>10.2f} s",
+        f"lookups             {result['queries']:>12}",
+    ]
+    lines += [f"lookup {name:<12} {value:>10.3f} ms" for name, value in result['latency_ms'].items()]
+    lines += [f"match top-20 {name:<6} {value:>10.3f} ms" for name, value in result['match_latency_ms'].items()]
+    print('\n'.join(lines), file=out)
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import db
+from benchmarks.runner import build_app, working_copy
+
+# ==================================================================================
+# KEYSET PAGINATION CHECK
+# ==================================================================================
+# Rows sharing one sort key are the normal case for keyset lists: a broadcast stamps all
+# its notifications with the same GETDATE(), a batch entry gives all its donations one
+# donation_date. `tied` such rows are added to one user's notifications (timestamped by
+# the database) and one donor's donations (timestamp bound from Python), then both lists
+# are paged with `after` cursors to the end and with `before` cursors back to the start
+# (db.get_user_notifications_keyset, db.get_donor_history_keyset). Each walk must return
+# every row exactly once, in the order of the plain ORDER BY, and stop.
+
+TIED_ROWS = 23
+
+
+def _add_tied_rows(tied):
+    """Adds `tied` same-timestamp notifications and donations; returns (user_id, donor_id)."""
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT TOP 1 id FROM [User] ORDER BY id")
+    user_id = cursor.fetchone()[0]
+    cursor.execute("SELECT TOP 1 id, bloodtype FROM Donor ORDER BY id")
+    donor_id, blood_type = cursor.fetchone()
+
+    # One statement, so every row gets the same GETDATE()
+    cursor.execute(f"""
+        INSERT INTO Notifications (user_id, message, type)
+        VALUES {', '.join(['(?, ?, ?)'] * tied)}
+    """, [value for n in range(tied) for value in (user_id, f'Pagination check {n}', 'Broadcast')])
+    donation_date = datetime.now()
+    cursor.executemany("""
+        INSERT INTO Donation_Completed (units, donor_id, blood_type, donation_date, is_exchange)
+        VALUES (1, ?, ?, ?, 0)
+    """, [(donor_id, blood_type, donation_date)] * tied)
+    conn.commit()
+    conn.close()
+    return user_id, donor_id
+
+def _expected_ids(query, key):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, (key,))
+    ids = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return ids
+
+def _walk(fetch, expected, per_page):
+    """
+    Pages forward with `after` and back with `before`.
+
+    Returns:
+        list[str]: Problems found (empty when both walks return `expected` exactly).
+    """
+    limit = len(expected) // per_page + 2
+    problems = []
+
+    forward, pages, page = [], [], fetch(per_page)
+    while True:
+        pages.append(page)
+        forward += [row.id for row in page]
+        if not page.has_next:
+            break
+        if len(pages) > limit:
+            problems.append(f'forward paging did not end after {limit} pages')
+            break
+        page = fetch(per_page, after=page.next_token)
+
+    backward = [row.id for row in pages[-1]]
+    page, steps = pages[-1], 0
+    while page.has_prev and steps <= limit:
+        page = fetch(per_page, before=page.prev_token)
+        backward = [row.id for row in page] + backward
+        steps += 1
+    if page.has_prev:
+        problems.append(f'backward paging did not end after {limit} pages')
+
+    for direction, ids in (('forward', forward), ('backward', backward)):
+        if len(ids) != len(set(ids)):
+            problems.append(f'{direction}: {len(ids) - len(set(ids))} duplicate row(s)')
+        missing = set(expected) - set(ids)
+        if missing:
+            problems.append(f'{direction}: {len(missing)} row(s) never returned')
+        if not problems and ids != expected:
+            problems.append(f'{direction}: rows out of order')
+    return problems
+
+def check(db_path, tied=TIED_ROWS, per_page=10, echo=None):
+    """
+    Returns:
+        dict: tied rows, per_page, and per list: rows and problems; ok when no list has any.
+    """
+    echo = echo or (lambda message: None)
+    app = build_app(working_copy(db_path), job_workers=0)
+    with app.app_context():
+        user_id, donor_id = _add_tied_rows(tied)
+        echo(f"Added {tied} same-timestamp notifications for user {user_id} and donations for donor {donor_id}")
+        lists = {
+            'notifications': (
+                lambda n, **cursor: db.get_user_notifications_keyset(user_id, n, **cursor),
+                _expected_ids("SELECT id FROM Notifications WHERE user_id = ? ORDER BY created_at DESC, id DESC",
+                              user_id)),
+            'donor history': (
+                lambda n, **cursor: db.get_donor_history_keyset(donor_id, n, **cursor),
+                _expected_ids("SELECT id FROM Donation_Completed WHERE donor_id = ? "
+                              "ORDER BY donation_date DESC, id DESC", donor_id)),
+        }
+        results = {name: {'rows': len(expected), 'problems': _walk(fetch, expected, per_page)}
+                   for name, (fetch, expected) in lists.items()}
+    app.extensions['db_pool'].close()
+    return {
+        'tied': tied,
+        'per_page': per_page,
+        'lists': results,
+        'ok': not any(result['problems'] for result in results.values()),
+    }
+
+def format_result(result, out=None):
+    lines = []
+    for name, entry in result['lists'].items():
+        lines.append(f"{name:<16} {entry['rows']:>6} rows  {'ok' if not entry['problems'] else 'FAILED'}")
+        lines += [f"  {problem}" for problem in entry['problems']]
+    lines.append('consistent' if result['ok'] else 'INCONSISTENT')
+    print('\n'.join(lines), file=out)
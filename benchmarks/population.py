@@ -0,0 +1,302 @@
+import json
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlite_backend import apply_derived_data, init_database, open_raw
+
+# ==================================================================================
+# SYNTHETIC POPULATIONS
+# ==================================================================================
+# Builds a SQLite database (sqlite_backend schema) filled with a deterministic,
+# seeded population of managers, donors, recipients, requests, donations, stock
+# and notifications. Rows are bulk-inserted directly (not through db.py), then
+# sqlite_backend.apply_derived_data() fills the denormalized columns, counters and
+# the donor search index exactly as `flask init-sqlite` does for the seed scripts.
+#
+# Every generated account logs in with PASSWORD:
+#   manager<n>@bench.local, donor<n>@bench.local, recipient<n>@bench.local  (n from 1)
+# Donor n is Donor.id n; recipient n is Recipient.id n. All generated donations are
+# at least 31 days old, so every donor is eligible to donate once during a run. The
+# donations still in stock are 31-40 days old, so their bags (42-day shelf life,
+# migration 009) are unexpired; a cached database older than MAX_AGE_DAYS is
+# regenerated before its stock runs out.
+
+PASSWORD = 'bench'
+EMAIL_DOMAIN = 'bench.local'
+
+AREAS = 6          # Area rows created by schema.sql
+BLOOD_TYPES = 8    # Blood_Type rows created by schema.sql, ids 1-8 in BLOOD_TYPE_NAMES order
+BLOOD_TYPE_NAMES = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+BLOOD_TYPE_WEIGHTS = (23, 3, 30, 3, 7, 1, 29, 4)
+
+FIRST_NAMES = ('Ali', 'Ahmed', 'Fatima', 'Ayesha', 'Omer', 'Hassan', 'Zainab', 'Bilal', 'Sara', 'Usman',
+               'Hamza', 'Maryam', 'Kamran', 'Sana', 'Imran', 'Hira', 'Faisal', 'Noor', 'Saad', 'Amna')
+LAST_NAMES = ('Khan', 'Ali', 'Sheikh', 'Malik', 'Qureshi', 'Siddiqui', 'Butt', 'Chaudhry', 'Raza', 'Hussain',
+              'Iqbal', 'Javed', 'Mirza', 'Baig', 'Abbasi', 'Shah')
+
+MESSAGES = (
+    ('Broadcast', 'Urgent: blood donors needed in your area. Please visit the nearest centre.'),
+    ('Broadcast', 'Blood drive this weekend. Walk-ins welcome.'),
+    ('Collection', 'Thank you for your donation. Your unit has been added to stock.'),
+    ('General', 'Your blood request has been approved.'),
+    ('General', 'Your profile was updated.'),
+)
+
+CHUNK = 20000  # rows per executemany call
+
+MAX_AGE_DAYS = 7  # generated stock expires 2-11 days after generation
+
+
+class Population:
+    """
+    Row counts for a generated database.
+
+    Args:
+        donors, recipients, requests, donations, notifications (int): Rows to generate.
+        managers (int): Manager accounts.
+        stock_ratio (float): Share of voluntary donations still in stock.
+    """
+
+    FIELDS = ('managers', 'donors', 'recipients', 'requests', 'donations', 'notifications', 'stock_ratio')
+
+    def __init__(self, donors, recipients, requests, donations, notifications, managers=5, stock_ratio=0.05):
+        self.managers = managers
+        self.donors = donors
+        self.recipients = recipients
+        self.requests = requests
+        self.donations = donations
+        self.notifications = notifications
+        self.stock_ratio = stock_ratio
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def __repr__(self):
+        return 'Population(' + ', '.join(f'{k}={v}' for k, v in self.to_dict().items()) + ')'
+
+
+SCALES = {
+    'tiny': Population(donors=500, recipients=100, requests=300, donations=2000, notifications=10000),
+    'small': Population(donors=5000, recipients=1000, requests=3000, donations=25000, notifications=100000),
+    'medium': Population(donors=25000, recipients=5000, requests=15000, donations=200000, notifications=1000000),
+    'large': Population(donors=100000, recipients=20000, requests=60000, donations=1000000, notifications=5000000),
+}
+
+
+def manifest_path(path):
+    """Sidecar JSON describing the population stored in the database at `path`."""
+    return path + '.population.json'
+
+def schema_version():
+    """Latest migration version; a cached database generated on an older schema is regenerated."""
+    from migrations import discover_migrations
+    return discover_migrations()[-1][0]
+
+def is_stale(manifest):
+    """True if a cached database is too old to use: older schema, or its stock is about to expire."""
+    if manifest.get('schema_version') != schema_version():
+        return True
+    created_at = datetime.fromisoformat(manifest['created_at'])
+    return (datetime.now() - created_at).days >= MAX_AGE_DAYS
+
+def load_manifest(path):
+    """Returns the manifest dict written by generate(), or None for a database it did not create."""
+    try:
+        with open(manifest_path(path), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def user_id(role, n, population):
+    """[User].id of the n-th (1-based) generated manager / donor / recipient."""
+    if role == 'Manager':
+        return n
+    if role == 'Donor':
+        return population.managers + n
+    return population.managers + population.donors + n
+
+def email(role, n):
+    return f'{role.lower()}{n}@{EMAIL_DOMAIN}'
+
+
+def _chunks(rows):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK))
+        if not chunk:
+            return
+        yield chunk
+
+def _stamp(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S.') + f'{dt.microsecond // 1000:03d}'
+
+
+class _Generator:
+    def __init__(self, population, seed):
+        self.p = population
+        self.rng = random.Random(seed)
+        self.now = datetime.now().replace(microsecond=0)
+        # Per-person attributes other tables depend on
+        self.donor_type = [0] * (population.donors + 1)
+        self.donor_area = [0] * (population.donors + 1)
+        self.recipient_type = [0] * (population.recipients + 1)
+
+    def _blood_type(self):
+        return self.rng.choices(range(1, BLOOD_TYPES + 1), weights=BLOOD_TYPE_WEIGHTS)[0]
+
+    def _name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def _person(self):
+        dob = self.now.date() - timedelta(days=self.rng.randint(18 * 365, 60 * 365))
+        age = (self.now.date() - dob).days // 365
+        number = '03' + ''.join(str(self.rng.randint(0, 9)) for _ in range(9))
+        return dob.isoformat(), age, number
+
+    def _ago(self, min_days, max_days):
+        return self.now - timedelta(seconds=self.rng.randint(min_days * 86400, max_days * 86400))
+
+    def users(self):
+        p = self.p
+        for n in range(1, p.managers + 1):
+            yield user_id('Manager', n, p), email('Manager', n), PASSWORD, 'Manager'
+        for n in range(1, p.donors + 1):
+            yield user_id('Donor', n, p), email('Donor', n), PASSWORD, 'Donor'
+        for n in range(1, p.recipients + 1):
+            yield user_id('Recipient', n, p), email('Recipient', n), PASSWORD, 'Recipient'
+
+    def managers(self):
+        for n in range(1, self.p.managers + 1):
+            yield n, f'Manager {n}', user_id('Manager', n, self.p)
+
+    def donors(self):
+        for n in range(1, self.p.donors + 1):
+            blood_type, area = self._blood_type(), self.rng.randint(1, AREAS)
+            self.donor_type[n], self.donor_area[n] = blood_type, area
+            dob, age, number = self._person()
+            yield (n, self._name(), blood_type, 'Active', area, number, dob, age,
+                   1 if self.rng.random() < 0.9 else 0, user_id('Donor', n, self.p))
+
+    def recipients(self):
+        for n in range(1, self.p.recipients + 1):
+            blood_type = self._blood_type()
+            self.recipient_type[n] = blood_type
+            dob, age, number = self._person()
+            yield (n, self._name(), blood_type, self.rng.randint(1, AREAS), number, dob, age,
+                   user_id('Recipient', n, self.p))
+
+    def requests(self):
+        statuses = ('Pending', 'Approved', 'Fulfilled', 'Rejected')
+        for n in range(1, self.p.requests + 1):
+            recipient = self.rng.randint(1, self.p.recipients)
+            status = self.rng.choices(statuses, weights=(20, 20, 55, 5))[0]
+            required = self.rng.randint(1, 4)
+            collected = {'Pending': 0, 'Approved': self.rng.randint(0, required - 1),
+                         'Fulfilled': required, 'Rejected': 0}[status]
+            requested = self._ago(1, 365)
+            fulfilled = (requested + timedelta(days=self.rng.randint(0, 14))).date().isoformat() \
+                if status == 'Fulfilled' else None
+            approved_by = self.rng.randint(1, self.p.managers) if status in ('Approved', 'Fulfilled') else None
+            yield (n, status, recipient, required, collected, requested.date().isoformat(), fulfilled,
+                   approved_by, self.recipient_type[recipient])
+
+    def donations(self, stock, history):
+        """Yields Donation_Completed rows; appends the matching Stock and Donor_History rows."""
+        for n in range(1, self.p.donations + 1):
+            donor = self.rng.randint(1, self.p.donors)
+            is_exchange = self.rng.random() < 0.15
+            request_id = self.rng.randint(1, self.p.requests) if is_exchange and self.p.requests else None
+            in_stock = not is_exchange and self.rng.random() < self.p.stock_ratio
+            donated = _stamp(self._ago(31, 40) if in_stock else self._ago(31, 3 * 365))
+            if in_stock:
+                stock.append((1, n, self.donor_area[donor], self.donor_type[donor], donated))
+            history.append((donor, donated, 1))
+            yield n, request_id, 1, donor, self.donor_type[donor], donated, int(is_exchange)
+
+    def notifications(self):
+        p = self.p
+        for _ in range(p.notifications):
+            roll = self.rng.random()
+            if roll < 0.8:
+                user = user_id('Donor', self.rng.randint(1, p.donors), p)
+            elif roll < 0.95:
+                user = user_id('Recipient', self.rng.randint(1, p.recipients), p)
+            else:
+                user = user_id('Manager', self.rng.randint(1, p.managers), p)
+            kind, message = self.rng.choice(MESSAGES)
+            yield user, message, 0 if self.rng.random() < 0.15 else 1, _stamp(self._ago(0, 180)), kind
+
+
+def _insert(raw, sql, rows):
+    count = 0
+    for chunk in _chunks(rows):
+        raw.executemany(sql, chunk)
+        count += len(chunk)
+    return count
+
+def generate(path, population, seed=1, echo=None):
+    """
+    Creates a fresh database at `path` holding `population`, plus its manifest.
+    An existing file at `path` is replaced.
+
+    Returns:
+        dict: Row count per table.
+    """
+    echo = echo or (lambda message: None)
+    init_database(path, seeds=())
+    gen = _Generator(population, seed)
+
+    raw = open_raw(path)
+    try:
+        raw.execute('BEGIN')
+        echo('users')
+        _insert(raw, 'INSERT INTO [User] (id, email, password, role) VALUES (?, ?, ?, ?)', gen.users())
+        _insert(raw, 'INSERT INTO Manager (id, name, user_id) VALUES (?, ?, ?)', gen.managers())
+        echo('donors')
+        _insert(raw, 'INSERT INTO Donor (id, name, bloodtype, status, area_id, number, DOB, age, availability, user_id) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', gen.donors())
+        echo('recipients')
+        _insert(raw, 'INSERT INTO Recipient (id, name, bloodtype, area_id, number, DOB, age, user_id) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', gen.recipients())
+        echo('requests')
+        _insert(raw, 'INSERT INTO Request (id, status, recipient_id, units_required, units_collected, '
+                     'date_requested, date_fulfilled, approved_by, blood_type) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                gen.requests())
+
+        echo('donations')
+        stock, history = [], []
+        sql = ('INSERT INTO Donation_Completed (id, request_id, units, donor_id, blood_type, donation_date, is_exchange) '
+               'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        for chunk in _chunks(gen.donations(stock, history)):
+            raw.executemany(sql, chunk)
+            raw.executemany('INSERT INTO Stock (units, donation_id, area_id, blood_type, received_at) '
+                            'VALUES (?, ?, ?, ?, ?)', stock)
+            raw.executemany('INSERT OR IGNORE INTO Donor_History (donor_id, [date], unit) VALUES (?, ?, ?)', history)
+            stock.clear()
+            history.clear()
+
+        echo('notifications')
+        _insert(raw, 'INSERT INTO Notifications (user_id, message, is_read, created_at, type) VALUES (?, ?, ?, ?, ?)',
+                gen.notifications())
+        raw.execute('COMMIT')
+
+        echo('derived data')
+        apply_derived_data(raw)
+        raw.execute('ANALYZE')
+
+        tables = [row[0] for row in raw.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        counts = {table: raw.execute(f'SELECT COUNT(*) FROM [{table}]').fetchone()[0] for table in tables}
+        version = raw.execute('SELECT MAX(version) FROM Schema_Migrations').fetchone()[0]
+    finally:
+        raw.close()
+
+    with open(manifest_path(path), 'w', encoding='utf-8') as f:
+        json.dump({'population': population.to_dict(), 'seed': seed, 'password': PASSWORD, 'schema_version': version,
+                   'created_at': datetime.now().isoformat(timespec='seconds'), 'counts': counts}, f, indent=2)
+    return counts
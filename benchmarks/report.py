@@ -0,0 +1,159 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from collections import Counter
+from datetime import datetime
+
+# ==================================================================================
+# RESULTS
+# ==================================================================================
+# summarize() turns samples into per-endpoint latency percentiles, throughput and
+# queries per request; save() writes them with the run's settings and the git commit
+# so two result files can be compared with compare() (`python -m benchmarks compare`).
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+FORMAT_VERSION = 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list (0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil(n * pct / 100)
+    return sorted_values[int(rank) - 1]
+
+def _stats(samples, elapsed):
+    latencies = sorted(s.latency * 1000 for s in samples)
+    count = len(samples)
+    errors = sum(1 for s in samples if not s.ok)
+    return {
+        'count': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / count, 3) if count else 0.0,
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+        },
+        'queries_per_request': round(sum(s.queries for s in samples) / count, 2) if count else 0.0,
+        'query_ms_per_request': round(sum(s.query_ms for s in samples) / count, 3) if count else 0.0,
+        'statuses': {str(code): n for code, n in sorted(Counter(s.status for s in samples).items())},
+    }
+
+def summarize(samples, elapsed):
+    """
+    Returns:
+        dict: {'total': stats, 'endpoints': {label: stats}} - see _stats() for the fields.
+    """
+    by_label = {}
+    for sample in samples:
+        by_label.setdefault(sample.label, []).append(sample)
+    return {
+        'total': _stats(samples, elapsed),
+        'endpoints': {label: _stats(group, elapsed) for label, group in sorted(by_label.items())},
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(('git',) + args, capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment():
+    """Commit, interpreter and machine the run was taken on."""
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def save(result, path=None):
+    """Writes `result` as JSON (default: benchmarks/results/<timestamp>-<commit>.json) and returns the path."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{result['environment']['commit'] or 'nogit'}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        result = json.load(f)
+    if result.get('format') != FORMAT_VERSION:
+        raise ValueError(f'{path}: unsupported result format {result.get("format")!r}')
+    return result
+
+
+# ==================================================================================
+# OUTPUT
+# ==================================================================================
+
+def format_table(summary, out=sys.stdout):
+    header = f"{'endpoint':<42} {'count':>7} {'err%':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}"
+    print(header, file=out)
+    print('-' * len(header), file=out)
+    rows = list(summary['endpoints'].items()) + [('TOTAL', summary['total'])]
+    for label, stats in rows:
+        latency = stats['latency_ms']
+        print(f"{label:<42} {stats['count']:>7} {stats['error_rate'] * 100:>6.1f} {stats['throughput_rps']:>8.1f} "
+              f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f} "
+              f"{stats['queries_per_request']:>6.1f}", file=out)
+
+
+def compare(base, new, threshold=0.10, min_ms=1.0):
+    """
+    Compares two saved results endpoint by endpoint.
+
+    An endpoint regresses when its p95 grows by more than `threshold` (fraction) and
+    `min_ms`, its throughput drops by more than `threshold`, or it runs more queries
+    per request.
+
+    Returns:
+        (list[dict], list[str]): Per-endpoint rows and the regression messages.
+    """
+    rows, regressions = [], []
+    for label in sorted(set(base['summary']['endpoints']) | set(new['summary']['endpoints'])):
+        old = base['summary']['endpoints'].get(label)
+        cur = new['summary']['endpoints'].get(label)
+        row = {'endpoint': label, 'base': old, 'new': cur}
+        rows.append(row)
+        if not old or not cur:
+            continue
+
+        old_p95, new_p95 = old['latency_ms']['p95'], cur['latency_ms']['p95']
+        if new_p95 > old_p95 * (1 + threshold) and new_p95 - old_p95 > min_ms:
+            regressions.append(f'{label}: p95 {old_p95:.2f} -> {new_p95:.2f} ms')
+        if cur['throughput_rps'] < old['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{label}: throughput {old['throughput_rps']:.1f} -> {cur['throughput_rps']:.1f} rps")
+        if cur['queries_per_request'] > old['queries_per_request'] + 0.5:
+            regressions.append(f"{label}: queries/request {old['queries_per_request']:.1f} "
+                               f"-> {cur['queries_per_request']:.1f}")
+    return rows, regressions
+
+def format_comparison(rows, out=sys.stdout):
+    header = f"{'endpoint':<42} {'p50':>19} {'p95':>19} {'rps':>17} {'q/req':>13}"
+    print(header, file=out)
+    print('-' * len(header), file=out)
+
+    def pair(old, cur, key, fmt):
+        a = fmt.format(old[key]) if old else '-'
+        b = fmt.format(cur[key]) if cur else '-'
+        return f'{a} -> {b}'
+
+    for row in rows:
+        old, cur = row['base'], row['new']
+        old_lat = old and old['latency_ms']
+        cur_lat = cur and cur['latency_ms']
+        print(f"{row['endpoint']:<42} {pair(old_lat, cur_lat, 'p50', '{:.2f}'):>19} "
+              f"{pair(old_lat, cur_lat, 'p95', '{:.2f}'):>19} {pair(old, cur, 'throughput_rps', '{:.1f}'):>17} "
+              f"{pair(old, cur, 'queries_per_request', '{:.1f}'):>13}", file=out)
@@ -0,0 +1,237 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from app import Config, create_app
+from benchmarks import population as populations
+from benchmarks.transport import HttpTransport, TestClientTransport, WsgiServer
+from benchmarks.workload import ACTIONS, LOGIN_LABEL, ROLE_WEIGHTS, Fixtures, login_form
+
+# ==================================================================================
+# RUNNER
+# ==================================================================================
+# run() copies a generated database to a scratch file, boots create_app() on it (SQLite
+# backend), starts `users` virtual-user threads and records one Sample per request.
+# Samples taken during the warm-up period are discarded.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+
+
+class Sample:
+    __slots__ = ('label', 'status', 'ok', 'latency', 'queries', 'query_ms')
+
+    def __init__(self, label, status, ok, latency, queries, query_ms):
+        self.label = label
+        self.status = status
+        self.ok = ok
+        self.latency = latency
+        self.queries = queries
+        self.query_ms = query_ms
+
+
+class Recorder:
+    """Collects samples from all virtual users once `start_recording()` has been called."""
+
+    def __init__(self, max_requests=None):
+        self.samples = []
+        self.recording = False
+        self.max_requests = max_requests
+        self.stop = threading.Event()
+
+    def start_recording(self):
+        self.recording = True
+
+    def add(self, sample):
+        if not self.recording:
+            return
+        self.samples.append(sample)  # list.append is atomic under the GIL
+        if self.max_requests and len(self.samples) >= self.max_requests:
+            self.stop.set()
+
+
+class VirtualUser:
+    """One simulated user: a role, a logged-in session (transport) and its own RNG."""
+
+    def __init__(self, role, transport, fixtures, recorder, seed, actions, session_length):
+        self.role = role
+        self.transport = transport
+        self.fixtures = fixtures
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.actions = actions
+        self.weights = [action.weight for action in actions]
+        self.session_length = session_length
+        self._label = None
+
+    def call(self, method, path, form=None, json_body=None):
+        start = time.perf_counter()
+        try:
+            response = self.transport.request(method, path, form=form, json_body=json_body)
+        except Exception:
+            self.recorder.add(Sample(self._label, 0, False, time.perf_counter() - start, 0, 0.0))
+            raise
+        latency = time.perf_counter() - start
+        # Redirects are successes (form posts, logins); JSON endpoints report failures in the body too
+        ok = response.status < 400 and not (response.json and 'error' in response.json)
+        self.recorder.add(Sample(self._label, response.status, ok, latency, response.queries, response.query_ms))
+        return response
+
+    def login(self):
+        self._label = LOGIN_LABEL
+        response = self.call('POST', '/login', form=login_form(self.role, self.rng, self.fixtures.population))
+        return response.status == 302
+
+    def run(self):
+        try:
+            while not self.recorder.stop.is_set():
+                if not self.login():
+                    return
+                for _ in range(self.session_length):
+                    if self.recorder.stop.is_set():
+                        return
+                    action = self.rng.choices(self.actions, weights=self.weights)[0]
+                    self._label = action.label
+                    try:
+                        action.run(self)
+                    except Exception:
+                        pass  # already recorded as a failed sample
+        finally:
+            self.transport.close()
+
+
+# ==================================================================================
+# DATABASE AND APP
+# ==================================================================================
+
+def population_database(population, seed=1, path=None, name='custom', reuse=False, echo=None):
+    """
+    Returns (path, Population) of a generated database, generating it if needed.
+
+    Without `path`, databases are cached as benchmarks/.data/<name>-seed<seed>.db. An existing
+    database is used when its manifest matches `population`, `seed` and the current schema
+    version and it is not old enough for its stock to expire (populations.is_stale), or
+    whatever population it holds when `reuse` is set; otherwise it is regenerated.
+    """
+    if path is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        path = os.path.join(DATA_DIR, f'{name}-seed{seed}.db')
+
+    manifest = populations.load_manifest(path) if os.path.exists(path) else None
+    current = manifest and not populations.is_stale(manifest)
+    if current and (reuse or (manifest['population'] == population.to_dict() and manifest['seed'] == seed)):
+        return path, populations.Population.from_dict(manifest['population'])
+    if reuse and os.path.exists(path):
+        if manifest:
+            raise ValueError(f'{path} was generated on an older schema (version {manifest.get("schema_version")}) '
+                             f'or its stock has expired ({manifest.get("created_at")}); regenerate it without --reuse.')
+        raise ValueError(f'{path} was not created by the benchmark generator (no {populations.manifest_path(path)}).')
+
+    if echo:
+        echo(f'Generating {population} into {path} ...')
+    populations.generate(path, population, seed=seed, echo=echo and (lambda table: echo(f'  {table}')))
+    return path, population
+
+def working_copy(path):
+    """Copies the database at `path` to a scratch file (runs never change the cached population)."""
+    work = path[:-3] + '.work.db' if path.endswith('.db') else path + '.work'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    src, dst = sqlite3.connect(path), sqlite3.connect(work)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+    return work
+
+def build_app(db_path, job_workers=1, pool_size=None, read_mode=None):
+    """create_app() on the SQLite file at `db_path`, with query tracing on (Server-Timing)."""
+
+    class BenchConfig(Config):
+        DB_BACKEND = 'sqlite'
+        SQLITE_PATH = db_path
+        JOB_WORKERS = job_workers
+        JOB_POLL_INTERVAL = 0.5
+        QUERY_TRACE = True
+        TESTING = False
+
+    if pool_size:
+        BenchConfig.DB_POOL_SIZE = pool_size
+    if read_mode:
+        BenchConfig.DB_READ_MODE = read_mode
+
+    return create_app(BenchConfig)
+
+
+# ==================================================================================
+# RUN
+# ==================================================================================
+
+def run(db_path, population, users=8, duration=30.0, warmup=5.0, max_requests=None, transport='client',
+        actions=None, seed=1, session_length=25, job_workers=1, pool_size=None, read_mode=None, echo=None):
+    """
+    Drives the workload against a fresh copy of `db_path`.
+
+    Args:
+        users (int): Concurrent virtual users (threads).
+        duration (float): Seconds to record after warm-up (unused when max_requests is given).
+        transport (str): 'client' (Flask test client) or 'wsgi' (local HTTP server).
+        actions (dict): role -> [Action]; defaults to workload.ACTIONS.
+        read_mode (str): DB_READ_MODE of the app (default: the app config).
+
+    Returns:
+        (list[Sample], float, dict): Samples, recorded wall-clock seconds, pool stats at the end.
+    """
+    echo = echo or (lambda message: None)
+    actions = actions or ACTIONS
+    work = working_copy(db_path)
+    app = build_app(work, job_workers=job_workers, pool_size=pool_size, read_mode=read_mode)
+    fixtures = Fixtures(work, population, seed=seed)
+    recorder = Recorder(max_requests)
+
+    server = WsgiServer(app).start() if transport == 'wsgi' else None
+
+    def make_transport():
+        if server:
+            return HttpTransport(server.host, server.port)
+        return TestClientTransport(app)
+
+    rng = random.Random(seed)
+    roles = [role for role in ROLE_WEIGHTS if role in actions]
+    threads = []
+    for n in range(users):
+        role = rng.choices(roles, weights=[ROLE_WEIGHTS[r] for r in roles])[0]
+        user = VirtualUser(role, make_transport(), fixtures, recorder, seed * 1000 + n, actions[role], session_length)
+        threads.append(threading.Thread(target=user.run, name=f'bench-user-{n}', daemon=True))
+
+    echo(f'{users} users ({transport}), warm-up {warmup:g}s, '
+         + (f'{max_requests} requests' if max_requests else f'{duration:g}s'))
+    for thread in threads:
+        thread.start()
+    try:
+        recorder.stop.wait(warmup)
+        recorder.start_recording()
+        started = time.perf_counter()
+        deadline = None if max_requests else started + duration
+        while not recorder.stop.wait(0.2):
+            if deadline and time.perf_counter() >= deadline:
+                break
+            if not any(thread.is_alive() for thread in threads):
+                break  # every user gave up (e.g. logins failing)
+        elapsed = time.perf_counter() - started
+    finally:
+        recorder.stop.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        if server:
+            server.stop()
+        app.extensions['job_workers'].stop(timeout=30)
+        pool_stats = app.extensions['db_pool'].stats()
+        app.extensions['db_pool'].close()
+        if app.extensions['db_read_pool']:
+            app.extensions['db_read_pool'].close()
+
+    return recorder.samples, elapsed, pool_stats
@@ -0,0 +1,131 @@
+import http.client
+import json
+import re
+import threading
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+# ==================================================================================
+# TRANSPORTS
+# ==================================================================================
+# A transport sends one request for one virtual user and keeps that user's session
+# cookie. 'client' calls the app in process through Flask's test client (no sockets,
+# measures the app itself); 'wsgi' serves the app on a local threaded WSGI server and
+# talks real HTTP/1.1 with keep-alive (adds the server and socket overhead).
+#
+# Queries per request and their time come from the app's Server-Timing header
+# (query_trace.py), so the benchmark measures the app exactly as deployed.
+
+_DB_TIMING = re.compile(r'\bdb;dur=([\d.]+);desc="(\d+) queries')
+
+
+class Response:
+    """Status, decoded JSON body (if any) and the query counters of one request."""
+
+    __slots__ = ('status', 'json', 'size', 'queries', 'query_ms')
+
+    def __init__(self, status, body, content_type, headers):
+        self.status = status
+        self.size = len(body)
+        self.json = None
+        if content_type and content_type.startswith('application/json') and body:
+            self.json = json.loads(body)
+        timing = _DB_TIMING.search(headers.get('Server-Timing') or '')
+        self.query_ms = float(timing.group(1)) if timing else 0.0
+        self.queries = int(timing.group(2)) if timing else 0
+
+
+# ==================================================================================
+# TRANSPORT IMPLEMENTATIONS
+# ==================================================================================
+
+class TestClientTransport:
+    """In-process requests through app.test_client() (one client, i.e. cookie jar, per user)."""
+
+    name = 'client'
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, form=None, json_body=None):
+        response = self._client.open(path, method=method, data=form, json=json_body)
+        try:
+            return Response(response.status_code, response.get_data(), response.content_type, response.headers)
+        finally:
+            response.close()
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """Real HTTP/1.1 requests over one keep-alive connection per user."""
+
+    name = 'wsgi'
+
+    def __init__(self, host, port, timeout=60.0):
+        self._host, self._port, self._timeout = host, port, timeout
+        self._conn = None
+        self._cookies = SimpleCookie()
+
+    def request(self, method, path, form=None, json_body=None):
+        headers = {}
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self._cookies:
+            headers['Cookie'] = '; '.join(f'{k}={m.value}' for k, m in self._cookies.items())
+
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server closed an idle keep-alive connection: reconnect once
+                self.close()
+                if attempt == 2:
+                    raise
+
+        for cookie in response.headers.get_all('Set-Cookie') or ():
+            self._cookies.load(cookie)
+        if response.will_close:
+            self.close()
+        return Response(response.status, data, response.getheader('Content-Type'), response.headers)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class WsgiServer:
+    """The app on a local threaded werkzeug server, run in a background thread."""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self._server = make_server(host, port, app, threaded=True, request_handler=QuietHandler)
+        self.host, self.port = host, self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, name='bench-wsgi', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._thread.join(timeout=10)
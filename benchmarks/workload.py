@@ -0,0 +1,249 @@
+import random
+import sqlite3
+import threading
+from collections import deque
+from urllib.parse import quote
+
+from benchmarks.population import AREAS, BLOOD_TYPES, BLOOD_TYPE_NAMES, PASSWORD, email
+
+# ==================================================================================
+# WORKLOAD
+# ==================================================================================
+# A virtual user picks a role (ROLE_WEIGHTS), logs in, then performs weighted random
+# actions for that role (ACTIONS), logging in again every `session_length` actions so
+# login stays in the mix. Every action is recorded under a stable label (method and
+# route rule), not the concrete URL, so results aggregate per endpoint.
+#
+# State-changing actions draw their targets from shared Fixtures queues so that,
+# e.g., each generated donor donates at most once and a request is approved once.
+
+ROLE_WEIGHTS = {'Manager': 20, 'Donor': 60, 'Recipient': 20}
+
+# Donations per POST /manager/submit-donations (a blood drive upload)
+DONATION_BATCH_SIZE = 50
+
+
+class Fixtures:
+    """
+    Targets for the workload, read once from the generated database.
+
+    Queues are shared by all virtual users (thread-safe pops); reads fall back to
+    random choices so they never run dry.
+    """
+
+    def __init__(self, path, population, seed=1):
+        self.population = population
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        raw = sqlite3.connect(path)
+        try:
+            self.pending = self._queue(raw, "SELECT id FROM Request WHERE status = 'Pending'")
+            self.approved = deque(raw.execute("""
+                SELECT r.id, rec.area_id FROM Request r JOIN Recipient rec ON rec.id = r.recipient_id
+                WHERE r.status = 'Approved'
+            """).fetchall())
+            self.rng.shuffle(self.approved)
+            self.donor_names = [row[0] for row in raw.execute("SELECT DISTINCT name FROM Donor")]
+            donors_by_area = {}
+            for donor_id, area_id in raw.execute("SELECT id, area_id FROM Donor"):
+                donors_by_area.setdefault(area_id, []).append(donor_id)
+        finally:
+            raw.close()
+
+        # Donors never donate twice in a run (30-day rule); separate queue per area for exchanges
+        self.donors_by_area = {}
+        for area_id, donor_ids in donors_by_area.items():
+            self.rng.shuffle(donor_ids)
+            self.donors_by_area[area_id] = deque(donor_ids)
+        self.fulfillable = deque()  # requests approved during the run
+
+    def _queue(self, raw, sql):
+        ids = [row[0] for row in raw.execute(sql)]
+        self.rng.shuffle(ids)
+        return deque(ids)
+
+    def pop(self, queue):
+        with self._lock:
+            return queue.popleft() if queue else None
+
+    def push(self, queue, item):
+        with self._lock:
+            queue.append(item)
+
+    def fresh_donor(self, area_id=None):
+        with self._lock:
+            areas = [area_id] if area_id else [a for a, q in self.donors_by_area.items() if q]
+            queue = self.donors_by_area.get(areas[0] if area_id else self.rng.choice(areas)) if areas else None
+            return queue.popleft() if queue else None
+
+
+class Action:
+    """One weighted step of a role's workload. `run(user)` returns the label's Response or None to skip."""
+
+    def __init__(self, label, weight, run):
+        self.label = label
+        self.weight = weight
+        self.run = run
+
+
+# ==================================================================================
+# ACTIONS
+# ==================================================================================
+
+def _manager_dashboard(user):
+    return user.call('GET', '/manager/dashboard')
+
+def _inventory(user):
+    return user.call('GET', '/manager/inventory')
+
+def _donor_list(user):
+    rng = user.rng
+    params = [f'page={rng.randint(1, 20)}']
+    if rng.random() < 0.5:
+        params.append(f'area_id={rng.randint(1, AREAS)}')
+    if rng.random() < 0.3:
+        params.append('blood_type=' + quote(rng.choice(BLOOD_TYPE_NAMES)))
+    return user.call('GET', '/manager/donors?' + '&'.join(params))
+
+def lookup_query(rng, fixtures):
+    """A donor lookup query: donor id, phone prefix, name prefix, typo or name + blood type."""
+    roll = rng.random()
+    if roll < 0.3:
+        query = str(rng.randint(1, fixtures.population.donors))
+    elif roll < 0.4:
+        query = '03' + ''.join(str(rng.randint(0, 9)) for _ in range(rng.randint(2, 6)))  # phone prefix
+    else:
+        name = rng.choice(fixtures.donor_names)
+        query = name[:rng.randint(3, len(name))]
+        if roll < 0.5 and len(query) > 4:
+            cut = rng.randrange(1, len(query) - 1)  # typo: a dropped letter
+            query = query[:cut] + query[cut + 1:]
+        elif roll > 0.9:
+            query += ' ' + rng.choice(BLOOD_TYPE_NAMES)
+    return query
+
+def _donor_lookup(user):
+    return user.call('POST', '/manager/donor-lookup', json_body={'query': lookup_query(user.rng, user.fixtures)})
+
+def _requests_list(user):
+    return user.call('GET', f'/manager/requests?page={user.rng.randint(1, 10)}')
+
+def _requests_by_area(user):
+    return user.call('GET', f'/manager/get-requests-by-area/{user.rng.randint(1, AREAS)}')
+
+def _submit_donation(user):
+    fixtures = user.fixtures
+    body = {'volume': 1, 'is_exchange': False}
+    target = fixtures.pop(fixtures.approved) if user.rng.random() < 0.2 else None
+    if target:
+        request_id, area_id = target
+        body.update(is_exchange=True, request_id=request_id)
+        body['donor_id'] = fixtures.fresh_donor(area_id)
+    else:
+        body['donor_id'] = fixtures.fresh_donor()
+    if body['donor_id'] is None:
+        return None
+    return user.call('POST', '/manager/submit-donation', json_body=body)
+
+def _submit_donations(user):
+    # A blood drive upload: a batch of voluntary donations from fresh donors
+    fixtures = user.fixtures
+    donor_ids = [d for d in (fixtures.fresh_donor() for _ in range(DONATION_BATCH_SIZE)) if d is not None]
+    if not donor_ids:
+        return None
+    return user.call('POST', '/manager/submit-donations', json_body=[{'donor_id': d, 'volume': 1} for d in donor_ids])
+
+def _approve(user):
+    request_id = user.fixtures.pop(user.fixtures.pending)
+    if request_id is None:
+        return None
+    response = user.call('POST', f'/manager/approve-request/{request_id}')
+    if response.status == 200:
+        user.fixtures.push(user.fixtures.fulfillable, request_id)
+    return response
+
+def _fulfill(user):
+    request_id = user.fixtures.pop(user.fixtures.fulfillable)
+    if request_id is None:
+        return None
+    return user.call('POST', f'/manager/fulfill-request/{request_id}')
+
+def _broadcast(user):
+    # Narrow target (one blood type) so a broadcast costs what a real one would
+    form = {'target_role': 'Donor', 'blood_type': user.rng.choice(BLOOD_TYPE_NAMES),
+            'message': 'Benchmark broadcast: donors needed.'}
+    return user.call('POST', '/manager/send-notification', form=form)
+
+def _donor_dashboard(user):
+    return user.call('GET', '/donor/dashboard')
+
+def _toggle_availability(user):
+    return user.call('POST', '/donor/toggle-availability')
+
+def _notifications(user):
+    return user.call('GET', f'/notifications/?page={user.rng.choice((1, 1, 1, 2, 3))}')
+
+def _unread_count(user):
+    return user.call('GET', '/notifications/unread-count')
+
+def _mark_all_read(user):
+    return user.call('POST', '/notifications/mark-all-read')
+
+def _recipient_dashboard(user):
+    return user.call('GET', '/recipient/dashboard')
+
+def _create_request(user):
+    form = {'units': str(user.rng.randint(1, 4)), 'blood_type': str(user.rng.randint(1, BLOOD_TYPES))}
+    return user.call('POST', '/recipient/create-request', form=form)
+
+
+ACTIONS = {
+    'Manager': [
+        Action('GET /manager/dashboard', 10, _manager_dashboard),
+        Action('GET /manager/inventory', 8, _inventory),
+        Action('GET /manager/donors', 10, _donor_list),
+        Action('POST /manager/donor-lookup', 15, _donor_lookup),
+        Action('GET /manager/requests', 8, _requests_list),
+        Action('GET /manager/get-requests-by-area/<id>', 5, _requests_by_area),
+        Action('POST /manager/submit-donation', 10, _submit_donation),
+        Action('POST /manager/submit-donations', 0.5, _submit_donations),
+        Action('POST /manager/approve-request/<id>', 5, _approve),
+        Action('POST /manager/fulfill-request/<id>', 3, _fulfill),
+        Action('POST /manager/send-notification', 0.5, _broadcast),
+    ],
+    'Donor': [
+        Action('GET /donor/dashboard', 40, _donor_dashboard),
+        Action('GET /notifications/', 20, _notifications),
+        Action('GET /notifications/unread-count', 30, _unread_count),
+        Action('POST /notifications/mark-all-read', 5, _mark_all_read),
+        Action('POST /donor/toggle-availability', 5, _toggle_availability),
+    ],
+    'Recipient': [
+        Action('GET /recipient/dashboard', 50, _recipient_dashboard),
+        Action('GET /notifications/unread-count', 30, _unread_count),
+        Action('GET /notifications/', 10, _notifications),
+        Action('POST /recipient/create-request', 10, _create_request),
+    ],
+}
+
+LOGIN_LABEL = 'POST /login'
+
+
+def login_form(role, rng, population):
+    """Credentials of a random generated user of `role`."""
+    count = {'Manager': population.managers, 'Donor': population.donors, 'Recipient': population.recipients}[role]
+    return {'email': email(role, rng.randint(1, count)), 'password': PASSWORD}
+
+
+def only(endpoints):
+    """
+    Restricts ACTIONS to labels containing any of `endpoints` (substring match).
+    Returns a role -> actions mapping without the roles left empty.
+    """
+    selected = {}
+    for role, actions in ACTIONS.items():
+        kept = [a for a in actions if any(e in a.label for e in endpoints)]
+        if kept:
+            selected[role] = kept
+    return selected
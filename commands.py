@@ -0,0 +1,201 @@
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from db import (reconcile_inventory_summary, reconcile_inventory_buckets, rebuild_donor_search_index,
+                get_blood_type_str, reference_data, get_dialect, sync_donor_eligibility, enqueue_job,
+                retire_expired_stock)
+from migrations import apply_migrations
+from query_plans import check_query_plans, KNOWN_SCANS
+from jobs import bootstrap_sweeps
+
+# ==================================================================================
+# MAINTENANCE COMMANDS (flask --app run <command>)
+# ==================================================================================
+
+@click.command('reconcile-inventory')
+@click.option('--dry-run', is_flag=True, help='Only report drift; do not rewrite Inventory_Summary / Inventory_Bucket.')
+@with_appcontext
+def reconcile_inventory_command(dry_run):
+    """Rebuilds Inventory_Summary and Inventory_Bucket from Stock and reports any drift."""
+    verb = 'Found' if dry_run else 'Fixed'
+
+    success, result = reconcile_inventory_summary(apply=not dry_run)
+    if not success:
+        raise click.ClickException(result)
+
+    if not result:
+        click.echo('Inventory_Summary matches Stock. No drift.')
+    else:
+        click.echo(f'{"Area":<20} {"Type":<6} {"Summary":>8} {"Stock":>8} {"Drift":>8}')
+        for row in result:
+            area_name = reference_data().area_name(row.area_id) or row.area_id
+            click.echo(f'{area_name:<20} {get_blood_type_str(row.blood_type) or row.blood_type:<6} '
+                       f'{row.summary_units:>8} {row.actual_units:>8} {row.summary_units - row.actual_units:>+8}')
+        click.echo(f'{verb} drift in {len(result)} (area, blood type) row(s).')
+
+    success, result = reconcile_inventory_buckets(apply=not dry_run)
+    if not success:
+        raise click.ClickException(result)
+
+    if not result:
+        click.echo('Inventory_Bucket matches Stock. No drift.')
+        return
+
+    click.echo(f'{"Area":<20} {"Type":<6} {"Expires":<10} {"Bucket":>8} {"Stock":>8} {"Drift":>8}')
+    for row in result:
+        area_name = reference_data().area_name(row.area_id) or row.area_id
+        click.echo(f'{area_name:<20} {get_blood_type_str(row.blood_type) or row.blood_type:<6} {str(row.expires_on):<10} '
+                   f'{row.bucket_units:>8} {row.actual_units:>8} {row.bucket_units - row.actual_units:>+8}')
+    click.echo(f'{verb} drift in {len(result)} (area, blood type, expiry day) row(s).')
+
+
+def _require_sql_server(command):
+    if get_dialect().name != 'mssql':
+        raise click.ClickException(f'{command} needs SQL Server (DB_BACKEND=mssql); '
+                                   f'the SQLite schema is rebuilt with init-sqlite.')
+
+
+@click.command('migrate')
+@click.option('--target', type=int, default=None, help='Highest migration version to apply.')
+@click.option('--dry-run', is_flag=True, help='List pending migrations without applying them.')
+@with_appcontext
+def migrate_command(target, dry_run):
+    """Applies pending scripts from Database/migrations/ (idempotent)."""
+    _require_sql_server('migrate')
+    success, result = apply_migrations(target=target, dry_run=dry_run)
+    if not success:
+        raise click.ClickException(result)
+
+    if not result:
+        click.echo('Database is up to date.')
+        return
+    for version, name in result:
+        click.echo(f'{"Pending" if dry_run else "Applied"} {version:03d}_{name}')
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Fails if any db.py read path scans a growing table on the seeded dataset."""
+    _require_sql_server('check-query-plans')
+    violations, known = check_query_plans()
+
+    for name, table, op, text in known:
+        click.echo(f'KNOWN  {name}: {op} on {table} ({KNOWN_SCANS[name]})')
+    for name, table, op, text in violations:
+        click.echo(f'SCAN   {name}: {op} on {table}\n       {" ".join(text.split())[:200]}')
+
+    if violations:
+        raise click.ClickException(f'{len(violations)} query plan(s) fall back to a scan.')
+    click.echo('No unexpected scans.')
+
+
+@click.command('run-jobs')
+@click.option('--workers', type=int, default=None, help='Worker threads (default: JOB_WORKERS).')
+@with_appcontext
+def run_jobs_command(workers):
+    """Runs background job workers in the foreground until interrupted."""
+    job_workers = current_app.extensions['job_workers']
+    if workers is not None:
+        job_workers.workers = workers
+    if job_workers.start() and current_app.config.get('STOCK_EXPIRY_SWEEP', True):
+        bootstrap_sweeps()
+    click.echo(f'Running {job_workers.workers} job worker(s). Press Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_workers.stop(timeout=30)
+
+
+@click.command('reindex-donor-search')
+@with_appcontext
+def reindex_donor_search_command():
+    """Rebuilds the donor name search index (Name_Token, Donor_Name_Token) from Donor."""
+    success, result = rebuild_donor_search_index()
+    if not success:
+        raise click.ClickException(result)
+    words, postings = result
+    click.echo(f'Indexed {postings} name word(s) of donors; vocabulary of {words} word(s).')
+
+
+@click.command('sync-donor-eligibility')
+@click.option('--dry-run', is_flag=True, help='Only report drift; do not rewrite Donor.')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Donors per transaction.')
+@click.option('--background', is_flag=True, help='Queue it as a job for the workers instead.')
+@with_appcontext
+def sync_donor_eligibility_command(dry_run, chunk_size, background):
+    """Backfills / verifies Donor.last_donation_at and eligible_from against Donation_Completed."""
+    if background:
+        success, result = enqueue_job('donor_eligibility', {'apply': not dry_run, 'chunk_size': chunk_size})
+        if not success:
+            raise click.ClickException(result)
+        click.echo(f'Queued job {result}; progress: /manager/jobs/{result}')
+        return
+
+    success, result = sync_donor_eligibility(apply=not dry_run, chunk_size=chunk_size)
+    if not success:
+        raise click.ClickException(result)
+
+    if not result.drift:
+        click.echo(f'Checked {result.checked} donor(s). Eligibility matches Donation_Completed. No drift.')
+        return
+
+    click.echo(f'{"Donor":>8} {"Stored last donation":<20} {"Eligible from":<13} {"Actual last donation":<20}')
+    for row in result.sample:
+        click.echo(f'{row.donor_id:>8} {str(row.last_donation_at or "-")[:19]:<20} {str(row.eligible_from or "-"):<13} '
+                   f'{str(row.actual_last_donation or "-")[:19]:<20}')
+    if result.drift > len(result.sample):
+        click.echo(f'... and {result.drift - len(result.sample)} more')
+
+    verb = 'Found' if dry_run else 'Fixed'
+    click.echo(f'{verb} drift on {result.drift} of {result.checked} donor(s).')
+
+
+@click.command('retire-expired-stock')
+@click.option('--chunk-size', type=int, default=None, help='Bags per transaction (default: STOCK_EXPIRY_CHUNK_SIZE).')
+@click.option('--background', is_flag=True, help='Queue it as a job for the workers instead.')
+@with_appcontext
+def retire_expired_stock_command(chunk_size, background):
+    """Deletes expired bags from Stock and takes them out of the inventory totals."""
+    if background:
+        success, result = enqueue_job('stock_expiry', {})
+        if not success:
+            raise click.ClickException(result)
+        click.echo(f'Queued job {result}; progress: /manager/jobs/{result}')
+        return
+
+    success, result = retire_expired_stock(chunk_size=chunk_size)
+    if not success:
+        raise click.ClickException(result)
+    click.echo(f'Retired {result.bags} expired bag(s), {result.units} unit(s), in {result.chunks} chunk(s).')
+
+
+@click.command('init-sqlite')
+@click.option('--path', default=None, help='Database file (default: SQLITE_PATH).')
+@click.option('--seed', 'seeds', multiple=True, help='Seed script in Database/ (default: data.sql, data2.sql).')
+@with_appcontext
+def init_sqlite_command(path, seeds):
+    """Creates a fresh SQLite database: schema, seed data and derived totals."""
+    from sqlite_backend import init_database, DEFAULT_SEEDS
+
+    path = path or current_app.config.get('SQLITE_PATH') or 'bloodlink.db'
+    counts = init_database(path, seeds or DEFAULT_SEEDS, echo=lambda message: click.echo(f'  {message}'))
+    for table, count in counts.items():
+        click.echo(f'{table:<22} {count:>8}')
+    click.echo(f'Created {path}.')
+
+
+def register_commands(app):
+    """Registers the maintenance commands on the app's CLI."""
+    app.cli.add_command(reconcile_inventory_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(run_jobs_command)
+    app.cli.add_command(reindex_donor_search_command)
+    app.cli.add_command(sync_donor_eligibility_command)
+    app.cli.add_command(retire_expired_stock_command)
+    app.cli.add_command(init_sqlite_command)
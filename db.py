@@ -1,20 +1,269 @@
-import pyodbc
-from flask import current_app
-from datetime import datetime
+import json
+import time
+from flask import current_app, g
+from datetime import datetime, timedelta
+from collections import namedtuple
+
+import donor_search
+from donor_index import donor_event, donor_index
+from db_backend import create_dialect, create_read_dialect, named_query
+from db_pool import ConnectionPool, PooledConnection
+from reference_data import ReferenceDataCache
+from ttl_cache import TTLCache
+from transaction_retry import RetryPolicy, TransactionStats, log as retry_log
+from notification_events import broker as notification_broker, notification_event, read_event
+from pagination import build_page, decode_cursor, seek_clause
 
 # ==================================================================================
 # DATABASE CONNECTION
 # ==================================================================================
+# Two kinds of helpers:
+#
+#   write path  Everything that changes data, and every read a write decides on, uses
+#               get_db_connection() - the request's connection to the primary - and
+#               run_transaction() for its transactions. Unchanged by DB_READ_MODE.
+#   read path   The reporting reads behind the manager list pages (inventory, expiring
+#               stock, donors, requests, rebalancing inputs) use get_read_connection().
+#               With DB_READ_MODE 'snapshot' or 'replica' that is a connection from a
+#               separate read pool that reads committed row versions (or a replica), so a
+#               long report neither waits on nor blocks stock allocation and fulfillment;
+#               with 'primary' (default) it is the request's connection, as before.
+#
+# A read helper only ever SELECTs and ends with conn.close() (a rollback), which also
+# ends its snapshot; anything it returns may already be stale, so the write path
+# re-reads what it acts on inside its own transaction.
+
+def _create_pool(app, dialect, max_size):
+    # Time and count every statement when query tracing is on (see query_trace.py)
+    tracer = app.extensions.get('query_tracer')
+    connect = tracer.wrap(dialect.connect) if tracer else dialect.connect
+    return ConnectionPool(
+        connect,
+        max_size=max_size,
+        timeout=app.config.get('DB_POOL_TIMEOUT', 10.0),
+        max_idle=app.config.get('DB_POOL_MAX_IDLE', 300.0),
+        health_check_interval=app.config.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30.0),
+    )
+
+def init_app(app):
+    """
+    Creates the connection pool(s) for the app and registers the teardown hook
+    that hands the request's connections back to them.
+    
+    The storage backend comes from DB_BACKEND: SQL Server (default) or a local SQLite
+    file for profiling and load tests (see db_backend.py / sqlite_backend.py). DB_READ_MODE
+    'snapshot' or 'replica' adds a read pool for the read path (db_backend.create_read_dialect).
+    Connections are traced when query_trace.init_app ran first (QUERY_TRACE).
+    """
+    dialect = create_dialect(app.config)
+    app.extensions['db_dialect'] = dialect
+    app.extensions['db_pool'] = _create_pool(app, dialect, app.config.get('DB_POOL_SIZE', 10))
+
+    read_dialect = create_read_dialect(app.config)
+    app.extensions['db_read_dialect'] = read_dialect
+    app.extensions['db_read_pool'] = _create_pool(
+        app, read_dialect, app.config.get('DB_READ_POOL_SIZE') or app.config.get('DB_POOL_SIZE', 10)
+    ) if read_dialect else None
+    app.extensions['reference_data'] = ReferenceDataCache(
+        _load_reference_data,
+        ttl=app.config.get('REFERENCE_DATA_TTL', 3600.0),
+    )
+    app.extensions['transaction_retry'] = RetryPolicy(
+        max_retries=app.config.get('TRANSACTION_RETRIES', 3),
+        base_delay=app.config.get('TRANSACTION_RETRY_BASE', 0.02),
+        max_delay=app.config.get('TRANSACTION_RETRY_MAX', 0.5),
+        budget=app.config.get('TRANSACTION_TIME_BUDGET', 5.0),
+    )
+    app.extensions['transaction_stats'] = TransactionStats()
+    app.extensions['unread_counts'] = TTLCache(ttl=app.config.get('UNREAD_COUNT_TTL', 5.0))
+    app.extensions['notification_broker'].add_listener(_unread_count_invalidator(app.extensions['unread_counts']))
+    app.teardown_appcontext(release_db_connection)
 
 def get_db_connection():
     """
-    Establishes and returns a connection to the SQL Server database.
-    Uses the connection string from the Flask app configuration.
+    Returns the connection for the current request (or app context).
+    
+    The first call in a request borrows a connection from the pool and stores it on `g`;
+    every later db.py helper in the same request reuses it. Calling close() on the returned
+    handle only rolls back uncommitted work - the connection goes back to the pool in
+    release_db_connection() when the app context tears down.
+    """
+    if 'db_conn' not in g:
+        g.db_conn = PooledConnection(current_app.extensions['db_pool'].acquire())
+    return g.db_conn
+
+def get_read_connection():
+    """
+    Returns the connection for read-path helpers in the current request (see above).
+    
+    With a read pool (DB_READ_MODE 'snapshot' / 'replica') the first call borrows a read
+    connection and stores it on `g` next to the write connection; without one this is
+    get_db_connection(). close() rolls back as there, ending the helper's snapshot.
+    Never use it for a read a write depends on.
+    """
+    pool = current_app.extensions['db_read_pool']
+    if pool is None:
+        return get_db_connection()
+    if 'db_read_conn' not in g:
+        g.db_read_conn = PooledConnection(pool.acquire())
+    return g.db_read_conn
+
+def _release(conn, pool, dialect, exc):
+    discard = isinstance(exc, dialect.error_types)
+    try:
+        conn.close()
+    except Exception:
+        discard = True
+    pool.release(conn._conn, discard=discard)
+
+def release_db_connection(exc=None):
+    """Teardown hook: returns the request's connections to their pools (discarding them on error)."""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        _release(conn, current_app.extensions['db_pool'], current_app.extensions['db_dialect'], exc)
+    read_conn = g.pop('db_read_conn', None)
+    if read_conn is not None:
+        _release(read_conn, current_app.extensions['db_read_pool'], current_app.extensions['db_read_dialect'], exc)
+
+def get_dialect():
+    """Returns the app's storage backend (db_backend.Dialect)."""
+    return current_app.extensions['db_dialect']
+
+def get_pool_stats():
+    """Returns connection pool usage counters (in use, idle, waits, wait time...) for sizing."""
+    return current_app.extensions['db_pool'].stats()
+
+def get_read_pool_stats():
+    """Returns the read pool's usage counters plus its target, or None without a read pool."""
+    pool = current_app.extensions['db_read_pool']
+    if pool is None:
+        return None
+    return dict(pool.stats(), target=current_app.extensions['db_read_dialect'].describe(),
+                mode=current_app.config.get('DB_READ_MODE'))
+
+def run_transaction(body, name=None):
+    """
+    Runs body(cursor) as one transaction on the request's connection: committed when it
+    returns (True, result), rolled back when it returns (False, error) or raises.
+    
+    A transient failure - deadlock victim, lock or snapshot conflict, dropped connection;
+    see Dialect.classify_error - is rolled back and the whole body run again, up to
+    TRANSACTION_RETRIES times after a jittered exponential backoff, as long as the request
+    stays within TRANSACTION_TIME_BUDGET seconds. A broken connection is replaced first.
+    A commit that fails on a dropped connection is never retried: it may have gone through.
+    Every run and retry is counted per `name` (see get_transaction_stats).
+    
+    The body must therefore be safe to re-run: it reads everything it decides on inside
+    the transaction, and side effects beyond the database (events, caches) belong after
+    the commit, in the caller.
+    
+    Returns:
+        (bool, object | str): (Success, the body's result or Error Message)
+    """
+    name = name or body.__name__
+    policy = current_app.extensions['transaction_retry']
+    stats = current_app.extensions['transaction_stats']
+    dialect = get_dialect()
+    if 'transaction_deadline' not in g:
+        g.transaction_deadline = time.monotonic() + policy.budget
+    
+    retries = 0
+    while True:
+        conn = get_db_connection()
+        committing = False
+        try:
+            success, result = body(conn.cursor())
+            if success:
+                committing = True
+                conn.commit()
+            else:
+                conn.rollback()
+            stats.record_run(name, success, retries)
+            return success, result
+        except Exception as e:
+            reason = dialect.classify_error(e)
+            if reason == 'connection':
+                release_db_connection(e)   # discarded by the pool; the next attempt borrows a fresh one
+            else:
+                conn.rollback()
+            delay = policy.delay(retries)
+            if (reason is None or (committing and reason == 'connection') or retries >= policy.max_retries
+                    or time.monotonic() + delay > g.transaction_deadline):
+                stats.record_run(name, False, retries, gave_up=reason is not None)
+                if reason:
+                    retry_log.error('Transaction %s failed after %d retries (%s): %s', name, retries, reason, e)
+                return False, str(e)
+            stats.record_retry(name, reason)
+            retry_log.warning('Transaction %s: %s on attempt %d, retrying in %.0f ms', name, reason, retries + 1,
+                              delay * 1000)
+            retries += 1
+            time.sleep(delay)
+        finally:
+            if 'db_conn' in g:
+                conn.close()
+
+def get_transaction_stats():
+    """Returns run / retry counters per run_transaction name (this process), most retried first."""
+    return current_app.extensions['transaction_stats'].stats()
+
+def _fetch_keyset(select_sql, conditions, params, sort_col, id_col, descending, per_page, key,
+                  after=None, before=None, sort_param='?', group_by='', count=None, read=False):
+    """
+    Runs one keyset (seek) page query and wraps the result in a KeysetPage.
+    
+    QUERY: Caller's SELECT + WHERE (filters AND (sort_key, id) beyond the cursor)
+           + ORDER BY (sort_key, id) + FETCH NEXT per_page + 1 ROWS (the extra row means "there is a next page").
+    KEYWORDS: Keyset Pagination, Seek, Cursor, Index Seek
+    
+    Args:
+        select_sql (str): SELECT ... FROM ... JOIN ... (no WHERE).
+        conditions (list[str]): Filter predicates, ANDed together.
+        params (list): Parameters for `conditions`.
+        sort_col, id_col (str): Sort key column and unique tie-breaker.
+        descending (bool): Natural list order.
+        key (callable): row -> (sort value, id).
+        after, before (str): Opaque cursor tokens (see pagination.py).
+        sort_param (str): Placeholder for the sort value, e.g. 'CAST(? AS DATETIME)'.
+        group_by (str): Optional GROUP BY clause.
+        count (callable): Lazy total for KeysetPage.total.
+        read (bool): Run on the read path (get_read_connection) - reporting pages only.
+    """
+    conditions = list(conditions)
+    params = list(params)
+    predicate, order_by = seek_clause(sort_col, id_col, descending, backwards=bool(before), sort_param=sort_param)
+    
+    token = before or after
+    if token:
+        sort_value, row_id = decode_cursor(token)
+        conditions.append(predicate)
+        params += [sort_value, sort_value, row_id]
+    
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    query = f"""
+        {select_sql}
+        {where_clause}
+        {group_by}
+        ORDER BY {order_by}
+        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY
     """
-    conn_str = current_app.config.get('DB_CONNECTION_STRING', 
-        'Driver={ODBC Driver 17 for SQL Server};Server=localhost;Database=BloodLink;Trusted_Connection=yes;')
-    conn = pyodbc.connect(conn_str)
-    return conn
+    
+    conn = get_read_connection() if read else get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params + [per_page + 1])
+    rows = cursor.fetchall()
+    conn.close()
+    return build_page(rows, per_page, key, after=after, before=before, count=count)
+
+def _count(query, params, read=False):
+    """Returns a zero-argument COUNT(*) runner (used as a lazily computed total)."""
+    def run():
+        conn = get_read_connection() if read else get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        total = cursor.fetchone()[0]
+        conn.close()
+        return total
+    return run
 
 # ==================================================================================
 # AUTHENTICATION & USER MANAGEMENT
@@ -55,34 +304,59 @@ def get_user_name_by_role_id(role, user_id):
     conn.close()
     return name
 
-def get_blood_type_id(type_str):
+def _load_reference_data():
     """
-    Helper function to retrieve the ID of a blood type from its string representation (e.g., 'A+').
+    Loader for the reference-data cache: reads Area and Blood_Type in one round trip.
+    Only the cursor is closed (not the request connection), so a reload triggered
+    in the middle of a transaction does not roll it back.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT bloodtype_id FROM Blood_Type WHERE type = ?", (type_str,))
-    row = cursor.fetchone()
-    conn.close()
-    return row[0] if row else None
+    cursor.execute("""
+        SELECT id, name, latitude, longitude FROM Area ORDER BY id;
+        SELECT bloodtype_id, type FROM Blood_Type ORDER BY bloodtype_id;
+    """)
+    areas = cursor.fetchall()
+    cursor.nextset()
+    blood_types = cursor.fetchall()
+    cursor.close()
+    return areas, blood_types
+
+def reference_data():
+    """Returns the app's in-process Area / Blood_Type cache (see reference_data.py)."""
+    return current_app.extensions['reference_data']
+
+def invalidate_reference_data():
+    """Drops cached Area / Blood_Type rows. Call after editing either table."""
+    reference_data().invalidate()
+
+def get_blood_type_id(type_str):
+    """
+    Helper function to retrieve the ID of a blood type from its string representation (e.g., 'A+').
+    Served from the reference-data cache.
+    """
+    return reference_data().blood_type_id(type_str)
+
+def get_blood_type_str(blood_type_id):
+    """
+    Helper function to retrieve the string representation of a blood type (e.g., 'A+') from its ID.
+    Served from the reference-data cache.
+    """
+    return reference_data().blood_type_str(blood_type_id)
 
 def get_all_areas():
     """
     Retrieves all available areas from the Area table.
     Used for populating dropdowns in registration and filtering.
+    Served from the reference-data cache.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM Area")
-    areas = cursor.fetchall()
-    conn.close()
-    return areas
+    return reference_data().areas()
 
 def register_user_transaction(email, password, role, name, **kwargs):
     """
     Registers a new user and creates their role-specific profile in a single atomic transaction.
     
-    QUERY: Multi-step INSERT using OUTPUT clause to get the new ID.
+    QUERY: Multi-step INSERT using OUTPUT clause to get the new ID (run_transaction: re-run on transient errors).
     KEYWORDS: Transaction, Atomic, Insert, Output, Rollback, Commit
     
     Args:
@@ -95,19 +369,18 @@ def register_user_transaction(email, password, role, name, **kwargs):
     Returns:
         (bool, str): (Success, Error Message)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    # Prepare common data (blood type id comes from the reference-data cache)
+    blood_type_id = None
+    if kwargs.get('blood_type'):
+        blood_type_id = get_blood_type_id(kwargs.get('blood_type'))
+
+    area_id = kwargs.get('area_id')
+
+    def register(cursor):
+        donor_rows = []
         # Step 1: Create the base User account
         cursor.execute("INSERT INTO [User] (email, password, role) OUTPUT INSERTED.id VALUES (?, ?, ?)", (email, password, role))
         user_id = cursor.fetchone()[0]
-        
-        # Prepare common data
-        blood_type_id = None
-        if kwargs.get('blood_type'):
-            blood_type_id = get_blood_type_id(kwargs.get('blood_type'))
-
-        area_id = kwargs.get('area_id')
 
         # Step 2: Create the Role-Specific Profile
         if role == 'Donor':
@@ -119,10 +392,13 @@ def register_user_transaction(email, password, role, name, **kwargs):
                 # Calculate age accurately accounting for leap years
                 age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
             
-            cursor.execute("""
+            cursor.execute(f"""
                 INSERT INTO Donor (name, user_id, bloodtype, DOB, age, area_id, number) 
+                {_DONOR_EVENT_OUTPUT}
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (name, user_id, blood_type_id, dob, age, area_id, kwargs.get('number')))
+            donor_rows = cursor.fetchall()
+            index_donor_name(cursor, donor_rows[0].id, name)
             
         elif role == 'Recipient':
             age = None
@@ -139,56 +415,111 @@ def register_user_transaction(email, password, role, name, **kwargs):
             
         elif role == 'Manager':
             cursor.execute("INSERT INTO Manager (name, user_id) VALUES (?, ?)", (name, user_id))
-        
-        conn.commit()
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+        return True, donor_rows
+    
+    success, result = run_transaction(register, 'register_user_transaction')
+    if not success:
+        return False, result
+    _donors_changed(result)
+    return True, None
 
 # ==================================================================================
 # MANAGER FUNCTIONS
 # ==================================================================================
 
-def get_inventory_stats(area_id=None, blood_type=None):
+InventoryRow = namedtuple('InventoryRow', ['area_name', 'type', 'total_units', 'expiring_units'])
+ExpiringStockRow = namedtuple('ExpiringStockRow', ['expires_on', 'area_name', 'type', 'units'])
+
+def _inventory_bucket_filters(area_id, blood_type):
+    """WHERE fragment and parameters shared by the Inventory_Bucket reads (None if the type is unknown)."""
+    ref = reference_data()
+    clause, params = "", []
+    if area_id:
+        clause += " AND area_id = ?"
+        params.append(area_id)
+    if blood_type:
+        blood_type_id = ref.blood_type_id(blood_type)
+        if blood_type_id is None:
+            return None, None
+        clause += " AND blood_type = ?"
+        params.append(blood_type_id)
+    return clause, params
+
+def get_inventory_stats(area_id=None, blood_type=None, expiring_days=None):
     """
-    Retrieves blood inventory statistics grouped by Area and Blood Type.
-    Supports optional filtering by Area ID and Blood Type.
+    Retrieves usable (unexpired) blood inventory grouped by Area and Blood Type, with the units
+    of each that expire within `expiring_days`. Supports optional filtering by Area ID and Blood Type.
+    
+    QUERY: Range read on the materialized Inventory_Bucket ledger (one row per Area x Blood Type x
+           expiry day, so bounded by the shelf life): unexpired days summed per Area and Type, and a
+           CASE sum for the days inside the expiring window. No Stock rows are read.
+           Area and Blood Type names are resolved from the reference-data cache instead of JOINs.
+    KEYWORDS: Inventory, Expiry, Materialized Summary, Aggregation, Filtering, Read Path
     
-    QUERY: Aggregation using SUM() and GROUP BY to calculate total units per category.
-    KEYWORDS: Inventory, Aggregation, Group By, Sum, Join
+    Args:
+        expiring_days (int): Window of the expiring count (default: STOCK_EXPIRING_DAYS config).
+    
+    Returns:
+        list[InventoryRow]: (area_name, type, total_units, expiring_units) ordered by area name and type
     """
-    conn = get_db_connection()
+    ref = reference_data()
+    if expiring_days is None:
+        expiring_days = current_app.config.get('STOCK_EXPIRING_DAYS', 7)
+    filters, filter_params = _inventory_bucket_filters(area_id, blood_type)
+    if filters is None:
+        return []
+    today = datetime.now().date()
+    
+    conn = get_read_connection()
     cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT area_id, blood_type,
+               SUM(units) as total_units,
+               SUM(CASE WHEN expires_on <= ? THEN units ELSE 0 END) as expiring_units
+        FROM Inventory_Bucket
+        WHERE expires_on > ? AND units > 0{filters}
+        GROUP BY area_id, blood_type
+    """, [today + timedelta(days=expiring_days), today] + filter_params)
+    rows = cursor.fetchall()
+    conn.close()
     
-    query = """
-        SELECT a.name as area_name, bt.type, SUM(s.units) as total_units
-        FROM Stock s
-        JOIN Donation_Completed dc ON s.donation_id = dc.id
-        JOIN Blood_Type bt ON dc.blood_type = bt.bloodtype_id
-        JOIN Area a ON s.area_id = a.id
-        WHERE 1=1
+    data = [InventoryRow(ref.area_name(row.area_id), ref.blood_type_str(row.blood_type), row.total_units,
+                         row.expiring_units) for row in rows]
+    data.sort(key=lambda item: (item.area_name or '', item.type or ''))
+    return data
+
+def get_expiring_stock(days=None, area_id=None, blood_type=None):
     """
-    params = []
+    Lists the units that expire within `days`, per expiry day, Area and Blood Type
+    (the "expiring in N days" view of the inventory page).
     
-    if area_id:
-        query += " AND s.area_id = ?"
-        params.append(area_id)
-        
-    if blood_type:
-        query += " AND bt.type = ?"
-        params.append(blood_type)
-        
-    query += """
-        GROUP BY a.name, bt.type
-        ORDER BY a.name, bt.type
+    QUERY: Range read on Inventory_Bucket for expires_on in (today, today + days]. No Stock rows are read.
+    KEYWORDS: Inventory, Expiry, Materialized Summary, Range Read, Filtering, Read Path
+    
+    Returns:
+        list[ExpiringStockRow]: (expires_on, area_name, type, units) ordered by expiry day, area name and type
     """
+    ref = reference_data()
+    if days is None:
+        days = current_app.config.get('STOCK_EXPIRING_DAYS', 7)
+    filters, filter_params = _inventory_bucket_filters(area_id, blood_type)
+    if filters is None:
+        return []
+    today = datetime.now().date()
     
-    cursor.execute(query, params)
-    data = cursor.fetchall()
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT expires_on, area_id, blood_type, units
+        FROM Inventory_Bucket
+        WHERE expires_on > ? AND expires_on <= ? AND units > 0{filters}
+    """, [today, today + timedelta(days=days)] + filter_params)
+    rows = cursor.fetchall()
     conn.close()
+    
+    data = [ExpiringStockRow(row.expires_on, ref.area_name(row.area_id), ref.blood_type_str(row.blood_type), row.units)
+            for row in rows]
+    data.sort(key=lambda item: (item.expires_on, item.area_name or '', item.type or ''))
     return data
 
 def get_all_donors(page=1, per_page=10, area_id=None, blood_type=None):
@@ -196,14 +527,17 @@ def get_all_donors(page=1, per_page=10, area_id=None, blood_type=None):
     Retrieves a paginated list of all donors with their statistics.
     Includes filtering by Area and Blood Type.
     
-    QUERY: Complex JOINs (Donor, Blood_Type, Area, Donation_Completed) with dynamic WHERE clause and OFFSET-FETCH pagination.
-    KEYWORDS: Pagination, Offset, Fetch, Dynamic SQL, Filtering, Count
+    QUERY: One statement: a CTE picks the page of donors (filters on Donor only, ORDER BY name,
+           OFFSET-FETCH) and a second one counts the filtered donors; only the page rows are then
+           joined to Blood_Type / Area and get their donation count from a seek on
+           IX_Donation_Completed_Donor_Date. Last donation is Donor.last_donation_at (migration 008),
+           so the cost does not grow with donation history. The count is LEFT JOINed to the page,
+           so a page past the end still returns one row carrying the total.
+    KEYWORDS: Pagination, Offset, Fetch, CTE, Count, Filtering, Read Path
     
     Returns:
         (list, int): (List of donor rows, Total count)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
     offset = (page - 1) * per_page
     
     # Construct WHERE clause dynamically
@@ -215,72 +549,306 @@ def get_all_donors(page=1, per_page=10, area_id=None, blood_type=None):
         params.append(area_id)
         
     if blood_type:
-        where_conditions.append("bt.type = ?")
-        params.append(blood_type)
+        # Blood type string -> id via the reference-data cache (no JOIN on Blood_Type)
+        where_conditions.append("d.bloodtype = ?")
+        params.append(get_blood_type_id(blood_type))
         
     where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
     
-    # Step 1: Get Total Count for Pagination
-    count_query = f"""
-        SELECT COUNT(*) 
-        FROM Donor d 
-        JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id 
-        {where_clause}
+    conn = get_read_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        WITH page AS (
+            SELECT d.id, d.name, d.bloodtype, d.number, d.area_id, d.availability, d.last_donation_at
+            FROM Donor d
+            {where_clause}
+            ORDER BY d.name, d.id
+            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+        ), filtered AS (
+            SELECT COUNT(*) AS total
+            FROM Donor d
+            {where_clause}
+        )
+        SELECT p.id, p.name, bt.type as blood_type, p.number as phone, a.name as area_name, p.availability as is_available,
+               (SELECT COUNT(*) FROM Donation_Completed dc WHERE dc.donor_id = p.id) as total_donations,
+               p.last_donation_at as last_donation,
+               f.total
+        FROM filtered f
+        LEFT JOIN page p ON 1 = 1
+        LEFT JOIN Blood_Type bt ON p.bloodtype = bt.bloodtype_id
+        LEFT JOIN Area a ON p.area_id = a.id
+        ORDER BY p.name, p.id
+    """, params + [offset, per_page] + params)
+    rows = cursor.fetchall()
+    conn.close()
+    
+    data = [row for row in rows if row.id is not None]
+    return data, rows[0].total
+
+def get_all_donors_keyset(per_page=10, area_id=None, blood_type=None, after=None, before=None):
     """
-    cursor.execute(count_query, params)
-    total = cursor.fetchone()[0]
+    Keyset-paginated variant of get_all_donors(): continues after / before a cursor
+    instead of using OFFSET, so deep pages cost the same as page 1.
     
-    # Step 2: Fetch Paginated Data
-    query = f"""
-        SELECT d.id, d.name, bt.type as blood_type, d.number as phone, a.name as area_name, d.availability as is_available,
-               COUNT(dc.id) as total_donations,
-               MAX(dc.donation_date) as last_donation
-        FROM Donor d
-        JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
-        LEFT JOIN Area a ON d.area_id = a.id
-        LEFT JOIN Donation_Completed dc ON d.id = dc.donor_id
-        {where_clause}
-        GROUP BY d.id, d.name, bt.type, d.number, a.name, d.availability
-        ORDER BY d.name
-        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+    QUERY: Seek on (d.name, d.id) with the same filters; donation count per page row from a
+           correlated seek on IX_Donation_Completed_Donor_Date (no GROUP BY over donations).
+    KEYWORDS: Keyset Pagination, Seek, Cursor, Filtering, Read Path
+    
+    Returns:
+        KeysetPage: Donor rows plus next/prev cursors and a lazily computed total.
+    """
+    conditions = []
+    params = []
+    
+    if area_id:
+        conditions.append("d.area_id = ?")
+        params.append(area_id)
+        
+    if blood_type:
+        conditions.append("d.bloodtype = ?")
+        params.append(get_blood_type_id(blood_type))
+    
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    
+    return _fetch_keyset("""
+            SELECT d.id, d.name, bt.type as blood_type, d.number as phone, a.name as area_name, d.availability as is_available,
+                   (SELECT COUNT(*) FROM Donation_Completed dc WHERE dc.donor_id = d.id) as total_donations,
+                   d.last_donation_at as last_donation
+            FROM Donor d
+            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+            LEFT JOIN Area a ON d.area_id = a.id
+        """, conditions, params, 'd.name', 'd.id', descending=False, per_page=per_page,
+        key=lambda row: (row.name, row.id), after=after, before=before,
+        count=_count(f"SELECT COUNT(*) FROM Donor d {where_clause}", params, read=True), read=True)
+
+DonorMatch = namedtuple('DonorMatch', ['id', 'name', 'type', 'area_id', 'number', 'availability', 'score'])
+
+_DONOR_MATCH_COLUMNS = "d.id, d.name, bt.type, d.area_id, d.number, d.availability"
+
+def search_donor(query, limit=10):
     """
+    Donor lookup for the donation entry form: by ID, phone number, name and blood type.
+    Returns up to `limit` DonorMatch rows, best match first (score 0.0 - 1.0).
     
-    main_params = params + [offset, per_page]
+    - Digits only: exact donor ID, then phone numbers starting with the digits.
+    - Words: each must match a word of the donor's name exactly, by prefix (typeahead)
+      or by trigram similarity (typos); 'A+', 'o-' ... filter by blood type and a digit
+      word by phone prefix. Matching and scoring live in donor_search.py.
     
-    cursor.execute(query, main_params)
-    data = cursor.fetchall()
+    QUERY: Name words resolved against the small Name_Token vocabulary (LIKE 'prefix%' seek,
+           trigram overlap via Name_Token_Gram), then TOP n postings of the best word from
+           Donor_Name_Token with EXISTS for the other words. Phone: number_digits LIKE 'prefix%'.
+    KEYWORDS: Search, N-gram, Trigram, Fuzzy Match, Prefix Seek, Inverted Index, TOP, EXISTS
+    """
+    parsed = donor_search.parse_query(query)
+    blood_type_ids = [get_blood_type_id(t) for t in parsed.blood_types]
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if parsed.digits:
+        matches = _search_donor_by_number(cursor, parsed.digits, limit)
+    elif parsed.words:
+        matches = _search_donor_by_name(cursor, parsed.words, blood_type_ids, parsed.phone, limit)
+    elif blood_type_ids or parsed.phone:
+        conditions, params = _donor_filters(blood_type_ids, parsed.phone)
+        cursor.execute(f"""
+            SELECT TOP (?) {_DONOR_MATCH_COLUMNS}
+            FROM Donor d
+            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY d.id
+        """, [limit] + params)
+        matches = [DonorMatch(*row, score=1.0) for row in cursor.fetchall()]
+    else:
+        matches = []
     conn.close()
-    return data, total
+    return matches
+
+def _donor_filters(blood_type_ids, phone):
+    """Blood type / phone prefix predicates on Donor d."""
+    conditions, params = [], []
+    if blood_type_ids:
+        conditions.append(f"d.bloodtype IN ({', '.join('?' * len(blood_type_ids))})")
+        params += blood_type_ids
+    if phone:
+        conditions.append("d.number_digits LIKE ?")
+        params.append(phone + '%')
+    return conditions, params
+
+def _search_donor_by_number(cursor, digits, limit):
+    matches = {}
+    if len(digits) <= 9:  # fits Donor.id (INT)
+        cursor.execute(f"""
+            SELECT {_DONOR_MATCH_COLUMNS}
+            FROM Donor d
+            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+            WHERE d.id = ?
+        """, (int(digits),))
+        for row in cursor.fetchall():
+            matches[row.id] = DonorMatch(*row, score=1.0)
+    
+    if len(digits) >= donor_search.MIN_PHONE_DIGITS:
+        cursor.execute(f"""
+            SELECT TOP (?) {_DONOR_MATCH_COLUMNS}, d.number_digits
+            FROM Donor d
+            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+            WHERE d.number_digits LIKE ?
+            ORDER BY d.number_digits, d.id
+        """, (limit, digits + '%'))
+        for row in cursor.fetchall():
+            if row.id not in matches:
+                matches[row.id] = DonorMatch(*row[:6], score=round(len(digits) / len(row.number_digits), 3))
+    return list(matches.values())[:limit]
+
+def _name_candidates(cursor, word):
+    """
+    Vocabulary words matching the query word `word`.
+    
+    Returns:
+        list[(int, float)]: (Name_Token.id, donor_search.word_score), best first.
+    """
+    candidates = {}
+    cursor.execute("""
+        SELECT TOP (?) id, token
+        FROM Name_Token
+        WHERE token LIKE ?
+        ORDER BY LEN(token), token
+    """, (donor_search.MAX_CANDIDATES, word + '%'))
+    for row in cursor.fetchall():
+        candidates[row.id] = donor_search.word_score(word, row.token)
+    
+    grams = sorted(donor_search.trigrams(word))
+    cursor.execute(f"""
+        SELECT TOP (?) t.id, t.token
+        FROM Name_Token_Gram g
+        JOIN Name_Token t ON t.id = g.token_id
+        WHERE g.gram IN ({', '.join('?' * len(grams))})
+        GROUP BY t.id, t.token
+        HAVING COUNT(*) >= ?
+        ORDER BY COUNT(*) DESC, t.id
+    """, [donor_search.MAX_CANDIDATES * 2] + grams + [donor_search.min_shared_grams(word)])
+    for row in cursor.fetchall():
+        score = donor_search.word_score(word, row.token)
+        if score > candidates.get(row.id, 0.0):
+            candidates[row.id] = score
+    
+    ranked = sorted(((token_id, score) for token_id, score in candidates.items() if score > 0),
+                    key=lambda candidate: -candidate[1])
+    return ranked[:donor_search.MAX_CANDIDATES]
+
+def _search_donor_by_name(cursor, words, blood_type_ids, phone, limit):
+    candidates = [_name_candidates(cursor, word) for word in words]
+    if not all(candidates):
+        return []
+    
+    # Postings are read for the longest (most selective) word; every other word must
+    # match one of its candidate vocabulary words too
+    driver = max(range(len(words)), key=lambda i: len(words[i]))
+    conditions, params = _donor_filters(blood_type_ids, phone)
+    for i, word_candidates in enumerate(candidates):
+        if i != driver:
+            conditions.append(f"""EXISTS (SELECT 1 FROM Donor_Name_Token o
+                WHERE o.donor_id = p.donor_id AND o.token_id IN ({', '.join('?' * len(word_candidates))}))""")
+            params += [token_id for token_id, _ in word_candidates]
+    filters = "".join(f" AND {condition}" for condition in conditions)
+    
+    # Driver words best first; stop once `limit` donors were found
+    found = {}
+    for token_id, _ in candidates[driver]:
+        cursor.execute(f"""
+            SELECT TOP (?) {_DONOR_MATCH_COLUMNS}
+            FROM Donor_Name_Token p
+            JOIN Donor d ON d.id = p.donor_id
+            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+            WHERE p.token_id = ?{filters}
+            ORDER BY p.donor_id
+        """, [limit, token_id] + params)
+        for row in cursor.fetchall():
+            found.setdefault(row.id, row)
+        if len(found) >= limit:
+            break
+    
+    matches = [DonorMatch(*row, score=round(donor_search.name_score(words, row.name), 3)) for row in found.values()]
+    matches.sort(key=lambda match: (-match.score, match.name, match.id))
+    return matches[:limit]
+
+def index_donor_name(cursor, donor_id, name):
+    """
+    Replaces the donor's rows in the name search index (donor_search.py). Runs on the
+    caller's cursor, in the same transaction as the INSERT/UPDATE of Donor.name.
+    
+    QUERY: DELETE postings; per word INSERT ... SELECT WHERE NOT EXISTS (UPDLOCK, HOLDLOCK
+           so two registrations never add the same word twice) + trigrams for new words.
+    KEYWORDS: Inverted Index, Upsert, Trigram, Transaction
+    """
+    cursor.execute("DELETE FROM Donor_Name_Token WHERE donor_id = ?", (donor_id,))
+    for token in donor_search.tokenize(name):
+        cursor.execute("""
+            INSERT INTO Name_Token (token)
+            OUTPUT INSERTED.id
+            SELECT ?
+            WHERE NOT EXISTS (SELECT 1 FROM Name_Token WITH (UPDLOCK, HOLDLOCK) WHERE token = ?)
+        """, (token, token))
+        row = cursor.fetchone()
+        if row:
+            token_id = row[0]
+            cursor.executemany("INSERT INTO Name_Token_Gram (gram, token_id) VALUES (?, ?)",
+                               [(gram, token_id) for gram in sorted(donor_search.trigrams(token))])
+        else:
+            cursor.execute("SELECT id FROM Name_Token WHERE token = ?", (token,))
+            token_id = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO Donor_Name_Token (token_id, donor_id) VALUES (?, ?)", (token_id, donor_id))
 
-def search_donor(query):
+def rebuild_donor_search_index():
     """
-    Searches for donors by ID (exact match) or Name (partial match).
-    Returns a list of matching donors with their ID, Name, Blood Type, and Area ID.
+    Rebuilds the donor name search index from Donor (after bulk imports or to apply a
+    tokenizer change).
     
-    QUERY: Conditional logic to switch between exact ID match and LIKE operator for name search.
-    KEYWORDS: Search, Lookup, Like, Wildcard, Partial Match
+    Returns:
+        (bool, (int, int) | str): (Success, (vocabulary words, postings) or Error Message)
     """
     conn = get_db_connection()
     cursor = conn.cursor()
+    try:
+        counts = donor_search.rebuild_index(cursor)
+        conn.commit()
+        return True, counts
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+# Donor columns the in-memory lookup index keeps (donor_index.py); every write to one
+# of them returns the committed row with this clause and publishes it after commit
+_DONOR_EVENT_OUTPUT = "OUTPUT INSERTED.id, INSERTED.name, INSERTED.bloodtype, INSERTED.area_id, INSERTED.availability"
+
+def _donors_changed(rows, last_donation=None):
+    """
+    Post-commit hook: publishes the donors' new indexed state (and the date of a donation
+    just recorded) to the donor index of every process.
+    """
+    events = current_app.extensions.get('donor_events')
+    if events:
+        for row in rows:
+            events.publish([row.id], donor_event(row, last_donation))
+
+def get_donor_index_rows(after_id=0, limit=20000):
+    """
+    One chunk of donors for loading the in-memory donor index, in id order.
     
-    # Check if query is numeric (ID search)
-    if str(query).isdigit():
-        cursor.execute("""
-            SELECT d.id, d.name, bt.type, d.area_id 
-            FROM Donor d 
-            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id 
-            WHERE d.id = ?
-        """, (query,))
-    else:
-        # Name search (partial match)
-        search_term = f"%{query}%"
-        cursor.execute("""
-            SELECT d.id, d.name, bt.type, d.area_id 
-            FROM Donor d 
-            JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id 
-            WHERE d.name LIKE ?
-        """, (search_term,))
-        
+    QUERY: Keyset scan of the clustered primary key (id > ?), TOP n.
+    KEYWORDS: Keyset, Bulk Load, Clustered Index
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT TOP (?) d.id, d.name, d.bloodtype, d.area_id, d.availability,
+               d.last_donation_at AS last_donation
+        FROM Donor d
+        WHERE d.id > ?
+        ORDER BY d.id
+    """, (limit, after_id))
     rows = cursor.fetchall()
     conn.close()
     return rows
@@ -314,12 +882,35 @@ def get_active_requests(area_id=None):
     conn.close()
     return data
 
+def get_request_match_target(request_id):
+    """
+    Retrieves what donor matching needs to know about a request: its blood type, the
+    recipient's area, status and units still missing.
+    
+    QUERY: SELECT Request JOIN Recipient by primary key.
+    KEYWORDS: Request, Donor Matching, Select
+    
+    Returns:
+        Row | None: (id, blood_type, area_id, status, units_required, units_collected)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.id, r.blood_type, rec.area_id, r.status, r.units_required, r.units_collected
+        FROM Request r
+        JOIN Recipient rec ON r.recipient_id = rec.id
+        WHERE r.id = ?
+    """, (request_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
 def get_all_requests(page=1, per_page=10):
     """
     Retrieves all requests with detailed status and approver info.
-    Supports pagination.
+    Supports pagination. Runs on the read path (get_read_connection).
     """
-    conn = get_db_connection()
+    conn = get_read_connection()
     cursor = conn.cursor()
     offset = (page - 1) * per_page
     
@@ -340,21 +931,42 @@ def get_all_requests(page=1, per_page=10):
     conn.close()
     return data, total
 
+def get_all_requests_keyset(per_page=10, after=None, before=None):
+    """
+    Keyset-paginated variant of get_all_requests() (newest first).
+    
+    QUERY: Seek on (r.date_requested, r.id) DESC instead of OFFSET-FETCH.
+    KEYWORDS: Keyset Pagination, Seek, Cursor, Read Path
+    
+    Returns:
+        KeysetPage: Request rows plus next/prev cursors and a lazily computed total.
+    """
+    return _fetch_keyset("""
+            SELECT r.id, rec.name, bt.type, r.units_required, r.units_collected, r.status, r.date_requested, m.name as approved_by_name
+            FROM Request r
+            JOIN Recipient rec ON r.recipient_id = rec.id
+            JOIN Blood_Type bt ON r.blood_type = bt.bloodtype_id
+            LEFT JOIN Manager m ON r.approved_by = m.id
+        """, [], [], 'r.date_requested', 'r.id', descending=True, per_page=per_page,
+        key=lambda row: (row.date_requested, row.id), after=after, before=before,
+        sort_param='CAST(? AS DATE)', count=_count("SELECT COUNT(*) FROM Request", [], read=True), read=True)
+
 def approve_request_transaction(request_id, manager_user_id):
     """
-    Approves a blood request and notifies eligible donors.
+    Approves a blood request and notifies the best-matched donors.
     
     Steps:
     1. Update Request status to 'Approved'.
     2. Notify the Recipient.
-    3. Broadcast notification to all eligible Donors (matching blood type).
+    3. Notify the MATCH_NOTIFY_DONORS best-matched eligible donors (donor_matching.py; off at 0,
+       skipped while the donor index is loading).
     
-    QUERY: Transaction block updating Request status and inserting Notifications.
-    KEYWORDS: Approval, Update, Notification, Broadcast, Transaction
+    QUERY: Transaction block updating Request status and enqueueing the recipient's and the
+           matched donors' notification jobs (delivered by jobs.py workers after commit).
+           Re-run on transient errors (run_transaction).
+    KEYWORDS: Approval, Update, Notification, Job Queue, Transaction
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    def approve(cursor):
         cursor.execute("SELECT id FROM Manager WHERE user_id = ?", (manager_user_id,))
         manager_id = cursor.fetchone()[0]
         
@@ -367,36 +979,34 @@ def approve_request_transaction(request_id, manager_user_id):
         
         # Step 2: Notify Recipient
         cursor.execute("""
-            SELECT r.user_id 
+            SELECT r.user_id, r.area_id, req.blood_type
             FROM Request req
             JOIN Recipient r ON req.recipient_id = r.id
             WHERE req.id = ?
         """, (request_id,))
-        recipient_user_id = cursor.fetchone()[0]
+        recipient_user_id, recipient_area_id, req_blood_type = cursor.fetchone()
         
         if recipient_user_id:
-            cursor.execute("""
-                INSERT INTO Notifications (user_id, message, type)
-                VALUES (?, 'Your request has been approved and is in process.', 'General')
-            """, (recipient_user_id,))
-        
-        # Step 3: Notify Eligible Donors (Broadcast)
-        cursor.execute("SELECT blood_type FROM Request WHERE id = ?", (request_id,))
-        req_blood_type = cursor.fetchone()[0]
+            insert_job(cursor, 'notification',
+                       {'user_id': recipient_user_id, 'message': 'Your request has been approved and is in process.', 'type': 'General'},
+                       idempotency_key=f'request:{request_id}:approved')
         
-        cursor.execute("""
-            SELECT user_id FROM Donor 
-            WHERE bloodtype = ? AND availability = 1
-        """, (req_blood_type,))
-        eligible_donors = cursor.fetchall()
-        
-        conn.commit()
+        # Step 3: Notify the best-matched donors
+        notify_limit = current_app.config.get('MATCH_NOTIFY_DONORS', 0)
+        index = donor_index()
+        matches = index.match_donors(req_blood_type, recipient_area_id, notify_limit) if index and notify_limit else None
+        if matches:
+            insert_job(cursor, 'donor_match',
+                       {'request_id': request_id, 'donor_ids': [m.id for m in matches],
+                        'message': f'A patient near you needs {get_blood_type_str(req_blood_type)} blood. '
+                                   'You are a match - please consider donating.'},
+                       idempotency_key=f'request:{request_id}:donor-match')
         return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+    
+    success, error = run_transaction(approve, 'approve_request_transaction')
+    if success:
+        _jobs_enqueued()
+    return success, error
 
 def submit_donation_transaction(donor_id, volume, is_exchange, request_id=None):
     """
@@ -405,22 +1015,27 @@ def submit_donation_transaction(donor_id, volume, is_exchange, request_id=None):
     Enforces 30-day donation rule.
     
     QUERY: Complex multi-step transaction involving:
-           1. Eligibility Check (Select)
+           1. Eligibility Check (Donor.eligible_from, read with the donor's row)
            2. Stock Consumption (Delete/Update) for Exchange
            3. Donation Recording (Insert)
-           4. Stock Addition (Insert)
+           4. Stock Addition (Insert, expires_at = shelf life) + Inventory_Summary / Inventory_Bucket increment
            5. History Update (Insert)
            6. Request Update (Update)
-           7. Notification (Insert)
-    KEYWORDS: Transaction, Exchange, Stock Management, FIFO, Insert, Update, Rollback
+           7. Donor Update: availability off, last_donation_at / eligible_from set, guarded
+              by eligible_from so two concurrent donations cannot both pass the check
+           8. Notification job (Insert into Jobs; delivered off the request path)
+           Re-run on transient errors such as deadlocks (run_transaction).
+    KEYWORDS: Transaction, Exchange, Stock Management, FEFO, Insert, Update, Rollback
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT bloodtype, area_id FROM Donor WHERE id = ?", (donor_id,))
+    def donate(cursor):
+        cursor.execute("SELECT bloodtype, area_id, last_donation_at, eligible_from FROM Donor WHERE id = ?", (donor_id,))
         row = cursor.fetchone()
+        if row is None:
+            return False, "Donor not found."
         blood_type_id = row[0]
         area_id = row[1]
+        donation_date = datetime.now()
+        today = donation_date.date()
         
         is_direct_exchange = False # Initialize flag
         
@@ -429,21 +1044,9 @@ def submit_donation_transaction(donor_id, volume, is_exchange, request_id=None):
             return False, "Donation limit is strictly 1 unit per session."
         
         # Step 0: Check Eligibility (30-day rule)
-        cursor.execute("""
-            SELECT TOP 1 donation_date 
-            FROM Donation_Completed 
-            WHERE donor_id = ? 
-            ORDER BY donation_date DESC
-        """, (donor_id,))
-        last_donation_row = cursor.fetchone()
-        
-        if last_donation_row:
-            last_date = last_donation_row[0].date()
-            today = datetime.now().date()
-            days_since = (today - last_date).days
-            
-            if days_since < 30:
-                return False, f"Donor is not eligible. Last donation was {days_since} days ago. Must wait 30 days."
+        if not _eligibility(row.eligible_from)[0]:
+            days_since = (today - row.last_donation_at.date()).days
+            return False, f"Donor is not eligible. Last donation was {days_since} days ago. Must wait 30 days."
 
         # Step 1: Handle Exchange Logic Checks & Outbound Stock
         if is_exchange and request_id:
@@ -480,18 +1083,20 @@ def submit_donation_transaction(donor_id, volume, is_exchange, request_id=None):
         cursor.execute("""
             INSERT INTO Donation_Completed (donor_id, units, blood_type, is_exchange, donation_date, request_id)
             OUTPUT INSERTED.id
-            VALUES (?, ?, ?, ?, GETDATE(), ?)
-        """, (donor_id, volume, blood_type_id, is_exchange, request_id))
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (donor_id, volume, blood_type_id, is_exchange, donation_date, request_id))
         donation_id = cursor.fetchone()[0]
         
         # Step 3: Add to Stock (Inbound)
         # Only add to stock if it's NOT a direct exchange.
         # Direct exchange units are logically consumed by the request immediately.
         if not is_direct_exchange:
+            expires_at = _stock_expiry(donation_date)
             cursor.execute("""
-                INSERT INTO Stock (units, donation_id, area_id)
-                VALUES (?, ?, ?)
-            """, (volume, donation_id, area_id))
+                INSERT INTO Stock (units, donation_id, area_id, blood_type, received_at, expires_at)
+                VALUES (?, ?, ?, ?, GETDATE(), ?)
+            """, (volume, donation_id, area_id, blood_type_id, expires_at))
+            adjust_inventory_summary(cursor, area_id, blood_type_id, int(volume), expires_on=expires_at.date())
         
         # Step 4: Update Donor History
         cursor.execute("INSERT INTO dbo.Donor_History (donor_id, [date], [unit]) VALUES (?, GETDATE(), ?)", (donor_id, volume))
@@ -519,43 +1124,310 @@ def submit_donation_transaction(donor_id, volume, is_exchange, request_id=None):
                 """, (request_id,))
                 recipient_user_id = cursor.fetchone()[0]
                 if recipient_user_id:
-                    cursor.execute("""
-                        INSERT INTO Notifications (user_id, message, type)
-                        VALUES (?, 'Your blood request has been fulfilled!', 'Collection')
-                    """, (recipient_user_id,))
+                    insert_job(cursor, 'notification',
+                               {'user_id': recipient_user_id, 'message': 'Your blood request has been fulfilled!', 'type': 'Collection'},
+                               idempotency_key=f'request:{request_id}:fulfilled')
 
-        # Step 6: Auto-Deactivate Donor (Set Availability to 0)
-        cursor.execute("UPDATE Donor SET availability = 0 WHERE id = ?", (donor_id,))
+        # Step 6: Auto-Deactivate Donor (Set Availability to 0) and record the donation date.
+        # Guarded by eligible_from: a concurrent donation for the same donor that committed
+        # after our check leaves no row to update.
+        cursor.execute(f"""
+            UPDATE Donor
+            SET availability = 0, last_donation_at = ?, eligible_from = ?
+            {_DONOR_EVENT_OUTPUT}
+            WHERE id = ? AND (eligible_from IS NULL OR eligible_from <= ?)
+        """, (donation_date, _eligible_from(donation_date), donor_id, today))
+        donor_rows = cursor.fetchall()
+        if not donor_rows:
+            return False, "Donor is not eligible. Another donation was just recorded. Must wait 30 days."
 
         # Step 7: Notify Donor
         cursor.execute("SELECT user_id FROM Donor WHERE id = ?", (donor_id,))
         donor_user_id = cursor.fetchone()[0]
         if donor_user_id:
-             cursor.execute("""
-                INSERT INTO Notifications (user_id, message, type)
-                VALUES (?, ?, 'General')
-            """, (donor_user_id, f'Thank you! Your donation of {volume} unit(s) has been recorded.'))
+            insert_job(cursor, 'notification',
+                       {'user_id': donor_user_id, 'message': f'Thank you! Your donation of {volume} unit(s) has been recorded.', 'type': 'General'})
 
-        conn.commit()
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+        return True, (donor_rows, today)
+    
+    success, result = run_transaction(donate, 'submit_donation_transaction')
+    if not success:
+        return False, result
+    donor_rows, today = result
+    _jobs_enqueued()
+    _donors_changed(donor_rows, last_donation=today)
+    return True, None
 
-def consume_stock(cursor, area_id, blood_type_id, units_needed):
+DonationBatchResult = namedtuple('DonationBatchResult', ['row', 'donor_id', 'success', 'donation_id', 'error'])
+
+# One parsed batch row; `row` is its position in the caller's list
+_BatchDonation = namedtuple('_BatchDonation', ['row', 'donor_id', 'volume', 'is_exchange', 'request_id'])
+
+# SQL Server takes fewer than 2100 parameters per statement; the widest statement of a batch
+# chunk (the Donation_Completed INSERT) binds 6 per row, so a chunk holds at most 349 rows
+DONATION_BATCH_MAX_CHUNK_SIZE = 2099 // 6
+
+def _parse_batch_donation(row, item):
+    """Validates one batch item. Returns (_BatchDonation, None) or (None, Error Message)."""
+    try:
+        donor_id = int(item['donor_id'])
+        volume = int(item.get('volume') or 1)
+        request_id = int(item['request_id']) if item.get('request_id') not in (None, '') else None
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None, "Invalid donor_id, volume or request_id."
+    if volume != 1:
+        return None, "Donation limit is strictly 1 unit per session."
+    return _BatchDonation(row, donor_id, volume, bool(item.get('is_exchange')), request_id), None
+
+def submit_donation_batch(donations, chunk_size=None):
     """
-    Consumes stock using FIFO (First-In-First-Out) strategy.
-    Removes oldest stock batches first.
+    Records a blood drive's donations in bulk, with the rules of submit_donation_transaction
+    (1 unit per session, 30-day rule, exchanges only within the donor's area, no stock swap
+    when donor and request share the blood type).
     
-    LOGIC:
-    1. Fetch all stock batches for the given Area and Blood Type, ordered by Date (Oldest first).
-    2. Iterate through batches and deduct units until the required amount is met.
-    3. Delete empty batches to keep the table clean.
+    QUERY: Per chunk of rows, one transaction (run_transaction: re-run on transient errors such as deadlocks):
+           1. Eligibility of every donor in one SELECT ... WHERE id IN (...) WITH (UPDLOCK)
+           2. Exchange requests in one SELECT (UPDLOCK); consume_stock per cross-type exchange
+           3. Multi-row INSERTs into Donation_Completed (OUTPUT ids), Stock and Donor_History
+           4. Inventory_Summary and Inventory_Bucket in one batch; Request in one UPDATE for all
+              requests, then the newly fulfilled ones in one UPDATE ... OUTPUT
+           5. One Donor UPDATE for all donors (guarded by eligible_from as in the single-row path)
+              and one notification_batch job thanking them
+    KEYWORDS: Batch, Bulk Insert, Set-Based, Exchange, Stock Management, Transaction
     
-    QUERY: SELECT with ORDER BY donation_date ASC to find oldest stock, followed by DELETE or UPDATE.
-    KEYWORDS: FIFO, Stock Consumption, Order By, Date, Delete, Update
+    Args:
+        donations (list[dict]): {'donor_id', 'volume' (default 1), 'is_exchange', 'request_id'} per donation.
+        chunk_size (int): Rows per transaction (default: DONATION_BATCH_CHUNK_SIZE config), capped at
+                          DONATION_BATCH_MAX_CHUNK_SIZE.
+    
+    Returns:
+        list[DonationBatchResult]: One per input row, in input order. A rejected row does not
+        affect the others; a database error that retries do not fix fails the rows of its chunk only.
+    """
+    chunk_size = min(chunk_size or current_app.config.get('DONATION_BATCH_CHUNK_SIZE', 250),
+                     DONATION_BATCH_MAX_CHUNK_SIZE)
+    results = [None] * len(donations)
+    pending, seen = [], set()
+    for row, item in enumerate(donations):
+        donation, error = _parse_batch_donation(row, item)
+        if donation and donation.donor_id in seen:
+            donation, error = None, "Donor appears more than once in this batch."
+        if donation is None:
+            results[row] = DonationBatchResult(row, item.get('donor_id') if isinstance(item, dict) else None,
+                                               False, None, error)
+            continue
+        seen.add(donation.donor_id)
+        pending.append(donation)
+    
+    donation_date = datetime.now()
+    for start in range(0, len(pending), chunk_size):
+        conflicted = []
+        
+        def record(cursor, chunk=pending[start:start + chunk_size]):
+            # Donors whose donation committed elsewhere after our read (only possible where
+            # UPDLOCK is a no-op, i.e. SQLite) are rejected and the rest of the chunk retried
+            conflicted.clear()
+            while True:
+                recorded, rejected, donor_rows, conflicts = _record_donation_chunk(cursor, chunk, donation_date)
+                if not conflicts:
+                    break
+                get_db_connection().rollback()
+                conflicted.extend(conflicts)
+                lost = {donation.row for donation in conflicts}
+                chunk = [donation for donation in chunk if donation.row not in lost]
+            return bool(recorded), (recorded, rejected, donor_rows)
+        
+        success, outcome = run_transaction(record, 'submit_donation_batch')
+        if isinstance(outcome, str):
+            # Database error that was not transient (or out of retries): the chunk's rows fail with it
+            for donation in pending[start:start + chunk_size]:
+                results[donation.row] = DonationBatchResult(donation.row, donation.donor_id, False, None, outcome)
+            continue
+        
+        recorded, rejected, donor_rows = outcome
+        if success:
+            _jobs_enqueued()
+            _donors_changed(donor_rows, last_donation=donation_date.date())
+        for donation in conflicted:
+            results[donation.row] = DonationBatchResult(
+                donation.row, donation.donor_id, False, None,
+                "Donor is not eligible. Another donation was just recorded. Must wait 30 days.")
+        for donation, error in rejected:
+            results[donation.row] = DonationBatchResult(donation.row, donation.donor_id, False, None, error)
+        for donation, donation_id in recorded:
+            results[donation.row] = DonationBatchResult(donation.row, donation.donor_id, True, donation_id, None)
+    return results
+
+def _record_donation_chunk(cursor, chunk, donation_date):
+    """
+    Writes one chunk of submit_donation_batch on the caller's cursor; run_transaction commits.
+    
+    Returns:
+        (list, list, list, list): ((donation, donation_id) recorded, (donation, error) rejected,
+                                   Donor rows for _donors_changed, donations whose donor was
+                                   updated concurrently - if any, the caller rolls back and retries
+                                   the chunk without them)
+    """
+    today = donation_date.date()
+    rejected = []
+    
+    # Step 1: Eligibility (30-day rule) for every donor of the chunk
+    placeholders = ', '.join('?' * len(chunk))
+    cursor.execute(f"""
+        SELECT id, bloodtype, area_id, user_id, last_donation_at, eligible_from
+        FROM Donor WITH (UPDLOCK)
+        WHERE id IN ({placeholders})
+    """, [d.donor_id for d in chunk])
+    donors = {row.id: row for row in cursor.fetchall()}
+    
+    eligible = []
+    for donation in chunk:
+        donor = donors.get(donation.donor_id)
+        if donor is None:
+            rejected.append((donation, "Donor not found."))
+        elif not _eligibility(donor.eligible_from)[0]:
+            days_since = (today - donor.last_donation_at.date()).days
+            rejected.append((donation, f"Donor is not eligible. Last donation was {days_since} days ago. Must wait 30 days."))
+        else:
+            eligible.append(donation)
+    
+    # Step 2: Exchange checks and outbound stock (same rules as submit_donation_transaction)
+    request_ids = sorted({d.request_id for d in eligible if d.is_exchange and d.request_id})
+    requests = {}
+    if request_ids:
+        cursor.execute(f"""
+            SELECT r.id, r.blood_type, rec.area_id, rec.user_id
+            FROM Request r WITH (UPDLOCK)
+            JOIN Recipient rec ON r.recipient_id = rec.id
+            WHERE r.id IN ({', '.join('?' * len(request_ids))})
+        """, request_ids)
+        requests = {row.id: row for row in cursor.fetchall()}
+    
+    accepted, direct = [], set()
+    for donation in eligible:
+        donor = donors[donation.donor_id]
+        if donation.is_exchange and donation.request_id:
+            req = requests.get(donation.request_id)
+            if req is None:
+                rejected.append((donation, "Request not found."))
+                continue
+            if str(donor.area_id) != str(req.area_id):
+                rejected.append((donation, "Location Mismatch: Donor and Request must be in the same area."))
+                continue
+            if donor.bloodtype == req.blood_type:
+                direct.add(donation.row)
+            elif not consume_stock(cursor, donor.area_id, req.blood_type, donation.volume):
+                rejected.append((donation, "Exchange Failed: Insufficient stock of required blood type for recipient."))
+                continue
+        accepted.append(donation)
+    if not accepted:
+        return [], rejected, [], []
+    
+    # Step 3: Record donations (Inbound), one multi-row INSERT
+    cursor.execute(f"""
+        INSERT INTO Donation_Completed (donor_id, units, blood_type, is_exchange, donation_date, request_id)
+        OUTPUT INSERTED.id, INSERTED.donor_id
+        VALUES {', '.join('(?, ?, ?, ?, ?, ?)' for _ in accepted)}
+    """, [value for d in accepted
+          for value in (d.donor_id, d.volume, donors[d.donor_id].bloodtype, d.is_exchange, donation_date, d.request_id)])
+    donation_ids = {row.donor_id: row.id for row in cursor.fetchall()}
+    
+    # Step 4: Stock (all but direct exchanges) and its summary, once per (area, blood type)
+    stocked = [d for d in accepted if d.row not in direct]
+    if stocked:
+        expires_at = _stock_expiry(donation_date)
+        cursor.execute(f"""
+            INSERT INTO Stock (units, donation_id, area_id, blood_type, received_at, expires_at)
+            VALUES {', '.join('(?, ?, ?, ?, GETDATE(), ?)' for _ in stocked)}
+        """, [value for d in stocked
+              for value in (d.volume, donation_ids[d.donor_id], donors[d.donor_id].area_id,
+                            donors[d.donor_id].bloodtype, expires_at)])
+        deltas = {}
+        for d in stocked:
+            key = (donors[d.donor_id].area_id, donors[d.donor_id].bloodtype, expires_at.date())
+            deltas[key] = deltas.get(key, 0) + d.volume
+        adjust_inventory_summaries(cursor, deltas)
+    
+    # Step 5: Donor History
+    cursor.execute(f"""
+        INSERT INTO dbo.Donor_History (donor_id, [date], [unit])
+        VALUES {', '.join('(?, GETDATE(), ?)' for _ in accepted)}
+    """, [value for d in accepted for value in (d.donor_id, d.volume)])
+    
+    # Step 6: Request progress, once per request, then mark the ones now complete
+    collected = {}
+    for d in accepted:
+        if d.is_exchange and d.request_id:
+            collected[d.request_id] = collected.get(d.request_id, 0) + d.volume
+    if collected:
+        ids = sorted(collected)
+        cursor.execute(f"""
+            UPDATE Request
+            SET units_collected = units_collected + CASE id {' '.join('WHEN ? THEN ?' for _ in ids)} END
+            WHERE id IN ({', '.join('?' * len(ids))})
+        """, [value for request_id in ids for value in (request_id, collected[request_id])] + ids)
+        cursor.execute(f"""
+            UPDATE Request
+            SET status = 'Fulfilled', date_fulfilled = GETDATE()
+            OUTPUT INSERTED.id
+            WHERE id IN ({', '.join('?' * len(ids))}) AND units_collected >= units_required AND status <> 'Fulfilled'
+        """, ids)
+        for (request_id,) in cursor.fetchall():
+            recipient_user_id = requests[request_id].user_id
+            if recipient_user_id:
+                insert_job(cursor, 'notification',
+                           {'user_id': recipient_user_id, 'message': 'Your blood request has been fulfilled!', 'type': 'Collection'},
+                           idempotency_key=f'request:{request_id}:fulfilled')
+    
+    # Step 7: Auto-deactivate the donors and record the donation date, guarded like the single-row path
+    cursor.execute(f"""
+        UPDATE Donor
+        SET availability = 0, last_donation_at = ?, eligible_from = ?
+        {_DONOR_EVENT_OUTPUT}
+        WHERE id IN ({', '.join('?' * len(accepted))}) AND (eligible_from IS NULL OR eligible_from <= ?)
+    """, [donation_date, _eligible_from(donation_date)] + [d.donor_id for d in accepted] + [today])
+    donor_rows = cursor.fetchall()
+    if len(donor_rows) < len(accepted):
+        updated = {row.id for row in donor_rows}
+        return [], rejected, [], [d for d in accepted if d.donor_id not in updated]
+    
+    # Step 8: Thank the donors with one notification job
+    user_ids = [donors[d.donor_id].user_id for d in accepted if donors[d.donor_id].user_id]
+    if user_ids:
+        insert_job(cursor, 'notification_batch',
+                   {'user_ids': user_ids, 'message': 'Thank you! Your donation of 1 unit(s) has been recorded.', 'type': 'General'})
+    
+    return [(d, donation_ids[d.donor_id]) for d in accepted], rejected, donor_rows, []
+
+def _stock_expiry(received_at):
+    """Midnight at which a bag received at `received_at` expires (STOCK_SHELF_LIFE_DAYS, migration 009)."""
+    shelf_life = current_app.config.get('STOCK_SHELF_LIFE_DAYS', 42)
+    return datetime.combine(received_at.date() + timedelta(days=shelf_life), datetime.min.time())
+
+def consume_stock(cursor, area_id, blood_type_id, units_needed):
+    """
+    Consumes stock first-expiring-first-out (FEFO). Expired bags are never allocated.
+    Safe under concurrent allocations from the same area: the bags taken are locked first,
+    so two transactions can never both count (and delete) the same bag.
+    
+    LOGIC (one set-based batch, one round trip):
+    1. Fail fast when the unexpired Inventory_Bucket rows of (area, type) - one row per
+       expiry day, so at most the shelf life in days - hold fewer units than needed.
+    2. Take the first-expiring N unexpired bags (N = units needed, as every bag holds at least
+       1 unit) from the covering index on Stock (area_id, blood_type, expires_at) WITH
+       (UPDLOCK, ROWLOCK, READPAST): each bag read is locked until commit, and bags already
+       locked by a concurrent allocation are skipped instead of waited for, so allocators
+       in the same area take the next bags in parallel. A running SUM over the locked bags
+       decides what is taken; if they cannot cover the need nothing is changed.
+    3. Bags fully covered by the running total are deleted; the last one is partially updated.
+    4. Decrement Inventory_Summary by the consumed amount and each expiry day's bucket by
+       what was taken from it.
+    Allocators of different areas and types can still deadlock on the ledgers; callers run
+    inside run_transaction, which re-runs the deadlock victim.
+    
+    QUERY: CTE with TOP + WITH (UPDLOCK, ROWLOCK, READPAST) + SUM() OVER (ORDER BY expires_at)
+           feeding a set-based DELETE and UPDATE.
+    KEYWORDS: FEFO, Expiry, Stock Consumption, Concurrency, Row Locking, Running Total, Window Function, Delete, Update
     
     Args:
         cursor: Active database cursor (part of transaction).
@@ -564,70 +1436,562 @@ def consume_stock(cursor, area_id, blood_type_id, units_needed):
         units_needed: Amount of units to remove.
         
     Returns:
-        bool: True if successful, False if insufficient stock.
+        bool: True if successful, False if insufficient unexpired stock.
     """
-    # Step 1: Check total available stock
-    cursor.execute("""
-        SELECT SUM(s.units) 
-        FROM Stock s
-        JOIN Donation_Completed dc ON s.donation_id = dc.id
-        WHERE s.area_id = ? AND dc.blood_type = ?
-    """, (area_id, blood_type_id))
-    total_available = cursor.fetchone()[0] or 0
-    
-    if total_available < units_needed:
-        return False
+    cursor.execute(named_query('consume_stock', """
+        SET NOCOUNT ON;
+        DECLARE @area_id INT = ?, @blood_type INT = ?, @needed INT = ?;
+        DECLARE @now DATETIME = GETDATE();
+        DECLARE @consumed INT = 0;
+        DECLARE @taken TABLE (bag_id INT PRIMARY KEY, take INT NOT NULL, whole BIT NOT NULL, expires_on DATE NOT NULL);
+        
+        IF ISNULL((SELECT SUM(units) FROM Inventory_Bucket
+                   WHERE area_id = @area_id AND blood_type = @blood_type
+                     AND expires_on > CAST(@now AS DATE)), 0) >= @needed
+        BEGIN
+            ;WITH first_expiring AS (
+                SELECT TOP (@needed) bag_id, units, expires_at
+                FROM Stock WITH (UPDLOCK, ROWLOCK, READPAST)
+                WHERE area_id = @area_id AND blood_type = @blood_type AND expires_at > @now
+                ORDER BY expires_at, bag_id
+            ), fefo AS (
+                SELECT bag_id, units, expires_at,
+                       SUM(units) OVER (ORDER BY expires_at, bag_id ROWS UNBOUNDED PRECEDING) as running
+                FROM first_expiring
+            )
+            INSERT INTO @taken (bag_id, take, whole, expires_on)
+            SELECT bag_id,
+                   CASE WHEN running <= @needed THEN units ELSE units - (running - @needed) END,
+                   CASE WHEN running <= @needed THEN 1 ELSE 0 END,
+                   CAST(expires_at AS DATE)
+            FROM fefo
+            WHERE running - units < @needed;
+            
+            SELECT @consumed = ISNULL(SUM(take), 0) FROM @taken;
+            
+            -- Short when concurrent allocations hold the remaining bags, or through drift
+            -- between buckets and bags (see reconcile_inventory_summary)
+            IF @consumed = @needed
+            BEGIN
+                DELETE s FROM Stock s JOIN @taken t ON s.bag_id = t.bag_id WHERE t.whole = 1;
+                UPDATE s SET units = s.units - t.take FROM Stock s JOIN @taken t ON s.bag_id = t.bag_id WHERE t.whole = 0;
+                UPDATE Inventory_Summary SET units = units - @needed
+                WHERE area_id = @area_id AND blood_type = @blood_type;
+                UPDATE b SET units = b.units - t.take
+                FROM Inventory_Bucket b
+                JOIN (SELECT expires_on, SUM(take) as take FROM @taken GROUP BY expires_on) t
+                    ON b.expires_on = t.expires_on
+                WHERE b.area_id = @area_id AND b.blood_type = @blood_type;
+            END
+        END
+        
+        SELECT @consumed;
+    """), (area_id, blood_type_id, units_needed))
+    consumed = cursor.fetchone()[0]
+    
+    return consumed == units_needed
+
+def adjust_inventory_summary(cursor, area_id, blood_type_id, delta, expires_on=None):
+    """
+    Applies a unit delta to the Inventory_Summary row for (area, blood type), creating it if needed,
+    and - for bags with an expiry - to the Inventory_Bucket row of their expiry day.
+    Must run on the caller's cursor so it commits or rolls back with the Stock change.
+    
+    QUERY: UPDATE WITH (UPDLOCK, SERIALIZABLE) then INSERT if no row matched (race-free upsert).
+    KEYWORDS: Upsert, Materialized Summary, Inventory, Transaction
+    """
+    if area_id is None or not delta:
+        return
+    cursor.execute(named_query('adjust_inventory_summary', """
+        UPDATE Inventory_Summary WITH (UPDLOCK, SERIALIZABLE)
+        SET units = units + ?
+        WHERE area_id = ? AND blood_type = ?;
         
-    # Step 2: Fetch stock batches ordered by date (FIFO)
+        IF @@ROWCOUNT = 0
+            INSERT INTO Inventory_Summary (area_id, blood_type, units) VALUES (?, ?, ?);
+    """), (delta, area_id, blood_type_id, area_id, blood_type_id, delta))
+    if expires_on is not None:
+        cursor.execute(named_query('adjust_inventory_bucket', """
+            UPDATE Inventory_Bucket WITH (UPDLOCK, SERIALIZABLE)
+            SET units = units + ?
+            WHERE area_id = ? AND blood_type = ? AND expires_on = ?;
+            
+            IF @@ROWCOUNT = 0
+                INSERT INTO Inventory_Bucket (area_id, blood_type, expires_on, units) VALUES (?, ?, ?, ?);
+        """), (delta, area_id, blood_type_id, expires_on, area_id, blood_type_id, expires_on, delta))
+
+def adjust_inventory_summaries(cursor, deltas):
+    """
+    Applies several unit deltas to Inventory_Summary and Inventory_Bucket in one batch (batch
+    counterpart of adjust_inventory_summary). Must run on the caller's cursor, like the Stock change.
+    
+    QUERY: The deltas go into a table variable once; one MERGE WITH (HOLDLOCK) per table
+           (summary deltas summed per area and type): existing rows incremented, missing ones inserted.
+    KEYWORDS: Upsert, Merge, Materialized Summary, Inventory, Transaction
+    
+    Args:
+        deltas (dict): {(area_id, blood_type_id, expires_on): delta}; expires_on None for bags without expiry
+    """
+    rows = [key + (delta,) for key, delta in sorted(deltas.items(), key=str) if key[0] is not None and delta]
+    if not rows:
+        return
+    cursor.execute(named_query('adjust_inventory_summaries', """
+        SET NOCOUNT ON;
+        DECLARE @delta TABLE (area_id INT NOT NULL, blood_type INT NOT NULL, expires_on DATE NULL, delta INT NOT NULL);
+        INSERT INTO @delta (area_id, blood_type, expires_on, delta) VALUES {values};
+        
+        MERGE Inventory_Summary WITH (HOLDLOCK) AS target
+        USING (SELECT area_id, blood_type, SUM(delta) FROM @delta GROUP BY area_id, blood_type)
+            AS source (area_id, blood_type, delta)
+            ON target.area_id = source.area_id AND target.blood_type = source.blood_type
+        WHEN MATCHED THEN
+            UPDATE SET units = target.units + source.delta
+        WHEN NOT MATCHED THEN
+            INSERT (area_id, blood_type, units) VALUES (source.area_id, source.blood_type, source.delta);
+        
+        MERGE Inventory_Bucket WITH (HOLDLOCK) AS target
+        USING (SELECT area_id, blood_type, expires_on, delta FROM @delta WHERE expires_on IS NOT NULL) AS source
+            ON target.area_id = source.area_id AND target.blood_type = source.blood_type
+           AND target.expires_on = source.expires_on
+        WHEN MATCHED THEN
+            UPDATE SET units = target.units + source.delta
+        WHEN NOT MATCHED THEN
+            INSERT (area_id, blood_type, expires_on, units)
+            VALUES (source.area_id, source.blood_type, source.expires_on, source.delta);
+    """).format(values=', '.join('(?, ?, ?, ?)' for _ in rows)), [value for row in rows for value in row])
+
+RetiredStock = namedtuple('RetiredStock', ['bags', 'units', 'chunks'])
+
+def retire_expired_stock(chunk_size=None, on_chunk=None):
+    """
+    Deletes every expired bag (expires_at passed) and takes it out of Inventory_Summary and
+    Inventory_Bucket. Run daily by the 'stock_expiry' job and by `flask --app run retire-expired-stock`.
+    
+    QUERY: Per chunk: DELETE TOP (n) ... OUTPUT INTO a table variable, seeking IX_Stock_Expires;
+           the deleted units are subtracted from the summary and buckets in one UPDATE each,
+           and emptied buckets of past days are dropped. Each chunk commits on its own, so the
+           sweep never holds the Stock locks of one long transaction.
+    KEYWORDS: Expiry, Sweep, Bulk Delete, OUTPUT INTO, Materialized Summary, Chunking
+    
+    Args:
+        chunk_size (int): Bags per chunk/transaction (default: STOCK_EXPIRY_CHUNK_SIZE config).
+        on_chunk (callable): on_chunk(cursor, bags, units) runs inside each chunk's transaction
+                             (e.g. to save job progress atomically with it).
+    
+    Returns:
+        (bool, RetiredStock | str): (Success, (bags, units, chunks) or Error Message)
+    """
+    chunk_size = chunk_size or current_app.config.get('STOCK_EXPIRY_CHUNK_SIZE', 1000)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    total_bags = total_units = chunks = 0
+    try:
+        while True:
+            cursor.execute(named_query('retire_expired_stock', """
+                SET NOCOUNT ON;
+                DECLARE @now DATETIME = GETDATE();
+                DECLARE @gone TABLE (area_id INT NULL, blood_type INT NULL, expires_on DATE NOT NULL, units INT NOT NULL);
+                
+                DELETE TOP (?) FROM Stock
+                OUTPUT DELETED.area_id, DELETED.blood_type, CAST(DELETED.expires_at AS DATE), DELETED.units INTO @gone
+                WHERE expires_at <= @now;
+                
+                UPDATE i SET units = i.units - g.units
+                FROM Inventory_Summary i
+                JOIN (SELECT area_id, blood_type, SUM(units) as units FROM @gone
+                      GROUP BY area_id, blood_type) g
+                    ON i.area_id = g.area_id AND i.blood_type = g.blood_type;
+                
+                UPDATE b SET units = b.units - g.units
+                FROM Inventory_Bucket b
+                JOIN (SELECT area_id, blood_type, expires_on, SUM(units) as units FROM @gone
+                      GROUP BY area_id, blood_type, expires_on) g
+                    ON b.area_id = g.area_id AND b.blood_type = g.blood_type AND b.expires_on = g.expires_on;
+                
+                DELETE FROM Inventory_Bucket WHERE expires_on <= CAST(@now AS DATE) AND units <= 0;
+                
+                SELECT COUNT(*), ISNULL(SUM(units), 0) FROM @gone;
+            """), (chunk_size,))
+            bags, units = cursor.fetchone()
+            if not bags:
+                conn.commit()
+                break
+            if on_chunk:
+                on_chunk(cursor, bags, units)
+            conn.commit()
+            total_bags += bags
+            total_units += units
+            chunks += 1
+            if bags < chunk_size:
+                break
+        return True, RetiredStock(total_bags, total_units, chunks)
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+RebalancingInputs = namedtuple('RebalancingInputs', ['stock', 'demand'])
+StockTransfer = namedtuple('StockTransfer', ['from_area_id', 'to_area_id', 'blood_type_id', 'planned_units', 'units'])
+
+def get_rebalancing_inputs():
+    """
+    Reads what the stock rebalancing planner (stock_rebalancing.py) balances: usable units and
+    the units open requests still need, per Area and Blood Type.
+    
+    QUERY: Two aggregates in one round trip: unexpired Inventory_Bucket rows (no Stock rows read)
+           and units_required of Approved requests, grouped by the recipient's area.
+    KEYWORDS: Inventory, Rebalancing, Materialized Summary, Aggregation, Read Path
+    
+    Returns:
+        RebalancingInputs: (stock, demand), each {(area_id, blood_type_id): units}
+    """
+    conn = get_read_connection()
+    cursor = conn.cursor()
     cursor.execute("""
-        SELECT s.bag_id, s.units
-        FROM Stock s
-        JOIN Donation_Completed dc ON s.donation_id = dc.id
-        WHERE s.area_id = ? AND dc.blood_type = ?
-        ORDER BY dc.donation_date ASC
-    """, (area_id, blood_type_id))
-    batches = cursor.fetchall()
-    
-    units_to_remove = units_needed
-    
-    for batch_id, batch_units in batches:
-        if units_to_remove <= 0:
-            break
+        SELECT area_id, blood_type, SUM(units) as units
+        FROM Inventory_Bucket
+        WHERE expires_on > ? AND units > 0
+        GROUP BY area_id, blood_type;
+        
+        SELECT rec.area_id, r.blood_type, SUM(r.units_required) as units
+        FROM Request r
+        JOIN Recipient rec ON r.recipient_id = rec.id
+        WHERE r.status = 'Approved' AND rec.area_id IS NOT NULL AND r.blood_type IS NOT NULL
+        GROUP BY rec.area_id, r.blood_type;
+    """, (datetime.now().date(),))
+    stock = {(row.area_id, row.blood_type): row.units for row in cursor.fetchall()}
+    cursor.nextset()
+    demand = {(row.area_id, row.blood_type): row.units for row in cursor.fetchall()}
+    conn.close()
+    return RebalancingInputs(stock, demand)
+
+def transfer_stock_transaction(transfers, chunk_size=300):
+    """
+    Executes a rebalancing plan: moves bags between areas and shifts their units in
+    Inventory_Summary and Inventory_Bucket, all in one transaction.
+    
+    LOGIC (per chunk of transfers, one set-based batch each):
+    1. The chunk's transfers go into a table variable with each one's starting unit within
+       its source (transfers from the same source and type take consecutive ranges).
+    2. A running SUM over the source's unexpired bags, latest-expiring first (the source keeps
+       its first-expiring bags for its own requests, FEFO), assigns every bag whose first unit
+       falls inside a transfer's range to that transfer. Bags are never split.
+    3. One UPDATE re-homes the assigned bags; the units moved per transfer and expiry day are
+       returned and applied to the ledgers with adjust_inventory_summaries.
+    Bags consumed or expired since the plan was computed are simply not moved, so a transfer
+    may move fewer units than planned, and bags locked by a concurrent allocation are skipped.
+    
+    QUERY: Table variable + SUM() OVER (PARTITION BY area, type ORDER BY expires_at DESC) WITH (UPDLOCK, READPAST)
+           feeding one set-based UPDATE of Stock.area_id, then one batched MERGE per ledger.
+           Re-run on transient errors such as deadlocks (run_transaction).
+    KEYWORDS: Rebalancing, Stock Transfer, Running Total, Window Function, Update, Materialized Summary, Transaction
+    
+    Args:
+        transfers (list): Transfers of a RebalancePlan (from_area_id, to_area_id, blood_type_id, units, ...).
+        chunk_size (int): Transfers per batch (6 parameters each, under SQL Server's 2100-parameter limit).
+    
+    Returns:
+        (bool, list[StockTransfer] | str): (Success, (from, to, type, planned units, units moved)
+                                           per transfer or Error Message)
+    """
+    transfers = [t for t in transfers if t.units > 0 and t.from_area_id != t.to_area_id]
+    
+    def transfer(cursor):
+        moved = [0] * len(transfers)
+        deltas = {}
+        for start in range(0, len(transfers), chunk_size):
+            rows, taken = [], {}
+            for seq in range(start, min(start + chunk_size, len(transfers))):
+                t = transfers[seq]
+                # Bags moved by earlier chunks are gone, so each chunk counts its sources from 0
+                source = (t.from_area_id, t.blood_type_id)
+                rows.append((seq, t.from_area_id, t.to_area_id, t.blood_type_id, taken.get(source, 0), t.units))
+                taken[source] = taken.get(source, 0) + t.units
             
-        if batch_units <= units_to_remove:
-            # Consume entire batch
-            cursor.execute("DELETE FROM Stock WHERE bag_id = ?", (batch_id,))
-            units_to_remove -= batch_units
-        else:
-            # Consume partial batch
-            cursor.execute("UPDATE Stock SET units = units - ? WHERE bag_id = ?", (units_to_remove, batch_id))
-            units_to_remove = 0
+            cursor.execute(named_query('transfer_stock', """
+                SET NOCOUNT ON;
+                DECLARE @now DATETIME = GETDATE();
+                DECLARE @plan TABLE (seq INT PRIMARY KEY, from_area INT NOT NULL, to_area INT NOT NULL,
+                                     blood_type INT NOT NULL, first_unit INT NOT NULL, units INT NOT NULL);
+                DECLARE @moved TABLE (bag_id INT PRIMARY KEY, seq INT NOT NULL, expires_on DATE NOT NULL, units INT NOT NULL);
+                INSERT INTO @plan (seq, from_area, to_area, blood_type, first_unit, units) VALUES {values};
+                
+                ;WITH bags AS (
+                    SELECT s.bag_id, s.area_id, s.blood_type, s.units, s.expires_at,
+                           SUM(s.units) OVER (PARTITION BY s.area_id, s.blood_type
+                                              ORDER BY s.expires_at DESC, s.bag_id DESC ROWS UNBOUNDED PRECEDING) as running
+                    FROM Stock s WITH (UPDLOCK, ROWLOCK, READPAST)
+                    WHERE s.expires_at > @now
+                      AND EXISTS (SELECT 1 FROM @plan p WHERE p.from_area = s.area_id AND p.blood_type = s.blood_type)
+                )
+                INSERT INTO @moved (bag_id, seq, expires_on, units)
+                SELECT b.bag_id, p.seq, CAST(b.expires_at AS DATE), b.units
+                FROM bags b
+                JOIN @plan p ON p.from_area = b.area_id AND p.blood_type = b.blood_type
+                 AND b.running - b.units >= p.first_unit AND b.running - b.units < p.first_unit + p.units;
+                
+                UPDATE s SET area_id = p.to_area
+                FROM Stock s
+                JOIN @moved m ON s.bag_id = m.bag_id
+                JOIN @plan p ON p.seq = m.seq;
+                
+                SELECT seq, expires_on, SUM(units) as units FROM @moved GROUP BY seq, expires_on;
+            """).format(values=', '.join('(?, ?, ?, ?, ?, ?)' for _ in rows)), [value for row in rows for value in row])
             
-    return True
+            for row in cursor.fetchall():
+                t = transfers[row.seq]
+                moved[row.seq] += row.units
+                for key, delta in (((t.from_area_id, t.blood_type_id, row.expires_on), -row.units),
+                                   ((t.to_area_id, t.blood_type_id, row.expires_on), row.units)):
+                    deltas[key] = deltas.get(key, 0) + delta
+        
+        adjust_inventory_summaries(cursor, deltas)
+        return True, [StockTransfer(t.from_area_id, t.to_area_id, t.blood_type_id, t.units, units)
+                      for t, units in zip(transfers, moved)]
+    
+    return run_transaction(transfer, 'transfer_stock_transaction')
 
-def fulfill_request_transaction(request_id):
+def reconcile_inventory_summary(apply=True):
     """
-    Manually fulfills a request by a Manager.
-    Consumes necessary stock and updates request status.
+    Rebuilds Inventory_Summary from Stock and reports any drift.
+    
+    QUERY: FULL OUTER JOIN of the summary against SUM(units) over Stock to find mismatched rows,
+           then (if apply) a MERGE that rewrites them - under a table lock so no donation
+           slips in between the comparison and the fix.
+    KEYWORDS: Reconciliation, Drift, Full Outer Join, Merge, Rebuild
     
-    QUERY: Transaction that consumes stock (FIFO) and updates Request status to 'Fulfilled'.
-    KEYWORDS: Fulfillment, Stock Consumption, Update, Transaction
+    Args:
+        apply (bool): False only reports drift without changing anything.
+        
+    Returns:
+        (bool, list | str): (Success, list of (area_id, blood_type, summary_units, actual_units) or Error Message)
     """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        # Step 1: Get Request Details
+        actual_stock = """
+            SELECT area_id, blood_type, SUM(units) as units
+            FROM Stock
+            WHERE area_id IS NOT NULL
+            GROUP BY area_id, blood_type
+        """
+        cursor.execute(f"""
+            SELECT COALESCE(a.area_id, i.area_id) as area_id,
+                   COALESCE(a.blood_type, i.blood_type) as blood_type,
+                   ISNULL(i.units, 0) as summary_units,
+                   ISNULL(a.units, 0) as actual_units
+            FROM ({actual_stock}) a
+            FULL OUTER JOIN Inventory_Summary i WITH (TABLOCKX, HOLDLOCK)
+                ON i.area_id = a.area_id AND i.blood_type = a.blood_type
+            WHERE ISNULL(i.units, 0) <> ISNULL(a.units, 0)
+            ORDER BY 1, 2
+        """)
+        drift = cursor.fetchall()
+        
+        if apply and drift:
+            cursor.execute(named_query('reconcile_apply', f"""
+                MERGE Inventory_Summary AS target
+                USING ({actual_stock}) AS source
+                    ON target.area_id = source.area_id AND target.blood_type = source.blood_type
+                WHEN MATCHED AND target.units <> source.units THEN
+                    UPDATE SET units = source.units
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT (area_id, blood_type, units) VALUES (source.area_id, source.blood_type, source.units)
+                WHEN NOT MATCHED BY SOURCE AND target.units <> 0 THEN
+                    UPDATE SET units = 0;
+            """))
+        
+        conn.commit()
+        return True, drift
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def reconcile_inventory_buckets(apply=True):
+    """
+    Rebuilds Inventory_Bucket (units per area, blood type and expiry day) from Stock and
+    reports any drift. Same approach as reconcile_inventory_summary.
+    
+    QUERY: FULL OUTER JOIN of the buckets against SUM(units) over Stock grouped by expiry day,
+           then (if apply) a MERGE that rewrites them, under a table lock.
+    KEYWORDS: Reconciliation, Drift, Expiry, Full Outer Join, Merge, Rebuild
+    
+    Args:
+        apply (bool): False only reports drift without changing anything.
+        
+    Returns:
+        (bool, list | str): (Success, list of (area_id, blood_type, expires_on, bucket_units, actual_units)
+                            or Error Message)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        actual_stock = """
+            SELECT area_id, blood_type, CAST(expires_at AS DATE) as expires_on, SUM(units) as units
+            FROM Stock
+            WHERE area_id IS NOT NULL AND blood_type IS NOT NULL AND expires_at IS NOT NULL
+            GROUP BY area_id, blood_type, CAST(expires_at AS DATE)
+        """
+        cursor.execute(named_query('reconcile_buckets_drift', f"""
+            SELECT COALESCE(a.area_id, b.area_id) as area_id,
+                   COALESCE(a.blood_type, b.blood_type) as blood_type,
+                   COALESCE(a.expires_on, b.expires_on) as expires_on,
+                   ISNULL(b.units, 0) as bucket_units,
+                   ISNULL(a.units, 0) as actual_units
+            FROM ({actual_stock}) a
+            FULL OUTER JOIN Inventory_Bucket b WITH (TABLOCKX, HOLDLOCK)
+                ON b.area_id = a.area_id AND b.blood_type = a.blood_type AND b.expires_on = a.expires_on
+            WHERE ISNULL(b.units, 0) <> ISNULL(a.units, 0)
+            ORDER BY 1, 2, 3
+        """))
+        drift = cursor.fetchall()
+        
+        if apply and drift:
+            cursor.execute(named_query('reconcile_buckets_apply', f"""
+                MERGE Inventory_Bucket AS target
+                USING ({actual_stock}) AS source
+                    ON target.area_id = source.area_id AND target.blood_type = source.blood_type
+                   AND target.expires_on = source.expires_on
+                WHEN MATCHED AND target.units <> source.units THEN
+                    UPDATE SET units = source.units
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT (area_id, blood_type, expires_on, units)
+                    VALUES (source.area_id, source.blood_type, source.expires_on, source.units)
+                WHEN NOT MATCHED BY SOURCE AND target.units <> 0 THEN
+                    DELETE;
+            """))
+        
+        conn.commit()
+        return True, drift
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def count_donors():
+    """Returns the number of donors (progress total for donor_eligibility jobs)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM Donor")
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+EligibilitySyncResult = namedtuple('EligibilitySyncResult', ['checked', 'drift', 'chunks', 'sample'])
+EligibilityDrift = namedtuple('EligibilityDrift', ['donor_id', 'last_donation_at', 'eligible_from', 'actual_last_donation'])
+
+def sync_donor_eligibility(apply=True, chunk_size=1000, start_after=0, on_chunk=None, sample_size=20):
+    """
+    Verifies Donor.last_donation_at / eligible_from (migration 008) against Donation_Completed
+    and, if apply, rewrites the donors that drifted. Also serves as the backfill.
+    
+    QUERY: Per chunk of donors in id order (keyset, TOP n, UPDLOCK so no donation for them can
+           commit in between): MAX(donation_date) per donor from a seek on
+           IX_Donation_Completed_Donor_Date; drifted donors rewritten with one executemany UPDATE.
+           Each chunk commits on its own, so a full pass never holds one long transaction.
+    KEYWORDS: Reconciliation, Drift, Backfill, Denormalization, Keyset, Chunking
+    
+    Args:
+        apply (bool): False only reports drift without changing anything.
+        chunk_size (int): Donors per chunk/transaction.
+        start_after (int): Resume after this donor id (the last one of a committed chunk).
+        on_chunk (callable): on_chunk(cursor, checked, drift, last_donor_id) runs inside each
+                             chunk's transaction, before its commit (e.g. to checkpoint a job).
+        sample_size (int): Drifted donors kept in the result for reporting.
+    
+    Returns:
+        (bool, EligibilitySyncResult | str): (Success, donors checked, drifted, chunks and a sample
+                                             of EligibilityDrift rows, or Error Message)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    checked, drift, chunks, last_donor_id = 0, 0, 0, start_after
+    sample, fixed = [], []
+    try:
+        while True:
+            cursor.execute("""
+                SELECT TOP (?) d.id, d.name, d.bloodtype, d.area_id, d.availability,
+                       d.last_donation_at, d.eligible_from,
+                       (SELECT MAX(dc.donation_date) FROM Donation_Completed dc
+                        WHERE dc.donor_id = d.id) AS latest_donation_date
+                FROM Donor d WITH (UPDLOCK)
+                WHERE d.id > ?
+                ORDER BY d.id
+            """, (chunk_size, last_donor_id))
+            rows = cursor.fetchall()
+            if not rows:
+                conn.commit()
+                break
+            
+            drifted = [row for row in rows
+                       if row.last_donation_at != row.latest_donation_date
+                       or row.eligible_from != (_eligible_from(row.latest_donation_date)
+                                                if row.latest_donation_date else None)]
+            if apply and drifted:
+                cursor.executemany("UPDATE Donor SET last_donation_at = ?, eligible_from = ? WHERE id = ?", [
+                    (row.latest_donation_date,
+                     _eligible_from(row.latest_donation_date) if row.latest_donation_date else None, row.id)
+                    for row in drifted])
+            if on_chunk:
+                on_chunk(cursor, checked + len(rows), drift + len(drifted), rows[-1].id)
+            conn.commit()
+            
+            checked += len(rows)
+            drift += len(drifted)
+            chunks += 1
+            last_donor_id = rows[-1].id
+            sample.extend(EligibilityDrift(row.id, row.last_donation_at, row.eligible_from, row.latest_donation_date)
+                          for row in drifted[:sample_size - len(sample)])
+            if apply:
+                fixed.extend(drifted)
+            if len(rows) < chunk_size:
+                break
+        
+        return True, EligibilitySyncResult(checked, drift, chunks, sample)
+    except Exception as e:
+        conn.rollback()
+        if checked:
+            return False, f"{e} (after {checked} donor(s) in {chunks} committed chunk(s))"
+        return False, str(e)
+    finally:
+        conn.close()
+        for row in fixed:
+            _donors_changed([row], last_donation=row.latest_donation_date)
+
+def fulfill_request_transaction(request_id):
+    """
+    Manually fulfills a request by a Manager.
+    Consumes necessary stock and updates request status.
+    
+    Only an Approved request can be fulfilled, and only once: the Request row is read with
+    an update lock, so a second manager fulfilling the same request waits for the first
+    and then finds it Fulfilled instead of consuming its stock again.
+    
+    QUERY: Transaction that locks the Request row (UPDLOCK, ROWLOCK), consumes stock (first-expiring-first-out)
+           and updates Request status to 'Fulfilled' only while it is still 'Approved'.
+           Re-run on transient errors such as deadlocks (run_transaction).
+    KEYWORDS: Fulfillment, Stock Consumption, Update, Transaction, Locking Hints
+    """
+    def fulfill(cursor):
+        # Step 1: Get and lock Request Details
         cursor.execute("""
-            SELECT r.units_required, r.blood_type, u.area_id, r.recipient_id
-            FROM Request r
+            SELECT r.units_required, r.blood_type, rec.area_id, r.recipient_id, r.status
+            FROM Request r WITH (UPDLOCK, ROWLOCK)
             JOIN Recipient rec ON r.recipient_id = rec.id
-            JOIN [User] u ON rec.user_id = u.id
             WHERE r.id = ?
         """, (request_id,))
         req_row = cursor.fetchone()
         
         if not req_row:
             return False, "Request not found"
+        if req_row.status == 'Fulfilled':
+            return False, "Request already fulfilled"
+        if req_row.status != 'Approved':
+            return False, "Only approved requests can be fulfilled"
             
         units_required = req_row[0]
         blood_type_id = req_row[1]
@@ -638,26 +2002,28 @@ def fulfill_request_transaction(request_id):
         if not consume_stock(cursor, area_id, blood_type_id, units_required):
             return False, "Insufficient stock in this area to fulfill request."
             
-        # Step 3: Update Request Status
-        cursor.execute("UPDATE Request SET status = 'Fulfilled', date_fulfilled = GETDATE() WHERE id = ?", (request_id,))
+        # Step 3: Update Request Status (rolls the consumption back if another fulfillment got there first)
+        cursor.execute("""
+            UPDATE Request SET status = 'Fulfilled', date_fulfilled = GETDATE()
+            WHERE id = ? AND status = 'Approved'
+        """, (request_id,))
+        if cursor.rowcount != 1:
+            return False, "Request already fulfilled"
         
         # Step 4: Notify Recipient
         cursor.execute("SELECT user_id FROM Recipient WHERE id = ?", (recipient_id,))
         recipient_user_id = cursor.fetchone()[0]
         
         if recipient_user_id:
-            cursor.execute("""
-                INSERT INTO Notifications (user_id, message, type)
-                VALUES (?, 'Your blood request has been fulfilled. Please come to collect.', 'Collection')
-            """, (recipient_user_id,))
-            
-        conn.commit()
+            insert_job(cursor, 'notification',
+                       {'user_id': recipient_user_id, 'message': 'Your blood request has been fulfilled. Please come to collect.', 'type': 'Collection'},
+                       idempotency_key=f'request:{request_id}:fulfilled')
         return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+    
+    success, error = run_transaction(fulfill, 'fulfill_request_transaction')
+    if success:
+        _jobs_enqueued()
+    return success, error
 
 # ==================================================================================
 # DONOR FUNCTIONS
@@ -697,6 +2063,21 @@ def get_donor_history(donor_id, page=1, per_page=5):
     conn.close()
     return history, total
 
+def get_donor_history_keyset(donor_id, per_page=5, after=None, before=None):
+    """
+    Keyset-paginated variant of get_donor_history() (newest first).
+    
+    Returns:
+        KeysetPage: Donation rows (id, units, donation_date, is_exchange) plus cursors.
+    """
+    return _fetch_keyset("""
+            SELECT id, units, donation_date, is_exchange 
+            FROM Donation_Completed
+        """, ["donor_id = ?"], [donor_id], 'donation_date', 'id', descending=True, per_page=per_page,
+        key=lambda row: (row.donation_date, row.id), after=after, before=before,
+        sort_param='CAST(? AS DATETIME)',
+        count=_count("SELECT COUNT(*) FROM Donation_Completed WHERE donor_id = ?", [donor_id]))
+
 def update_donor_profile(user_id, name, area_id, number, dob_str):
     """Updates donor profile details."""
     conn = get_db_connection()
@@ -709,12 +2090,17 @@ def update_donor_profile(user_id, name, area_id, number, dob_str):
             today = datetime.today().date()
             age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
             
-        cursor.execute("""
+        cursor.execute(f"""
             UPDATE Donor
             SET name = ?, area_id = ?, number = ?, DOB = ?, age = ?
+            {_DONOR_EVENT_OUTPUT}
             WHERE user_id = ?
         """, (name, area_id, number, dob, age, user_id))
+        donor_rows = cursor.fetchall()
+        for row in donor_rows:
+            index_donor_name(cursor, row.id, name)
         conn.commit()
+        _donors_changed(donor_rows)
         return True, None
     except Exception as e:
         conn.rollback()
@@ -727,14 +2113,16 @@ def toggle_donor_availability(user_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        cursor.execute(f"""
             UPDATE Donor 
             SET availability = CASE WHEN availability = 1 THEN 0 ELSE 1 END 
-            OUTPUT INSERTED.availability
+            {_DONOR_EVENT_OUTPUT}
             WHERE user_id = ?
         """, (user_id,))
-        new_status = cursor.fetchone()[0]
+        donor_rows = cursor.fetchall()
+        new_status = donor_rows[0].availability
         conn.commit()
+        _donors_changed(donor_rows)
         return True, new_status
     except Exception as e:
         conn.rollback()
@@ -742,15 +2130,39 @@ def toggle_donor_availability(user_id):
     finally:
         conn.close()
 
+def _eligible_from(donation_date):
+    """First day a donor may donate again after a donation on `donation_date` (30-day rule)."""
+    return donation_date.date() + timedelta(days=30)
+
+def _eligibility(eligible_from):
+    """
+    Applies the 30-day rule to a donor's Donor.eligible_from date (None if never donated).
+    
+    Returns:
+        (bool, int): (Is Eligible, Days Left)
+    """
+    if not eligible_from:
+        # No donations yet -> Eligible
+        return True, 0
+    
+    days_left = (eligible_from - datetime.now().date()).days
+    if days_left <= 0:
+        return True, 0
+    else:
+        # Still cooling down
+        return False, days_left
+
 def check_donor_eligibility(user_id):
     """
     Checks if a donor is eligible to donate based on the 30-day rule.
     Does NOT auto-update availability.
     
     LOGIC:
-    1. Fetch the last donation date for the donor.
-    2. Calculate days elapsed since then.
-    3. If < 30 days, return False and the remaining days.
+    1. Fetch the donor's eligible_from date (kept by submit_donation_transaction).
+    2. If it is still in the future, return False and the remaining days.
+    
+    QUERY: Single-row SELECT of Donor.eligible_from by user_id.
+    KEYWORDS: Eligibility, 30-Day Rule, Point Read
     
     Returns:
         (bool, int): (Is Eligible, Days Left)
@@ -758,36 +2170,11 @@ def check_donor_eligibility(user_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        # Get donor details
-        cursor.execute("SELECT id FROM Donor WHERE user_id = ?", (user_id,))
+        cursor.execute("SELECT eligible_from FROM Donor WHERE user_id = ?", (user_id,))
         row = cursor.fetchone()
         if not row: return False, 0
         
-        donor_id = row[0]
-        
-        # Check last donation date
-        cursor.execute("""
-            SELECT TOP 1 donation_date 
-            FROM Donation_Completed 
-            WHERE donor_id = ? 
-            ORDER BY donation_date DESC
-        """, (donor_id,))
-        last_donation_row = cursor.fetchone()
-        
-        if not last_donation_row:
-            # No donations yet -> Eligible
-            return True, 0
-            
-        last_date = last_donation_row[0].date()
-        today = datetime.now().date()
-        days_since = (today - last_date).days
-        
-        if days_since >= 30:
-            return True, 0
-        else:
-            # Still cooling down
-            days_left = 30 - days_since
-            return False, days_left
+        return _eligibility(row[0])
             
     except Exception as e:
         print(f"Error checking eligibility: {e}")
@@ -795,6 +2182,82 @@ def check_donor_eligibility(user_id):
     finally:
         conn.close()
 
+def get_donor_dashboard(user_id, page=1, per_page=5, notification_limit=5):
+    """
+    Loads everything the donor dashboard needs in a single round trip.
+    
+    QUERY: One batch returning multiple result sets (read with cursor.nextset()):
+           1. Donor profile with blood type string (eligible_from for the 30-day rule)
+           2. Total donations (history pagination)
+           3. Page of donation history (OFFSET-FETCH)
+           4. Latest notifications (TOP n)
+           5. Unread notification count ([User].unread_notifications counter)
+    KEYWORDS: Batch, Multiple Result Sets, Nextset, Dashboard, Round Trip
+    
+    Returns:
+        dict | None: donor, is_eligible, days_left, history, total, notifications, unread_count
+                     (None if the user has no donor profile)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    offset = (page - 1) * per_page
+    
+    cursor.execute(named_query('donor_dashboard', """
+        SET NOCOUNT ON;
+        DECLARE @user_id INT = ?;
+        DECLARE @donor_id INT = (SELECT id FROM Donor WHERE user_id = @user_id);
+        
+        SELECT d.*, bt.type as blood_type_str 
+        FROM Donor d
+        JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+        WHERE d.id = @donor_id;
+        
+        SELECT COUNT(*) as total
+        FROM Donation_Completed 
+        WHERE donor_id = @donor_id;
+        
+        SELECT units, donation_date, is_exchange 
+        FROM Donation_Completed 
+        WHERE donor_id = @donor_id 
+        ORDER BY donation_date DESC
+        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY;
+        
+        SELECT TOP (?) id, message, is_read, created_at, type
+        FROM Notifications
+        WHERE user_id = @user_id
+        ORDER BY created_at DESC;
+        
+        SELECT unread_notifications FROM [User] WHERE id = @user_id;
+    """), (user_id, offset, per_page, notification_limit))
+    
+    donor = cursor.fetchone()
+    if not donor:
+        conn.close()
+        return None
+    
+    cursor.nextset()
+    donation_stats = cursor.fetchone()
+    cursor.nextset()
+    history = cursor.fetchall()
+    cursor.nextset()
+    notifications = cursor.fetchall()
+    cursor.nextset()
+    unread_count = cursor.fetchone()[0]
+    _unread_counts().set(user_id, unread_count)
+    conn.close()
+    
+    is_eligible, days_left = _eligibility(donor.eligible_from)
+    
+    return {
+        'donor': donor,
+        'is_eligible': is_eligible,
+        'days_left': days_left,
+        'history': history,
+        'total': donation_stats.total,
+        'notifications': notifications,
+        'unread_count': unread_count,
+    }
+
 def mark_notification_read(notification_id, user_id=None):
     """
     Marks a notification as read.
@@ -892,16 +2355,99 @@ def get_recipient_requests(recipient_id, page=1, per_page=5):
     conn.close()
     return requests, total
 
+def get_recipient_requests_keyset(recipient_id, per_page=5, after=None, before=None):
+    """
+    Keyset-paginated variant of get_recipient_requests() (newest first).
+    
+    Returns:
+        KeysetPage: Request rows plus next/prev cursors and a lazily computed total.
+    """
+    return _fetch_keyset("""
+            SELECT * FROM Request
+        """, ["recipient_id = ?"], [recipient_id], 'date_requested', 'id', descending=True, per_page=per_page,
+        key=lambda row: (row.date_requested, row.id), after=after, before=before,
+        sort_param='CAST(? AS DATE)',
+        count=_count("SELECT COUNT(*) FROM Request WHERE recipient_id = ?", [recipient_id]))
+
+def get_recipient_dashboard(user_id, page=1, per_page=5, notification_limit=5):
+    """
+    Loads everything the recipient dashboard needs in a single round trip.
+    
+    QUERY: One batch returning multiple result sets (read with cursor.nextset()):
+           1. Recipient profile with blood type and area name
+           2. Total request count (pagination)
+           3. Page of requests (OFFSET-FETCH)
+           4. Latest notifications (TOP n)
+           5. Unread notification count ([User].unread_notifications counter)
+    KEYWORDS: Batch, Multiple Result Sets, Nextset, Dashboard, Round Trip
+    
+    Returns:
+        dict | None: recipient, requests, total, notifications, unread_count
+                     (None if the user has no recipient profile)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    offset = (page - 1) * per_page
+    
+    cursor.execute(named_query('recipient_dashboard', """
+        SET NOCOUNT ON;
+        DECLARE @user_id INT = ?;
+        DECLARE @recipient_id INT = (SELECT id FROM Recipient WHERE user_id = @user_id);
+        
+        SELECT r.*, bt.type as blood_type_str, a.name as area_name
+        FROM Recipient r
+        LEFT JOIN Blood_Type bt ON r.bloodtype = bt.bloodtype_id
+        LEFT JOIN Area a ON r.area_id = a.id
+        WHERE r.id = @recipient_id;
+        
+        SELECT COUNT(*) FROM Request WHERE recipient_id = @recipient_id;
+        
+        SELECT * FROM Request 
+        WHERE recipient_id = @recipient_id 
+        ORDER BY date_requested DESC
+        OFFSET ? ROWS FETCH NEXT ? ROWS ONLY;
+        
+        SELECT TOP (?) id, message, is_read, created_at, type
+        FROM Notifications
+        WHERE user_id = @user_id
+        ORDER BY created_at DESC;
+        
+        SELECT unread_notifications FROM [User] WHERE id = @user_id;
+    """), (user_id, offset, per_page, notification_limit))
+    
+    recipient = cursor.fetchone()
+    if not recipient:
+        conn.close()
+        return None
+    
+    cursor.nextset()
+    total = cursor.fetchone()[0]
+    cursor.nextset()
+    requests = cursor.fetchall()
+    cursor.nextset()
+    notifications = cursor.fetchall()
+    cursor.nextset()
+    unread_count = cursor.fetchone()[0]
+    _unread_counts().set(user_id, unread_count)
+    conn.close()
+    
+    return {
+        'recipient': recipient,
+        'requests': requests,
+        'total': total,
+        'notifications': notifications,
+        'unread_count': unread_count,
+    }
+
 def create_request_transaction(user_id, units, blood_type_id):
     """
     Creates a new blood request and notifies managers.
     
     QUERY: Transaction that validates limit (Max 4 units) and INSERTs a new Request.
+           Re-run on transient errors (run_transaction).
     KEYWORDS: Request, Limit, Validation, Insert, Transaction
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
+    def create_request(cursor):
         cursor.execute("SELECT id FROM Recipient WHERE user_id = ?", (user_id,))
         recipient_id = cursor.fetchone()[0]
         
@@ -913,29 +2459,59 @@ def create_request_transaction(user_id, units, blood_type_id):
             INSERT INTO Request (recipient_id, units_required, blood_type, status)
             VALUES (?, ?, ?, 'Pending')
         """, (recipient_id, units, blood_type_id))
-        
-        conn.commit()
         return True, None
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        conn.close()
+    
+    return run_transaction(create_request, 'create_request_transaction')
 
 # ==================================================================================
 # NOTIFICATION FUNCTIONS
 # ==================================================================================
 
+def insert_notification(cursor, user_id, message, type='General'):
+    """
+    Inserts a notification and bumps the recipient's unread counter on the caller's cursor.
+    Runs inside the caller's transaction; the caller commits and then calls _notifications_changed().
+    
+    QUERY: One batch - INSERT into Notifications + UPDATE [User].unread_notifications.
+    KEYWORDS: Notification, Counter, Denormalization, Insert, Update
+    """
+    cursor.execute("""
+        INSERT INTO Notifications (user_id, message, type)
+        VALUES (?, ?, ?);
+        
+        UPDATE [User]
+        SET unread_notifications = unread_notifications + 1
+        WHERE id = ?;
+    """, (user_id, message, type, user_id))
+
+def _unread_counts():
+    return current_app.extensions['unread_counts']
+
+def _unread_count_invalidator(cache):
+    """Broker listener: drops cached unread counts on every notification event, local or relayed."""
+    def invalidate(user_ids, event):
+        if user_ids is None:
+            cache.clear()
+        else:
+            cache.invalidate(*user_ids)
+    return invalidate
+
+def _notifications_changed(user_ids=None, event=None):
+    """
+    Post-commit hook for writes that change a user's notifications.
+    Publishes `event` for `user_ids` (None = every user, for broadcasts); the publish drops
+    their cached unread counts and wakes their open /notifications/stream connections.
+    """
+    notification_broker().publish(user_ids, event or read_event())
+
 def create_notification(user_id, message, type='General'):
     """Creates a single notification for a user."""
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            INSERT INTO Notifications (user_id, message, type)
-            VALUES (?, ?, ?)
-        """, (user_id, message, type))
+        insert_notification(cursor, user_id, message, type)
         conn.commit()
+        _notifications_changed([user_id], notification_event(message, type))
         return True, None
     except Exception as e:
         conn.rollback()
@@ -943,62 +2519,123 @@ def create_notification(user_id, message, type='General'):
     finally:
         conn.close()
 
-def broadcast_notification(target_role, message, blood_type=None):
+BroadcastResult = namedtuple('BroadcastResult', ['count', 'chunks', 'chunk_size', 'elapsed_ms'])
+
+def _broadcast_target_sql(target_role, blood_type=None):
+    """
+    Builds the target-user subquery of a broadcast (one user_id column, NULLs excluded).
+    
+    Returns:
+        (str, list) | None: (SELECT ... AS user_id, params), or None for an unknown role
+    """
+    if target_role == 'All':
+        return "SELECT id AS user_id FROM [User]", []
+    if target_role == 'Manager':
+        return "SELECT user_id FROM Manager WHERE user_id IS NOT NULL", []
+    if target_role in ('Donor', 'Recipient'):
+        # Blood type string -> id via the reference-data cache (no JOIN on Blood_Type)
+        sql = f"SELECT user_id FROM {target_role} WHERE user_id IS NOT NULL"
+        params = []
+        if blood_type:
+            sql += " AND bloodtype = ?"
+            params.append(get_blood_type_id(blood_type))
+        return sql, params
+    return None
+
+def count_broadcast_targets(target_role, blood_type=None):
+    """Returns how many users a broadcast would reach (progress total for broadcast jobs)."""
+    target = _broadcast_target_sql(target_role, blood_type)
+    if target is None:
+        return 0
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM ({target[0]}) t", target[1])
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def broadcast_notification(target_role, message, blood_type=None, chunk_size=None, start_after=0, on_chunk=None):
     """
     Broadcasts a notification to a group of users.
     target_role: 'All', 'Donor', 'Recipient', 'Manager'
     blood_type: Optional filter for Donors/Recipients (e.g., 'A+')
     
-    QUERY: Bulk INSERT using executemany() for efficiency. Selects target user IDs based on role/blood type.
-    KEYWORDS: Broadcast, Bulk Insert, Notification, Filtering, Efficiency
+    QUERY: Set-based INSERT INTO Notifications ... SELECT TOP (chunk) from the role/blood-type
+           filter, entirely server-side (no user IDs travel to Python). The inserted user IDs are
+           captured with OUTPUT INTO a table variable to bump their unread counters in the same batch.
+           Chunks walk the target set in user_id order and commit one by one, so a large
+           broadcast never holds one long transaction.
+    KEYWORDS: Broadcast, INSERT...SELECT, OUTPUT, @@ROWCOUNT, Chunking, Notification, Counter
+    
+    Args:
+        chunk_size (int): Users per chunk/transaction (default: BROADCAST_CHUNK_SIZE config).
+        start_after (int): Resume after this user_id (the last one of a committed chunk).
+        on_chunk (callable): on_chunk(cursor, count, last_user_id) runs inside each chunk's
+                             transaction, before its commit (e.g. to checkpoint a job).
+    
+    Returns:
+        (bool, BroadcastResult | str): (Success, count/chunks/chunk_size/elapsed_ms or Error Message)
     """
+    target = _broadcast_target_sql(target_role, blood_type)
+    if target is None:
+        return True, BroadcastResult(0, 0, 0, 0.0)
+    target_sql, target_params = target
+    chunk_size = chunk_size or current_app.config.get('BROADCAST_CHUNK_SIZE', 5000)
+    
     conn = get_db_connection()
     cursor = conn.cursor()
+    started = time.perf_counter()
+    count, chunks, last_user_id = 0, 0, start_after
     try:
-        user_ids = []
-        
-        if target_role == 'All':
-            cursor.execute("SELECT id FROM [User]")
-            user_ids = [row[0] for row in cursor.fetchall()]
-            
-        elif target_role == 'Manager':
-            cursor.execute("SELECT user_id FROM Manager")
-            user_ids = [row[0] for row in cursor.fetchall()]
-            
-        elif target_role == 'Donor':
-            sql = "SELECT user_id FROM Donor d JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id WHERE 1=1"
-            p = []
-            if blood_type:
-                sql += " AND bt.type = ?"
-                p.append(blood_type)
-            cursor.execute(sql, p)
-            user_ids = [row[0] for row in cursor.fetchall()]
+        while True:
+            cursor.execute(named_query('broadcast_chunk', """
+                SET NOCOUNT ON;
+                DECLARE @chunk_size INT = ?, @message NVARCHAR(MAX) = ?, @after INT = ?;
+                DECLARE @sent TABLE (user_id INT PRIMARY KEY);
+                DECLARE @inserted INT;
+                
+                INSERT INTO Notifications (user_id, message, type)
+                OUTPUT inserted.user_id INTO @sent
+                SELECT TOP (@chunk_size) t.user_id, @message, 'Broadcast'
+                FROM ({target_sql}) t
+                WHERE t.user_id > @after
+                ORDER BY t.user_id;
+                SET @inserted = @@ROWCOUNT;
+                
+                UPDATE u
+                SET unread_notifications = u.unread_notifications + 1
+                FROM [User] u
+                JOIN @sent s ON s.user_id = u.id;
+                
+                SELECT @inserted, (SELECT MAX(user_id) FROM @sent);
+            """).format(target_sql=target_sql), [chunk_size, message, last_user_id] + target_params)
+            inserted, max_user_id = cursor.fetchone()
+            if not inserted:
+                conn.commit()
+                break
             
-        elif target_role == 'Recipient':
-            sql = "SELECT user_id FROM Recipient r JOIN Blood_Type bt ON r.bloodtype = bt.bloodtype_id WHERE 1=1"
-            p = []
-            if blood_type:
-                sql += " AND bt.type = ?"
-                p.append(blood_type)
-            cursor.execute(sql, p)
-            user_ids = [row[0] for row in cursor.fetchall()]
-
-        # Bulk Insert
-        if user_ids:
-            insert_data = [(uid, message, 'Broadcast') for uid in user_ids if uid is not None]
-            if insert_data:
-                cursor.executemany("""
-                    INSERT INTO Notifications (user_id, message, type)
-                    VALUES (?, ?, ?)
-                """, insert_data)
+            if on_chunk:
+                on_chunk(cursor, count + inserted, max_user_id)
+            conn.commit()
+            count += inserted
+            chunks += 1
+            last_user_id = max_user_id
+            if inserted < chunk_size:
+                break
         
-        conn.commit()
-        return True, len(user_ids)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        current_app.logger.info("broadcast to %s: %d notification(s) in %d chunk(s) of %d, %.0f ms",
+                                target_role, count, chunks, chunk_size, elapsed_ms)
+        return True, BroadcastResult(count, chunks, chunk_size, elapsed_ms)
     except Exception as e:
         conn.rollback()
+        if count:
+            return False, f"{e} (after {count} notification(s) in {chunks} committed chunk(s))"
         return False, str(e)
     finally:
         conn.close()
+        if count:
+            _notifications_changed(None, notification_event(message, 'Broadcast'))
 
 def get_user_notifications(user_id, page=1, per_page=10):
     """
@@ -1025,30 +2662,73 @@ def get_user_notifications(user_id, page=1, per_page=10):
     conn.close()
     return notifications, total
 
+def get_user_notifications_keyset(user_id, per_page=10, after=None, before=None):
+    """
+    Keyset-paginated variant of get_user_notifications() (newest first).
+    
+    QUERY: Seek on (created_at, id) DESC instead of OFFSET-FETCH plus a separate COUNT(*).
+    KEYWORDS: Notification, Keyset Pagination, Seek, Cursor
+    
+    Returns:
+        KeysetPage: Notification rows plus next/prev cursors and a lazily computed total.
+    """
+    return _fetch_keyset("""
+            SELECT id, message, is_read, created_at, type
+            FROM Notifications
+        """, ["user_id = ?"], [user_id], 'created_at', 'id', descending=True, per_page=per_page,
+        key=lambda row: (row.created_at, row.id), after=after, before=before,
+        sort_param='CAST(? AS DATETIME)',
+        count=_count("SELECT COUNT(*) FROM Notifications WHERE user_id = ?", [user_id]))
+
 def get_unread_notification_count(user_id):
-    """Returns the count of unread notifications."""
+    """
+    Returns the count of unread notifications.
+    
+    QUERY: Point read of the denormalized [User].unread_notifications counter (PK seek),
+           served from a short-TTL in-process cache on repeat page loads.
+    KEYWORDS: Notification, Counter, Cache, Point Read
+    """
+    count = _unread_counts().get(user_id)
+    if count is not None:
+        return count
+    
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("""
-        SELECT COUNT(*) 
-        FROM Notifications 
-        WHERE user_id = ? AND is_read = 0
-    """, (user_id,))
-    count = cursor.fetchone()[0]
+    cursor.execute("SELECT unread_notifications FROM [User] WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
     conn.close()
+    count = row[0] if row else 0
+    _unread_counts().set(user_id, count)
     return count
 
 def mark_notification_read(notification_id, user_id):
-    """Marks a specific notification as read."""
+    """
+    Marks a specific notification as read.
+    
+    QUERY: One batch - UPDATE only if still unread, then decrement the counter by @@ROWCOUNT.
+    KEYWORDS: Notification, Counter, Update, @@ROWCOUNT
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        cursor.execute(named_query('mark_notification_read', """
+            SET NOCOUNT ON;
+            DECLARE @user_id INT = ?;
+            DECLARE @marked INT;
+            
             UPDATE Notifications 
             SET is_read = 1 
-            WHERE id = ? AND user_id = ?
-        """, (notification_id, user_id))
+            WHERE id = ? AND user_id = @user_id AND is_read = 0;
+            SET @marked = @@ROWCOUNT;
+            
+            IF @marked > 0
+                UPDATE [User]
+                SET unread_notifications = CASE WHEN unread_notifications > @marked
+                                                THEN unread_notifications - @marked ELSE 0 END
+                WHERE id = @user_id;
+        """), (user_id, notification_id))
         conn.commit()
+        _notifications_changed([user_id], read_event())
         return True, None
     except Exception as e:
         conn.rollback()
@@ -1057,16 +2737,358 @@ def mark_notification_read(notification_id, user_id):
         conn.close()
 
 def mark_all_notifications_read(user_id):
-    """Marks all notifications for a user as read."""
+    """
+    Marks all notifications for a user as read.
+    
+    QUERY: One batch - UPDATE the unread rows only, then decrement the counter by @@ROWCOUNT
+           (not reset to 0, so a notification inserted concurrently stays counted).
+    KEYWORDS: Notification, Counter, Update, @@ROWCOUNT
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
+        cursor.execute(named_query('mark_all_notifications_read', """
+            SET NOCOUNT ON;
+            DECLARE @user_id INT = ?;
+            DECLARE @marked INT;
+            
             UPDATE Notifications 
             SET is_read = 1 
-            WHERE user_id = ?
-        """, (user_id,))
+            WHERE user_id = @user_id AND is_read = 0;
+            SET @marked = @@ROWCOUNT;
+            
+            IF @marked > 0
+                UPDATE [User]
+                SET unread_notifications = CASE WHEN unread_notifications > @marked
+                                                THEN unread_notifications - @marked ELSE 0 END
+                WHERE id = @user_id;
+        """), (user_id,))
+        conn.commit()
+        _notifications_changed([user_id], read_event())
+        return True, None
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+# ==================================================================================
+# JOB QUEUE FUNCTIONS (Jobs table, see Database/migrations/005_jobs.sql)
+# ==================================================================================
+
+Job = namedtuple('Job', ['id', 'kind', 'payload', 'attempts', 'max_attempts', 'progress_done', 'checkpoint'])
+
+def insert_job(cursor, kind, payload, idempotency_key=None, max_attempts=5, run_after=None):
+    """
+    Enqueues a job on the caller's cursor, inside the caller's transaction, so the job exists
+    if and only if the surrounding work commits. The caller commits and then calls _jobs_enqueued().
+    A run_after datetime defers the job (e.g. the next daily stock expiry sweep); None runs it now.
+    
+    QUERY: Idempotent insert - an existing row with the same idempotency_key (locked with
+           UPDLOCK, HOLDLOCK against a concurrent enqueue) is returned instead of a new one.
+    KEYWORDS: Job Queue, Outbox, Idempotency, Insert, SCOPE_IDENTITY
+    
+    Returns:
+        (int, bool): (job id, True if newly created)
+    """
+    cursor.execute(named_query('insert_job', """
+        SET NOCOUNT ON;
+        DECLARE @key NVARCHAR(200) = ?;
+        DECLARE @job_id INT = (SELECT id FROM Jobs WITH (UPDLOCK, HOLDLOCK) WHERE idempotency_key = @key);
+        DECLARE @created BIT = 0;
+        
+        IF @job_id IS NULL
+        BEGIN
+            INSERT INTO Jobs (kind, payload, idempotency_key, max_attempts, run_after)
+            VALUES (?, ?, @key, ?, ISNULL(?, GETDATE()));
+            SET @job_id = SCOPE_IDENTITY();
+            SET @created = 1;
+        END
+        
+        SELECT @job_id, @created;
+    """), (idempotency_key, kind, json.dumps(payload), max_attempts, run_after))
+    job_id, created = cursor.fetchone()
+    return job_id, bool(created)
+
+def _jobs_enqueued():
+    """Post-commit hook: wakes this process's job workers instead of waiting for their next poll."""
+    workers = current_app.extensions.get('job_workers')
+    if workers:
+        workers.wake()
+
+def enqueue_job(kind, payload, idempotency_key=None, max_attempts=5, run_after=None):
+    """
+    Enqueues a standalone job (e.g. a manager's broadcast).
+    
+    Returns:
+        (bool, int | str): (Success, job id or Error Message)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        job_id, created = insert_job(cursor, kind, payload, idempotency_key, max_attempts, run_after)
+        conn.commit()
+        if created:
+            _jobs_enqueued()
+        return True, job_id
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def claim_job(worker_id, lease_seconds=300):
+    """
+    Claims the next runnable job for a worker.
+    
+    QUERY: UPDATE TOP (1) through a CTE with (ROWLOCK, UPDLOCK, READPAST): concurrent workers
+           skip rows another worker is claiming instead of blocking on them. Running jobs whose
+           lease (run_after) has lapsed are reclaimed. OUTPUT returns the claimed row.
+    KEYWORDS: Job Queue, READPAST, UPDLOCK, OUTPUT, Lease
+    
+    Returns:
+        Job | None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(named_query('claim_job', """
+            SET NOCOUNT ON;
+            WITH next_job AS (
+                SELECT TOP (1) *
+                FROM Jobs WITH (ROWLOCK, UPDLOCK, READPAST)
+                WHERE status IN ('Queued', 'Running') AND run_after <= GETDATE()
+                ORDER BY run_after, id
+            )
+            UPDATE next_job
+            SET status = 'Running',
+                attempts = attempts + 1,
+                locked_by = ?,
+                run_after = DATEADD(SECOND, ?, GETDATE()),
+                updated_at = GETDATE()
+            OUTPUT inserted.id, inserted.kind, inserted.payload, inserted.attempts,
+                   inserted.max_attempts, inserted.progress_done, inserted.checkpoint;
+        """), (worker_id, lease_seconds))
+        row = cursor.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    
+    if not row:
+        return None
+    return Job(row.id, row.kind, json.loads(row.payload), row.attempts, row.max_attempts,
+               row.progress_done, json.loads(row.checkpoint) if row.checkpoint else None)
+
+def save_job_progress(cursor, job_id, done, total=None, checkpoint=None, lease_seconds=300):
+    """
+    Records progress (and optional resume checkpoint) on the caller's cursor, in the same
+    transaction as the work it describes, and extends the job's lease.
+    """
+    cursor.execute("""
+        UPDATE Jobs
+        SET progress_done = ?,
+            progress_total = COALESCE(?, progress_total),
+            checkpoint = COALESCE(?, checkpoint),
+            run_after = DATEADD(SECOND, ?, GETDATE()),
+            updated_at = GETDATE()
+        WHERE id = ? AND status = 'Running'
+    """, (done, total, json.dumps(checkpoint) if checkpoint is not None else None, lease_seconds, job_id))
+
+def mark_job_done(cursor, job_id, result=None):
+    """Marks a running job Done on the caller's cursor (no-op if it already finished)."""
+    cursor.execute("""
+        UPDATE Jobs
+        SET status = 'Done',
+            result = ?,
+            progress_done = CASE WHEN progress_total IS NULL THEN progress_done ELSE progress_total END,
+            locked_by = NULL,
+            updated_at = GETDATE(),
+            finished_at = GETDATE()
+        WHERE id = ? AND status = 'Running'
+    """, (json.dumps(result) if result is not None else None, job_id))
+
+def complete_job(job_id, result=None):
+    """Marks a job Done after its handler returned."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        mark_job_done(cursor, job_id, result)
+        conn.commit()
+        return True, None
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def fail_job(job_id, error, retry_delay):
+    """
+    Records a failed attempt: the job is re-queued after `retry_delay` seconds,
+    or marked Failed once it has used up max_attempts.
+    
+    Returns:
+        (bool, str): (Success, new status or Error Message)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SET NOCOUNT ON;
+            UPDATE Jobs
+            SET status = CASE WHEN attempts >= max_attempts THEN 'Failed' ELSE 'Queued' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN GETDATE() END,
+                run_after = DATEADD(SECOND, ?, GETDATE()),
+                last_error = ?,
+                locked_by = NULL,
+                updated_at = GETDATE()
+            WHERE id = ?;
+            
+            SELECT status FROM Jobs WHERE id = ?;
+        """, (retry_delay, error, job_id, job_id))
+        status = cursor.fetchone()[0]
+        conn.commit()
+        return True, status
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def get_job(job_id):
+    """Returns one job's status and progress row (None if unknown)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, kind, status, attempts, max_attempts, progress_done, progress_total,
+               result, last_error, created_at, finished_at
+        FROM Jobs
+        WHERE id = ?
+    """, (job_id,))
+    job = cursor.fetchone()
+    conn.close()
+    return job
+
+def get_recent_jobs(limit=10, kinds=None):
+    """
+    Returns the most recent jobs, newest first (manager dashboard progress panel).
+    
+    QUERY: SELECT TOP (n) ... ORDER BY id DESC (clustered index, backwards scan of n rows).
+    KEYWORDS: Job Queue, Progress, TOP
+    """
+    sql = """
+        SELECT TOP (?) id, kind, status, attempts, max_attempts, progress_done, progress_total,
+               result, last_error, created_at, finished_at
+        FROM Jobs
+    """
+    params = [limit]
+    if kinds:
+        sql += f" WHERE kind IN ({', '.join('?' for _ in kinds)})"
+        params.extend(kinds)
+    sql += " ORDER BY id DESC"
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    jobs = cursor.fetchall()
+    conn.close()
+    return jobs
+
+def deliver_notification(job_id, user_id, message, type='General'):
+    """
+    Runs a queued single-user notification: inserts it and marks its job Done in one
+    transaction, so a retried job never delivers the same notification twice.
+    
+    QUERY: Notification INSERT + unread counter UPDATE + Jobs UPDATE, one commit.
+    KEYWORDS: Job Queue, Notification, Idempotency, Transaction
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        mark_job_done(cursor, job_id)
+        if cursor.rowcount == 0:
+            # Another attempt already delivered it (e.g. after a lapsed lease)
+            conn.rollback()
+            return True, None
+        insert_notification(cursor, user_id, message, type)
+        conn.commit()
+        _notifications_changed([user_id], notification_event(message, type))
+        return True, None
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def notify_matched_donors(job_id, donor_ids, message, type='General'):
+    """
+    Runs a queued donor-match notification: notifies the matched donors who are still
+    available and marks the job Done in one transaction (exactly once, like deliver_notification).
+    
+    QUERY: SELECT Donor.user_id by id list + notification INSERT / counter UPDATE per donor
+           + Jobs UPDATE, one commit.
+    KEYWORDS: Job Queue, Notification, Donor Matching, Transaction
+    
+    Returns:
+        tuple: (True, None) or (False, error)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        mark_job_done(cursor, job_id)
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return True, None
+        user_ids = []
+        if donor_ids:
+            placeholders = ', '.join('?' * len(donor_ids))
+            cursor.execute(f"SELECT user_id FROM Donor WHERE id IN ({placeholders}) AND availability = 1",
+                           list(donor_ids))
+            user_ids = [row[0] for row in cursor.fetchall()]
+        for user_id in user_ids:
+            insert_notification(cursor, user_id, message, type)
+        conn.commit()
+        _notifications_changed(user_ids, notification_event(message, type))
+        return True, None
+    except Exception as e:
+        conn.rollback()
+        return False, str(e)
+    finally:
+        conn.close()
+
+def deliver_notifications(job_id, user_ids, message, type='General'):
+    """
+    Runs a queued notification_batch job: one message to many users (e.g. the donors of a
+    donation batch), delivered and marked Done in one transaction, exactly once.
+    
+    QUERY: INSERT INTO Notifications ... SELECT by id list + one unread counter UPDATE
+           + Jobs UPDATE, one commit.
+    KEYWORDS: Job Queue, Notification, Bulk Insert, Counter, Transaction
+    
+    Returns:
+        tuple: (True, None) or (False, error)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        mark_job_done(cursor, job_id)
+        if cursor.rowcount == 0:
+            conn.rollback()
+            return True, None
+        if user_ids:
+            placeholders = ', '.join('?' * len(user_ids))
+            cursor.execute(f"""
+                INSERT INTO Notifications (user_id, message, type)
+                SELECT id, ?, ? FROM [User] WHERE id IN ({placeholders});
+                
+                UPDATE [User]
+                SET unread_notifications = unread_notifications + 1
+                WHERE id IN ({placeholders});
+            """, [message, type] + list(user_ids) + list(user_ids))
         conn.commit()
+        _notifications_changed(list(user_ids), notification_event(message, type))
         return True, None
     except Exception as e:
         conn.rollback()
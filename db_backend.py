@@ -0,0 +1,242 @@
+import re
+import threading
+
+# ==================================================================================
+# STORAGE BACKENDS (SQL dialects)
+# ==================================================================================
+# db.py is written in T-SQL and talks DB-API (connection.cursor(), cursor.execute(sql,
+# params), fetchone/fetchall/nextset, commit/rollback). A Dialect opens connections for
+# the pool and is the one place that knows which engine sits behind them:
+#
+#   mssql   SQL Server through pyodbc (production). Queries run exactly as written.
+#   sqlite  A local SQLite file (sqlite_backend.py) for profiling and load tests on one
+#           box. Its connections translate the portable subset of T-SQL on the fly.
+#
+# Batches that lean on T-SQL specifics (table variables, MERGE, OUTPUT INTO, locking
+# hints) are tagged in db.py with named_query(); a dialect can register a hand-tuned
+# replacement for any name with register_query(). The same mechanism serves per-dialect
+# tuning of an otherwise portable query.
+
+class Dialect:
+    """
+    Base class for a storage backend.
+
+    Attributes:
+        name (str): Registry key ('mssql', 'sqlite').
+        error_types (tuple): Driver exception classes after which a connection is discarded.
+    """
+
+    name = None
+    error_types = ()
+
+    def connect(self):
+        """Opens a new DB-API connection (called by the pool only)."""
+        raise NotImplementedError
+
+    def describe(self):
+        """Short human-readable target description for logs and diagnostics."""
+        return self.name
+
+    def classify_error(self, exc):
+        """
+        Whether a failed transaction can simply be run again (db.run_transaction).
+
+        Returns:
+            str | None: 'deadlock', 'lock_timeout', 'snapshot_conflict', 'unavailable' or
+                        'connection' (the connection is broken and must be replaced), or
+                        None for errors a retry cannot fix (constraint violations, bad SQL...).
+        """
+        return None
+
+
+# Native SQL Server errors after which the rolled-back transaction can run again
+MSSQL_RETRYABLE_ERRORS = {
+    1205: 'deadlock',            # chosen as deadlock victim
+    1222: 'lock_timeout',        # lock request time out period exceeded (SET LOCK_TIMEOUT)
+    3960: 'snapshot_conflict',   # snapshot isolation update conflict
+    40197: 'unavailable',        # service error processing the request (failover)
+    40501: 'unavailable',        # service is busy
+    40613: 'unavailable',        # database not currently available
+}
+# SQLSTATEs of the same classes when no native number matches
+MSSQL_RETRYABLE_SQLSTATES = {
+    '40001': 'deadlock',         # serialization failure
+    '08S01': 'connection',       # communication link failure
+    '08001': 'connection',       # client unable to establish connection
+    '08007': 'connection',       # connection failure during transaction
+}
+_NATIVE_ERROR = re.compile(r'\((\d{4,5})\)')
+
+
+class SqlServerDialect(Dialect):
+    """
+    SQL Server through pyodbc; T-SQL is executed as written.
+
+    Args:
+        conn_str (str): ODBC connection string.
+        isolation (str): Session isolation level set on every new connection (e.g. 'SNAPSHOT'
+                         for the reporting read pool); None keeps the server default.
+    """
+
+    name = 'mssql'
+
+    def __init__(self, conn_str, isolation=None):
+        self.conn_str = conn_str
+        self.isolation = isolation
+
+    @property
+    def error_types(self):
+        import pyodbc
+        return (pyodbc.Error,)
+
+    def connect(self):
+        # Imported lazily so the SQLite backend runs without an ODBC driver installed
+        import pyodbc
+        conn = pyodbc.connect(self.conn_str)
+        if self.isolation:
+            # Session-wide: every later transaction on this connection runs at this level
+            cursor = conn.cursor()
+            cursor.execute(f'SET TRANSACTION ISOLATION LEVEL {self.isolation}')
+            cursor.close()
+        return conn
+
+    def classify_error(self, exc):
+        import pyodbc
+        if not isinstance(exc, pyodbc.Error):
+            return None
+        # pyodbc puts the SQLSTATE first and the native error number in parentheses in the message
+        for number in _NATIVE_ERROR.findall(str(exc.args[-1]) if exc.args else ''):
+            reason = MSSQL_RETRYABLE_ERRORS.get(int(number))
+            if reason:
+                return reason
+        return MSSQL_RETRYABLE_SQLSTATES.get(exc.args[0] if exc.args else None)
+
+    def describe(self):
+        server = [part for part in self.conn_str.split(';') if part.lower().startswith(('server=', 'database='))]
+        if self.isolation:
+            server.append(self.isolation)
+        return 'mssql (' + ', '.join(server) + ')'
+
+
+DEFAULT_CONNECTION_STRING = \
+    'Driver={ODBC Driver 17 for SQL Server};Server=localhost;Database=BloodLink;Trusted_Connection=yes;'
+
+def create_dialect(config):
+    """
+    Builds the dialect selected by DB_BACKEND ('mssql' by default, or 'sqlite').
+
+    Args:
+        config (dict-like): App config (DB_CONNECTION_STRING, SQLITE_PATH, SQLITE_BUSY_TIMEOUT).
+    """
+    backend = (config.get('DB_BACKEND') or 'mssql').lower()
+    if backend == 'mssql':
+        return SqlServerDialect(config.get('DB_CONNECTION_STRING', DEFAULT_CONNECTION_STRING))
+    if backend == 'sqlite':
+        from sqlite_backend import SqliteDialect
+        return SqliteDialect(config.get('SQLITE_PATH') or 'bloodlink.db',
+                             busy_timeout=config.get('SQLITE_BUSY_TIMEOUT', 30.0))
+    raise ValueError(f"Unknown DB_BACKEND {backend!r} (expected 'mssql' or 'sqlite')")
+
+
+# Where the reporting reads of the manager pages run (db.get_read_connection)
+READ_MODES = ('primary', 'snapshot', 'replica')
+
+def create_read_dialect(config):
+    """
+    Builds the dialect of the separate read pool selected by DB_READ_MODE, or returns None
+    for 'primary' (reads share the request's connection to the primary, as writes do).
+
+      snapshot  SQL Server: connections to the primary at SNAPSHOT isolation, so reads see
+                the last committed row versions instead of waiting on writers' locks
+                (needs ALLOW_SNAPSHOT_ISOLATION ON, see README).
+      replica   SQL Server: connections to DB_READ_CONNECTION_STRING, e.g. a readable
+                secondary (ApplicationIntent=ReadOnly); reads may lag the primary.
+    On SQLite both open read-only connections to the same file, each reading from one
+    WAL snapshot per helper (see SqliteDialect).
+
+    Args:
+        config (dict-like): App config (DB_READ_MODE, DB_READ_CONNECTION_STRING and the
+                            settings create_dialect reads).
+    """
+    mode = (config.get('DB_READ_MODE') or 'primary').lower()
+    if mode not in READ_MODES:
+        raise ValueError(f"Unknown DB_READ_MODE {mode!r} (expected one of {', '.join(READ_MODES)})")
+    if mode == 'primary':
+        return None
+    backend = (config.get('DB_BACKEND') or 'mssql').lower()
+    if backend == 'mssql':
+        if mode == 'snapshot':
+            return SqlServerDialect(config.get('DB_CONNECTION_STRING', DEFAULT_CONNECTION_STRING),
+                                    isolation='SNAPSHOT')
+        if not config.get('DB_READ_CONNECTION_STRING'):
+            raise ValueError("DB_READ_MODE 'replica' needs DB_READ_CONNECTION_STRING")
+        return SqlServerDialect(config['DB_READ_CONNECTION_STRING'])
+    if backend == 'sqlite':
+        from sqlite_backend import SqliteDialect
+        return SqliteDialect(config.get('SQLITE_PATH') or 'bloodlink.db',
+                             busy_timeout=config.get('SQLITE_BUSY_TIMEOUT', 30.0), read_only=True)
+    raise ValueError(f"Unknown DB_BACKEND {backend!r} (expected 'mssql' or 'sqlite')")
+
+
+# ==================================================================================
+# NAMED QUERIES
+# ==================================================================================
+
+class NamedQuery(str):
+    """
+    SQL text tagged with a registry name. Behaves as the plain (T-SQL) string everywhere,
+    so drivers that know nothing about names just run it.
+
+    `format(**kwargs)` fills {placeholders} and remembers the arguments, so a dialect's
+    replacement template can be filled with the same values.
+    """
+
+    def __new__(cls, name, sql, fields=None):
+        query = super().__new__(cls, sql)
+        query.name = name
+        query.fields = fields or {}
+        return query
+
+    def format(self, **fields):
+        return NamedQuery(self.name, str.format(self, **fields), fields)
+
+
+class QueryOverride:
+    """
+    A dialect's replacement for a named query.
+
+    Args:
+        sql (str): Replacement text, in the dialect's own syntax. May contain {fields}
+                   filled from NamedQuery.format().
+        params (tuple[str]): Names for the leading positional parameters the caller passes,
+                             referenced as :name in `sql`. Parameters beyond these are bound,
+                             in order, to plain ? placeholders.
+    """
+
+    def __init__(self, sql, params=()):
+        self.sql = sql
+        self.params = tuple(params)
+
+    def __repr__(self):
+        return f'QueryOverride(params={self.params!r})'
+
+
+_OVERRIDES = {}
+_lock = threading.Lock()
+
+def named_query(name, sql):
+    """Tags `sql` so dialects can replace it (see register_query)."""
+    return NamedQuery(name, sql)
+
+def register_query(dialect, name, sql, params=()):
+    """Registers `dialect`'s replacement for the query tagged `name`."""
+    with _lock:
+        _OVERRIDES[(dialect, name)] = QueryOverride(sql, params)
+
+def query_override(dialect, name):
+    """Returns the QueryOverride registered for (dialect, name), or None."""
+    return _OVERRIDES.get((dialect, name))
+
+def registered_queries(dialect):
+    """Names with a replacement registered for `dialect`."""
+    return sorted(name for d, name in _OVERRIDES if d == dialect)
@@ -0,0 +1,238 @@
+import threading
+import time
+from collections import deque
+
+# ==================================================================================
+# CONNECTION POOL
+# ==================================================================================
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the configured timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of database connections.
+
+    LOGIC:
+    1. Idle connections are kept in a LIFO stack so the warmest connection is reused first.
+    2. Checkout blocks (up to `timeout` seconds) once `max_size` connections are in use.
+    3. Connections idle longer than `max_idle` seconds are closed instead of reused.
+    4. Connections idle longer than `health_check_interval` seconds are pinged before use;
+       broken ones are discarded and replaced transparently.
+
+    Args:
+        connect (callable): Zero-argument factory returning a new DB-API connection.
+        max_size (int): Maximum number of open connections (in use + idle).
+        timeout (float): Seconds to wait for a free connection before raising PoolTimeout.
+        max_idle (float): Seconds an idle connection may live before it is evicted.
+        health_check_interval (float): Idle seconds after which a connection is pinged on checkout.
+        health_check_query (str): Cheap statement used as the ping.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=10.0, max_idle=300.0,
+                 health_check_interval=30.0, health_check_query="SELECT 1"):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, returned_at)
+        self._in_use = 0
+        self._closed = False
+
+        # Counters for sizing the pool
+        self._created = 0
+        self._evicted = 0
+        self._broken = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _open_count(self):
+        return self._in_use + len(self._idle)
+
+    def _evict_stale(self, now):
+        """Closes idle connections past max_idle. Caller must hold the lock."""
+        stale = []
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            stale.append(self._idle.popleft()[0])
+        self._evicted += len(stale)
+        return stale
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """
+        Checks out a connection, opening a new one if the pool has capacity.
+        Raises PoolTimeout if none becomes available within `timeout` seconds.
+        """
+        waited_from = None
+        deadline = None
+
+        while True:
+            conn = None
+            idle_for = 0.0
+            reserved = False
+            timed_out = False
+
+            with self._lock:
+                now = time.monotonic()
+                stale = self._evict_stale(now)
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    idle_for = now - returned_at
+                    reserved = True
+                elif self._open_count() < self.max_size:
+                    reserved = True
+                else:
+                    # Pool exhausted: wait for a release
+                    if waited_from is None:
+                        waited_from = now
+                        deadline = now + self.timeout
+                        self._waits += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        timed_out = True
+                    else:
+                        self._lock.wait(remaining)
+
+                if reserved:
+                    self._in_use += 1
+                    self._checkouts += 1
+                if (reserved or timed_out) and waited_from is not None:
+                    self._wait_time += now - waited_from
+
+            # Network work happens outside the lock
+            _close_all(stale)
+            if timed_out:
+                raise PoolTimeout(
+                    f"Timed out after {self.timeout}s waiting for a database connection "
+                    f"(max {self.max_size})."
+                )
+            if not reserved:
+                continue
+
+            if conn is not None and idle_for >= self.health_check_interval and not self._is_healthy(conn):
+                _close_all([conn])
+                conn = None
+                with self._lock:
+                    self._broken += 1
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                with self._lock:
+                    self._created += 1
+
+            return conn
+
+    def release(self, conn, discard=False):
+        """Returns a connection to the pool. Pass discard=True to close it instead (e.g. after an error)."""
+        if not discard:
+            try:
+                conn.rollback()  # Never hand an open transaction to the next borrower
+            except Exception:
+                discard = True
+
+        if discard or self._closed:
+            _close_all([conn])
+            with self._lock:
+                if discard:
+                    self._broken += 1
+            self._release_slot()
+            return
+
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def _release_slot(self):
+        with self._lock:
+            self._in_use -= 1
+            self._lock.notify()
+
+    def close(self):
+        """Closes every idle connection. Connections still checked out are closed on release."""
+        with self._lock:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._closed = True
+        _close_all(idle)
+
+    def stats(self):
+        """
+        Returns a snapshot of pool usage counters.
+
+        Returns:
+            dict: max_size, in_use, idle, created, evicted, broken, checkouts,
+                  waits, wait_time (total seconds), avg_wait_ms, timeouts
+        """
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'evicted': self._evicted,
+                'broken': self._broken,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time': round(self._wait_time, 6),
+                'avg_wait_ms': round(self._wait_time * 1000 / self._waits, 3) if self._waits else 0.0,
+                'timeouts': self._timeouts,
+            }
+
+
+class PooledConnection:
+    """
+    Request-scoped handle around a pooled connection.
+
+    db.py helpers call conn.close() when they are done. For a shared request connection
+    that must not hand the connection back yet, so close() only closes the cursors opened
+    through this handle and rolls back uncommitted work (matching what closing a real
+    connection did). The connection is returned to the pool once, at app-context teardown.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursors = []
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        self._cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        _close_all(self._cursors)
+        self._cursors = []
+        self._conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _close_all(conns):
+    for conn in conns:
+        try:
+            conn.close()
+        except Exception:
+            pass
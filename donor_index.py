@@ -0,0 +1,563 @@
+import logging
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, namedtuple
+from datetime import date, datetime
+from heapq import heappop, heappush, heapreplace
+
+from flask import current_app
+
+import donor_matching
+import donor_search
+from notification_events import NotificationBroker
+
+# ==================================================================================
+# IN-MEMORY DONOR INDEX (manager donor lookup and donor matching)
+# ==================================================================================
+# A process-local copy of what donor lookup and matching need - id, name words, blood
+# type, area, availability and day of the last donation - so typeahead queries and
+# request matching (donor_matching.py) never touch the database. Each donor is one
+# "slot" in parallel arrays (array module: machine ints, no per-donor Python objects);
+# names live in one UTF-8 bytearray. Name words use the same tokenizer and scoring as
+# the database index (donor_search.py): a vocabulary, the trigrams of each word and,
+# per word, an array of slots in ascending order. For matching, donors are also kept
+# in one bucket per (blood type, area), ordered by last donation: every donor in a
+# bucket shares compatibility and proximity, so the best of a bucket come first and the
+# top K over all buckets is a K-step merge rather than a pass over every donor.
+#
+# The index is loaded in a background thread when a process serves its first request;
+# until it is ready, lookups go to the database (db.search_donor). db.py publishes a
+# 'donor' event with the committed row after every write to a donor's indexed columns
+# (register, profile update, availability toggle, donation); the index applies it as an
+# upsert. With several worker processes the events travel between them over the same
+# socket relay as notifications (NOTIFICATION_RELAY_DIR). A full reload every
+# DONOR_INDEX_REFRESH seconds picks up rows changed outside db.py and drops the space
+# left behind by renamed donors.
+#
+# Memory (`python -m benchmarks index --donors 100000`): 6.4 MB per 100k donors with
+# the synthetic population's two-word names, about 64 bytes per donor; a vocabulary word
+# adds a few hundred bytes (string, dict entry, trigram entries, postings header).
+
+log = logging.getLogger(__name__)
+
+MAX_MATCHES = 1000      # deepest result served (offset + limit)
+MAX_PREFIX_WORDS = 200  # vocabulary words scanned per prefix
+LOAD_CHUNK = 20000      # donors read per query while loading
+
+IndexMatch = namedtuple('IndexMatch', ['id', 'name', 'blood_type_id', 'area_id', 'availability', 'score'])
+
+
+def donor_event(row, last_donation=None):
+    """
+    Builds the event published for a committed donor row (id, name, bloodtype, area_id,
+    availability) and, for a donation, its date. The event carries the whole indexed
+    state, so applying it twice or late is harmless.
+    """
+    event = {'kind': 'donor', 'id': row.id, 'name': row.name, 'blood_type': row.bloodtype,
+             'area_id': row.area_id, 'available': bool(row.availability)}
+    if last_donation is not None:
+        event['last_donation'] = last_donation.isoformat()
+    return event
+
+def _day(value):
+    """Day number (date.toordinal) of a date, datetime or ISO string; 0 for None."""
+    if not value:
+        return 0
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10]).toordinal()
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+class _Arrays:
+    """The index data. Not thread-safe: DonorIndex serializes access."""
+
+    def __init__(self):
+        # Per slot
+        self.donor_id = array('i')
+        self.blood_type = array('B')
+        self.area_id = array('i')        # 0 = none
+        self.available = array('B')
+        self.last_donation = array('i')  # day number, 0 = never donated
+        self.name_start = array('I')     # offsets into names
+        self.name_len = array('H')
+        self.names = bytearray()
+        self.token_start = array('I')    # offsets into token_flat
+        self.token_count = array('B')
+        self.token_flat = array('i')     # vocabulary ids of each slot's name words
+        # Donor id -> slot (-1 = not indexed); ids are dense, so an array beats a dict
+        self.slot_of = array('i')
+        # Vocabulary
+        self.tokens = []                 # vocabulary id -> word
+        self.token_id = {}               # word -> vocabulary id
+        self.sorted_tokens = []          # for prefix ranges (bisect)
+        self.postings = []               # vocabulary id -> array of slots, ascending
+        self.gram_tokens = {}            # trigram -> array of vocabulary ids
+        # Matching: (blood type, area) -> array of last_donation << 32 | slot, ascending
+        # (appended unordered while loading, sorted by finish_load())
+        self.buckets = {}
+        self.buckets_sorted = False
+        self.garbage = 0                 # bytes/entries left behind by renames
+
+    def __len__(self):
+        return len(self.donor_id)
+
+    def _vocabulary_id(self, token):
+        token_id = self.token_id.get(token)
+        if token_id is None:
+            token_id = len(self.tokens)
+            self.tokens.append(token)
+            self.token_id[token] = token_id
+            insort(self.sorted_tokens, token)
+            self.postings.append(array('i'))
+            for gram in donor_search.trigrams(token):
+                self.gram_tokens.setdefault(gram, array('i')).append(token_id)
+        return token_id
+
+    def slot_tokens(self, slot):
+        start = self.token_start[slot]
+        return self.token_flat[start:start + self.token_count[slot]]
+
+    def name(self, slot):
+        start = self.name_start[slot]
+        return self.names[start:start + self.name_len[slot]].decode('utf-8')
+
+    def _bucket_add(self, blood_type, area_id, last_day, slot):
+        entries = self.buckets.setdefault((blood_type, area_id), array('q'))
+        key = last_day << 32 | slot
+        if self.buckets_sorted:
+            entries.insert(bisect_left(entries, key), key)
+        else:
+            entries.append(key)
+
+    def _bucket_remove(self, blood_type, area_id, last_day, slot):
+        entries = self.buckets[(blood_type, area_id)]
+        key = last_day << 32 | slot
+        if self.buckets_sorted:
+            del entries[bisect_left(entries, key)]
+        else:
+            entries.remove(key)
+
+    def finish_load(self):
+        """Orders the matching buckets once the bulk load is done."""
+        for bucket, entries in self.buckets.items():
+            self.buckets[bucket] = array('q', sorted(entries))
+        self.buckets_sorted = True
+
+    def upsert(self, donor_id, name, blood_type, area_id, available, last_day=None):
+        """Adds or updates one donor. `last_day` None keeps the known last donation."""
+        if donor_id >= len(self.slot_of):
+            self.slot_of.extend([-1] * (donor_id + 1 - len(self.slot_of)))
+        slot = self.slot_of[donor_id]
+        token_ids = [self._vocabulary_id(token) for token in donor_search.tokenize(name)[:255]]
+        encoded = (name or '').encode('utf-8')[:65535]
+
+        if slot < 0:
+            slot = len(self.donor_id)
+            self.slot_of[donor_id] = slot
+            self.donor_id.append(donor_id)
+            self.blood_type.append(blood_type or 0)
+            self.area_id.append(area_id or 0)
+            self.available.append(1 if available else 0)
+            self.last_donation.append(last_day or 0)
+            self._bucket_add(blood_type or 0, area_id or 0, last_day or 0, slot)
+            self.name_start.append(len(self.names))
+            self.name_len.append(len(encoded))
+            self.names += encoded
+            self.token_start.append(len(self.token_flat))
+            self.token_count.append(len(token_ids))
+            self.token_flat.extend(token_ids)
+            for token_id in token_ids:
+                postings = self.postings[token_id]
+                if postings and postings[-1] > slot:
+                    postings.insert(bisect_left(postings, slot), slot)
+                else:
+                    postings.append(slot)
+            return
+
+        old = (self.blood_type[slot], self.area_id[slot], self.last_donation[slot])
+        new = (blood_type or 0, area_id or 0, old[2] if last_day is None else last_day)
+        if new != old:
+            self._bucket_remove(*old, slot)
+            self._bucket_add(*new, slot)
+        self.blood_type[slot], self.area_id[slot], self.last_donation[slot] = new
+        self.available[slot] = 1 if available else 0
+        if encoded == bytes(self.names[self.name_start[slot]:self.name_start[slot] + self.name_len[slot]]):
+            return
+
+        # Renamed: move the slot between postings and append the new name and words
+        old_ids = set(self.slot_tokens(slot))
+        for token_id in old_ids.difference(token_ids):
+            postings = self.postings[token_id]
+            del postings[bisect_left(postings, slot)]
+        for token_id in set(token_ids).difference(old_ids):
+            postings = self.postings[token_id]
+            postings.insert(bisect_left(postings, slot), slot)
+        self.garbage += self.name_len[slot] + self.token_count[slot] * self.token_flat.itemsize
+        self.name_start[slot] = len(self.names)
+        self.name_len[slot] = len(encoded)
+        self.names += encoded
+        self.token_start[slot] = len(self.token_flat)
+        self.token_count[slot] = len(token_ids)
+        self.token_flat.extend(token_ids)
+
+    def _candidates(self, word):
+        """{vocabulary id: donor_search.word_score} of the best words matching `word`, best first."""
+        scores = {}
+        i = bisect_left(self.sorted_tokens, word)
+        for token in self.sorted_tokens[i:i + MAX_PREFIX_WORDS]:
+            if not token.startswith(word):
+                break
+            scores[self.token_id[token]] = donor_search.word_score(word, token)
+
+        shared = Counter()
+        for gram in donor_search.trigrams(word):
+            shared.update(self.gram_tokens.get(gram, ()))
+        needed = donor_search.min_shared_grams(word)
+        for token_id, count in shared.items():
+            if count >= needed and token_id not in scores:
+                score = donor_search.word_score(word, self.tokens[token_id])
+                if score:
+                    scores[token_id] = score
+
+        ranked = sorted(scores.items(), key=lambda candidate: -candidate[1])
+        return dict(ranked[:donor_search.MAX_CANDIDATES])
+
+    def search(self, words, blood_type_ids=(), donor_id=None, limit=MAX_MATCHES):
+        """
+        The `limit` best (score, slot) pairs: highest score first, then slot (donor id) order.
+
+        The ranking is exact, so a deeper page continues the previous one. Postings are
+        read for the longest word, best vocabulary match first; every other word must
+        match one of the donor's words as well. A word's postings are read only while a
+        donor found there could still make the top `limit` (its score is bounded by the
+        word's own score and the other words' best candidates).
+        """
+        blood_types = set(blood_type_ids)
+
+        def accepted(slot):
+            return not blood_types or self.blood_type[slot] in blood_types
+
+        if donor_id is not None:
+            slot = self.slot_of[donor_id] if 0 <= donor_id < len(self.slot_of) else -1
+            return [(1.0, slot)] if slot >= 0 and accepted(slot) else []
+
+        if not words:
+            matches = []
+            for slot in range(len(self.donor_id)):
+                if accepted(slot):
+                    matches.append((1.0, slot))
+                    if len(matches) >= limit:
+                        break
+            return matches
+
+        candidates = [self._candidates(word) for word in words]
+        if not all(candidates):
+            return []
+        driver = max(range(len(words)), key=lambda i: len(words[i]))
+        best_scores = [max(word_candidates.values()) for word_candidates in candidates]
+
+        top = []  # min-heap of (score, -slot): top[0] is the worst match kept
+        seen = set()
+        for token_id, token_score in candidates[driver].items():
+            bound = sum(token_score if i == driver else best for i, best in enumerate(best_scores)) / len(words)
+            if len(top) >= limit and top[0][0] > bound:
+                break
+            for slot in self.postings[token_id]:
+                if len(top) >= limit and (top[0][0] > bound or (top[0][0] == bound and -top[0][1] < slot)):
+                    break
+                if slot in seen or not accepted(slot):
+                    continue
+                seen.add(slot)
+                tokens = self.slot_tokens(slot)
+                total = 0.0
+                for word_candidates in candidates:
+                    best = max(word_candidates.get(token, 0.0) for token in tokens)
+                    if not best:
+                        break
+                    total += best
+                else:
+                    match = (total / len(words), -slot)
+                    if len(top) < limit:
+                        heappush(top, match)
+                    elif match > top[0]:
+                        heapreplace(top, match)
+
+        return [(round(score, 3), -slot) for score, slot in sorted(top, reverse=True)]
+
+    def match(self, score, slot):
+        area_id = self.area_id[slot]
+        return IndexMatch(self.donor_id[slot], self.name(slot), self.blood_type[slot],
+                          area_id or None, bool(self.available[slot]), score)
+
+    def rank_donors(self, type_scores, area_scores, today, limit):
+        """
+        The `limit` best eligible donors for a request as (score, slot, days since donation),
+        best first; equal scores go to the donor rested longest, then in slot order (the
+        order within a bucket). Unavailable donors and donors within the donation interval
+        are skipped.
+
+        Args:
+            type_scores (dict): Blood type id -> compatibility (types missing are incompatible).
+            area_scores (dict): Area id -> proximity (areas missing score 0.0).
+            today (int): Day number of today.
+        """
+        cutoff = today - donor_matching.DONATION_INTERVAL_DAYS
+        heap = []
+
+        def push_next(base, entries, i):
+            # Next eligible, available donor of a bucket (its best remaining one)
+            while i < len(entries):
+                key = entries[i]
+                last_day, slot = key >> 32, key & 0xFFFFFFFF
+                if last_day > cutoff:
+                    return  # everyone after donated more recently still
+                if self.available[slot]:
+                    days = today - last_day if last_day else None
+                    heappush(heap, (-donor_matching.score(base, days), last_day, slot, days, base, entries, i))
+                    return
+                i += 1
+
+        for (blood_type, area_id), entries in self.buckets.items():
+            compatibility = type_scores.get(blood_type)
+            if compatibility:
+                push_next(donor_matching.base_score(compatibility, area_scores.get(area_id, 0.0)), entries, 0)
+
+        ranked = []
+        while heap and len(ranked) < limit:
+            score, _, slot, days, base, entries, i = heappop(heap)
+            ranked.append((-score, slot, days))
+            push_next(base, entries, i + 1)
+        return ranked
+
+    def memory_bytes(self):
+        """Approximate bytes held: arrays and their over-allocation plus vocabulary objects."""
+        size = sum(sys.getsizeof(a) for a in (
+            self.donor_id, self.blood_type, self.area_id, self.available, self.last_donation, self.name_start,
+            self.name_len, self.names, self.token_start, self.token_count, self.token_flat, self.slot_of))
+        size += sys.getsizeof(self.buckets) + sum(sys.getsizeof(b) for b in self.buckets.values())
+        size += sys.getsizeof(self.tokens) + sys.getsizeof(self.token_id) + sys.getsizeof(self.sorted_tokens)
+        size += sum(sys.getsizeof(token) for token in self.tokens)
+        size += sys.getsizeof(self.postings) + sum(sys.getsizeof(p) for p in self.postings)
+        size += sys.getsizeof(self.gram_tokens) + sum(sys.getsizeof(g) + sys.getsizeof(ids)
+                                                      for g, ids in self.gram_tokens.items())
+        return size
+
+
+class DonorIndex:
+    """
+    Thread-safe, process-local donor lookup index with background (re)loading.
+
+    Args:
+        app: Flask app; loading runs in an app context of its own.
+        refresh_interval (float): Seconds after which the next lookup starts a full reload
+                                  in the background (0 = never).
+    """
+
+    def __init__(self, app, refresh_interval=3600.0):
+        self.app = app
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._pending = None   # events received while a load runs, replayed onto its result
+        self._loading = False
+        self._pid = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.loads = 0
+        self.events = 0
+
+    @property
+    def ready(self):
+        return self._data is not None
+
+    def start(self):
+        """Starts the first load in this process (idempotent; re-runs after a fork)."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid == os.getpid():
+                    return
+                self._pid = os.getpid()
+                self._data = None
+            self.reload(wait=False)
+
+    def reload(self, wait=True):
+        """Loads a fresh copy from the database, replacing the current one when done."""
+        with self._lock:
+            if self._loading:
+                return False
+            self._loading = True
+            self._pending = []
+        if wait:
+            self._load()
+        else:
+            threading.Thread(target=self._load, name='donor-index-load', daemon=True).start()
+        return True
+
+    def _load(self):
+        from db import get_donor_index_rows
+
+        started = time.monotonic()
+        data = _Arrays()
+        try:
+            with self.app.app_context():
+                after = 0
+                while True:
+                    rows = get_donor_index_rows(after, LOAD_CHUNK)
+                    for row in rows:
+                        data.upsert(row.id, row.name, row.bloodtype, row.area_id, row.availability,
+                                    _day(row.last_donation))
+                    if len(rows) < LOAD_CHUNK:
+                        break
+                    after = rows[-1].id
+            data.finish_load()
+            with self._lock:
+                for event in self._pending:
+                    self._apply(data, event)
+                self._data = data
+                self.loaded_at = time.monotonic()
+                self.load_seconds = self.loaded_at - started
+                self.loads += 1
+            log.info('Donor index loaded: %d donors in %.1fs', len(data), self.load_seconds)
+        except Exception:
+            log.exception('Could not load the donor index; lookups use the database')
+        finally:
+            with self._lock:
+                self._pending = None
+                self._loading = False
+
+    @staticmethod
+    def _apply(data, event):
+        last_day = _day(event['last_donation']) if 'last_donation' in event else None
+        data.upsert(event['id'], event['name'], event['blood_type'], event['area_id'], event['available'], last_day)
+
+    def on_event(self, donor_ids, event):
+        """Broker listener: applies 'donor' events (also buffered for a load in progress)."""
+        if event.get('kind') != 'donor':
+            return
+        with self._lock:
+            self.events += 1
+            if self._data is not None:
+                self._apply(self._data, event)
+            if self._pending is not None:
+                self._pending.append(event)
+
+    def search(self, query, offset=0, limit=10):
+        """
+        One page of ranked matches for a lookup query (see donor_search.parse_query).
+
+        Returns:
+            list[IndexMatch] | None: None when the index cannot answer - not loaded yet,
+            or a phone number query (phone numbers are not indexed in memory).
+        """
+        if self._data is None:
+            return None
+        from db import get_blood_type_id
+
+        self._refresh_if_stale()
+        parsed = donor_search.parse_query(query)
+        if parsed.phone or (parsed.digits and len(parsed.digits) >= donor_search.MIN_PHONE_DIGITS):
+            return None
+        type_ids = [get_blood_type_id(blood_type) for blood_type in parsed.blood_types]
+        if not (parsed.words or parsed.digits or type_ids):
+            return []
+
+        with self._lock:
+            data = self._data
+            ranked = data.search(parsed.words, type_ids,
+                                 donor_id=int(parsed.digits) if parsed.digits else None,
+                                 limit=min(offset + limit, MAX_MATCHES))
+            return [data.match(score, slot) for score, slot in ranked[offset:offset + limit]]
+
+    def match_donors(self, blood_type_id, area_id, limit=20):
+        """
+        Ranks the eligible donors for a request of `blood_type_id` in `area_id`
+        (see donor_matching.py).
+
+        Returns:
+            list[donor_matching.DonorMatchScore] | None: Best first; None while the index
+            is not loaded.
+        """
+        if self._data is None:
+            return None
+        from db import reference_data
+
+        self._refresh_if_stale()
+        ref = reference_data()
+        recipient_type = ref.blood_type_str(blood_type_id)
+        type_scores = {bt.bloodtype_id: donor_matching.compatibility(recipient_type, bt.type)
+                       for bt in ref.blood_types()}
+        recipient_area = ref.area(area_id) if area_id else None
+        distances = {area.id: donor_matching.distance_km(recipient_area, area) for area in ref.areas()}
+        area_scores = {area: donor_matching.proximity(distance) for area, distance in distances.items()}
+
+        with self._lock:
+            data = self._data
+            ranked = data.rank_donors(type_scores, area_scores, date.today().toordinal(), limit)
+            matches = []
+            for score, slot, days in ranked:
+                distance = distances.get(data.area_id[slot])
+                matches.append(donor_matching.DonorMatchScore(
+                    data.donor_id[slot], data.name(slot), data.blood_type[slot], data.area_id[slot] or None, days,
+                    None if distance is None else round(distance, 1), round(score, 3)))
+            return matches
+
+    def _refresh_if_stale(self):
+        if (self.refresh_interval and self.loaded_at
+                and time.monotonic() - self.loaded_at > self.refresh_interval):
+            self.reload(wait=False)
+
+    def stats(self):
+        with self._lock:
+            data = self._data
+            if data is None:
+                return {'ready': False, 'loading': self._loading}
+            return {
+                'ready': True,
+                'loading': self._loading,
+                'donors': len(data),
+                'vocabulary': len(data.tokens),
+                'memory_bytes': data.memory_bytes(),
+                'garbage_bytes': data.garbage,
+                'loads': self.loads,
+                'load_seconds': round(self.load_seconds, 3),
+                'age_seconds': round(time.monotonic() - self.loaded_at, 1),
+                'events': self.events,
+            }
+
+
+# ==================================================================================
+# APP INTEGRATION
+# ==================================================================================
+
+def init_app(app):
+    """
+    Creates the app's DonorIndex and the 'donor_events' broker db.py publishes donor changes
+    on. The first load starts with the first request each process serves (never in CLI
+    commands). Does nothing when DONOR_INDEX is off.
+    """
+    if not app.config.get('DONOR_INDEX', True):
+        return None
+
+    relay_dir = app.config.get('NOTIFICATION_RELAY_DIR')
+    events = NotificationBroker(relay_dir=os.path.join(relay_dir, 'donor-index') if relay_dir else None)
+    index = DonorIndex(app, refresh_interval=app.config.get('DONOR_INDEX_REFRESH', 3600.0))
+    events.add_listener(index.on_event)
+    app.extensions['donor_events'] = events
+    app.extensions['donor_index'] = index
+
+    @app.before_request
+    def start_donor_index():
+        events.start()
+        index.start()
+
+    return index
+
+def donor_index():
+    """The app's DonorIndex, or None when DONOR_INDEX is off."""
+    return current_app.extensions.get('donor_index')
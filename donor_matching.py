@@ -0,0 +1,78 @@
+from collections import namedtuple
+from math import asin, cos, radians, sin, sqrt
+
+# ==================================================================================
+# DONOR MATCHING (which donors to ask for an approved request)
+# ==================================================================================
+# A donor's match score for a request (0.0 - 1.0) weighs:
+#
+#   compatibility  1.0 for the requested blood type, COMPATIBLE_SCORE for another type the
+#                  recipient can receive (ABO/Rh red-cell rules), so O- donors are not
+#                  used up on requests other types could cover
+#   proximity      1.0 in the recipient's own area, falling with the distance between the
+#                  areas' centres (Area.latitude / longitude, migration 007); 0.0 when
+#                  either area has no coordinates
+#   rest           days since the donor's last donation, up to REST_DAYS (never donated = 1.0)
+#
+# Donors who donated in the last DONATION_INTERVAL_DAYS or are marked unavailable are not
+# matched at all; equal scores go to the donor rested longest. The ranking runs over the
+# in-memory donor index (donor_index.py).
+
+DONATION_INTERVAL_DAYS = 30   # the 30-day rule (db._eligible_from)
+COMPATIBLE_SCORE = 0.7        # compatibility of a compatible but different blood type
+PROXIMITY_KM = 10.0           # distance at which proximity has halved
+REST_DAYS = 180               # rest beyond this many days scores no higher
+
+WEIGHTS = {'compatibility': 0.5, 'proximity': 0.3, 'rest': 0.2}
+
+# Recipient blood type -> donor blood types it can receive
+COMPATIBLE_DONORS = {
+    'O-': ('O-',),
+    'O+': ('O+', 'O-'),
+    'A-': ('A-', 'O-'),
+    'A+': ('A+', 'A-', 'O+', 'O-'),
+    'B-': ('B-', 'O-'),
+    'B+': ('B+', 'B-', 'O+', 'O-'),
+    'AB-': ('AB-', 'A-', 'B-', 'O-'),
+    'AB+': ('AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'),
+}
+
+DonorMatchScore = namedtuple('DonorMatchScore', ['id', 'name', 'blood_type_id', 'area_id', 'days_since_donation',
+                                                 'distance_km', 'score'])
+
+
+def compatibility(recipient_type, donor_type):
+    """1.0 for the same blood type, COMPATIBLE_SCORE for a compatible one, else 0.0."""
+    if donor_type == recipient_type:
+        return 1.0
+    return COMPATIBLE_SCORE if donor_type in COMPATIBLE_DONORS.get(recipient_type, ()) else 0.0
+
+def distance_km(area_a, area_b):
+    """Great-circle distance between two areas' centres, or None if either has no coordinates."""
+    if area_a is None or area_b is None:
+        return None
+    if area_a.id == area_b.id:
+        return 0.0
+    if None in (area_a.latitude, area_a.longitude, area_b.latitude, area_b.longitude):
+        return None
+    lat_a, lon_a, lat_b, lon_b = map(radians, map(float, (area_a.latitude, area_a.longitude,
+                                                          area_b.latitude, area_b.longitude)))
+    h = sin((lat_b - lat_a) / 2) ** 2 + cos(lat_a) * cos(lat_b) * sin((lon_b - lon_a) / 2) ** 2
+    return 2 * 6371.0 * asin(sqrt(h))
+
+def proximity(distance):
+    """1.0 at distance 0, 0.5 at PROXIMITY_KM, towards 0.0 further out; 0.0 if unknown."""
+    return 0.0 if distance is None else 1.0 / (1.0 + distance / PROXIMITY_KM)
+
+def rest(days_since_donation):
+    """Days since the last donation, as 0.0 - 1.0 (None = never donated = 1.0)."""
+    if days_since_donation is None:
+        return 1.0
+    return min(days_since_donation, REST_DAYS) / REST_DAYS
+
+def base_score(compatibility_score, proximity_score):
+    """The part of the score shared by all donors of one blood type and area."""
+    return WEIGHTS['compatibility'] * compatibility_score + WEIGHTS['proximity'] * proximity_score
+
+def score(base, days_since_donation):
+    return base + WEIGHTS['rest'] * rest(days_since_donation)
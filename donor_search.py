@@ -0,0 +1,155 @@
+import re
+from collections import namedtuple
+from math import ceil
+
+# ==================================================================================
+# DONOR NAME SEARCH (n-gram index)
+# ==================================================================================
+# A leading-wildcard LIKE '%term%' cannot seek, so donor lookup goes through an index
+# of the words in Donor.name (Database/migrations/006_donor_search_index.sql):
+#
+#   Name_Token        the vocabulary: every distinct lower-case word of any donor name
+#   Name_Token_Gram   trigrams of each vocabulary word ('  ali ' -> '  a', ' al', 'ali', 'li ')
+#   Donor_Name_Token  postings: which donors' names contain which word
+#
+# A query word is matched against the (small) vocabulary first - by prefix through the
+# unique index on Name_Token.token and by trigram similarity through Name_Token_Gram -
+# and only the postings of the matching words are read, donor id order, TOP n. The cost
+# depends on the result limit and the vocabulary, not on the number of donors.
+#
+# db.py keeps the index current in the same transaction as every Donor.name write;
+# rebuild_index() recreates it from scratch (init-sqlite, benchmark populations,
+# `flask --app run reindex-donor-search`).
+
+MAX_TOKEN_LENGTH = 50        # Name_Token.token is NVARCHAR(50)
+SIMILARITY_THRESHOLD = 0.3   # minimum trigram similarity for a fuzzy word match
+MAX_CANDIDATES = 20          # vocabulary words considered per query word
+MIN_PHONE_DIGITS = 4         # shorter digit-only queries are donor ids only
+
+_WORD = re.compile(r'[^\W_]+')
+_BLOOD_TYPE = re.compile(r'^(?:A|B|AB|O)[+-]$', re.IGNORECASE)
+_PHONE_SEPARATORS = re.compile(r'[\s\-+()]')
+
+SearchQuery = namedtuple('SearchQuery', ['words', 'blood_types', 'phone', 'digits'])
+
+
+def tokenize(name):
+    """Distinct lower-case words of `name`, in order (letters and digits; anything else separates)."""
+    tokens = []
+    for word in _WORD.findall((name or '').lower()):
+        word = word[:MAX_TOKEN_LENGTH]
+        if word not in tokens:
+            tokens.append(word)
+    return tokens
+
+def trigrams(token):
+    """Set of trigrams of `token`, padded so word starts and ends form grams of their own."""
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(a, b):
+    """Trigram similarity (shared / all distinct trigrams) of two words, 0.0 - 1.0."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+def min_shared_grams(word):
+    """Fewest trigrams a vocabulary word must share with `word` to reach SIMILARITY_THRESHOLD."""
+    return max(1, ceil(SIMILARITY_THRESHOLD * len(trigrams(word))))
+
+def word_score(word, token):
+    """
+    How well the name word `token` matches the query word `word`: 1.0 for the same word,
+    0.5 - 1.0 for a prefix (typeahead; longer prefixes score higher), otherwise the
+    trigram similarity (0.0 below SIMILARITY_THRESHOLD).
+    """
+    if token == word:
+        return 1.0
+    if token.startswith(word):
+        return 0.5 + 0.5 * len(word) / len(token)
+    score = similarity(word, token)
+    return score if score >= SIMILARITY_THRESHOLD else 0.0
+
+def name_score(words, name):
+    """Average over the query words of their best match among the words of `name`."""
+    tokens = tokenize(name)
+    if not words or not tokens:
+        return 0.0
+    return sum(max(word_score(word, token) for token in tokens) for word in words) / len(words)
+
+def parse_query(query):
+    """
+    Splits a lookup query into its parts.
+
+    A query of digits only (spaces, dashes, '+' and brackets allowed) is a donor id or
+    phone number prefix. Otherwise 'A+', 'o-', ... are blood type filters, digit words
+    a phone number prefix and everything else name words.
+
+    Returns:
+        SearchQuery: (words, blood_types, phone, digits)
+    """
+    query = str(query or '').strip()
+    digits = _PHONE_SEPARATORS.sub('', query)
+    if digits.isdigit():
+        return SearchQuery([], [], None, digits)
+
+    words, blood_types, phone = [], [], None
+    for part in query.split():
+        if _BLOOD_TYPE.match(part):
+            if part.upper() not in blood_types:
+                blood_types.append(part.upper())
+            continue
+        for word in tokenize(part):
+            if word.isdigit():
+                phone = phone or word
+            elif word not in words:
+                words.append(word)
+    return SearchQuery(words, blood_types, phone, None)
+
+
+# ==================================================================================
+# FULL REBUILD
+# ==================================================================================
+
+REBUILD_CHUNK = 20000  # donors read per query
+
+def _donor_chunks(cursor):
+    """(id, name) rows of every donor, REBUILD_CHUNK ids at a time (no open result set between chunks)."""
+    cursor.execute("SELECT MAX(id) FROM Donor")
+    max_id = cursor.fetchone()[0] or 0
+    for low in range(0, max_id, REBUILD_CHUNK):
+        cursor.execute("SELECT id, name FROM Donor WHERE id > ? AND id <= ?", (low, low + REBUILD_CHUNK))
+        yield cursor.fetchall()
+
+def rebuild_index(cursor):
+    """
+    Recreates Name_Token, Name_Token_Gram and Donor_Name_Token from Donor.name.
+
+    Uses only plain DB-API calls and portable SQL, so it runs on a pyodbc cursor, a db.py
+    connection's cursor or a raw sqlite3 cursor alike. The caller commits.
+
+    Returns:
+        (int, int): (vocabulary words, postings)
+    """
+    cursor.execute("DELETE FROM Donor_Name_Token")
+    cursor.execute("DELETE FROM Name_Token_Gram")
+    cursor.execute("DELETE FROM Name_Token")
+
+    vocabulary = set()
+    for rows in _donor_chunks(cursor):
+        for _, name in rows:
+            vocabulary.update(tokenize(name))
+
+    cursor.executemany("INSERT INTO Name_Token (token) VALUES (?)", [(token,) for token in sorted(vocabulary)])
+    cursor.execute("SELECT id, token FROM Name_Token")
+    token_ids = {token: token_id for token_id, token in cursor.fetchall()}
+    cursor.executemany("INSERT INTO Name_Token_Gram (gram, token_id) VALUES (?, ?)",
+                       [(gram, token_id) for token, token_id in token_ids.items() for gram in trigrams(token)])
+
+    postings = 0
+    for rows in _donor_chunks(cursor):
+        batch = [(token_ids[token], donor_id) for donor_id, name in rows for token in tokenize(name)]
+        if batch:
+            cursor.executemany("INSERT INTO Donor_Name_Token (token_id, donor_id) VALUES (?, ?)", batch)
+            postings += len(batch)
+    return len(token_ids), postings
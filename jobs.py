@@ -0,0 +1,284 @@
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from db import (
+    claim_job, complete_job, fail_job, save_job_progress, deliver_notification, deliver_notifications,
+    broadcast_notification, count_broadcast_targets, notify_matched_donors, sync_donor_eligibility, count_donors,
+    retire_expired_stock, enqueue_job
+)
+
+# ==================================================================================
+# BACKGROUND JOB WORKERS
+# ==================================================================================
+# Jobs are rows in the Jobs table (Database/migrations/005_jobs.sql), enqueued with
+# db.enqueue_job() or, inside a transaction, db.insert_job(). A pool of worker threads
+# per process claims and runs them; failures are retried with exponential backoff
+# until max_attempts, and a job left Running by a dead worker is reclaimed once its
+# lease lapses.
+
+log = logging.getLogger(__name__)
+
+_HANDLERS = {}
+
+def job_handler(kind):
+    """Registers handler(job, worker) for jobs of `kind`. Its return value is stored as the job result."""
+    def register(func):
+        _HANDLERS[kind] = func
+        return func
+    return register
+
+
+class JobError(Exception):
+    """Raised by a handler to fail the current attempt (it is retried until max_attempts)."""
+
+
+class JobWorkers:
+    """
+    A pool of worker threads polling the Jobs table.
+
+    Args:
+        app: Flask app; each job runs in its own app context so it borrows a pooled
+             connection only for as long as it runs.
+        workers (int): Threads per process.
+        poll_interval (float): Seconds between polls when the queue is empty.
+        lease_seconds (int): How long a claimed job stays reserved without progress.
+        retry_base (float): Backoff of the first retry; doubles per attempt (capped at 1h).
+    """
+
+    def __init__(self, app, workers=2, poll_interval=2.0, lease_seconds=300, retry_base=5.0):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retry_base = retry_base
+        self._wakeup = threading.Condition()
+        self._pending_wakeups = 0
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the worker threads once per process (safe to call on every request).
+        
+        Returns:
+            bool: True if this call started them.
+        """
+        if self.workers <= 0 or self._pid == os.getpid():
+            return False
+        with self._lock:
+            if self._pid == os.getpid():
+                return False
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = []
+            for n in range(self.workers):
+                worker_id = f'{socket.gethostname()}:{os.getpid()}:{n}'
+                thread = threading.Thread(target=self._run, args=(worker_id,), name=f'job-worker-{n}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return True
+
+    def wake(self):
+        """Wakes one idle worker (called after a job is enqueued in this process)."""
+        with self._wakeup:
+            self._pending_wakeups += 1
+            self._wakeup.notify()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._pid = None
+
+    def _wait(self):
+        with self._wakeup:
+            if not self._pending_wakeups and not self._stopping.is_set():
+                self._wakeup.wait(self.poll_interval)
+            self._pending_wakeups = max(0, self._pending_wakeups - 1)
+
+    def _run(self, worker_id):
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_once(worker_id)
+            except Exception:
+                # Database unreachable, Jobs table missing, ... - keep polling
+                log.exception('Job worker %s could not claim a job', worker_id)
+                ran = False
+            if not ran:
+                self._wait()
+
+    def run_once(self, worker_id):
+        """
+        Claims and runs at most one job.
+
+        Returns:
+            bool: True if a job was claimed.
+        """
+        with self.app.app_context():
+            job = claim_job(worker_id, self.lease_seconds)
+            if job is None:
+                return False
+
+            handler = _HANDLERS.get(job.kind)
+            try:
+                if handler is None:
+                    raise JobError(f'No handler for job kind {job.kind!r}')
+                if job.attempts > job.max_attempts:
+                    raise JobError('Lease expired on the final attempt')
+                result = handler(job, self)
+            except Exception as e:
+                delay = min(self.retry_base * 2 ** (job.attempts - 1), 3600)
+                success, status = fail_job(job.id, str(e), delay)
+                log.warning('Job %s (%s) attempt %s failed: %s -> %s', job.id, job.kind, job.attempts, e,
+                            status if success else 'unrecorded')
+                return True
+
+            success, error = complete_job(job.id, result)
+            if not success:
+                log.error('Job %s (%s) ran but could not be marked done: %s', job.id, job.kind, error)
+            return True
+
+
+# ==================================================================================
+# HANDLERS
+# ==================================================================================
+
+@job_handler('notification')
+def run_notification_job(job, worker):
+    """Delivers one queued notification (exactly once, see db.deliver_notification)."""
+    p = job.payload
+    success, error = deliver_notification(job.id, p['user_id'], p['message'], p.get('type', 'General'))
+    if not success:
+        raise JobError(error)
+    return None
+
+@job_handler('notification_batch')
+def run_notification_batch_job(job, worker):
+    """Delivers one message to a list of users (e.g. a donation batch's donors), exactly once (see db.deliver_notifications)."""
+    p = job.payload
+    success, error = deliver_notifications(job.id, p['user_ids'], p['message'], p.get('type', 'General'))
+    if not success:
+        raise JobError(error)
+    return None
+
+@job_handler('donor_match')
+def run_donor_match_job(job, worker):
+    """Notifies the donors matched to an approved request, exactly once (see db.notify_matched_donors)."""
+    p = job.payload
+    success, error = notify_matched_donors(job.id, p['donor_ids'], p['message'], p.get('type', 'General'))
+    if not success:
+        raise JobError(error)
+    return None
+
+@job_handler('broadcast')
+def run_broadcast_job(job, worker):
+    """
+    Fans a manager's broadcast out in committed chunks. Each chunk's transaction also saves
+    the last user_id reached, so a retry resumes after it instead of notifying anyone twice.
+    """
+    p = job.payload
+    checkpoint = job.checkpoint or {}
+    total = count_broadcast_targets(p['target_role'], p.get('blood_type')) if 'total' not in checkpoint else checkpoint['total']
+
+    def on_chunk(cursor, count, last_user_id):
+        save_job_progress(cursor, job.id, job.progress_done + count, total,
+                          checkpoint={'last_user_id': last_user_id, 'total': total},
+                          lease_seconds=worker.lease_seconds)
+
+    success, result = broadcast_notification(p['target_role'], p['message'], p.get('blood_type'),
+                                             start_after=checkpoint.get('last_user_id', 0), on_chunk=on_chunk)
+    if not success:
+        raise JobError(result)
+    return {'count': job.progress_done + result.count, 'chunks': result.chunks,
+            'chunk_size': result.chunk_size, 'elapsed_ms': round(result.elapsed_ms)}
+
+@job_handler('donor_eligibility')
+def run_donor_eligibility_job(job, worker):
+    """
+    Backfills / verifies Donor.last_donation_at and eligible_from against Donation_Completed
+    in committed chunks (db.sync_donor_eligibility), resuming after the last donor reached.
+    """
+    p = job.payload
+    checkpoint = job.checkpoint or {}
+    total = checkpoint['total'] if 'total' in checkpoint else count_donors()
+    drift_before = checkpoint.get('drift', 0)
+
+    def on_chunk(cursor, checked, drift, last_donor_id):
+        save_job_progress(cursor, job.id, job.progress_done + checked, total,
+                          checkpoint={'last_donor_id': last_donor_id, 'drift': drift_before + drift, 'total': total},
+                          lease_seconds=worker.lease_seconds)
+
+    success, result = sync_donor_eligibility(apply=p.get('apply', True), chunk_size=p.get('chunk_size', 1000),
+                                             start_after=checkpoint.get('last_donor_id', 0), on_chunk=on_chunk)
+    if not success:
+        raise JobError(result)
+    return {'checked': job.progress_done + result.checked, 'drift': drift_before + result.drift,
+            'applied': p.get('apply', True), 'sample': [row.donor_id for row in result.sample]}
+
+
+@job_handler('stock_expiry')
+def run_stock_expiry_job(job, worker):
+    """
+    Retires expired bags in committed chunks (db.retire_expired_stock), then schedules the
+    next day's sweep. Re-running a chunk is harmless: deleted bags are simply gone.
+    """
+    retired = [job.progress_done]
+
+    def on_chunk(cursor, bags, units):
+        retired[0] += bags
+        save_job_progress(cursor, job.id, retired[0], lease_seconds=worker.lease_seconds)
+
+    success, result = retire_expired_stock(on_chunk=on_chunk)
+    if not success:
+        raise JobError(result)
+    schedule_stock_expiry_sweep(datetime.now().date() + timedelta(days=1))
+    return {'bags': retired[0], 'units': result.units, 'chunks': result.chunks}
+
+
+def schedule_stock_expiry_sweep(day=None):
+    """
+    Enqueues the 'stock_expiry' sweep of `day` (default today), due just after midnight -
+    when that day's bags expire. The idempotency key makes it once per day across processes.
+    """
+    day = day or datetime.now().date()
+    run_after = datetime.combine(day, datetime.min.time()) + timedelta(minutes=5)
+    return enqueue_job('stock_expiry', {}, idempotency_key=f'stock-expiry:{day.isoformat()}', run_after=run_after)
+
+
+# ==================================================================================
+# APP INTEGRATION
+# ==================================================================================
+
+def init_app(app):
+    """
+    Creates the app's JobWorkers. Threads start with the first request each process serves
+    (never in CLI commands such as `flask migrate`); `flask --app run run-jobs` runs them standalone.
+    """
+    workers = JobWorkers(
+        app,
+        workers=app.config.get('JOB_WORKERS', 2),
+        poll_interval=app.config.get('JOB_POLL_INTERVAL', 2.0),
+        lease_seconds=app.config.get('JOB_LEASE_SECONDS', 300),
+        retry_base=app.config.get('JOB_RETRY_BASE', 5.0),
+    )
+    app.extensions['job_workers'] = workers
+
+    @app.before_request
+    def start_job_workers():
+        if workers.start() and app.config.get('STOCK_EXPIRY_SWEEP', True):
+            bootstrap_sweeps()
+
+
+def bootstrap_sweeps():
+    """Makes sure today's stock expiry sweep is queued (each sweep queues the next day's)."""
+    success, error = schedule_stock_expiry_sweep()
+    if not success:
+        log.warning('Could not schedule the stock expiry sweep: %s', error)
@@ -0,0 +1,110 @@
+import os
+import re
+
+from db import get_db_connection
+
+# ==================================================================================
+# SCHEMA MIGRATION RUNNER
+# ==================================================================================
+# Scripts live in Database/migrations/ and are named NNN_description.sql.
+# Applied versions are recorded in Schema_Migrations, so re-running is a no-op.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Database', 'migrations')
+
+_FILENAME = re.compile(r'^(\d+)_(.+)\.sql$')
+_GO = re.compile(r'^\s*GO\s*;?\s*$', re.IGNORECASE | re.MULTILINE)
+_USE = re.compile(r'^\s*USE\s+\S+\s*;?\s*$', re.IGNORECASE)
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        IF OBJECT_ID('Schema_Migrations', 'U') IS NULL
+            CREATE TABLE Schema_Migrations (
+                version INT PRIMARY KEY,
+                name NVARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL DEFAULT GETDATE()
+            );
+    """)
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """
+    Lists migration scripts in version order.
+
+    Returns:
+        list[(int, str, str)]: (version, name, path)
+    """
+    found = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    found.sort()
+
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return found
+
+def split_batches(sql):
+    """
+    Splits a script on GO separators (as SSMS/sqlcmd do).
+    `USE <db>` batches are dropped: the runner always works on the configured database.
+    """
+    batches = []
+    for batch in _GO.split(sql):
+        lines = [line for line in batch.splitlines() if not _USE.match(line)]
+        batch = '\n'.join(lines).strip()
+        if batch and not all(line.strip().startswith('--') or not line.strip() for line in lines):
+            batches.append(batch)
+    return batches
+
+def get_applied_versions():
+    """Returns the set of migration versions already recorded in Schema_Migrations."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM Schema_Migrations")
+    applied = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    conn.close()
+    return applied
+
+def apply_migrations(target=None, dry_run=False):
+    """
+    Applies every pending migration (up to `target`, if given) in version order.
+    Each script runs in its own transaction together with its Schema_Migrations row,
+    so a failing script leaves no partial changes and is retried on the next run.
+
+    Args:
+        target (int): Highest version to apply (default: all).
+        dry_run (bool): Only report what would be applied.
+
+    Returns:
+        (bool, list | str): (Success, list of (version, name) applied or Error Message)
+    """
+    applied = get_applied_versions()
+    pending = [(v, n, p) for v, n, p in discover_migrations()
+               if v not in applied and (target is None or v <= target)]
+
+    if dry_run:
+        return True, [(v, n) for v, n, _ in pending]
+
+    done = []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    for version, name, path in pending:
+        with open(path, encoding='utf-8') as f:
+            batches = split_batches(f.read())
+        try:
+            for batch in batches:
+                cursor.execute(batch)
+                while cursor.nextset():
+                    pass
+            cursor.execute("INSERT INTO Schema_Migrations (version, name) VALUES (?, ?)", (version, name))
+            conn.commit()
+            done.append((version, name))
+        except Exception as e:
+            conn.rollback()
+            conn.close()
+            return False, f"Migration {version:03d}_{name} failed: {e}"
+    conn.close()
+    return True, done
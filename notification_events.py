@@ -0,0 +1,258 @@
+import json
+import os
+import queue
+import socket
+import threading
+import uuid
+
+from flask import current_app
+
+# ==================================================================================
+# NOTIFICATION PUB/SUB (live badge updates over Server-Sent Events)
+# ==================================================================================
+# db.py publishes after each committed notification change; every open
+# /notifications/stream of the affected users gets the event from its own queue.
+#
+# Events are small dicts:
+#   {'kind': 'notification', 'message': ..., 'type': ...}   a new notification
+#   {'kind': 'read'}                                         notifications marked read
+# Target user ids of None mean "everyone" (broadcasts).
+#
+# A broker only reaches streams in its own process. With several worker processes,
+# set NOTIFICATION_RELAY_DIR: each process then binds a UNIX datagram socket in that
+# directory and forwards what it publishes to its siblings (no external service needed).
+
+MAX_MESSAGE_LENGTH = 200  # notification text carried in an event (full text stays in the DB)
+
+
+class Subscription:
+    """
+    One subscriber's event queue. Bounded: a client that stops reading loses its oldest
+    events rather than growing memory - the stream re-reads the count on the next event anyway.
+    """
+
+    def __init__(self, broker, user_id, max_pending):
+        self.user_id = user_id
+        self._broker = broker
+        self._events = queue.Queue(maxsize=max_pending)
+
+    def get(self, timeout=None):
+        """Waits up to `timeout` seconds for the next event; returns None on timeout."""
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """Returns every event already queued without waiting."""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def put(self, event):
+        while True:
+            try:
+                self._events.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        self._broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NotificationBroker:
+    """
+    In-process pub/sub keyed by user id.
+
+    Args:
+        max_pending (int): Queue bound per subscription.
+        relay_dir (str): Optional directory for the cross-process SocketRelay.
+    """
+
+    def __init__(self, max_pending=100, relay_dir=None):
+        self.max_pending = max_pending
+        self.relay_dir = relay_dir
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> set of Subscription
+        self._listeners = []
+        self._relay = None
+        self._relay_pid = None
+        self.published = 0
+
+    def subscribe(self, user_id):
+        self.start()
+        subscription = Subscription(self, user_id, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.user_id)
+            if subs:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.user_id]
+
+    def add_listener(self, listener):
+        """
+        Registers listener(user_ids, event), called for every event - local or relayed -
+        before subscribers are woken (e.g. to invalidate per-process caches).
+        """
+        self._listeners.append(listener)
+
+    def publish(self, user_ids, event):
+        """Delivers `event` to the streams of `user_ids` (None = all users) in every process."""
+        if user_ids is not None:
+            user_ids = sorted({uid for uid in user_ids if uid is not None})
+            if not user_ids:
+                return
+        self.published += 1
+        self._deliver(user_ids, event)
+        relay = self.start()
+        if relay:
+            relay.send(user_ids, event)
+
+    def _deliver(self, user_ids, event):
+        for listener in self._listeners:
+            listener(user_ids, event)
+        with self._lock:
+            if user_ids is None:
+                targets = [sub for subs in self._subscribers.values() for sub in subs]
+            else:
+                targets = [sub for uid in user_ids for sub in self._subscribers.get(uid, ())]
+        for subscription in targets:
+            subscription.put(event)
+
+    def start(self):
+        """
+        Binds this process's relay socket if a relay directory is configured (idempotent).
+        Re-binds after a fork so pre-forked workers each get their own socket.
+        """
+        if not self.relay_dir:
+            return None
+        if self._relay_pid != os.getpid():
+            with self._lock:
+                if self._relay_pid != os.getpid():
+                    self._relay = SocketRelay(self.relay_dir, self._deliver)
+                    self._relay_pid = os.getpid()
+        return self._relay
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def close(self):
+        if self._relay and self._relay_pid == os.getpid():
+            self._relay.close()
+        self._relay = None
+        self._relay_pid = None
+
+
+class SocketRelay:
+    """
+    Forwards events to sibling processes over UNIX datagram sockets found in `directory`.
+    Delivery is best effort: a sibling whose socket buffer is full misses the event and
+    catches up on its clients' next event or reconnect.
+    """
+
+    def __init__(self, directory, deliver):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+        self._deliver = deliver
+        self._closed = False
+
+        self._recv = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._recv.bind(self.path)
+        self._send = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send.setblocking(False)
+
+        self._thread = threading.Thread(target=self._listen, name='notification-relay', daemon=True)
+        self._thread.start()
+
+    def send(self, user_ids, event):
+        payload = json.dumps({'user_ids': user_ids, 'event': event}).encode('utf-8')
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.sock') or path == self.path:
+                continue
+            try:
+                self._send.sendto(payload, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Socket file left behind by a worker that exited
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                pass
+
+    def _listen(self):
+        while not self._closed:
+            try:
+                data = self._recv.recv(65536)
+            except OSError:
+                return
+            try:
+                message = json.loads(data.decode('utf-8'))
+                self._deliver(message['user_ids'], message['event'])
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def close(self):
+        self._closed = True
+        self._recv.close()
+        self._send.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# ==================================================================================
+# APP INTEGRATION
+# ==================================================================================
+
+def init_app(app):
+    """Creates the app's NotificationBroker (must run before db.init_app registers its listener)."""
+    broker = NotificationBroker(
+        max_pending=app.config.get('NOTIFICATION_STREAM_MAX_PENDING', 100),
+        relay_dir=app.config.get('NOTIFICATION_RELAY_DIR'),
+    )
+    app.extensions['notification_broker'] = broker
+
+    @app.before_request
+    def start_notification_relay():
+        # Bind the relay socket in each worker before it serves anything, so the worker
+        # receives its siblings' events even if it never publishes itself
+        broker.start()
+
+def broker():
+    return current_app.extensions['notification_broker']
+
+def notification_event(message, type='General'):
+    """Builds the event published for a newly inserted notification."""
+    if len(message) > MAX_MESSAGE_LENGTH:
+        message = message[:MAX_MESSAGE_LENGTH - 1] + '…'
+    return {'kind': 'notification', 'message': message, 'type': type}
+
+def read_event():
+    return {'kind': 'read'}
+
+def format_sse(event, data):
+    """Serializes one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
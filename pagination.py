@@ -0,0 +1,153 @@
+import base64
+import json
+from datetime import date, datetime
+
+from flask import current_app, request
+
+# ==================================================================================
+# KEYSET (SEEK) PAGINATION
+# ==================================================================================
+# Instead of OFFSET n ROWS (which reads and discards n rows), a keyset page continues
+# from the last row seen: WHERE (sort_key, id) < (last_sort_key, last_id). Deep pages
+# cost the same as page 1 because the index seek starts right at the cursor.
+#
+# The cursor handed to the browser is an opaque, URL-safe token of (sort key, id).
+
+class InvalidCursor(ValueError):
+    """Raised when an after/before token cannot be decoded."""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise InvalidCursor("Unknown cursor value type")
+    return value
+
+def encode_cursor(sort_value, row_id):
+    """Builds an opaque token for the (sort key, id) of a row."""
+    raw = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """
+    Reverses encode_cursor().
+
+    Returns:
+        (object, int): (sort key, id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw.decode('utf-8'))
+        return _decode_value(sort_value), int(row_id)
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid pagination cursor: {e}") from e
+
+def seek_clause(sort_col, id_col, descending, backwards, sort_param='?'):
+    """
+    Builds the WHERE fragment and ORDER BY for one keyset step.
+
+    Args:
+        sort_col, id_col (str): Column expressions of the sort key and the unique tie-breaker.
+        descending (bool): The list's natural order (e.g. newest first).
+        backwards (bool): True when paging towards the start of the list (a 'before' cursor).
+        sort_param (str): Placeholder for the sort value, e.g. 'CAST(? AS DATETIME)'.
+
+    Returns:
+        (str, str): (predicate using 3 params: sort value, sort value, id; ORDER BY clause)
+    """
+    # Walking backwards through a DESC list is walking forwards through an ASC one
+    ascending = descending == backwards
+    op = '>' if ascending else '<'
+    direction = 'ASC' if ascending else 'DESC'
+    predicate = f"({sort_col} {op} {sort_param} OR ({sort_col} = {sort_param} AND {id_col} {op} ?))"
+    order_by = f"{sort_col} {direction}, {id_col} {direction}"
+    return predicate, order_by
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated list.
+
+    Attributes:
+        items (list): Rows on this page, in the list's natural order.
+        next_token / prev_token (str | None): Cursors for the following / preceding page.
+        total (int): Lazily computed - the COUNT(*) only runs if something reads it.
+    """
+
+    def __init__(self, items, next_token, prev_token, count=None):
+        self.items = items
+        self.next_token = next_token
+        self.prev_token = prev_token
+        self._count = count
+        self._total = None
+
+    @property
+    def has_next(self):
+        return self.next_token is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_token is not None
+
+    @property
+    def total(self):
+        if self._total is None and self._count is not None:
+            self._total = self._count()
+        return self._total
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def build_page(rows, per_page, key, after=None, before=None, count=None):
+    """
+    Turns the per_page + 1 rows fetched by a seek query into a KeysetPage.
+
+    Args:
+        rows (list): Rows in fetch order (reversed when paging with `before`).
+        per_page (int): Page size; one extra row was fetched to detect another page.
+        key (callable): row -> (sort value, id) for building cursors.
+        after, before (str | None): The cursor this page was requested with.
+        count (callable): Optional zero-argument COUNT(*) for KeysetPage.total.
+    """
+    more = len(rows) > per_page
+    items = list(rows[:per_page])
+
+    if before:
+        items.reverse()
+        prev_token = encode_cursor(*key(items[0])) if more and items else None
+        next_token = encode_cursor(*key(items[-1])) if items else None
+    else:
+        next_token = encode_cursor(*key(items[-1])) if more else None
+        prev_token = encode_cursor(*key(items[0])) if after and items else None
+
+    return KeysetPage(items, next_token, prev_token, count)
+
+
+def keyset_request_args():
+    """
+    Decides whether a list view should use keyset pagination (opt-in).
+    Keyset mode applies when the URL carries an after/before cursor, or when
+    KEYSET_PAGINATION is enabled in the app config.
+
+    Returns:
+        (str, str) | None: (after, before) cursors in keyset mode, else None (use page numbers)
+    """
+    after = request.args.get('after') or None
+    before = request.args.get('before') or None
+    if after or before or current_app.config.get('KEYSET_PAGINATION'):
+        return after, before
+    return None
@@ -0,0 +1,138 @@
+import xml.etree.ElementTree as ET
+
+import db
+from db import get_db_connection
+
+# ==================================================================================
+# QUERY PLAN REGRESSION CHECK
+# ==================================================================================
+# Runs the read paths of db.py against the seeded database, pulls the plans they
+# actually used from the plan cache (sys.dm_exec_query_stats, needs VIEW SERVER STATE)
+# and flags any full scan of a table that is expected to grow.
+# With DB_READ_MODE=replica the read-path helpers run on the replica and their plans
+# are not in the primary's cache; run the check with DB_READ_MODE=primary.
+
+SHOWPLAN_NS = {'p': 'http://schemas.microsoft.com/sqlserver/2004/07/showplan'}
+
+SCAN_OPERATORS = {'Table Scan', 'Clustered Index Scan', 'Index Scan'}
+
+# Lookup tables that stay tiny by design; scanning them is cheaper than seeking.
+# Inventory_Bucket is bounded by areas x blood types x shelf-life days.
+SMALL_TABLES = {'Area', 'Blood_Type', 'Manager', 'Inventory_Summary', 'Inventory_Bucket', 'Schema_Migrations'}
+
+# Scans we know about and are tracked separately: {function name: reason}
+KNOWN_SCANS = {
+    'get_all_donors': 'COUNT(*) of the filtered donors for the page count (Donor only)',
+}
+
+def _scenarios(cursor):
+    """
+    Builds (function name, callable) pairs covering the hot read paths,
+    using ids sampled from the seeded data.
+    """
+    cursor.execute("""
+        SELECT
+            (SELECT TOP 1 user_id FROM Donor WHERE user_id IS NOT NULL ORDER BY id),
+            (SELECT TOP 1 id FROM Donor ORDER BY id),
+            (SELECT TOP 1 user_id FROM Recipient WHERE user_id IS NOT NULL ORDER BY id),
+            (SELECT TOP 1 id FROM Recipient ORDER BY id),
+            (SELECT TOP 1 email FROM [User] ORDER BY id),
+            (SELECT TOP 1 area_id FROM Donor WHERE area_id IS NOT NULL ORDER BY id)
+    """)
+    donor_user_id, donor_id, recipient_user_id, recipient_id, email, area_id = cursor.fetchone()
+    cursor.close()
+
+    return [
+        ('get_user_by_email_password', lambda: db.get_user_by_email_password(email, '')),
+        ('get_donor_by_user_id', lambda: db.get_donor_by_user_id(donor_user_id)),
+        ('get_donor_dashboard', lambda: db.get_donor_dashboard(donor_user_id)),
+        ('get_donor_history', lambda: db.get_donor_history(donor_id)),
+        ('check_donor_eligibility', lambda: db.check_donor_eligibility(donor_user_id)),
+        ('get_recipient_by_user_id', lambda: db.get_recipient_by_user_id(recipient_user_id)),
+        ('get_recipient_dashboard', lambda: db.get_recipient_dashboard(recipient_user_id)),
+        ('get_recipient_requests', lambda: db.get_recipient_requests(recipient_id)),
+        ('get_inventory_stats', lambda: db.get_inventory_stats(area_id)),
+        ('get_expiring_stock', lambda: db.get_expiring_stock(7, area_id)),
+        ('get_all_donors', lambda: db.get_all_donors(1, 10, area_id, 'A+')),
+        ('search_donor', lambda: db.search_donor('Ali')),
+        ('get_donor_index_rows', lambda: db.get_donor_index_rows(donor_id, 100)),
+        ('get_active_requests', lambda: db.get_active_requests(area_id)),
+        ('get_all_requests', lambda: db.get_all_requests(1, 10)),
+        ('get_user_notifications', lambda: db.get_user_notifications(donor_user_id)),
+        ('get_unread_notification_count', lambda: db.get_unread_notification_count(donor_user_id)),
+    ]
+
+def _server_time(cursor):
+    cursor.execute("SELECT SYSDATETIME()")
+    return cursor.fetchone()[0]
+
+def _plans_since(cursor, since):
+    """Cached plans (statement text, plan XML) executed in this database since `since`."""
+    cursor.execute("""
+        SELECT st.text, CAST(qp.query_plan AS NVARCHAR(MAX))
+        FROM sys.dm_exec_query_stats qs
+        CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) st
+        CROSS APPLY sys.dm_exec_query_plan(qs.plan_handle) qp
+        WHERE qs.last_execution_time >= ?
+          AND st.dbid = DB_ID()
+          AND st.text NOT LIKE '%dm_exec_query_stats%'
+    """, (since,))
+    return cursor.fetchall()
+
+def find_scans(plan_xml):
+    """
+    Parses a showplan XML document and returns full scans of non-lookup tables.
+    Scans under a row goal (TOP / OFFSET-FETCH reading only a few ordered rows) are not scans
+    of the whole table and are ignored.
+
+    Returns:
+        list[(str, str, str)]: (table, physical operator, statement text)
+    """
+    scans = []
+    root = ET.fromstring(plan_xml)
+    for stmt in root.iter(f"{{{SHOWPLAN_NS['p']}}}StmtSimple"):
+        text = (stmt.get('StatementText') or '').strip()
+        for relop in stmt.iter(f"{{{SHOWPLAN_NS['p']}}}RelOp"):
+            if relop.get('PhysicalOp') not in SCAN_OPERATORS:
+                continue
+            if relop.get('EstimateRowsWithoutRowGoal') is not None:
+                continue
+            obj = relop.find('.//p:Object', SHOWPLAN_NS)
+            if obj is None:
+                continue
+            table = (obj.get('Table') or '').strip('[]')
+            if table.startswith('@') or table.startswith('#') or table in SMALL_TABLES:
+                continue
+            scans.append((table, relop.get('PhysicalOp'), text))
+    return scans
+
+def check_query_plans():
+    """
+    Exercises each scenario and collects the scans its plans contain.
+
+    Returns:
+        (list, list): (violations, known) - each a list of (function, table, operator, statement)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    scenarios = _scenarios(cursor)
+
+    violations, known = [], []
+    for name, call in scenarios:
+        cursor = conn.cursor()
+        since = _server_time(cursor)
+        call()
+        cursor = conn.cursor()
+        seen = set()
+        for _, plan_xml in _plans_since(cursor, since):
+            if not plan_xml:
+                continue
+            for table, op, text in find_scans(plan_xml):
+                if (table, op, text) in seen:
+                    continue
+                seen.add((table, op, text))
+                (known if name in KNOWN_SCANS else violations).append((name, table, op, text))
+        cursor.close()
+
+    conn.close()
+    return violations, known
@@ -0,0 +1,389 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+
+from flask import current_app, g, has_app_context, request
+
+# ==================================================================================
+# QUERY TRACING
+# ==================================================================================
+# Every pooled connection is wrapped (db.init_app) so each cursor.execute/executemany
+# and the fetch*/nextset calls that drain it are timed and counted against the current
+# app context (a request, or a background job / CLI context). Per request this yields:
+#
+#   Server-Timing header   db;dur=<ms>;desc="<n> queries, <rows> rows", app;dur=<ms>
+#   slow-query log         statements over QUERY_SLOW_MS (every request, sampled or not)
+#   /manager/diagnostics   top statements by total time, per-endpoint DB time
+#
+# Counting and timing are always on (two clock reads per call). Only a sampled share of
+# contexts (QUERY_TRACE_SAMPLE_RATE) is fingerprinted and aggregated into QueryStats;
+# fingerprints are cached per distinct SQL text, and each context takes the stats lock
+# once, when it ends. Parameter values are never recorded, only their shape.
+
+log = logging.getLogger(__name__)
+slow_log = logging.getLogger('bloodlink.slow_queries')
+
+BACKGROUND = '(background)'  # endpoint label for app contexts outside a request
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+_STRINGS = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'(?<![\w@#.\]])-?\d+(?:\.\d+)?\b')
+_VALUE_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Normalized statement text: comments dropped, string and number literals replaced
+    by ?, (?, ?, ...) lists collapsed to (?+), whitespace squeezed.
+    Statements differing only in literal values share a fingerprint.
+    """
+    text = _COMMENTS.sub(' ', sql)
+    text = _STRINGS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _VALUE_LISTS.sub('(?+)', text)
+    return _SPACES.sub(' ', text).strip()
+
+def params_shape(params, many=False):
+    """
+    Describes bound parameters without their values, e.g. '3: int, str, None' or,
+    for executemany, '250 x 3'.
+    """
+    if len(params) == 1 and isinstance(params[0], (list, tuple)):
+        params = params[0]  # execute(sql, (a, b)) as well as execute(sql, a, b)
+    if many:
+        rows = list(params)
+        return f'{len(rows)} x {len(rows[0]) if rows else 0}'
+    if not params:
+        return '0'
+    return f'{len(params)}: ' + ', '.join('None' if p is None else type(p).__name__ for p in params)
+
+
+class Statement:
+    """One execute()/executemany() call and the fetches that drained its results."""
+
+    __slots__ = ('sql', 'params', 'many', 'elapsed', 'rows', 'result_sets')
+
+    def __init__(self, sql, params, many):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.elapsed = 0.0
+        self.rows = 0
+        self.result_sets = 1
+
+
+class ContextTrace:
+    """Statements run in one app context (stored on `g`)."""
+
+    __slots__ = ('sampled', 'endpoint', 'started', 'statements', 'db_time', 'rows')
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.endpoint = BACKGROUND
+        self.started = time.perf_counter()
+        self.statements = []
+        self.db_time = 0.0
+        self.rows = 0
+
+    def server_timing(self):
+        total = (time.perf_counter() - self.started) * 1000
+        return (f'db;dur={self.db_time * 1000:.3f};desc="{len(self.statements)} queries, {self.rows} rows", '
+                f'app;dur={total:.3f}')
+
+
+# ==================================================================================
+# AGGREGATED STATS
+# ==================================================================================
+
+class QueryStats:
+    """
+    Process-wide totals per statement fingerprint and per endpoint, from sampled contexts.
+
+    Args:
+        max_statements (int): Distinct fingerprints kept; when full, the one with the least
+                              total time makes room for a new one.
+    """
+
+    def __init__(self, max_statements=500):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._statements = {}
+            self._endpoints = {}
+            self._since = time.time()
+
+    def record(self, trace):
+        endpoint = trace.endpoint
+        entries = [(fingerprint(s.sql), getattr(s.sql, 'name', None), params_shape(s.params, s.many), s)
+                   for s in trace.statements]
+
+        with self._lock:
+            ep = self._endpoints.get(endpoint)
+            if ep is None:
+                ep = self._endpoints[endpoint] = {'endpoint': endpoint, 'contexts': 0, 'queries': 0,
+                                                  'db_time': 0.0, 'max_db_time': 0.0, 'rows': 0}
+            ep['contexts'] += 1
+            ep['queries'] += len(trace.statements)
+            ep['db_time'] += trace.db_time
+            ep['max_db_time'] = max(ep['max_db_time'], trace.db_time)
+            ep['rows'] += trace.rows
+
+            for key, name, shape, statement in entries:
+                entry = self._statements.get(key)
+                if entry is None:
+                    if len(self._statements) >= self.max_statements:
+                        del self._statements[min(self._statements, key=lambda k: self._statements[k]['total_time'])]
+                    entry = self._statements[key] = {
+                        'fingerprint': key, 'name': name, 'calls': 0, 'total_time': 0.0, 'max_time': 0.0,
+                        'rows': 0, 'params': None, 'endpoints': {},
+                    }
+                entry['calls'] += 1
+                entry['total_time'] += statement.elapsed
+                entry['max_time'] = max(entry['max_time'], statement.elapsed)
+                entry['rows'] += statement.rows
+                entry['params'] = shape
+                entry['endpoints'][endpoint] = entry['endpoints'].get(endpoint, 0) + 1
+
+    def top_statements(self, limit=25, order_by='total_time'):
+        """
+        Returns:
+            list[dict]: fingerprint, name, calls, total_ms, avg_ms, max_ms, rows, avg_rows,
+                        params (shape of the latest call), endpoints (most frequent first)
+        """
+        with self._lock:
+            entries = sorted(self._statements.values(), key=lambda e: e[order_by], reverse=True)[:limit]
+            entries = [dict(e, endpoints=dict(e['endpoints'])) for e in entries]
+        for e in entries:
+            e['total_ms'] = round(e.pop('total_time') * 1000, 3)
+            e['max_ms'] = round(e.pop('max_time') * 1000, 3)
+            e['avg_ms'] = round(e['total_ms'] / e['calls'], 3)
+            e['avg_rows'] = round(e['rows'] / e['calls'], 1)
+            e['endpoints'] = sorted(e['endpoints'].items(), key=lambda kv: kv[1], reverse=True)
+        return entries
+
+    def endpoints(self):
+        """
+        Returns:
+            list[dict]: endpoint, contexts, queries, db_ms, avg_queries, avg_db_ms, max_db_ms, rows
+                        (most total DB time first)
+        """
+        with self._lock:
+            rows = [dict(ep) for ep in self._endpoints.values()]
+        for ep in rows:
+            ep['db_ms'] = round(ep.pop('db_time') * 1000, 3)
+            ep['max_db_ms'] = round(ep.pop('max_db_time') * 1000, 3)
+            ep['avg_queries'] = round(ep['queries'] / ep['contexts'], 2)
+            ep['avg_db_ms'] = round(ep['db_ms'] / ep['contexts'], 3)
+        return sorted(rows, key=lambda ep: ep['db_ms'], reverse=True)
+
+    @property
+    def since(self):
+        return self._since
+
+
+# ==================================================================================
+# CONNECTION / CURSOR WRAPPERS
+# ==================================================================================
+
+class TracingCursor:
+    """DB-API cursor proxy timing execute/executemany and the fetches of their results."""
+
+    def __init__(self, cursor, tracer):
+        self._cursor = cursor
+        self._tracer = tracer
+        self._statement = None
+        self._trace = None
+
+    def _run(self, method, sql, params, many):
+        trace = self._tracer.current()
+        statement = Statement(sql, params, many)
+        self._statement, self._trace = statement, trace
+        start = time.perf_counter()
+        try:
+            method(sql, *params)
+        finally:
+            elapsed = time.perf_counter() - start
+            statement.elapsed += elapsed
+            if trace is not None:
+                trace.statements.append(statement)
+                trace.db_time += elapsed
+        return self
+
+    def execute(self, sql, *params):
+        return self._run(self._cursor.execute, sql, params, False)
+
+    def executemany(self, sql, *params):
+        return self._run(self._cursor.executemany, sql, params, True)
+
+    def _drain(self, method, *args):
+        """Calls a fetch/nextset method, adding its time to the statement whose results it reads."""
+        start = time.perf_counter()
+        result = method(*args)
+        elapsed = time.perf_counter() - start
+        statement, trace = self._statement, self._trace
+        if statement is not None:
+            statement.elapsed += elapsed
+            if trace is not None:
+                trace.db_time += elapsed
+        return result, statement, trace
+
+    def _count(self, statement, trace, rows):
+        if statement is not None:
+            statement.rows += rows
+            if trace is not None:
+                trace.rows += rows
+
+    def fetchone(self):
+        row, statement, trace = self._drain(self._cursor.fetchone)
+        self._count(statement, trace, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, *args):
+        rows, statement, trace = self._drain(self._cursor.fetchmany, *args)
+        self._count(statement, trace, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows, statement, trace = self._drain(self._cursor.fetchall)
+        self._count(statement, trace, len(rows))
+        return rows
+
+    def nextset(self):
+        more, statement, _ = self._drain(self._cursor.nextset)
+        if more and statement is not None:
+            statement.result_sets += 1
+        return more
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracingConnection:
+    """DB-API connection proxy handing out TracingCursors."""
+
+    def __init__(self, conn, tracer):
+        self._conn = conn
+        self._tracer = tracer
+
+    def cursor(self):
+        return TracingCursor(self._conn.cursor(), self._tracer)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# ==================================================================================
+# TRACER
+# ==================================================================================
+
+class QueryTracer:
+    """
+    Args:
+        sample_rate (float): Share of app contexts aggregated into `stats` (0 - 1).
+        slow_ms (float): Statements at or over this many milliseconds are written to the
+                         slow-query log (None disables it).
+        max_statements (int): Distinct fingerprints kept in `stats`.
+    """
+
+    def __init__(self, sample_rate=1.0, slow_ms=200.0, max_statements=500):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.stats = QueryStats(max_statements)
+
+    def wrap(self, connect):
+        """Returns a connection factory whose connections are traced."""
+        def traced_connect():
+            return TracingConnection(connect(), self)
+        return traced_connect
+
+    def current(self):
+        """The ContextTrace of the current app context (created on first use), or None outside one."""
+        if not has_app_context():
+            return None
+        trace = g.get('query_trace')
+        if trace is None:
+            trace = g.query_trace = ContextTrace(random.random() < self.sample_rate)
+        return trace
+
+    def finish(self, trace):
+        """Writes slow statements to the log and aggregates a sampled trace."""
+        if self.slow_ms is not None:
+            threshold = self.slow_ms / 1000
+            for statement in trace.statements:
+                if statement.elapsed >= threshold:
+                    slow_log.warning('%.1f ms | %s | rows=%d | params=%s | %s', statement.elapsed * 1000, trace.endpoint,
+                                     statement.rows, params_shape(statement.params, statement.many),
+                                     fingerprint(statement.sql))
+        if trace.sampled and trace.statements:
+            self.stats.record(trace)
+
+
+def _add_slow_log_file(path):
+    # Once per file, however many apps a process creates (tests, benchmarks)
+    if not any(isinstance(h, logging.FileHandler) and h.baseFilename == os.path.abspath(path)
+               for h in slow_log.handlers):
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_log.addHandler(handler)
+
+def init_app(app):
+    """
+    Creates the app's QueryTracer (db.init_app wraps the pool's connections with it) and
+    the hooks that emit Server-Timing and close each context's trace.
+    Does nothing when QUERY_TRACE is off.
+    """
+    if not app.config.get('QUERY_TRACE', True):
+        return None
+
+    slow_ms = app.config.get('QUERY_SLOW_MS', 200.0)
+    tracer = QueryTracer(
+        sample_rate=app.config.get('QUERY_TRACE_SAMPLE_RATE', 1.0),
+        slow_ms=slow_ms if slow_ms and slow_ms > 0 else None,
+        max_statements=app.config.get('QUERY_STATS_MAX_STATEMENTS', 500),
+    )
+    app.extensions['query_tracer'] = tracer
+    if app.config.get('QUERY_SLOW_LOG'):
+        _add_slow_log_file(app.config['QUERY_SLOW_LOG'])
+
+    @app.before_request
+    def start_query_trace():
+        tracer.current().endpoint = request.endpoint or request.path
+
+    @app.after_request
+    def add_server_timing(response):
+        trace = g.get('query_trace')
+        if trace is not None:
+            response.headers.add('Server-Timing', trace.server_timing())
+        return response
+
+    @app.teardown_appcontext
+    def finish_query_trace(exc=None):
+        trace = g.pop('query_trace', None)
+        if trace is None:
+            return
+        try:
+            tracer.finish(trace)
+        except Exception:
+            log.exception('Could not record query trace for %s', trace.endpoint)
+
+    return tracer
+
+def tracer():
+    """The app's QueryTracer, or None when tracing is off."""
+    return current_app.extensions.get('query_tracer')
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import namedtuple
+
+# ==================================================================================
+# REFERENCE DATA CACHE (Area, Blood_Type)
+# ==================================================================================
+
+Area = namedtuple('Area', ['id', 'name', 'latitude', 'longitude'])
+BloodType = namedtuple('BloodType', ['bloodtype_id', 'type'])
+
+
+class ReferenceDataCache:
+    """
+    In-process cache for the small, rarely-changing lookup tables (Area and Blood_Type).
+
+    LOGIC:
+    1. The first lookup loads both tables through `loader` and keeps them in memory.
+    2. Entries are served from memory until `ttl` seconds have passed, then reloaded.
+    3. A lookup miss (e.g. an Area added after the last load) forces one early reload,
+       at most once every `miss_reload_interval` seconds.
+    4. invalidate() drops everything so the next lookup reloads immediately.
+
+    Args:
+        loader (callable): Returns (areas, blood_types) as lists of (id, name, latitude, longitude) /
+                           (bloodtype_id, type) rows.
+        ttl (float): Seconds before cached data is considered stale.
+        miss_reload_interval (float): Minimum seconds between reloads triggered by misses.
+    """
+
+    def __init__(self, loader, ttl=3600.0, miss_reload_interval=5.0):
+        self._loader = loader
+        self.ttl = ttl
+        self.miss_reload_interval = miss_reload_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._loaded_at = 0.0
+
+    def _snapshot(self, force=False):
+        """Returns the current data dict, (re)loading it if missing, stale or forced."""
+        data = self._data
+        now = time.monotonic()
+        if data is not None and not force and now - self._loaded_at < self.ttl:
+            return data
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._data is not None and self._loaded_at > now - (self.miss_reload_interval if force else self.ttl):
+                return self._data
+
+            areas, blood_types = self._loader()
+            areas = [Area(*row[:4]) for row in areas]
+            blood_types = [BloodType(row[0], row[1]) for row in blood_types]
+            self._data = {
+                'areas': areas,
+                'area_names': {a.id: a.name for a in areas},
+                'area_by_id': {a.id: a for a in areas},
+                'blood_types': blood_types,
+                'type_to_id': {bt.type: bt.bloodtype_id for bt in blood_types},
+                'id_to_type': {bt.bloodtype_id: bt.type for bt in blood_types},
+            }
+            self._loaded_at = time.monotonic()
+            return self._data
+
+    def _lookup(self, table, key):
+        value = self._snapshot()[table].get(key)
+        if value is None:
+            value = self._snapshot(force=True)[table].get(key)
+        return value
+
+    def invalidate(self):
+        """Drops the cached tables; the next lookup reloads them from the database."""
+        with self._lock:
+            self._data = None
+            self._loaded_at = 0.0
+
+    def areas(self):
+        """All areas as Area(id, name, latitude, longitude) tuples."""
+        return list(self._snapshot()['areas'])
+
+    def area(self, area_id):
+        """Area(id, name, latitude, longitude) for an id, or None if unknown."""
+        return self._lookup('area_by_id', _as_int(area_id))
+
+    def area_name(self, area_id):
+        """Area name for an id, or None if unknown."""
+        return self._lookup('area_names', _as_int(area_id))
+
+    def blood_types(self):
+        """All blood types as BloodType(bloodtype_id, type) tuples."""
+        return list(self._snapshot()['blood_types'])
+
+    def blood_type_id(self, type_str):
+        """Blood type id for its string (e.g. 'A+'), or None if unknown."""
+        return self._lookup('type_to_id', type_str)
+
+    def blood_type_str(self, bloodtype_id):
+        """Blood type string for its id, or None if unknown."""
+        return self._lookup('id_to_type', _as_int(bloodtype_id))
+
+
+def _as_int(value):
+    # Route parameters arrive as strings ('3'); the cache is keyed by the table's INT ids
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
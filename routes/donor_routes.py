@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from db import (
-    get_donor_by_user_id, get_donor_history, toggle_donor_availability, 
+    get_donor_by_user_id, get_donor_dashboard, toggle_donor_availability, 
     create_notification, update_donor_profile, get_all_areas, 
-    check_donor_eligibility, get_user_notifications, get_unread_notification_count
+    check_donor_eligibility
 )
 from datetime import datetime, timedelta
 
@@ -22,33 +22,24 @@ def dashboard():
     if not is_donor(): return redirect(url_for('auth.login'))
     
     user_id = session.get('user_id')
+    page = request.args.get('page', 1, type=int)
+    per_page = 5
     
-    donor = get_donor_by_user_id(user_id)
+    # SINGLE ROUND TRIP:
+    # Profile, 30-day eligibility, history page, recent notifications and the unread
+    # count all come back from one batched query (see db.get_donor_dashboard).
+    # Note: The eligibility check is read-only; it doesn't modify the database.
+    dashboard_data = get_donor_dashboard(user_id, page, per_page, notification_limit=5)
     
-    if not donor:
+    if not dashboard_data:
         return "Donor profile not found", 404
-
-    # BUSINESS LOGIC: 30-Day Rule Check
-    # We check if the donor has donated in the last 30 days.
-    # This function returns (True, 0) if eligible, or (False, days_left) if in cooldown.
-    # Note: This is a read-only check; it doesn't modify the database.
-    is_eligible, days_left = check_donor_eligibility(user_id)
-    
-    # Refresh donor data after potential auto-update
-    donor = get_donor_by_user_id(user_id)
-            
-    page = request.args.get('page', 1, type=int)
-    per_page = 5
-    history, total = get_donor_history(donor.id, page, per_page)
-    total_pages = (total + per_page - 1) // per_page
     
-    # Get Notifications
-    notifications, _ = get_user_notifications(user_id, page=1, per_page=5)
-    unread_count = get_unread_notification_count(user_id)
+    total_pages = (dashboard_data['total'] + per_page - 1) // per_page
     
-    return render_template('donor/dashboard.html', donor=donor, history=history, page=page, total_pages=total_pages, 
-                           is_eligible=is_eligible, days_left=days_left,
-                           notifications=notifications, unread_count=unread_count)
+    return render_template('donor/dashboard.html', donor=dashboard_data['donor'], history=dashboard_data['history'],
+                           page=page, total_pages=total_pages,
+                           is_eligible=dashboard_data['is_eligible'], days_left=dashboard_data['days_left'],
+                           notifications=dashboard_data['notifications'], unread_count=dashboard_data['unread_count'])
 
 @donor_bp.route('/toggle-availability', methods=['POST'])
 def toggle_availability():
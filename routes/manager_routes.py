@@ -1,13 +1,31 @@
-from flask import Blueprint, render_template, request, jsonify, session, flash, redirect, url_for
+import csv
+import io
+import uuid
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, jsonify, session, flash, redirect, url_for
 from db import (
-    get_inventory_stats, get_all_donors, search_donor, 
-    submit_donation_transaction, get_all_requests, approve_request_transaction, 
-    fulfill_request_transaction, get_active_requests, broadcast_notification,
-    get_all_areas
+    get_inventory_stats, get_expiring_stock, get_all_donors, get_all_donors_keyset, search_donor, 
+    submit_donation_transaction, submit_donation_batch, get_all_requests, get_all_requests_keyset, approve_request_transaction, 
+    fulfill_request_transaction, get_active_requests, enqueue_job, get_job, get_recent_jobs,
+    get_all_areas, get_blood_type_str, get_dialect, get_pool_stats, get_read_pool_stats, get_transaction_stats, get_request_match_target,
+    reference_data, get_rebalancing_inputs, transfer_stock_transaction
 )
+from donor_index import donor_index, MAX_MATCHES
+from stock_rebalancing import plan_rebalancing
+from pagination import InvalidCursor, keyset_request_args
+import query_trace
 
 manager_bp = Blueprint('manager', __name__, url_prefix='/manager')
 
+# Donor lookup results per request (the request's 'limit' is capped at the maximum)
+DONOR_LOOKUP_LIMIT = 10
+DONOR_LOOKUP_MAX_LIMIT = 50
+
+# Ranked donors per request-matches call
+DONOR_MATCH_LIMIT = 20
+DONOR_MATCH_MAX_LIMIT = 100
+
 def is_manager():
     """Checks if the current user has the 'Manager' role."""
     return session.get('role') == 'Manager'
@@ -16,31 +34,112 @@ def is_manager():
 def send_notification():
     """
     Handles manual notification broadcasting by a Manager.
-    POST: Sends notification to target group.
+    POST: Queues the broadcast as a background job and returns at once (progress on the dashboard).
     GET: Renders notification form.
     """
     if not is_manager(): return redirect(url_for('auth.login'))
     
     if request.method == 'POST':
         target_role = request.form.get('target_role')
-        blood_type = request.form.get('blood_type')
+        blood_type = request.form.get('blood_type') or None
         message = request.form.get('message')
+        # One key per rendered form: a double submit or browser retry reuses the queued job
+        form_key = request.form.get('idempotency_key')
         
-        success, count_or_error = broadcast_notification(target_role, message, blood_type)
+        success, job_id_or_error = enqueue_job(
+            'broadcast',
+            {'target_role': target_role, 'message': message, 'blood_type': blood_type},
+            idempotency_key=f'broadcast:{form_key}' if form_key else None,
+        )
         
         if success:
-            flash(f'Notification sent to {count_or_error} users.')
+            flash(f'Broadcast queued as job #{job_id_or_error}. Progress is shown below.', 'success')
             return redirect(url_for('manager.dashboard'))
         else:
-            flash(f'Error sending notification: {count_or_error}')
+            flash(f'Error sending notification: {job_id_or_error}')
             
-    return render_template('manager/send_notification.html')
+    return render_template('manager/send_notification.html', idempotency_key=uuid.uuid4().hex)
+
+def _job_json(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'progress_done': job.progress_done,
+        'progress_total': job.progress_total,
+        'last_error': job.last_error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+@manager_bp.route('/jobs')
+def jobs():
+    """API Endpoint: Recent broadcast jobs with progress (polled by the dashboard)."""
+    if not is_manager(): return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify([_job_json(job) for job in get_recent_jobs(5, kinds=['broadcast'])])
+
+@manager_bp.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    """API Endpoint: Status and progress of one background job."""
+    if not is_manager(): return jsonify({'error': 'Unauthorized'}), 401
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(_job_json(job))
+
+# Sort keys accepted by /diagnostics?sort=
+_DIAGNOSTICS_ORDER = {'total': 'total_time', 'max': 'max_time', 'calls': 'calls'}
+
+@manager_bp.route('/diagnostics')
+def diagnostics():
+    """
+    Query diagnostics for this process: statements by total (or max) time, DB time per
+    endpoint, connection pool usage (write and read pools), transaction retries and the in-memory donor index.
+    ?format=json returns the same data as JSON.
+    """
+    if not is_manager(): return redirect(url_for('auth.login'))
+    
+    sort = request.args.get('sort', 'total')
+    limit = min(request.args.get('limit', 25, type=int), 200)
+    tracer = query_trace.tracer()
+    index = donor_index()
+    
+    data = {
+        'backend': get_dialect().describe(),
+        'pool': get_pool_stats(),
+        'read_pool': get_read_pool_stats(),
+        'transactions': get_transaction_stats(),
+        'donor_index': index.stats() if index else None,
+        'tracing': tracer is not None,
+        'sample_rate': tracer.sample_rate if tracer else None,
+        'slow_ms': tracer.slow_ms if tracer else None,
+        'since': datetime.fromtimestamp(tracer.stats.since).isoformat(timespec='seconds') if tracer else None,
+        'statements': tracer.stats.top_statements(limit, _DIAGNOSTICS_ORDER.get(sort, 'total_time')) if tracer else [],
+        'endpoints': tracer.stats.endpoints() if tracer else [],
+    }
+    if request.args.get('format') == 'json':
+        return jsonify(data)
+    return render_template('manager/diagnostics.html', sort=sort, **data)
+
+@manager_bp.route('/diagnostics/reset', methods=['POST'])
+def reset_diagnostics():
+    """Clears the aggregated query statistics and transaction retry counters."""
+    if not is_manager(): return redirect(url_for('auth.login'))
+    current_app.extensions['transaction_stats'].reset()
+    tracer = query_trace.tracer()
+    if tracer:
+        tracer.stats.reset()
+        flash('Query statistics cleared.', 'success')
+    return redirect(url_for('manager.diagnostics'))
 
 @manager_bp.route('/dashboard')
 def dashboard():
-    """Renders the Manager Dashboard."""
+    """Renders the Manager Dashboard, including progress of recent broadcast jobs."""
     if not is_manager(): return redirect(url_for('auth.login'))
-    return render_template('manager/dashboard.html', user=session)
+    jobs = [_job_json(job) for job in get_recent_jobs(5, kinds=['broadcast'])]
+    return render_template('manager/dashboard.html', user=session, jobs=jobs)
 
 @manager_bp.route('/donation-entry')
 def donation_entry():
@@ -55,20 +154,77 @@ def donation_entry():
 @manager_bp.route('/inventory')
 def inventory():
     """
-    Displays the current blood inventory.
-    Supports filtering by Area and Blood Type via query parameters.
+    Displays the current (unexpired) blood inventory and the units expiring within N days.
+    Supports filtering by Area and Blood Type, and the window via ?expiring_days= (default STOCK_EXPIRING_DAYS).
     """
     if not is_manager(): return redirect(url_for('auth.login'))
     
     area_id = request.args.get('area_id')
     blood_type = request.args.get('blood_type')
+    expiring_days = request.args.get('expiring_days', type=int)
+    if expiring_days is None or not 0 < expiring_days <= current_app.config.get('STOCK_SHELF_LIFE_DAYS', 42):
+        expiring_days = current_app.config.get('STOCK_EXPIRING_DAYS', 7)
     
-    inventory_data = get_inventory_stats(area_id, blood_type)
+    inventory_data = get_inventory_stats(area_id, blood_type, expiring_days)
+    expiring = get_expiring_stock(expiring_days, area_id, blood_type)
     areas = get_all_areas()
     
-    return render_template('manager/inventory.html', inventory=inventory_data, areas=areas, 
+    return render_template('manager/inventory.html', inventory=inventory_data, expiring=expiring,
+                           expiring_days=expiring_days, areas=areas,
                            current_area=area_id, current_blood_type=blood_type)
 
+def _rebalancing_plan():
+    """Plans transfers from the current stock and open requests (stock_rebalancing.py)."""
+    inputs = get_rebalancing_inputs()
+    return plan_rebalancing(get_all_areas(), inputs.stock, inputs.demand)
+
+@manager_bp.route('/rebalancing')
+def rebalancing():
+    """
+    Proposes the transfers between areas that cover the most open (Approved) demand at the
+    lowest total distance, with the units no area can spare. ?format=json returns the same data as JSON.
+    """
+    if not is_manager(): return redirect(url_for('auth.login'))
+    
+    plan = _rebalancing_plan()
+    ref = reference_data()
+    data = {
+        'transfers': [{'from_area_id': t.from_area_id, 'from_area': ref.area_name(t.from_area_id),
+                       'to_area_id': t.to_area_id, 'to_area': ref.area_name(t.to_area_id),
+                       'blood_type': get_blood_type_str(t.blood_type_id), 'units': t.units,
+                       'distance_km': t.distance_km} for t in plan.transfers],
+        'units': plan.units,
+        'unit_km': plan.unit_km,
+        'shortfall': {get_blood_type_str(blood_type_id): units for blood_type_id, units in sorted(plan.shortfall.items())},
+        'elapsed_ms': round(plan.elapsed_ms, 1),
+    }
+    if request.args.get('format') == 'json':
+        return jsonify(data)
+    return render_template('manager/rebalancing.html', **data)
+
+@manager_bp.route('/rebalancing/execute', methods=['POST'])
+def execute_rebalancing():
+    """
+    Re-plans from the current stock and moves the bags in one transaction (db.transfer_stock_transaction).
+    JSON callers (Accept: application/json) get the units moved per transfer.
+    """
+    if not is_manager(): return redirect(url_for('auth.login'))
+    
+    plan = _rebalancing_plan()
+    success, result = transfer_stock_transaction(plan.transfers)
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    if not success:
+        if wants_json: return jsonify({'error': result}), 500
+        flash(f'Rebalancing failed: {result}', 'error')
+        return redirect(url_for('manager.rebalancing'))
+    
+    moved = sum(t.units for t in result)
+    if wants_json:
+        return jsonify({'success': True, 'planned_units': plan.units, 'units': moved,
+                        'transfers': [t._asdict() for t in result]})
+    flash(f'Moved {moved} of {plan.units} planned unit(s) in {len(result)} transfer(s).', 'success')
+    return redirect(url_for('manager.rebalancing'))
+
 @manager_bp.route('/donors')
 def donors():
     """
@@ -82,6 +238,18 @@ def donors():
     blood_type = request.args.get('blood_type')
     
     per_page = 10
+    
+    # KEYSET MODE (opt-in): ?after= / ?before= cursors instead of OFFSET paging.
+    cursors = keyset_request_args()
+    if cursors:
+        try:
+            cursor_page = get_all_donors_keyset(per_page, area_id, blood_type, *cursors)
+        except InvalidCursor:
+            cursor_page = get_all_donors_keyset(per_page, area_id, blood_type)
+        return render_template('manager/donors_list.html', donors=cursor_page.items, cursor_page=cursor_page,
+                               page=1, total_pages=0, areas=get_all_areas(),
+                               current_area=area_id, current_blood_type=blood_type)
+    
     donors, total = get_all_donors(page, per_page, area_id, blood_type)
     
     total_pages = (total + per_page - 1) // per_page
@@ -93,21 +261,41 @@ def donors():
 @manager_bp.route('/donor-lookup', methods=['POST'])
 def donor_lookup():
     """
-    API Endpoint: Look up a donor by ID or Name.
-    Returns: JSON list of matching donors.
+    API Endpoint: Look up a donor by ID, phone number, name (prefix / fuzzy) or blood type.
+    Body: {"query": "ali kh o+", "limit": 10, "page": 1}
+    Returns: JSON page of matching donors, best match first, and whether a next page exists.
+    
+    Served from the in-memory donor index (donor_index.py) once it is loaded; phone
+    number queries and lookups before that go to the database (search_donor).
     """
     if not is_manager(): return jsonify({'error': 'Unauthorized'}), 403
     
     query = request.json.get('query')
     if not query: return jsonify({'error': 'No query provided'}), 400
+    try:
+        limit = min(max(int(request.json.get('limit') or DONOR_LOOKUP_LIMIT), 1), DONOR_LOOKUP_MAX_LIMIT)
+        page = max(int(request.json.get('page') or 1), 1)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit or page'}), 400
+    offset = (page - 1) * limit
+    if offset + limit > MAX_MATCHES:
+        return jsonify({'error': 'Page out of range; refine the query'}), 400
     
-    rows = search_donor(query)
-    
-    results = []
-    for row in rows:
-        results.append({'id': row.id, 'name': row.name, 'blood_type': row.type, 'area_id': row.area_id})
+    # One row more than the page shows whether there is a next page
+    index = donor_index()
+    matches = index.search(query, offset, limit + 1) if index else None
+    if matches is not None:
+        source = 'index'
+        results = [{'id': m.id, 'name': m.name, 'blood_type': get_blood_type_str(m.blood_type_id),
+                    'area_id': m.area_id, 'number': None, 'available': m.availability, 'score': m.score}
+                   for m in matches]
+    else:
+        source = 'db'
+        results = [{'id': row.id, 'name': row.name, 'blood_type': row.type, 'area_id': row.area_id,
+                    'number': row.number, 'available': bool(row.availability), 'score': row.score}
+                   for row in search_donor(query, limit=offset + limit + 1)[offset:]]
         
-    return jsonify({'results': results})
+    return jsonify({'results': results[:limit], 'page': page, 'has_next': len(results) > limit, 'source': source})
 
 @manager_bp.route('/get-requests-by-area/<int:area_id>', methods=['GET'])
 def get_requests_by_area(area_id):
@@ -156,13 +344,82 @@ def submit_donation():
     else:
         return jsonify({'error': error}), 500
 
+# CSV columns of a batch upload (header row required; volume and the exchange columns are optional)
+DONATION_BATCH_COLUMNS = ('donor_id', 'volume', 'is_exchange', 'request_id')
+
+def _batch_flag(value):
+    """is_exchange from JSON (bool) or CSV text ('1', 'true', 'yes')."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+def _read_donation_batch():
+    """
+    Reads a donation batch from the request: a CSV upload ('file' field) or a JSON array
+    (bare, or as {"donations": [...]}).
+    
+    Returns:
+        list[dict] | None: The rows, or None if the body holds neither.
+    """
+    upload = request.files.get('file')
+    if upload:
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        rows = [{column: (row.get(column) or '').strip() for column in DONATION_BATCH_COLUMNS} for row in reader]
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('donations') if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            return None
+    return [dict(row, is_exchange=_batch_flag(row.get('is_exchange'))) if isinstance(row, dict) else {}
+            for row in rows]
+
+@manager_bp.route('/submit-donations', methods=['POST'])
+def submit_donations():
+    """
+    API Endpoint: Record a blood drive's donations in one call (db.submit_donation_batch).
+    Body: JSON [{"donor_id": 12, "volume": 1, "is_exchange": false, "request_id": null}, ...]
+          or a CSV upload ('file') with the columns donor_id, volume, is_exchange, request_id.
+    Returns: a result per row in input order ({"row", "donor_id", "success", "donation_id", "error"})
+             and the recorded / failed counts. Rejected rows do not stop the others.
+    """
+    if not is_manager(): return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        donations = _read_donation_batch()
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': f'Unreadable CSV: {e}'}), 400
+    if not donations:
+        return jsonify({'error': 'No donations provided'}), 400
+    max_rows = current_app.config.get('DONATION_BATCH_MAX_ROWS', 5000)
+    if len(donations) > max_rows:
+        return jsonify({'error': f'At most {max_rows} donations per batch'}), 400
+    
+    results = submit_donation_batch(donations)
+    recorded = sum(1 for r in results if r.success)
+    return jsonify({
+        'recorded': recorded,
+        'failed': len(results) - recorded,
+        'results': [r._asdict() for r in results],
+    })
+
 @manager_bp.route('/requests')
 def view_requests():
     """Displays all blood requests with pagination."""
     if not is_manager(): return redirect(url_for('auth.login'))
     
-    page = request.args.get('page', 1, type=int)
     per_page = 10
+    
+    # KEYSET MODE (opt-in): ?after= / ?before= cursors instead of OFFSET paging.
+    cursors = keyset_request_args()
+    if cursors:
+        try:
+            cursor_page = get_all_requests_keyset(per_page, *cursors)
+        except InvalidCursor:
+            cursor_page = get_all_requests_keyset(per_page)
+        return render_template('manager/requests.html', requests=cursor_page.items, cursor_page=cursor_page,
+                               page=1, total_pages=0)
+    
+    page = request.args.get('page', 1, type=int)
     requests, total = get_all_requests(page, per_page)
     
     total_pages = (total + per_page - 1) // per_page
@@ -178,7 +435,7 @@ def approve_request(request_id):
     # APPROVAL WORKFLOW:
     # 1. Updates request status to 'Approved'.
     # 2. Notifies the Recipient.
-    # 3. (Previously) Broadcasted to donors, but now removed to reduce spam.
+    # 3. Notifies the MATCH_NOTIFY_DONORS best-matched donors (off by default to reduce spam).
     success, error = approve_request_transaction(request_id, manager_user_id)
     
     if success:
@@ -186,6 +443,37 @@ def approve_request(request_id):
     else:
         return jsonify({'error': error}), 500
 
+@manager_bp.route('/requests/<int:request_id>/matches')
+def request_matches(request_id):
+    """
+    API Endpoint: The eligible donors best matched to a request (?limit=20, at most 100),
+    ranked by blood type compatibility, area distance and days since their last donation
+    (donor_matching.py). Served from the in-memory donor index only: 503 while it loads
+    or when DONOR_INDEX is off.
+    """
+    if not is_manager(): return jsonify({'error': 'Unauthorized'}), 403
+    
+    limit = min(max(request.args.get('limit', DONOR_MATCH_LIMIT, type=int), 1), DONOR_MATCH_MAX_LIMIT)
+    target = get_request_match_target(request_id)
+    if target is None: return jsonify({'error': 'Request not found'}), 404
+    
+    index = donor_index()
+    matches = index.match_donors(target.blood_type, target.area_id, limit) if index else None
+    if matches is None:
+        return jsonify({'error': 'Donor index not available, try again shortly'}), 503
+    
+    ref = reference_data()
+    area_name = lambda area_id: ref.area_name(area_id) if area_id else None
+    return jsonify({
+        'request': {'id': target.id, 'blood_type': get_blood_type_str(target.blood_type), 'area_id': target.area_id,
+                    'area': area_name(target.area_id), 'status': target.status,
+                    'units_required': target.units_required, 'units_collected': target.units_collected},
+        'matches': [{'id': m.id, 'name': m.name, 'blood_type': get_blood_type_str(m.blood_type_id),
+                     'area_id': m.area_id, 'area': area_name(m.area_id), 'distance_km': m.distance_km,
+                     'days_since_donation': m.days_since_donation, 'score': m.score}
+                    for m in matches],
+    })
+
 @manager_bp.route('/fulfill-request/<int:request_id>', methods=['POST'])
 def fulfill_request(request_id):
     """API Endpoint: Manually fulfill a request (deducts stock)."""
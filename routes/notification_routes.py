@@ -1,5 +1,12 @@
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request
-from db import get_user_notifications, mark_notification_read, mark_all_notifications_read, get_unread_notification_count
+import time
+
+from flask import Blueprint, Response, current_app, render_template, session, redirect, url_for, jsonify, request
+from db import (
+    get_user_notifications, get_user_notifications_keyset, mark_notification_read,
+    mark_all_notifications_read, get_unread_notification_count
+)
+from notification_events import broker, format_sse
+from pagination import InvalidCursor, keyset_request_args
 
 notification_bp = Blueprint('notifications', __name__, url_prefix='/notifications')
 
@@ -13,9 +20,19 @@ def view_notifications():
         return redirect(url_for('auth.login'))
         
     user_id = session['user_id']
+    per_page = 10
+    
+    # KEYSET MODE (opt-in): ?after= / ?before= cursors instead of page numbers.
+    cursors = keyset_request_args()
+    if cursors:
+        try:
+            cursor_page = get_user_notifications_keyset(user_id, per_page, *cursors)
+        except InvalidCursor:
+            cursor_page = get_user_notifications_keyset(user_id, per_page)
+        return render_template('notifications.html', notifications=cursor_page.items, cursor_page=cursor_page,
+                               page=1, total_pages=0)
     
     page = request.args.get('page', 1, type=int)
-    per_page = 10
     notifications, total = get_user_notifications(user_id, page, per_page)
     
     total_pages = (total + per_page - 1) // per_page
@@ -65,3 +82,47 @@ def unread_count():
         
     count = get_unread_notification_count(session['user_id'])
     return jsonify({'count': count})
+
+
+@notification_bp.route('/stream')
+def stream():
+    """
+    Server-Sent Events: pushes the unread count (event 'unread') and new notification
+    summaries (event 'notification') to the browser as db.py publishes them.
+    
+    An idle stream holds no database connection - only a queue subscription - so it is cheap
+    under a gevent worker. The count is re-read (from the TTL cache) after each batch of events,
+    in a short app context that returns its connection to the pool straight away.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+        
+    user_id = session['user_id']
+    app = current_app._get_current_object()
+    heartbeat = app.config.get('NOTIFICATION_STREAM_HEARTBEAT', 15)
+    max_age = app.config.get('NOTIFICATION_STREAM_MAX_AGE', 300)
+    notification_broker = broker()
+    
+    def unread_frame():
+        with app.app_context():
+            return format_sse('unread', {'count': get_unread_notification_count(user_id)})
+    
+    def events():
+        # Subscribe before the first count so nothing published in between is missed
+        with notification_broker.subscribe(user_id) as subscription:
+            yield "retry: 2000\n\n"  # reconnect delay (ms) after max_age or a dropped connection
+            yield unread_frame()
+            
+            deadline = time.monotonic() + max_age
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in [event] + subscription.drain():
+                    if event.get('kind') == 'notification':
+                        yield format_sse('notification', {'message': event['message'], 'type': event['type']})
+                yield unread_frame()
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'X-Accel-Buffering': 'no'})  # no proxy buffering (nginx)
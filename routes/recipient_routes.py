@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, flash
 from db import (
-    get_recipient_by_user_id, get_recipient_requests, create_request_transaction, 
-    update_recipient_profile, get_all_areas, get_user_notifications, get_unread_notification_count
+    get_recipient_by_user_id, get_recipient_dashboard, create_request_transaction, 
+    update_recipient_profile, get_all_areas
 )
 
 recipient_bp = Blueprint('recipient', __name__, url_prefix='/recipient')
@@ -19,23 +19,21 @@ def dashboard():
     if not is_recipient(): return redirect(url_for('auth.login'))
     
     user_id = session.get('user_id')
-    recipient = get_recipient_by_user_id(user_id)
-    
-    if not recipient:
-        return "Recipient profile not found", 404
-        
     page = request.args.get('page', 1, type=int)
     per_page = 5
-    requests, total = get_recipient_requests(recipient.id, page, per_page)
     
-    total_pages = (total + per_page - 1) // per_page
+    # SINGLE ROUND TRIP: profile, request page, notifications and unread count
+    # come back from one batched query (see db.get_recipient_dashboard).
+    dashboard_data = get_recipient_dashboard(user_id, page, per_page, notification_limit=5)
+    
+    if not dashboard_data:
+        return "Recipient profile not found", 404
     
-    # Get Notifications
-    notifications, _ = get_user_notifications(user_id, page=1, per_page=5)
-    unread_count = get_unread_notification_count(user_id)
+    total_pages = (dashboard_data['total'] + per_page - 1) // per_page
     
-    return render_template('recipient/dashboard.html', recipient=recipient, requests=requests, page=page, total_pages=total_pages,
-                           notifications=notifications, unread_count=unread_count)
+    return render_template('recipient/dashboard.html', recipient=dashboard_data['recipient'], requests=dashboard_data['requests'],
+                           page=page, total_pages=total_pages,
+                           notifications=dashboard_data['notifications'], unread_count=dashboard_data['unread_count'])
 
 @recipient_bp.route('/create-request', methods=['POST'])
 def create_request():
@@ -0,0 +1,946 @@
+import os
+import re
+import sqlite3
+from collections import namedtuple
+from datetime import date, datetime
+from functools import lru_cache
+
+from db_backend import Dialect, NamedQuery, query_override, register_query
+
+# ==================================================================================
+# SQLITE BACKEND (local profiling / load testing)
+# ==================================================================================
+# Lets the unchanged app run on a single SQLite file:
+#
+#   export DB_BACKEND=sqlite SQLITE_PATH=bloodlink.db
+#   flask --app run init-sqlite        # Database/sqlite/schema.sql + data.sql + data2.sql
+#   flask --app run run
+#
+# SqliteConnection mimics the pyodbc behaviour db.py relies on: multi-statement batches
+# whose result sets are read with nextset(), attribute access on rows, datetime values,
+# and a transaction that stays open until commit()/rollback(). Writes start it with
+# BEGIN IMMEDIATE, so concurrent writers queue on busy_timeout instead of deadlocking
+# on a lock upgrade. Plain reads run in autocommit, except on the read-only connections
+# of the reporting read pool (DB_READ_MODE), which open a deferred BEGIN on their first
+# statement so every read until rollback() sees the same WAL snapshot.
+#
+# T-SQL is translated once per distinct query text (cached):
+#   GETDATE(), SYSDATETIME()           -> local time with milliseconds
+#   DATEADD(unit, n, x)                -> strftime(..., x, 'n units')
+#   SELECT TOP (n) ...                 -> ... LIMIT n (at the end of the same query level)
+#   OFFSET x ROWS FETCH NEXT y ROWS    -> LIMIT y OFFSET x
+#   OUTPUT INSERTED.a, INSERTED.b      -> RETURNING a, b
+#   ISNULL, LEN, SCOPE_IDENTITY(), @@ROWCOUNT, CAST(? AS DATE|DATETIME), N'...', dbo.
+#   WITH (UPDLOCK, HOLDLOCK, ...)      -> dropped; the statement takes the write lock instead
+# Parameters are re-ordered along with the text they belong to. Batches beyond this
+# subset (DECLARE, IF, MERGE, OUTPUT INTO) have SQLite versions registered at the end of
+# this module under their db.py named_query() names.
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Database', 'sqlite')
+SEED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Database')
+DEFAULT_SEEDS = ('data.sql', 'data2.sql')
+
+# GETDATE() equivalent. DATETIME values are stored as text, so every timestamp - this, the
+# DATEADD translation and datetimes bound from Python (adapter below) - uses the one format
+# 'YYYY-MM-DD HH:MM:SS.mmm' (milliseconds, as SQL Server DATETIME): a row then compares
+# equal to its own timestamp read back and bound again (keyset cursors).
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+# ==================================================================================
+# VALUE CONVERSION
+# ==================================================================================
+
+def _to_datetime(value):
+    return datetime.fromisoformat(value.decode() if isinstance(value, bytes) else value)
+
+def _to_date(value):
+    return date.fromisoformat((value.decode() if isinstance(value, bytes) else value)[:10])
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' ', timespec='milliseconds'))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('DATETIME', _to_datetime)
+sqlite3.register_converter('DATE', _to_date)
+sqlite3.register_converter('BIT', lambda value: value not in (b'0', b''))
+
+# Declared column types are converted by the converters above. Computed columns
+# (MAX(donation_date) AS last_donation) carry no type, so temporal-looking names are
+# parsed from their text as pyodbc would have returned datetimes for them.
+_TEMPORAL_NAME = re.compile(r'date|_at$|^last_donation|run_after', re.IGNORECASE)
+_TEMPORAL_TEXT = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$')
+
+
+class Row(tuple):
+    """A result row supporting row[0] and row.column_name, like pyodbc.Row."""
+
+    __slots__ = ()
+    _index = {}
+    cursor_description = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+@lru_cache(maxsize=512)
+def _row_class(names):
+    index = {}
+    for i, name in enumerate(names):
+        index.setdefault(name, i)
+    temporal = tuple(i for i, name in enumerate(names) if _TEMPORAL_NAME.search(name))
+    return type('Row', (Row,), {'__slots__': (), '_index': index}), temporal
+
+def _make_rows(description, raw_rows):
+    row_class, temporal = _row_class(tuple(column[0] for column in description))
+    row_class.cursor_description = description
+    rows = []
+    for raw in raw_rows:
+        if temporal:
+            raw = list(raw)
+            for i in temporal:
+                value = raw[i]
+                if isinstance(value, str) and _TEMPORAL_TEXT.match(value):
+                    raw[i] = _to_date(value) if len(value) == 10 else _to_datetime(value)
+        rows.append(row_class(raw))
+    return rows
+
+# ==================================================================================
+# T-SQL TRANSLATION
+# ==================================================================================
+
+Statement = namedtuple('Statement', ['sql', 'params', 'writes'])
+
+_TOKENS = re.compile(r"""
+    (?P<string>(?:(?<!\w)N)?'(?:[^']|'')*')
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<param>\?)
+  | (?P<named>(?<![:\w]):[A-Za-z_]\w*)
+""", re.VERBOSE | re.DOTALL)
+_STRING_MARK = re.compile(r'\x01(\d+)\x01')
+_PARAM_MARK = re.compile(r'\x02(\d+)\x02')
+
+_NOCOUNT = re.compile(r'^SET\s+NOCOUNT\s+(?:ON|OFF)$', re.IGNORECASE)
+_UNSUPPORTED = re.compile(r'^(?:DECLARE|IF|BEGIN|MERGE|EXEC|PRINT)\b', re.IGNORECASE)
+_LOCK_HINTS = re.compile(r'\bWITH\s*\(\s*((?:NOLOCK|UPDLOCK|HOLDLOCK|ROWLOCK|READPAST|SERIALIZABLE|TABLOCKX?|'
+                         r'PAGLOCK|XLOCK|READCOMMITTED|REPEATABLEREAD|NOWAIT)\b[^)]*)\)', re.IGNORECASE)
+_WRITE_LOCKS = re.compile(r'UPDLOCK|HOLDLOCK|SERIALIZABLE|TABLOCK|XLOCK', re.IGNORECASE)
+_WRITES = re.compile(r'^(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+_CTE_WRITES = re.compile(r'\b(?:INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+_FUNCTIONS = [
+    (re.compile(r'\b(?:GETDATE|SYSDATETIME)\s*\(\s*\)|\bCURRENT_TIMESTAMP\b', re.IGNORECASE), NOW),
+    (re.compile(r'\bSCOPE_IDENTITY\s*\(\s*\)', re.IGNORECASE), 'last_insert_rowid()'),
+    (re.compile(r'@@ROWCOUNT\b', re.IGNORECASE), 'changes()'),
+    (re.compile(r'\bISNULL\s*\(', re.IGNORECASE), 'IFNULL('),
+    (re.compile(r'\bLEN\s*\(', re.IGNORECASE), 'LENGTH('),
+    (re.compile(r'\bdbo\.', re.IGNORECASE), ''),
+    (re.compile(r'\bCAST\s*\(\s*(\x02\d+\x02)\s+AS\s+(?:DATETIME2?|DATE)\s*\)', re.IGNORECASE), r'\1'),
+    (re.compile(r'\bOFFSET\s+(\S+?)\s+ROWS?\s+FETCH\s+(?:NEXT|FIRST)\s+(\S+?)\s+ROWS?\s+ONLY\b', re.IGNORECASE),
+     r'LIMIT \2 OFFSET \1'),
+]
+_DATEADD = re.compile(r'\bDATEADD\s*\(', re.IGNORECASE)
+_DATEADD_UNITS = {
+    'year': 'years', 'yy': 'years', 'yyyy': 'years',
+    'month': 'months', 'mm': 'months', 'm': 'months',
+    'day': 'days', 'dd': 'days', 'd': 'days',
+    'hour': 'hours', 'hh': 'hours',
+    'minute': 'minutes', 'mi': 'minutes', 'n': 'minutes',
+    'second': 'seconds', 'ss': 'seconds', 's': 'seconds',
+}
+_TOP = re.compile(r'\bSELECT(\s+DISTINCT)?\s+TOP\s*(?:\(\s*([^()]*?)\s*\)|(\d+|\x02\d+\x02))\s*', re.IGNORECASE)
+_OUTPUT = re.compile(r'\s*\bOUTPUT\s+(INSERTED\.\w+(?:\s*,\s*INSERTED\.\w+)*)(?!\s+INTO)', re.IGNORECASE)
+
+
+def _mask(sql, names=()):
+    """
+    Replaces string literals with \\x01n\\x01 and parameters with \\x02i\\x02 (i = index into
+    the caller's parameter tuple) and drops comments, so rewriting can never touch them.
+    `:name` placeholders resolve through `names`; plain ? take the following positions.
+    """
+    strings = []
+    position = [len(names)]
+
+    def replace(match):
+        kind = match.lastgroup
+        if kind == 'string':
+            text = match.group()
+            strings.append(text[1:] if text[0] in 'Nn' else text)
+            return f'\x01{len(strings) - 1}\x01'
+        if kind == 'comment':
+            return ' '
+        if kind == 'named':
+            try:
+                return f'\x02{names.index(match.group()[1:])}\x02'
+            except ValueError:
+                raise sqlite3.ProgrammingError(f'Unknown parameter {match.group()}') from None
+        position[0] += 1
+        return f'\x02{position[0] - 1}\x02'
+
+    return _TOKENS.sub(replace, sql), strings
+
+def _unmask(text, strings):
+    """Restores string literals and turns parameter marks into ?, returning their indexes in order."""
+    params = tuple(int(index) for index in _PARAM_MARK.findall(text))
+    text = _PARAM_MARK.sub('?', text)
+    return _STRING_MARK.sub(lambda m: strings[int(m.group(1))], text), params
+
+def _split_args(text, start):
+    """Splits the call arguments starting at `start` (just after '(') on top-level commas."""
+    args, depth, begin = [], 0, start
+    for i in range(start, len(text)):
+        ch = text[i]
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            if depth == 0:
+                args.append(text[begin:i].strip())
+                return args, i + 1
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            args.append(text[begin:i].strip())
+            begin = i + 1
+    raise sqlite3.ProgrammingError('Unbalanced parentheses in DATEADD')
+
+def _rewrite_dateadd(text):
+    while True:
+        match = _DATEADD.search(text)
+        if not match:
+            return text
+        (unit, amount, value), end = _split_args(text, match.end())
+        unit = unit.lower()
+        if unit in ('week', 'wk', 'ww'):
+            modifier = f"(({amount}) * 7) || ' days'"
+        elif unit in _DATEADD_UNITS:
+            modifier = f"({amount}) || ' {_DATEADD_UNITS[unit]}'"
+        else:
+            raise sqlite3.NotSupportedError(f'DATEADD unit {unit!r} is not supported on SQLite')
+        text = f"{text[:match.start()]}strftime('%Y-%m-%d %H:%M:%f', {value}, {modifier}){text[end:]}"
+
+def _rewrite_top(text):
+    """Moves each SELECT TOP (n) to a LIMIT n at the end of the same parenthesis level."""
+    while True:
+        match = _TOP.search(text)
+        if not match:
+            return text
+        limit = match.group(2) or match.group(3)
+        rest = text[match.end():]
+        depth, cut = 0, len(rest)
+        for i, ch in enumerate(rest):
+            if ch == '(':
+                depth += 1
+            elif ch == ')':
+                if depth == 0:
+                    cut = i
+                    break
+                depth -= 1
+        text = (f"{text[:match.start()]}SELECT{match.group(1) or ''} {rest[:cut].rstrip()} "
+                f"LIMIT {limit}{' ' if cut < len(rest) else ''}{rest[cut:]}")
+
+def _translate(text):
+    """
+    Rewrites one masked T-SQL statement into SQLite.
+
+    Returns:
+        (str, bool): (statement, takes the write lock)
+    """
+    locks = False
+    for match in _LOCK_HINTS.finditer(text):
+        locks = locks or bool(_WRITE_LOCKS.search(match.group(1)))
+    text = _LOCK_HINTS.sub('', text)
+
+    for pattern, replacement in _FUNCTIONS:
+        text = pattern.sub(replacement, text)
+    text = _rewrite_dateadd(text)
+    text = _rewrite_top(text)
+
+    output = _OUTPUT.search(text)
+    if output:
+        columns = re.sub(r'(?i)INSERTED\.', '', output.group(1))
+        text = f'{text[:output.start()]}{text[output.end():]} RETURNING {columns}'
+    return text, locks
+
+@lru_cache(maxsize=1024)
+def prepare(sql, names=()):
+    """
+    Translates a (possibly multi-statement) batch into SQLite statements.
+
+    Args:
+        sql (str): T-SQL from db.py or a registered SQLite override.
+        names (tuple[str]): Override parameter names (see db_backend.QueryOverride).
+
+    Returns:
+        list[Statement]: (sql, indexes into the caller's parameters, takes the write lock)
+    """
+    masked, strings = _mask(sql, names)
+    statements = []
+    for text in masked.split(';'):
+        text = ' '.join(text.split())
+        if not text or _NOCOUNT.match(text):
+            continue
+        if _UNSUPPORTED.match(text):
+            raise sqlite3.NotSupportedError(
+                f'T-SQL statement needs a SQLite override (register_query): {text[:80]}')
+        text, locks = _translate(text)
+        text, params = _unmask(text, strings)
+        writes = locks or bool(_WRITES.match(text)) or (text[:4].upper() == 'WITH' and bool(_CTE_WRITES.search(text)))
+        statements.append(Statement(text, params, writes))
+    return statements
+
+def prepare_query(sql):
+    """Resolves a db.py query to its SQLite statements (registered override first)."""
+    if isinstance(sql, NamedQuery):
+        override = query_override(SqliteDialect.name, sql.name)
+        if override is not None:
+            text = override.sql.format(**sql.fields) if sql.fields else override.sql
+            return prepare(text, override.params)
+    return prepare(str(sql))
+
+# ==================================================================================
+# CONNECTION / CURSOR (pyodbc-compatible surface used by db.py)
+# ==================================================================================
+
+class SqliteCursor:
+    """
+    Runs a translated batch statement by statement. Every statement that returns rows
+    contributes one result set (as with SET NOCOUNT ON); fetch* reads the current one and
+    nextset() moves to the next. rowcount is that of the last INSERT/UPDATE/DELETE.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor()
+        self._results = []
+        self._rows = None
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        raw = self.connection.raw
+        results = []
+        rowcount = -1
+        for statement in prepare_query(sql):
+            try:
+                values = [params[i] for i in statement.params]
+            except IndexError:
+                raise sqlite3.ProgrammingError(
+                    f'Statement needs {max(statement.params) + 1} parameter(s), got {len(params)}') from None
+            if not raw.in_transaction:
+                if statement.writes:
+                    raw.execute('BEGIN IMMEDIATE')
+                elif self.connection.snapshot:
+                    raw.execute('BEGIN')
+            self._cursor.execute(statement.sql, values)
+            if self._cursor.description is not None:
+                rows = _make_rows(self._cursor.description, self._cursor.fetchall())
+                results.append((self._cursor.description, rows))
+                if statement.writes:
+                    rowcount = len(rows)
+            else:
+                rowcount = self._cursor.rowcount
+        self._results = results
+        self.rowcount = rowcount
+        self._next_result()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        for params in seq_of_params:
+            self.execute(sql, params)
+
+    def _next_result(self):
+        if self._results:
+            self.description, rows = self._results.pop(0)
+            self._rows = iter(rows)
+            return True
+        self.description, self._rows = None, None
+        return False
+
+    def nextset(self):
+        return self._next_result() or None
+
+    def _current(self):
+        if self._rows is None:
+            raise sqlite3.ProgrammingError('No results. Previous SQL was not a query.')
+        return self._rows
+
+    def fetchone(self):
+        return next(self._current(), None)
+
+    def fetchmany(self, size=1):
+        rows = self._current()
+        return [row for _, row in zip(range(size), rows)]
+
+    def fetchall(self):
+        return list(self._current())
+
+    def __iter__(self):
+        return self._current()
+
+    def close(self):
+        self._results, self._rows = [], None
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """
+    Wraps a sqlite3 connection opened in autocommit mode; SqliteCursor opens transactions.
+    With `snapshot`, reads run in a transaction too (one WAL snapshot until rollback).
+    """
+
+    def __init__(self, raw, snapshot=False):
+        self.raw = raw
+        self.snapshot = snapshot
+
+    def cursor(self):
+        return SqliteCursor(self)
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.execute('COMMIT')
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute('ROLLBACK')
+
+    def close(self):
+        self.raw.close()
+
+
+def open_raw(path, busy_timeout=30.0):
+    """Opens a sqlite3 connection with the settings every backend connection uses."""
+    raw = sqlite3.connect(path, timeout=busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                          isolation_level=None, check_same_thread=False, cached_statements=256)
+    raw.execute('PRAGMA journal_mode = WAL')   # readers never block the writer
+    raw.execute('PRAGMA synchronous = NORMAL')  # durable at checkpoints; fine for load tests
+    raw.execute('PRAGMA foreign_keys = ON')
+    raw.execute('PRAGMA temp_store = MEMORY')
+    return raw
+
+
+class SqliteDialect(Dialect):
+    """
+    SQLite file backend.
+
+    Args:
+        path (str): Database file (created by `flask --app run init-sqlite`).
+        busy_timeout (float): Seconds a writer waits for the write lock before failing.
+        read_only (bool): Connections refuse writes (PRAGMA query_only) and read from one
+                          WAL snapshot per transaction; used by the reporting read pool.
+    """
+
+    name = 'sqlite'
+    error_types = (sqlite3.Error,)
+
+    def __init__(self, path, busy_timeout=30.0, read_only=False):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.read_only = read_only
+
+    def classify_error(self, exc):
+        # Writers serialize on BEGIN IMMEDIATE, so there are no deadlocks; a writer that waited
+        # busy_timeout for the write lock may still get it on another attempt
+        if isinstance(exc, sqlite3.OperationalError) and 'locked' in str(exc):
+            return 'lock_timeout'
+        return None
+
+    def connect(self):
+        raw = open_raw(self.path, self.busy_timeout)
+        if self.read_only:
+            raw.execute('PRAGMA query_only = ON')
+        return SqliteConnection(raw, snapshot=self.read_only)
+
+    def describe(self):
+        return f'sqlite ({self.path}, read-only)' if self.read_only else f'sqlite ({self.path})'
+
+# ==================================================================================
+# SQLITE VERSIONS OF T-SQL-SPECIFIC BATCHES (db.py named_query names)
+# ==================================================================================
+# Each batch runs inside the caller's write transaction (BEGIN IMMEDIATE), so the
+# table variables and UPDLOCK/READPAST locking of the T-SQL versions are not needed.
+
+register_query('sqlite', 'consume_stock', f"""
+    CREATE TEMP TABLE IF NOT EXISTS fefo_taken (bag_id INTEGER PRIMARY KEY, take INTEGER NOT NULL,
+                                                whole INTEGER NOT NULL, expires_on DATE NOT NULL);
+    DELETE FROM temp.fefo_taken;
+
+    INSERT INTO temp.fefo_taken (bag_id, take, whole, expires_on)
+    SELECT bag_id,
+           CASE WHEN running <= :needed THEN units ELSE units - (running - :needed) END,
+           CASE WHEN running <= :needed THEN 1 ELSE 0 END,
+           date(expires_at)
+    FROM (
+        SELECT bag_id, units, expires_at,
+               SUM(units) OVER (ORDER BY expires_at, bag_id ROWS UNBOUNDED PRECEDING) AS running
+        FROM (
+            SELECT bag_id, units, expires_at
+            FROM Stock
+            WHERE area_id = :area_id AND blood_type = :blood_type AND expires_at > {NOW}
+            ORDER BY expires_at, bag_id
+            LIMIT :needed
+        )
+    )
+    WHERE running - units < :needed
+      AND IFNULL((SELECT SUM(units) FROM Inventory_Bucket
+                  WHERE area_id = :area_id AND blood_type = :blood_type
+                    AND expires_on > date('now', 'localtime')), 0) >= :needed;
+
+    DELETE FROM Stock
+    WHERE bag_id IN (SELECT bag_id FROM temp.fefo_taken WHERE whole = 1)
+      AND (SELECT SUM(take) FROM temp.fefo_taken) = :needed;
+    UPDATE Stock
+    SET units = units - (SELECT take FROM temp.fefo_taken t WHERE t.bag_id = Stock.bag_id)
+    WHERE bag_id IN (SELECT bag_id FROM temp.fefo_taken WHERE whole = 0)
+      AND (SELECT SUM(take) FROM temp.fefo_taken) = :needed;
+    UPDATE Inventory_Summary SET units = units - :needed
+    WHERE area_id = :area_id AND blood_type = :blood_type
+      AND (SELECT SUM(take) FROM temp.fefo_taken) = :needed;
+    UPDATE Inventory_Bucket
+    SET units = Inventory_Bucket.units - t.take
+    FROM (SELECT expires_on, SUM(take) AS take FROM temp.fefo_taken GROUP BY expires_on) t
+    WHERE Inventory_Bucket.area_id = :area_id AND Inventory_Bucket.blood_type = :blood_type
+      AND Inventory_Bucket.expires_on = t.expires_on
+      AND (SELECT SUM(take) FROM temp.fefo_taken) = :needed;
+
+    SELECT IFNULL(SUM(take), 0) FROM temp.fefo_taken;
+""", params=('area_id', 'blood_type', 'needed'))
+
+register_query('sqlite', 'adjust_inventory_summary', """
+    INSERT INTO Inventory_Summary (area_id, blood_type, units) VALUES (:area_id, :blood_type, :delta)
+    ON CONFLICT (area_id, blood_type) DO UPDATE SET units = units + excluded.units;
+""", params=('delta', 'area_id', 'blood_type'))
+
+register_query('sqlite', 'adjust_inventory_bucket', """
+    INSERT INTO Inventory_Bucket (area_id, blood_type, expires_on, units)
+    VALUES (:area_id, :blood_type, :expires_on, :delta)
+    ON CONFLICT (area_id, blood_type, expires_on) DO UPDATE SET units = units + excluded.units;
+""", params=('delta', 'area_id', 'blood_type', 'expires_on'))
+
+# {values} is one (?, ?, ?, ?) per (area_id, blood_type, expires_on, delta) row. Existing rows are updated
+# before missing ones are inserted (like the MERGE): an upsert's candidate row is checked against
+# units >= 0 before the conflict is resolved, so negative deltas would fail.
+register_query('sqlite', 'adjust_inventory_summaries', """
+    CREATE TEMP TABLE IF NOT EXISTS inventory_delta (area_id INTEGER NOT NULL, blood_type INTEGER NOT NULL,
+                                                     expires_on DATE NULL, delta INTEGER NOT NULL);
+    DELETE FROM temp.inventory_delta;
+    INSERT INTO temp.inventory_delta (area_id, blood_type, expires_on, delta) VALUES {values};
+
+    UPDATE Inventory_Summary
+    SET units = Inventory_Summary.units + d.delta
+    FROM (SELECT area_id, blood_type, SUM(delta) AS delta FROM temp.inventory_delta GROUP BY area_id, blood_type) d
+    WHERE Inventory_Summary.area_id = d.area_id AND Inventory_Summary.blood_type = d.blood_type;
+    INSERT INTO Inventory_Summary (area_id, blood_type, units)
+    SELECT area_id, blood_type, SUM(delta) FROM temp.inventory_delta d
+    WHERE NOT EXISTS (SELECT 1 FROM Inventory_Summary i WHERE i.area_id = d.area_id AND i.blood_type = d.blood_type)
+    GROUP BY area_id, blood_type;
+
+    UPDATE Inventory_Bucket
+    SET units = Inventory_Bucket.units + d.delta
+    FROM temp.inventory_delta d
+    WHERE Inventory_Bucket.area_id = d.area_id AND Inventory_Bucket.blood_type = d.blood_type
+      AND Inventory_Bucket.expires_on = d.expires_on;
+    INSERT INTO Inventory_Bucket (area_id, blood_type, expires_on, units)
+    SELECT area_id, blood_type, expires_on, delta FROM temp.inventory_delta d
+    WHERE expires_on IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM Inventory_Bucket b
+        WHERE b.area_id = d.area_id AND b.blood_type = d.blood_type AND b.expires_on = d.expires_on);
+""")
+
+register_query('sqlite', 'retire_expired_stock', f"""
+    CREATE TEMP TABLE IF NOT EXISTS stock_gone (bag_id INTEGER PRIMARY KEY, area_id INTEGER NULL, blood_type INTEGER NULL,
+                                                expires_on DATE NOT NULL, units INTEGER NOT NULL);
+    DELETE FROM temp.stock_gone;
+
+    INSERT INTO temp.stock_gone (bag_id, area_id, blood_type, expires_on, units)
+    SELECT bag_id, area_id, blood_type, date(expires_at), units
+    FROM Stock
+    WHERE expires_at <= {NOW}
+    LIMIT :chunk_size;
+
+    DELETE FROM Stock WHERE bag_id IN (SELECT bag_id FROM temp.stock_gone);
+
+    UPDATE Inventory_Summary
+    SET units = Inventory_Summary.units - g.units
+    FROM (SELECT area_id, blood_type, SUM(units) AS units FROM temp.stock_gone GROUP BY area_id, blood_type) g
+    WHERE Inventory_Summary.area_id = g.area_id AND Inventory_Summary.blood_type = g.blood_type;
+
+    UPDATE Inventory_Bucket
+    SET units = Inventory_Bucket.units - g.units
+    FROM (SELECT area_id, blood_type, expires_on, SUM(units) AS units FROM temp.stock_gone
+          GROUP BY area_id, blood_type, expires_on) g
+    WHERE Inventory_Bucket.area_id = g.area_id AND Inventory_Bucket.blood_type = g.blood_type
+      AND Inventory_Bucket.expires_on = g.expires_on;
+
+    DELETE FROM Inventory_Bucket WHERE expires_on <= date('now', 'localtime') AND units <= 0;
+
+    SELECT COUNT(*), IFNULL(SUM(units), 0) FROM temp.stock_gone;
+""", params=('chunk_size',))
+
+# {values} is one (?, ?, ?, ?, ?, ?) per (seq, from_area, to_area, blood_type, first_unit, units) transfer
+register_query('sqlite', 'transfer_stock', f"""
+    CREATE TEMP TABLE IF NOT EXISTS transfer_plan (seq INTEGER PRIMARY KEY, from_area INTEGER NOT NULL,
+                                                   to_area INTEGER NOT NULL, blood_type INTEGER NOT NULL,
+                                                   first_unit INTEGER NOT NULL, units INTEGER NOT NULL);
+    CREATE TEMP TABLE IF NOT EXISTS transfer_moved (bag_id INTEGER PRIMARY KEY, seq INTEGER NOT NULL,
+                                                    expires_on DATE NOT NULL, units INTEGER NOT NULL);
+    DELETE FROM temp.transfer_plan;
+    DELETE FROM temp.transfer_moved;
+    INSERT INTO temp.transfer_plan (seq, from_area, to_area, blood_type, first_unit, units) VALUES {{values}};
+
+    INSERT INTO temp.transfer_moved (bag_id, seq, expires_on, units)
+    SELECT b.bag_id, p.seq, date(b.expires_at), b.units
+    FROM (
+        SELECT s.bag_id, s.area_id, s.blood_type, s.units, s.expires_at,
+               SUM(s.units) OVER (PARTITION BY s.area_id, s.blood_type
+                                  ORDER BY s.expires_at DESC, s.bag_id DESC ROWS UNBOUNDED PRECEDING) AS running
+        FROM Stock s
+        WHERE s.expires_at > {NOW}
+          AND EXISTS (SELECT 1 FROM temp.transfer_plan p WHERE p.from_area = s.area_id AND p.blood_type = s.blood_type)
+    ) b
+    JOIN temp.transfer_plan p ON p.from_area = b.area_id AND p.blood_type = b.blood_type
+     AND b.running - b.units >= p.first_unit AND b.running - b.units < p.first_unit + p.units;
+
+    UPDATE Stock
+    SET area_id = p.to_area
+    FROM temp.transfer_moved m
+    JOIN temp.transfer_plan p ON p.seq = m.seq
+    WHERE Stock.bag_id = m.bag_id;
+
+    SELECT seq, expires_on, SUM(units) AS units FROM temp.transfer_moved GROUP BY seq, expires_on;
+""")
+
+register_query('sqlite', 'reconcile_apply', """
+    INSERT INTO Inventory_Summary (area_id, blood_type, units)
+    SELECT area_id, blood_type, SUM(units)
+    FROM Stock
+    WHERE area_id IS NOT NULL
+    GROUP BY area_id, blood_type
+    ON CONFLICT (area_id, blood_type) DO UPDATE SET units = excluded.units
+    WHERE units <> excluded.units;
+
+    UPDATE Inventory_Summary SET units = 0
+    WHERE units <> 0 AND NOT EXISTS (
+        SELECT 1 FROM Stock s
+        WHERE s.area_id = Inventory_Summary.area_id AND s.blood_type = Inventory_Summary.blood_type);
+""")
+
+# date() instead of CAST(... AS DATE), which SQLite would turn into a number
+_ACTUAL_BUCKETS = """
+    SELECT area_id, blood_type, date(expires_at) AS expires_on, SUM(units) AS units
+    FROM Stock
+    WHERE area_id IS NOT NULL AND blood_type IS NOT NULL AND expires_at IS NOT NULL
+    GROUP BY area_id, blood_type, date(expires_at)
+"""
+
+register_query('sqlite', 'reconcile_buckets_drift', f"""
+    SELECT COALESCE(a.area_id, b.area_id) AS area_id,
+           COALESCE(a.blood_type, b.blood_type) AS blood_type,
+           COALESCE(a.expires_on, b.expires_on) AS expires_on,
+           IFNULL(b.units, 0) AS bucket_units,
+           IFNULL(a.units, 0) AS actual_units
+    FROM ({_ACTUAL_BUCKETS}) a
+    FULL OUTER JOIN Inventory_Bucket b
+        ON b.area_id = a.area_id AND b.blood_type = a.blood_type AND b.expires_on = a.expires_on
+    WHERE IFNULL(b.units, 0) <> IFNULL(a.units, 0)
+    ORDER BY 1, 2, 3
+""")
+
+register_query('sqlite', 'reconcile_buckets_apply', f"""
+    INSERT INTO Inventory_Bucket (area_id, blood_type, expires_on, units)
+    SELECT area_id, blood_type, expires_on, units FROM ({_ACTUAL_BUCKETS}) WHERE true
+    ON CONFLICT (area_id, blood_type, expires_on) DO UPDATE SET units = excluded.units
+    WHERE units <> excluded.units;
+
+    DELETE FROM Inventory_Bucket
+    WHERE NOT EXISTS (
+        SELECT 1 FROM Stock s
+        WHERE s.area_id = Inventory_Bucket.area_id AND s.blood_type = Inventory_Bucket.blood_type
+          AND date(s.expires_at) = Inventory_Bucket.expires_on);
+""")
+
+register_query('sqlite', 'donor_dashboard', """
+    SELECT d.*, bt.type as blood_type_str
+    FROM Donor d
+    JOIN Blood_Type bt ON d.bloodtype = bt.bloodtype_id
+    WHERE d.user_id = :user_id;
+
+    SELECT COUNT(*) as total
+    FROM Donation_Completed
+    WHERE donor_id = (SELECT id FROM Donor WHERE user_id = :user_id);
+
+    SELECT units, donation_date, is_exchange
+    FROM Donation_Completed
+    WHERE donor_id = (SELECT id FROM Donor WHERE user_id = :user_id)
+    ORDER BY donation_date DESC
+    LIMIT :per_page OFFSET :offset;
+
+    SELECT id, message, is_read, created_at, type
+    FROM Notifications
+    WHERE user_id = :user_id
+    ORDER BY created_at DESC
+    LIMIT :notification_limit;
+
+    SELECT unread_notifications FROM [User] WHERE id = :user_id;
+""", params=('user_id', 'offset', 'per_page', 'notification_limit'))
+
+register_query('sqlite', 'recipient_dashboard', """
+    SELECT r.*, bt.type as blood_type_str, a.name as area_name
+    FROM Recipient r
+    LEFT JOIN Blood_Type bt ON r.bloodtype = bt.bloodtype_id
+    LEFT JOIN Area a ON r.area_id = a.id
+    WHERE r.user_id = :user_id;
+
+    SELECT COUNT(*) FROM Request
+    WHERE recipient_id = (SELECT id FROM Recipient WHERE user_id = :user_id);
+
+    SELECT * FROM Request
+    WHERE recipient_id = (SELECT id FROM Recipient WHERE user_id = :user_id)
+    ORDER BY date_requested DESC
+    LIMIT :per_page OFFSET :offset;
+
+    SELECT id, message, is_read, created_at, type
+    FROM Notifications
+    WHERE user_id = :user_id
+    ORDER BY created_at DESC
+    LIMIT :notification_limit;
+
+    SELECT unread_notifications FROM [User] WHERE id = :user_id;
+""", params=('user_id', 'offset', 'per_page', 'notification_limit'))
+
+# {target_sql} is db._broadcast_target_sql(); its own ? parameters follow the named ones
+register_query('sqlite', 'broadcast_chunk', """
+    CREATE TEMP TABLE IF NOT EXISTS broadcast_sent (user_id INTEGER PRIMARY KEY);
+    DELETE FROM temp.broadcast_sent;
+
+    INSERT INTO temp.broadcast_sent (user_id)
+    SELECT t.user_id
+    FROM ({target_sql}) t
+    WHERE t.user_id > :after
+    ORDER BY t.user_id
+    LIMIT :chunk_size;
+
+    INSERT INTO Notifications (user_id, message, type)
+    SELECT user_id, :message, 'Broadcast' FROM temp.broadcast_sent;
+
+    UPDATE [User]
+    SET unread_notifications = unread_notifications + 1
+    WHERE id IN (SELECT user_id FROM temp.broadcast_sent);
+
+    SELECT COUNT(*), MAX(user_id) FROM temp.broadcast_sent;
+""", params=('chunk_size', 'message', 'after'))
+
+register_query('sqlite', 'mark_notification_read', """
+    UPDATE [User]
+    SET unread_notifications = MAX(unread_notifications - 1, 0)
+    WHERE id = :user_id AND EXISTS (
+        SELECT 1 FROM Notifications
+        WHERE id = :notification_id AND user_id = :user_id AND is_read = 0);
+
+    UPDATE Notifications
+    SET is_read = 1
+    WHERE id = :notification_id AND user_id = :user_id AND is_read = 0;
+""", params=('user_id', 'notification_id'))
+
+register_query('sqlite', 'mark_all_notifications_read', """
+    UPDATE [User]
+    SET unread_notifications = MAX(unread_notifications - (
+        SELECT COUNT(*) FROM Notifications WHERE user_id = :user_id AND is_read = 0), 0)
+    WHERE id = :user_id;
+
+    UPDATE Notifications
+    SET is_read = 1
+    WHERE user_id = :user_id AND is_read = 0;
+""", params=('user_id',))
+
+register_query('sqlite', 'insert_job', f"""
+    INSERT INTO Jobs (kind, payload, idempotency_key, max_attempts, run_after)
+    VALUES (:kind, :payload, :key, :max_attempts, IFNULL(:run_after, {NOW}))
+    ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING;
+
+    SELECT CASE WHEN changes() > 0 THEN last_insert_rowid()
+                ELSE (SELECT id FROM Jobs WHERE idempotency_key = :key) END,
+           changes() > 0;
+""", params=('key', 'kind', 'payload', 'max_attempts', 'run_after'))
+
+# Writers are serialized, so the oldest runnable row can be claimed with a plain UPDATE
+register_query('sqlite', 'claim_job', f"""
+    UPDATE Jobs
+    SET status = 'Running',
+        attempts = attempts + 1,
+        locked_by = :worker_id,
+        run_after = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime', :lease_seconds || ' seconds'),
+        updated_at = {NOW}
+    WHERE id = (
+        SELECT id FROM Jobs
+        WHERE status IN ('Queued', 'Running') AND run_after <= {NOW}
+        ORDER BY run_after, id
+        LIMIT 1)
+    RETURNING id, kind, payload, attempts, max_attempts, progress_done, checkpoint;
+""", params=('worker_id', 'lease_seconds'))
+
+# ==================================================================================
+# SCHEMA AND SEED DATA
+# ==================================================================================
+# Database/sqlite/schema.sql is the SQLite equivalent of create.sql plus every migration.
+# The seed scripts are the same T-SQL files used for SQL Server; run_tsql_script() runs
+# the subset they use (DECLARE, SET/SELECT @var = ..., table variables, IF [NOT] EXISTS,
+# PRINT, DBCC) and apply_derived_data() replaces their "DERIVED DATA" section.
+
+DERIVED_DATA_MARKER = '-- DERIVED DATA'
+
+_DECLARE_TABLE = re.compile(r'^DECLARE\s+@(\w+)\s+TABLE\s*(\(.*\))$', re.IGNORECASE)
+_DECLARE_SCALAR = re.compile(r'^@(\w+)\s+[^=]+?(?:\s*=\s*(.+))?$', re.IGNORECASE)
+_ASSIGN = re.compile(r'^(SET|SELECT)\s+@(\w+)\s*=\s*(.+)$', re.IGNORECASE)
+_IF_EXISTS = re.compile(r'^IF\s+(NOT\s+)?EXISTS\s*\(', re.IGNORECASE)
+_VARIABLE = re.compile(r'(?<!@)@(\w+)')
+
+
+class _ScriptRunner:
+    """Runs one GO batch of a T-SQL seed script; variables live for the batch."""
+
+    def __init__(self, raw, echo):
+        self.raw = raw
+        self.echo = echo
+        self.variables = {}
+        self.tables = []
+
+    def run(self, batch):
+        masked, self.strings = _mask(batch)
+        try:
+            for text in masked.split(';'):
+                text = ' '.join(text.split())
+                if text:
+                    self.statement(text)
+        finally:
+            for name in self.tables:
+                self.raw.execute(f'DROP TABLE IF EXISTS temp.tv_{name}')
+
+    def statement(self, text):
+        keyword = text.split(None, 1)[0].upper()
+        if keyword == 'PRINT':
+            if self.echo:
+                self.echo(_unmask(text[5:].strip(), self.strings)[0].strip("'"))
+            return
+        if keyword == 'DBCC' or _NOCOUNT.match(text):
+            return  # identity reseeds: rowids restart after DELETE of every row anyway
+
+        table = _DECLARE_TABLE.match(text)
+        if table:
+            name = table.group(1).lower()
+            self.raw.execute(f'CREATE TEMP TABLE tv_{name} {table.group(2)}')
+            self.tables.append(name)
+            return
+        if keyword == 'DECLARE':
+            declarations, _ = _split_args(text[len('DECLARE'):] + ')', 0)
+            for declaration in declarations:
+                match = _DECLARE_SCALAR.match(declaration)
+                self.variables[match.group(1).lower()] = self.scalar(match.group(2)) if match.group(2) else None
+            return
+
+        assign = _ASSIGN.match(text)
+        if assign:
+            kind, name, expression = assign.groups()
+            rows = self.query(f'SELECT {expression}')
+            if kind.upper() == 'SET':
+                self.variables[name.lower()] = rows[0][0] if rows else None
+            elif rows:
+                self.variables[name.lower()] = rows[-1][0]  # T-SQL keeps the last row's value
+            return
+
+        condition = _IF_EXISTS.match(text)
+        if condition:
+            _, end = _split_args(text, condition.end())
+            subquery = text[condition.end():end - 1]
+            exists = self.query(f"SELECT {condition.group(1) or ''}EXISTS ({subquery})")[0][0]
+            if exists:
+                self.statement(text[end:].strip())
+            return
+
+        self.query(text)
+
+    def scalar(self, expression):
+        return self.query(f'SELECT {expression}')[0][0]
+
+    def query(self, text):
+        values = []
+
+        def substitute(match):
+            name = match.group(1).lower()
+            if name in self.tables:
+                return f'temp.tv_{name}'
+            if name not in self.variables:
+                raise sqlite3.ProgrammingError(f'Undeclared variable @{match.group(1)}')
+            values.append(self.variables[name])
+            return f'\x02{len(values) - 1}\x02'
+
+        text, _ = _translate(_VARIABLE.sub(substitute, text))
+        sql, params = _unmask(text, self.strings)
+        return self.raw.execute(sql, [values[i] for i in params]).fetchall()
+
+
+def run_tsql_script(raw, script, echo=None):
+    """
+    Runs a T-SQL seed script (GO batches) on a raw sqlite3 connection in one transaction.
+    Everything from the DERIVED DATA marker on is skipped (see Database/sqlite/derived.sql).
+    """
+    from migrations import split_batches
+
+    script = script.split(DERIVED_DATA_MARKER, 1)[0]
+    raw.execute('BEGIN')
+    try:
+        for batch in split_batches(script):
+            _ScriptRunner(raw, echo).run(batch)
+        raw.execute('COMMIT')
+    except Exception:
+        raw.execute('ROLLBACK')
+        raise
+
+def apply_derived_data(raw):
+    """
+    Fills what the seed scripts' DERIVED DATA section does on SQL Server: runs
+    Database/sqlite/derived.sql and rebuilds the donor search index (donor_search.py).
+    """
+    from donor_search import rebuild_index
+
+    with open(os.path.join(SCHEMA_DIR, 'derived.sql'), encoding='utf-8') as f:
+        raw.executescript(f.read())
+    raw.execute('BEGIN')
+    try:
+        rebuild_index(raw.cursor())
+        raw.execute('COMMIT')
+    except Exception:
+        raw.execute('ROLLBACK')
+        raise
+
+def init_database(path, seeds=DEFAULT_SEEDS, echo=None):
+    """
+    Creates a fresh SQLite database at `path`: schema, seed scripts, derived data, ANALYZE.
+    An existing file at `path` is replaced.
+
+    Args:
+        seeds (iterable[str]): Seed scripts, relative to Database/ unless absolute.
+        echo (callable): Receives the scripts' PRINT messages.
+
+    Returns:
+        dict: Row count per table.
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    raw = open_raw(path)
+    try:
+        with open(os.path.join(SCHEMA_DIR, 'schema.sql'), encoding='utf-8') as f:
+            raw.executescript(f.read())
+        for seed in seeds:
+            with open(os.path.join(SEED_DIR, seed), encoding='utf-8') as f:
+                run_tsql_script(raw, f.read(), echo)
+        apply_derived_data(raw)
+        raw.execute('ANALYZE')  # planner statistics for the seeded data
+
+        tables = [row[0] for row in raw.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        return {table: raw.execute(f'SELECT COUNT(*) FROM [{table}]').fetchone()[0] for table in tables}
+    finally:
+        raw.close()
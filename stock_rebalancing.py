@@ -0,0 +1,285 @@
+import heapq
+import time
+from collections import namedtuple
+from math import asin, cos, radians, sin, sqrt
+
+# ==================================================================================
+# STOCK REBALANCING (which bags to move between areas so open requests can be fulfilled)
+# ==================================================================================
+# Per blood type, each area's usable stock is compared with the units its open
+# (Approved) requests still need: areas holding more than they need are sources,
+# areas holding less are sinks. Moving units is a transportation problem: ship
+# min(total surplus, total deficit) units from sources to sinks at the lowest total
+# distance (unit x km between area centres, Area.latitude / longitude, migration 007).
+#
+# It is solved exactly as a min-cost flow by successive shortest paths (Dijkstra with
+# node potentials, stopped at the first sink reached). Every area could ship to every
+# other, but optimal transfers run between nearby areas, so the flow is first solved
+# over each area's CANDIDATES nearest counterparts only; the potentials of that
+# solution then price every other (source, sink) pair, and any pair that would lower
+# the cost (or a sink left short while supply remains) is added and the flow solved
+# again. The first pass is nearly always optimal, which keeps hundreds of areas well
+# under a second.
+
+CANDIDATES = 8                 # nearest sinks per source (and sources per sink) in the first pass
+UNKNOWN_DISTANCE_KM = 50.0     # cost of a transfer from or to an area without coordinates
+EARTH_RADIUS_KM = 6371.0       # as in donor_matching.distance_km
+
+Transfer = namedtuple('Transfer', ['from_area_id', 'to_area_id', 'blood_type_id', 'units', 'distance_km'])
+RebalancePlan = namedtuple('RebalancePlan', ['transfers', 'units', 'unit_km', 'shortfall', 'elapsed_ms'])
+
+
+def plan_rebalancing(areas, stock, demand, candidates=CANDIDATES):
+    """
+    Computes the transfers that cover the most open demand at the lowest total distance.
+
+    Args:
+        areas (list[Area]): Every area (reference_data.Area: id, name, latitude, longitude).
+        stock (dict): {(area_id, blood_type_id): usable units}
+        demand (dict): {(area_id, blood_type_id): units still needed by open requests}
+        candidates (int): Nearest counterparts per area in the first pass.
+
+    Returns:
+        RebalancePlan: (transfers, units moved, total unit x km, {blood_type_id: units no
+        area can spare}, solve time in ms). Transfers are ordered by blood type, source and sink.
+    """
+    started = time.perf_counter()
+    area_ids = [area.id for area in areas]
+    position = {area_id: n for n, area_id in enumerate(area_ids)}
+    km = _distance_matrix(areas)
+    transfers, shortfall = [], {}
+
+    for blood_type_id in sorted({key[1] for key in demand}):
+        sources, sinks = {}, {}
+        for area_id in area_ids:
+            balance = stock.get((area_id, blood_type_id), 0) - demand.get((area_id, blood_type_id), 0)
+            if balance > 0:
+                sources[area_id] = balance
+            elif balance < 0:
+                sinks[area_id] = -balance
+        if not sinks:
+            continue
+
+        source_ids, sink_ids = sorted(sources), sorted(sinks)
+        cost = [[round(1000 * (km[position[i]][position[j]] if km[position[i]][position[j]] is not None
+                               else UNKNOWN_DISTANCE_KM)) for j in sink_ids] for i in source_ids]
+        flows = _min_cost_flow([sources[i] for i in source_ids], [sinks[j] for j in sink_ids], cost, candidates)
+
+        moved = 0
+        for (i, j), units in sorted(flows.items()):
+            distance = km[position[source_ids[i]]][position[sink_ids[j]]]
+            transfers.append(Transfer(source_ids[i], sink_ids[j], blood_type_id, units,
+                                      None if distance is None else round(distance, 2)))
+            moved += units
+        if sum(sinks.values()) > moved:
+            shortfall[blood_type_id] = sum(sinks.values()) - moved
+
+    unit_km = sum(t.units * (t.distance_km if t.distance_km is not None else UNKNOWN_DISTANCE_KM) for t in transfers)
+    return RebalancePlan(transfers, sum(t.units for t in transfers), round(unit_km, 2), shortfall,
+                         (time.perf_counter() - started) * 1000)
+
+
+def _distance_matrix(areas):
+    """Great-circle km between every two areas (donor_matching.distance_km); None without coordinates."""
+    points = [None if area.latitude is None or area.longitude is None
+              else (radians(float(area.latitude)), radians(float(area.longitude))) for area in areas]
+    cos_lat = [None if point is None else cos(point[0]) for point in points]
+    km = [[None] * len(areas) for _ in areas]
+    for a, point_a in enumerate(points):
+        km[a][a] = 0.0
+        if point_a is None:
+            continue
+        lat_a, lon_a = point_a
+        for b in range(a + 1, len(points)):
+            if points[b] is None:
+                continue
+            lat_b, lon_b = points[b]
+            h = sin((lat_b - lat_a) / 2) ** 2 + cos_lat[a] * cos_lat[b] * sin((lon_b - lon_a) / 2) ** 2
+            km[a][b] = km[b][a] = 2 * EARTH_RADIUS_KM * asin(sqrt(h))
+    return km
+
+
+def _min_cost_flow(supply, demand, cost, candidates):
+    """
+    Min-cost flow of min(sum(supply), sum(demand)) units over the complete bipartite graph
+    sources x sinks with integer `cost` (cost[i][j]), priced from a sparse candidate graph.
+
+    Returns:
+        dict: {(source index, sink index): units}
+    """
+    n_src, n_snk = len(supply), len(demand)
+    if not n_src or not n_snk:
+        return {}
+    target = min(sum(supply), sum(demand))
+
+    edges = [set() for _ in range(n_src)]
+    for i in range(n_src):
+        edges[i].update(heapq.nsmallest(candidates, range(n_snk), key=cost[i].__getitem__))
+    for j in range(n_snk):
+        for i in heapq.nsmallest(candidates, range(n_src), key=lambda i: cost[i][j]):
+            edges[i].add(j)
+
+    while True:
+        flows, h_src, h_snk, left_supply, left_demand = _successive_shortest_paths(supply, demand, cost, edges)
+
+        missing = []
+        if sum(flows.values()) < target:
+            # Sinks left short although supply remains: connect them directly
+            missing = [(i, j) for i in range(n_src) if left_supply[i]
+                       for j in range(n_snk) if left_demand[j] and j not in edges[i]]
+        # Pricing: a pair outside the candidate graph with a negative reduced cost would lower the cost
+        for i in range(n_src):
+            row, hi, known = cost[i], h_src[i], edges[i]
+            missing.extend((i, j) for j in range(n_snk) if row[j] + hi - h_snk[j] < 0 and j not in known)
+        if not missing:
+            return flows
+        for i, j in missing:
+            edges[i].add(j)
+
+
+def _successive_shortest_paths(supply, demand, cost, edges):
+    """
+    Successive shortest paths from the sources with supply left to the super sink, over the
+    candidate `edges` (edges[i] = sink indexes source i may ship to) and their residual
+    reverse edges. Reduced costs stay non-negative through node potentials, so each
+    search is a Dijkstra that stops as soon as it reaches the super sink.
+
+    Sources with supply left are where every search starts (distance 0, potential 0), so
+    they are never expanded: every sink keeps its candidate sources sorted by cost and a
+    pointer to the cheapest one still holding supply (sources only run out), and the
+    resulting first hop of every sink waits in a `seeds` heap kept across searches. Only
+    the sinks a search settles, or whose cheapest source ran out, are re-seeded.
+
+    Returns:
+        (dict, list, list, list, list): flows {(i, j): units}, source and sink potentials,
+                                        supply and demand left
+    """
+    n_src, n_snk = len(supply), len(demand)
+    left_supply, left_demand = list(supply), list(demand)
+    # Potentials of inactive sources and of sinks are stored minus `offset`, which every
+    # search raises for all nodes it did not settle; the super sink's is always `offset`
+    h_src, h_snk, offset = [0] * n_src, [0] * n_snk, 0
+    received = [{} for _ in range(n_snk)]   # received[j][i] = units source i ships to sink j
+    adjacency = [sorted(sinks) for sinks in edges]
+    by_sink = [[] for _ in range(n_snk)]
+    for i, sinks in enumerate(edges):
+        for j in sinks:
+            by_sink[j].append((cost[i][j], i))
+    for candidates in by_sink:
+        candidates.sort()
+    cheapest = [0] * n_snk
+    stamp = [0] * n_snk
+    seeds = []   # (reduced cost of the first hop + offset, sink, stamp); stale when the stamp moved on
+
+    def reseed(j):
+        candidates, k = by_sink[j], cheapest[j]
+        while k < len(candidates) and not left_supply[candidates[k][1]]:
+            k += 1
+        cheapest[j] = k
+        stamp[j] += 1
+        if k < len(candidates):
+            heapq.heappush(seeds, (candidates[k][0] - h_snk[j], j, stamp[j]))
+
+    for j in range(n_snk):
+        reseed(j)
+    remaining = min(sum(supply), sum(demand))
+
+    # Nodes: sources 0..n_src-1, sinks n_src..n_src+n_snk-1, super sink SINK
+    SINK = n_src + n_snk
+    while remaining:
+        dist, pred, best, heap, taken = {}, {}, {}, [], []
+        found = None
+        while True:
+            while seeds and seeds[0][2] != stamp[seeds[0][1]]:
+                heapq.heappop(seeds)
+            if seeds and (not heap or seeds[0][0] - offset < heap[0][0]):
+                seed = heapq.heappop(seeds)
+                taken.append(seed)
+                node = n_src + seed[1]
+                if node in dist:
+                    continue
+                d = seed[0] - offset
+                pred[node] = by_sink[seed[1]][cheapest[seed[1]]][1]
+            elif heap:
+                d, node = heapq.heappop(heap)
+                if node in dist:
+                    continue
+            else:
+                break
+            dist[node] = d
+            if node == SINK:
+                found = d
+                break
+            if node < n_src:
+                row, hi = cost[node], h_src[node]
+                for j in adjacency[node]:
+                    v = n_src + j
+                    nd = d + row[j] + hi - h_snk[j]
+                    if v not in dist and nd < best.get(v, nd + 1):
+                        best[v] = nd
+                        pred[v] = node
+                        heapq.heappush(heap, (nd, v))
+            else:
+                j = node - n_src
+                if left_demand[j]:
+                    nd = d + h_snk[j]
+                    if nd < best.get(SINK, nd + 1):
+                        best[SINK] = nd
+                        pred[SINK] = node
+                        heapq.heappush(heap, (nd, SINK))
+                for i in received[j]:
+                    if left_supply[i] or i in dist:
+                        continue
+                    nd = d - cost[i][j] + h_snk[j] - h_src[i]
+                    if nd < best.get(i, nd + 1):
+                        best[i] = nd
+                        pred[i] = node
+                        heapq.heappush(heap, (nd, i))
+        for seed in taken:
+            heapq.heappush(seeds, seed)
+        if found is None:
+            break
+
+        # Potentials: nodes settled before the sink move by their distance, the rest by the
+        # sink's (kept as a common offset); sources with supply left stay at 0
+        for node, d in dist.items():
+            if node < n_src:
+                h_src[node] += d - found
+            elif node < SINK:
+                h_snk[node - n_src] += d - found
+                reseed(node - n_src)
+        offset += found
+
+        # Walk the path back from the super sink and push its bottleneck
+        path = []
+        node = pred[SINK]
+        while node in pred:
+            path.append((pred[node], node))
+            node = pred[node]
+        units = min(left_supply[node], left_demand[pred[SINK] - n_src], remaining)
+        for u, v in path:
+            if v >= n_src:   # forward edge (source u -> sink v) has no limit
+                continue
+            units = min(units, received[u - n_src][v])
+        for u, v in path:
+            if u < n_src:                         # forward: source u ships to sink v
+                j = v - n_src
+                received[j][u] = received[j].get(u, 0) + units
+            else:                                 # reverse: sink u takes less from source v
+                j = u - n_src
+                received[j][v] -= units
+                if not received[j][v]:
+                    del received[j][v]
+        left_supply[node] -= units
+        if not left_supply[node]:
+            h_src[node] = -offset
+            for j in adjacency[node]:
+                if by_sink[j][cheapest[j]][1] == node:
+                    reseed(j)
+        left_demand[pred[SINK] - n_src] -= units
+        remaining -= units
+
+    h_src = [h + offset if not left else 0 for h, left in zip(h_src, left_supply)]
+    h_snk = [h + offset for h in h_snk]
+    flows = {(i, j): units for j, sources in enumerate(received) for i, units in sources.items()}
+    return flows, h_src, h_snk, left_supply, left_demand
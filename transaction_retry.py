@@ -0,0 +1,89 @@
+import logging
+import random
+import threading
+
+# ==================================================================================
+# TRANSACTION RETRIES
+# ==================================================================================
+# db.run_transaction re-runs a transaction whose failure was transient: a deadlock
+# victim, a lock or snapshot conflict, a dropped connection. The dialect says whether
+# an error is retryable and why (db_backend.Dialect.classify_error); RetryPolicy says
+# how long to wait - exponential backoff with full jitter, so the victims of one
+# deadlock do not collide again in lockstep - and whether the request's time budget
+# leaves room for another attempt. TransactionStats counts the outcomes per
+# transaction for /manager/diagnostics.
+
+log = logging.getLogger('bloodlink.transactions')
+
+
+class RetryPolicy:
+    """
+    Args:
+        max_retries (int): Re-runs after the first attempt.
+        base_delay (float): Backoff ceiling of the first retry in seconds; doubles per retry.
+        max_delay (float): Upper bound of the backoff ceiling.
+        budget (float): Seconds a request (or job) may spend in transactions, retries included;
+                        no retry is started that would sleep past it.
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.02, max_delay=0.5, budget=5.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay(self, retry):
+        """Seconds to wait before retry number `retry` (0-based): uniform in [0, ceiling]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class TransactionStats:
+    """
+    Thread-safe per-transaction counters: runs, committed and failed runs, retries by
+    reason, runs that needed a retry, and runs that gave up on a retryable error
+    (out of retries or out of budget).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name = {}
+
+    def _entry(self, name):
+        entry = self._by_name.get(name)
+        if entry is None:
+            entry = self._by_name[name] = {'name': name, 'runs': 0, 'committed': 0, 'failed': 0,
+                                           'retried_runs': 0, 'retries': 0, 'gave_up': 0, 'reasons': {}}
+        return entry
+
+    def record_retry(self, name, reason):
+        with self._lock:
+            entry = self._entry(name)
+            entry['retries'] += 1
+            entry['reasons'][reason] = entry['reasons'].get(reason, 0) + 1
+
+    def record_run(self, name, success, retries, gave_up=False):
+        with self._lock:
+            entry = self._entry(name)
+            entry['runs'] += 1
+            entry['committed' if success else 'failed'] += 1
+            entry['retried_runs'] += bool(retries)
+            entry['gave_up'] += gave_up
+
+    def stats(self):
+        """
+        Returns:
+            list[dict]: name, runs, committed, failed, retried_runs, retries, gave_up and
+                        {reason: retries} per transaction, most retried first.
+        """
+        with self._lock:
+            rows = [dict(entry, reasons=dict(entry['reasons'])) for entry in self._by_name.values()]
+        rows.sort(key=lambda row: (-row['retries'], -row['runs'], row['name']))
+        return rows
+
+    def totals(self):
+        rows = self.stats()
+        return {key: sum(row[key] for row in rows) for key in ('runs', 'retries', 'retried_runs', 'gave_up')}
+
+    def reset(self):
+        with self._lock:
+            self._by_name = {}
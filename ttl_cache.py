@@ -0,0 +1,62 @@
+import threading
+import time
+
+# ==================================================================================
+# SMALL IN-PROCESS TTL CACHE
+# ==================================================================================
+
+class TTLCache:
+    """
+    Thread-safe key -> value cache whose entries expire after `ttl` seconds.
+
+    Used for hot per-user values (e.g. the unread-notification badge) where a few
+    seconds of staleness across worker processes is acceptable. Writers in this
+    process call invalidate() so their own users see changes immediately.
+
+    Args:
+        ttl (float): Seconds an entry is served before it must be reloaded.
+        max_entries (int): Upper bound on cached keys; oldest entries are dropped first.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (value, expires_at); dict keeps insertion order
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value, or `default` if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self):
+        """Drops expired entries, then the oldest ones until under max_entries. Caller holds the lock."""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]